@@ -0,0 +1,82 @@
+"""
+Benchmark: índice de autocompletado por prefijo (database/autocomplete.py).
+
+Para catálogos de 10k, 50k y 200k productos reporta:
+- tiempo de construcción (get_active_products + ordenar) y memoria del índice
+- latencia de complete() con textos que coinciden con muchos, pocos y ningún
+  producto, comparada con una búsqueda en la BD (search_by_name)
+- latencia de un alta/baja incremental frente a reconstruir el índice
+
+Uso: python benchmarks/bench_autocomplete.py
+"""
+import time
+import tracemalloc
+
+from comun import crear_bd_temporal, limpiar_bd_temporal, medir, sembrar_catalogo, repo
+from database.autocomplete import ProductAutocomplete
+
+
+TAMANIOS = (10_000, 50_000, 200_000)
+# Los nombres sintéticos son "Producto Bench 000000" .. "Producto Bench 199999"
+TEXTOS = (
+    ("muchos", "producto"),
+    ("pocos", "bench 00042"),
+    ("uno", "000421"),
+    ("ninguno", "yerba"),
+)
+REPETICIONES = 20_000
+REPETICIONES_BD = 200
+CAMBIOS = 500
+
+
+def construir():
+    """Returns: (índice, segundos, bytes asignados por el índice)"""
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    indice = ProductAutocomplete(1)
+    segundos = time.perf_counter() - inicio
+    memoria = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return indice, segundos, memoria
+
+
+def main():
+    print("=" * 76)
+    print("  BENCHMARK: autocompletado por prefijo (µs por operación)")
+    print("=" * 76)
+
+    for tamanio in TAMANIOS:
+        temp_dir = crear_bd_temporal(seed=False)
+        try:
+            nombres = sembrar_catalogo(tamanio)
+            indice, segundos, memoria = construir()
+            print(f"\n{tamanio} productos: construcción {segundos * 1000:.0f} ms, "
+                  f"{memoria / 1024 / 1024:.1f} MB ({memoria / tamanio:.0f} bytes/producto)")
+
+            print(f"  {'texto':<24}{'resultados':>11}{'complete()':>12}{'search_by_name':>16}")
+            for etiqueta, texto in TEXTOS:
+                resultados = indice.complete(texto)
+                memoria_us = 1e6 / medir(lambda: indice.complete(texto), REPETICIONES)
+                bd_us = 1e6 / medir(lambda: repo.search_by_name(texto, 1, limit=10), REPETICIONES_BD)
+                print(f"  {etiqueta + ' (' + texto + ')':<24}{len(resultados):>11}"
+                      f"{memoria_us:>12.1f}{bd_us:>16.0f}")
+
+            # Bajas y altas sobre el índice ya construido (lo que hacen los avisos del repository)
+            cambios = nombres[::max(1, tamanio // CAMBIOS)][:CAMBIOS]
+            inicio = time.perf_counter()
+            for nombre in cambios:
+                indice.remove(nombre)
+            for nombre in cambios:
+                indice.add(nombre)
+            incremental_us = (time.perf_counter() - inicio) / (2 * len(cambios)) * 1e6
+            inicio = time.perf_counter()
+            indice.rebuild()
+            rebuild_ms = (time.perf_counter() - inicio) * 1000
+            print(f"  alta/baja incremental {incremental_us:.1f} µs  vs  rebuild {rebuild_ms:.0f} ms")
+            indice.close()
+        finally:
+            limpiar_bd_temporal(temp_dir)
+
+
+if __name__ == "__main__":
+    main()
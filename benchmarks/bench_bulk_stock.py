@@ -0,0 +1,52 @@
+"""
+Benchmark: recibir una entrega de proveedor de N líneas.
+
+- fila por fila: InventarioSQLite.aumentar_stock por línea (una transacción
+  y un fsync por línea)
+- en lote: InventarioSQLite.ajustar_stock_lote (una transacción, executemany
+  por tanda), con la entrega como generador
+
+Uso: python benchmarks/bench_bulk_stock.py
+"""
+import time
+
+from comun import crear_bd_temporal, limpiar_bd_temporal, sembrar_catalogo, repo
+from inventario_sqlite import InventarioSQLite
+
+
+LINEAS = (100, 400, 5_000)
+CATALOGO = 10_000
+
+
+def main():
+    print("=" * 72)
+    print(f"  BENCHMARK: entrega de proveedor (catálogo de {CATALOGO}, perfil {repo.DURABILITY_PROFILE})")
+    print("=" * 72)
+    print(f"{'líneas':>8}{'fila por fila':>16}{'en lote':>12}{'mejora':>9}")
+
+    temp_dir = crear_bd_temporal(seed=False)
+    try:
+        nombres = sembrar_catalogo(CATALOGO, stock=0)
+        inventario = InventarioSQLite(branch_id=1)
+
+        for lineas in LINEAS:
+            entrega = [(nombres[(i * 7) % CATALOGO], 12) for i in range(lineas)]
+
+            inicio = time.perf_counter()
+            for nombre, cantidad in entrega:
+                inventario.aumentar_stock(nombre, cantidad)
+            fila_por_fila = time.perf_counter() - inicio
+
+            inicio = time.perf_counter()
+            resultado = inventario.ajustar_stock_lote(fila for fila in entrega)
+            en_lote = time.perf_counter() - inicio
+            assert resultado == {"applied": lineas, "failures": []}
+
+            print(f"{lineas:>8}{fila_por_fila * 1000:>13.0f} ms{en_lote * 1000:>9.1f} ms"
+                  f"{fila_por_fila / en_lote:>8.0f}x")
+    finally:
+        limpiar_bd_temporal(temp_dir)
+
+
+if __name__ == "__main__":
+    main()
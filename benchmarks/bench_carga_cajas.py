@@ -0,0 +1,367 @@
+"""
+Benchmark: generador de carga con varias cajas en varias sucursales.
+
+test_concurrency.py prueba que las ventas concurrentes son correctas; esto
+mide cuánto rinden. Cada caja es un thread (o un proceso) que hace el camino
+real de una venta: SesionVenta.agregar_producto por cada item y
+confirmar_pago -> RegistroVentas -> process_sale_atomic, contra una BD temporal.
+
+Carga realista:
+- tamaño de carrito log-normal (mediana CARRITO_MEDIANA, la mayoría chicos y
+  algunos muy grandes), entre 1 y CARRITO_MAXIMO items
+- productos con sesgo Zipf: los primeros del catálogo (pan, leche...) salen
+  en casi todos los carritos; con stock limitado, se agotan
+- cantidad por item: casi siempre 1
+
+Reporta: ventas por segundo (total y por sucursal), latencia de checkout
+(confirmar_pago) p50/p95/p99, espera del write lock dentro de
+process_sale_atomic (metrics.py) y tasas de fallas por stock (items
+rechazados al agregar y cobros que fallan al confirmar).
+
+El resultado queda en un JSON (--salida) para compararlo con corridas
+anteriores (--comparar).
+
+Uso:
+    python benchmarks/bench_carga_cajas.py
+    python benchmarks/bench_carga_cajas.py --sucursales 4 --cajas 4 --modo procesos --sharding
+    python benchmarks/bench_carga_cajas.py --salida nueva.json --comparar anterior.json
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import platform
+import random
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+from comun import crear_bd_temporal, crear_sucursales, limpiar_bd_temporal, sembrar_catalogo, repo
+from carrito import Carrito
+from database import metrics, sharding
+from inventario_sqlite import InventarioSQLite
+from registro_ventas import RegistroVentas
+from sesion_venta import SesionVenta
+
+
+CARRITO_MEDIANA = 6
+CARRITO_DISPERSION = 0.8  # sigma de la log-normal
+CARRITO_MAXIMO = 80
+# Probabilidad de llevar 1, 2 o 3 unidades de un item
+CANTIDADES = (1, 2, 3)
+PESOS_CANTIDAD = (0.80, 0.15, 0.05)
+# Segundos que una caja espera a que arranquen las demás (si una no arranca, fallan todas)
+ESPERA_ARRANQUE = 120
+
+
+# ---------- Una caja ----------
+
+def armar_carrito(rng, nombres, pesos_acumulados):
+    """Items de un carrito: [(nombre, cantidad)] con tamaño log-normal y sesgo Zipf"""
+    tamanio = round(rng.lognormvariate(math.log(CARRITO_MEDIANA), CARRITO_DISPERSION))
+    tamanio = max(1, min(CARRITO_MAXIMO, tamanio))
+    productos = rng.choices(nombres, cum_weights=pesos_acumulados, k=tamanio)
+    return [(nombre, rng.choices(CANTIDADES, PESOS_CANTIDAD)[0]) for nombre in productos]
+
+
+def correr_caja(config, cash_register_id, branch_id, indice, barrera):
+    """
+    Hace config["ventas"] ventas en una caja.
+
+    Returns:
+        dict: latencias de checkout (s), contadores de fallas e inicio/fin
+        (time.time(), comparables entre procesos)
+    """
+    rng = random.Random(config["semilla"] * 1_000_003 + indice)
+    nombres = config["nombres"]
+    pesos = [1 / (rango + 1) ** config["zipf"] for rango in range(len(nombres))]
+    pesos_acumulados = list(_acumular(pesos))
+
+    inventario = InventarioSQLite(branch_id=branch_id)
+    registro = RegistroVentas(branch_id=branch_id, cash_register_id=cash_register_id)
+    resultado = {
+        "branch_id": branch_id, "latencias": [], "items": 0, "items_rechazados": 0,
+        "cobros_fallidos": 0, "carritos_vacios": 0, "errores": 0,
+    }
+
+    barrera.wait(ESPERA_ARRANQUE)
+    resultado["inicio"] = time.time()
+    for _ in range(config["ventas"]):
+        sesion = SesionVenta(inventario, registro, reservar_stock=config["reservas"])
+        sesion.iniciar_venta(Carrito())
+        for nombre, cantidad in armar_carrito(rng, nombres, pesos_acumulados):
+            resultado["items"] += 1
+            if not sesion.agregar_producto(nombre, cantidad).exito:
+                resultado["items_rechazados"] += 1
+        if sesion.carrito.esta_vacio():
+            resultado["carritos_vacios"] += 1
+            continue
+
+        inicio = time.perf_counter()
+        try:
+            sesion.confirmar_pago("efectivo")
+            resultado["latencias"].append(time.perf_counter() - inicio)
+        except ValueError:
+            # Otra caja se llevó el stock entre agregar y cobrar
+            resultado["cobros_fallidos"] += 1
+            sesion.carrito.vaciar()
+        except sqlite3.Error:
+            # Ej: se agotaron los reintentos esperando el write lock
+            resultado["errores"] += 1
+            sesion.carrito.vaciar()
+    resultado["fin"] = time.time()
+    return resultado
+
+
+def _acumular(valores):
+    total = 0.0
+    for valor in valores:
+        total += valor
+        yield total
+
+
+def _preparar_proceso(config):
+    """El proceso hijo arranca con el repository por defecto: apuntarlo a la BD temporal"""
+    repo.DB_PATH = config["db_path"]
+    repo.SHARDING = config["sharding"]
+    repo.DURABILITY_PROFILE = config["perfil"]
+    metrics.enable()
+
+
+def _proceso_caja(config, cash_register_id, branch_id, indice, barrera, cola):
+    _preparar_proceso(config)
+    try:
+        resultado = correr_caja(config, cash_register_id, branch_id, indice, barrera)
+        resultado["metricas"] = metrics.snapshot().get("process_sale_atomic")
+    except Exception as e:
+        # Avisar al proceso principal en vez de dejarlo esperando en la cola
+        resultado = {"falla": f"caja {cash_register_id}: {type(e).__name__} {e}"}
+    finally:
+        repo.close_pool()
+    cola.put(resultado)
+
+
+# ---------- Todas las cajas ----------
+
+def correr_hilos(config, cajas):
+    """Una caja por thread, todas en este proceso (comparten pools y métricas)."""
+    metrics.reset()
+    metrics.enable()
+    barrera = threading.Barrier(len(cajas))
+    resultados = [None] * len(cajas)
+
+    def caja(i, cash_register_id, branch_id):
+        resultados[i] = correr_caja(config, cash_register_id, branch_id, i, barrera)
+
+    threads = [threading.Thread(target=caja, args=(i, *registro)) for i, registro in enumerate(cajas)]
+    try:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        metrics.disable()
+    return resultados, [metrics.snapshot().get("process_sale_atomic")]
+
+
+def correr_procesos(config, cajas):
+    """Una caja por proceso: cada una con su intérprete (sin GIL compartido) y sus conexiones."""
+    contexto = multiprocessing.get_context("spawn")
+    barrera = contexto.Barrier(len(cajas))
+    cola = contexto.Queue()
+    procesos = [
+        contexto.Process(target=_proceso_caja, args=(config, *registro, i, barrera, cola))
+        for i, registro in enumerate(cajas)
+    ]
+    for p in procesos:
+        p.start()
+    resultados = [cola.get() for _ in procesos]
+    for p in procesos:
+        p.join()
+    fallas = [r["falla"] for r in resultados if "falla" in r]
+    if fallas:
+        raise RuntimeError("; ".join(fallas))
+    return resultados, [r.pop("metricas") for r in resultados]
+
+
+# ---------- Resultados ----------
+
+def percentiles_ms(muestras):
+    """p50/p95/p99/max (nearest-rank) en milisegundos"""
+    ordenadas = sorted(muestras)
+    if not ordenadas:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    resultado = {}
+    for etiqueta, q in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99)):
+        indice = min(len(ordenadas) - 1, max(0, int(q * len(ordenadas) + 0.5) - 1))
+        resultado[etiqueta] = ordenadas[indice] * 1000
+    resultado["max"] = ordenadas[-1] * 1000
+    return resultado
+
+
+def resumir(resultados, metricas):
+    """Arma el dict que se guarda en el JSON."""
+    duracion = max(r["fin"] for r in resultados) - min(r["inicio"] for r in resultados)
+    latencias = [latencia for r in resultados for latencia in r["latencias"]]
+    ventas = len(latencias)
+    intentos = ventas + sum(r["cobros_fallidos"] + r["errores"] for r in resultados)
+    items = sum(r["items"] for r in resultados)
+
+    # Espera del lock: sumas exactas; el p99 sale de la ventana de metrics.py
+    # (con procesos, el mayor de los p99 de cada proceso)
+    metricas = [m for m in metricas if m and "lock_wait" in m]
+    espera_total = sum(m["lock_wait"]["sum"] for m in metricas)
+    transacciones = sum(m["transactions"] for m in metricas)
+
+    por_sucursal = {}
+    for r in resultados:
+        sucursal = por_sucursal.setdefault(str(r["branch_id"]), {"ventas": 0, "cobros_fallidos": 0})
+        sucursal["ventas"] += len(r["latencias"])
+        sucursal["cobros_fallidos"] += r["cobros_fallidos"]
+    for sucursal in por_sucursal.values():
+        sucursal["ventas_por_segundo"] = sucursal["ventas"] / duracion
+
+    return {
+        "duracion_s": duracion,
+        "ventas": ventas,
+        "ventas_por_segundo": ventas / duracion,
+        "checkout_ms": percentiles_ms(latencias),
+        "espera_lock_ms": {
+            "total": espera_total * 1000,
+            "por_venta": espera_total * 1000 / transacciones if transacciones else 0.0,
+            "p99": max((m["lock_wait"]["p99"] for m in metricas), default=0.0) * 1000,
+            "fraccion_del_checkout": espera_total / sum(latencias) if latencias else 0.0,
+        },
+        "items": items,
+        "items_rechazados": sum(r["items_rechazados"] for r in resultados),
+        "tasa_items_rechazados": sum(r["items_rechazados"] for r in resultados) / items if items else 0.0,
+        "carritos_vacios": sum(r["carritos_vacios"] for r in resultados),
+        "cobros_fallidos": sum(r["cobros_fallidos"] for r in resultados),
+        "tasa_cobros_fallidos": (intentos - ventas) / intentos if intentos else 0.0,
+        "errores": sum(r["errores"] for r in resultados),
+        "por_sucursal": por_sucursal,
+    }
+
+
+# Métricas que se comparan con --comparar: (camino en "resultados", mayor es mejor)
+COMPARABLES = (
+    (("ventas_por_segundo",), True),
+    (("checkout_ms", "p50"), False),
+    (("checkout_ms", "p99"), False),
+    (("espera_lock_ms", "por_venta"), False),
+    (("tasa_cobros_fallidos",), False),
+)
+
+
+def comparar(anterior, actual):
+    """Imprime cada métrica de COMPARABLES antes y ahora."""
+    if anterior["config"] != actual["config"]:
+        print("  Aviso: la corrida anterior usó otra configuración")
+    print(f"\n  {'métrica':<28}{'anterior':>12}{'actual':>12}{'cambio':>10}")
+    for camino, mayor_es_mejor in COMPARABLES:
+        antes, ahora = anterior["resultados"], actual["resultados"]
+        for clave in camino:
+            antes, ahora = antes[clave], ahora[clave]
+        cambio = (ahora - antes) / antes if antes else 0.0
+        peor = cambio < 0 if mayor_es_mejor else cambio > 0
+        marca = " (peor)" if peor and abs(cambio) >= 0.05 else ""
+        print(f"  {'.'.join(camino):<28}{antes:>12.3f}{ahora:>12.3f}{cambio:>9.0%}{marca}")
+
+
+def imprimir(resumen):
+    print(f"\n  Ventas:           {resumen['ventas']} en {resumen['duracion_s']:.1f} s "
+          f"({resumen['ventas_por_segundo']:.0f} ventas/s)")
+    for branch_id, sucursal in sorted(resumen["por_sucursal"].items(), key=lambda x: int(x[0])):
+        print(f"    sucursal {branch_id:>3}: {sucursal['ventas_por_segundo']:8.0f} ventas/s")
+    checkout = resumen["checkout_ms"]
+    print(f"  Checkout:         p50 {checkout['p50']:.2f} ms   p95 {checkout['p95']:.2f} ms   "
+          f"p99 {checkout['p99']:.2f} ms   max {checkout['max']:.2f} ms")
+    espera = resumen["espera_lock_ms"]
+    print(f"  Espera del lock:  {espera['por_venta']:.2f} ms por venta (p99 {espera['p99']:.2f} ms), "
+          f"{espera['fraccion_del_checkout']:.0%} del checkout")
+    print(f"  Items rechazados: {resumen['items_rechazados']} de {resumen['items']} "
+          f"({resumen['tasa_items_rechazados']:.1%})")
+    print(f"  Cobros fallidos:  {resumen['cobros_fallidos']} ({resumen['tasa_cobros_fallidos']:.1%}), "
+          f"errores {resumen['errores']}, carritos vacíos {resumen['carritos_vacios']}")
+
+
+def argumentos():
+    parser = argparse.ArgumentParser(description="Carga de varias cajas en varias sucursales")
+    parser.add_argument("--sucursales", type=int, default=2)
+    parser.add_argument("--cajas", type=int, default=4, help="cajas por sucursal")
+    parser.add_argument("--modo", choices=("hilos", "procesos"), default="hilos")
+    parser.add_argument("--ventas", type=int, default=100, help="ventas por caja")
+    parser.add_argument("--catalogo", type=int, default=5_000, help="productos por sucursal")
+    parser.add_argument("--stock", type=int, default=300, help="stock inicial de cada producto")
+    parser.add_argument("--zipf", type=float, default=1.1, help="sesgo hacia los productos más vendidos")
+    parser.add_argument("--reservas", action="store_true", help="los carritos reservan stock")
+    parser.add_argument("--sharding", action="store_true", help="un archivo por sucursal")
+    parser.add_argument("--perfil", default="safe", help="perfil de durabilidad")
+    parser.add_argument("--semilla", type=int, default=1)
+    parser.add_argument("--salida", default="carga_cajas.json", help="JSON con el resultado")
+    parser.add_argument("--comparar", help="JSON de una corrida anterior")
+    return parser.parse_args()
+
+
+def main():
+    args = argumentos()
+    config = {
+        "sucursales": args.sucursales, "cajas_por_sucursal": args.cajas, "modo": args.modo,
+        "ventas": args.ventas, "catalogo": args.catalogo, "stock": args.stock, "zipf": args.zipf,
+        "reservas": args.reservas, "sharding": args.sharding, "perfil": args.perfil,
+        "semilla": args.semilla,
+    }
+    print("=" * 72)
+    print(f"  BENCHMARK: carga de {args.sucursales * args.cajas} cajas en {args.sucursales} "
+          f"sucursales ({args.modo}, perfil {args.perfil})")
+    print("=" * 72)
+
+    perfil_original = repo.DURABILITY_PROFILE
+    temp_dir = crear_bd_temporal(seed=False)
+    try:
+        cajas = crear_sucursales(args.sucursales, args.cajas)
+        nombres = sembrar_catalogo(args.catalogo, branch_ids=range(1, args.sucursales + 1),
+                                   stock=args.stock)
+        if args.sharding:
+            repo.close_pool()
+            sharding.split_into_shards(repo.DB_PATH)
+        repo.SHARDING = args.sharding
+        repo.DURABILITY_PROFILE = args.perfil
+
+        correr = correr_procesos if args.modo == "procesos" else correr_hilos
+        resultados, metricas = correr(
+            dict(config, nombres=nombres, db_path=repo.DB_PATH), cajas
+        )
+        resumen = resumir(resultados, metricas)
+    finally:
+        repo.SHARDING = False
+        repo.DURABILITY_PROFILE = perfil_original
+        limpiar_bd_temporal(temp_dir)
+
+    imprimir(resumen)
+    salida = {
+        "benchmark": "carga_cajas",
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "entorno": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "plataforma": platform.platform(),
+            "cpus": multiprocessing.cpu_count(),
+        },
+        "config": config,
+        "resultados": resumen,
+    }
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(salida, f, indent=2, sort_keys=True)
+    print(f"\n  Resultado en {args.salida}")
+
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            comparar(json.load(f), salida)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
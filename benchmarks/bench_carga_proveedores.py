@@ -0,0 +1,107 @@
+"""
+Benchmark: arranque de GestorProveedor según proveedores y relaciones.
+
+Compara la carga de antes (get_all_suppliers + get_relations_by_supplier
+por proveedor + obtener_producto por relación: 1 + P + R queries) con la
+carga en bloque de ahora (get_all_suppliers + iter_supplier_relations:
+1 + R / SUPPLIER_PAGE_SIZE queries), para cada combinación de ESCENARIOS.
+
+Cada proveedor vende un tramo del catálogo (se reparten las relaciones
+entre proveedores); el catálogo tiene CATALOGO productos. Mediana de
+REPETICIONES cargas, cada una con un InventarioSQLite nuevo (sin productos
+internados de antes).
+
+Uso: python benchmarks/bench_carga_proveedores.py
+"""
+import sqlite3
+import statistics
+import time
+
+from comun import crear_bd_temporal, limpiar_bd_temporal, sembrar_catalogo, repo
+from gestor_proveedor import GestorProveedor
+from inventario_sqlite import InventarioSQLite
+from producto_proveedor import ProductoProveedor
+from proveedor import Proveedor
+
+
+CATALOGO = 20_000
+# (proveedores, relaciones)
+ESCENARIOS = [(10, 2_000), (30, 5_000), (100, 20_000), (300, 50_000)]
+REPETICIONES = 3
+
+
+def cargar_antes(inventario):
+    """El GestorProveedor._cargar de antes: una query por proveedor y por relación"""
+    relaciones = []
+    for proveedor_id, nombre_proveedor in repo.get_all_suppliers():
+        proveedor = Proveedor(nombre_proveedor, id=proveedor_id)
+        for relacion_id, _, nombre_producto, precio_compra, stock in repo.get_relations_by_supplier(proveedor_id):
+            producto = inventario.obtener_producto(nombre_producto)
+            if producto:
+                relaciones.append(ProductoProveedor(
+                    producto, proveedor, precio_compra, stock, id_relacion=relacion_id
+                ))
+    return relaciones
+
+
+def sembrar_proveedores(proveedores, relaciones):
+    """
+    Reemplaza los proveedores por `proveedores` proveedores que suman
+    `relaciones` relaciones: cada uno vende un tramo consecutivo del catálogo.
+    """
+    por_proveedor = relaciones // proveedores
+    conn = sqlite3.connect(repo.DB_PATH)
+    try:
+        conn.execute("DELETE FROM product_supplier")
+        conn.execute("DELETE FROM supplier")
+        primer_producto = conn.execute(
+            "SELECT MIN(id) FROM product WHERE category = 'Bench'").fetchone()[0]
+        for p in range(proveedores):
+            supplier_id = conn.execute(
+                "INSERT INTO supplier (name, active) VALUES (?, 1)", (f"Proveedor Bench {p}",)
+            ).lastrowid
+            desde = primer_producto + (p * por_proveedor) % CATALOGO
+            conn.execute(
+                """INSERT INTO product_supplier (product_id, supplier_id, purchase_price, available_stock)
+                   SELECT id, ?, 80, 500 FROM product
+                   WHERE category = 'Bench' AND id >= ? ORDER BY id LIMIT ?""",
+                (supplier_id, desde, por_proveedor)
+            )
+        conn.commit()
+        return conn.execute("SELECT COUNT(*) FROM product_supplier").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def mediana_s(fn):
+    tiempos = []
+    for _ in range(REPETICIONES):
+        inicio = time.perf_counter()
+        resultado = fn()
+        tiempos.append(time.perf_counter() - inicio)
+    return resultado, statistics.median(tiempos)
+
+
+def main():
+    print("=" * 72)
+    print(f"  BENCHMARK: carga de GestorProveedor (catálogo de {CATALOGO}, "
+          f"página de {repo.SUPPLIER_PAGE_SIZE})")
+    print("=" * 72)
+
+    temp_dir = crear_bd_temporal()
+    try:
+        sembrar_catalogo(CATALOGO)
+        print(f"\n{'proveedores':>12}{'relaciones':>12}{'antes':>12}{'ahora':>12}{'x':>8}")
+        for proveedores, relaciones in ESCENARIOS:
+            total = sembrar_proveedores(proveedores, relaciones)
+            antes, seg_antes = mediana_s(lambda: cargar_antes(InventarioSQLite(branch_id=1)))
+            gestor, seg_ahora = mediana_s(lambda: GestorProveedor(InventarioSQLite(branch_id=1)))
+            assert len(antes) == len(gestor.relaciones) == total, (len(antes), len(gestor.relaciones), total)
+            print(f"{proveedores:>12}{total:>12}{seg_antes * 1000:>9.0f} ms"
+                  f"{seg_ahora * 1000:>9.0f} ms{seg_antes / seg_ahora:>7.1f}x")
+    finally:
+        limpiar_bd_temporal(temp_dir)
+
+
+if __name__ == "__main__":
+    main()
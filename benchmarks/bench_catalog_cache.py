@@ -0,0 +1,80 @@
+"""
+Benchmark: escaneos por segundo de InventarioSQLite.obtener_producto
+con y sin la caché del catálogo (catalog_cache.py).
+
+Simula una caja armando carritos de 40 productos distintos de un catálogo
+de 1000. Dos escenarios:
+- sucursal tranquila: nadie más escribe
+- con otra caja vendiendo cada 5 ms (cada venta invalida la caché)
+
+Uso: python benchmarks/bench_catalog_cache.py
+"""
+import threading
+import time
+
+from comun import crear_bd_temporal, limpiar_bd_temporal, sembrar_catalogo, repo
+from inventario_sqlite import InventarioSQLite
+
+
+CATALOGO = 1000
+ITEMS_POR_CARRITO = 40
+CARRITOS = 250
+PAUSA_OTRA_CAJA = 0.005
+
+
+def escanear(inventario, nombres):
+    """Arma CARRITOS carritos. Returns: escaneos/segundo"""
+    inicio = time.perf_counter()
+    for carrito in range(CARRITOS):
+        base = (carrito * 7) % (len(nombres) - ITEMS_POR_CARRITO)
+        for nombre in nombres[base:base + ITEMS_POR_CARRITO]:
+            inventario.obtener_producto(nombre)
+    return CARRITOS * ITEMS_POR_CARRITO / (time.perf_counter() - inicio)
+
+
+def con_otra_caja(fn, nombres):
+    """Corre fn() mientras otra caja vende cada PAUSA_OTRA_CAJA segundos."""
+    detener = threading.Event()
+    items = [{"product_name": nombres[-1], "quantity": 1, "price_at_sale": 100}]
+
+    def otra_caja():
+        while not detener.is_set():
+            repo.process_sale_atomic(1, 2, items, 100, "2026-03-05 10:00:00")
+            time.sleep(PAUSA_OTRA_CAJA)
+
+    hilo = threading.Thread(target=otra_caja)
+    hilo.start()
+    try:
+        return fn()
+    finally:
+        detener.set()
+        hilo.join()
+
+
+def main():
+    temp_dir = crear_bd_temporal()
+    try:
+        nombres = sembrar_catalogo(CATALOGO)
+
+        print("=" * 72)
+        print(f"  BENCHMARK: escaneos/segundo (carritos de {ITEMS_POR_CARRITO}, catálogo de {CATALOGO})")
+        print("=" * 72)
+        print(f"{'escenario':<28}{'sin caché':>12}{'con caché':>12}{'mejora':>9}{'hit rate':>11}")
+
+        for escenario, correr in (
+            ("sucursal tranquila", lambda fn: fn()),
+            ("otra caja vendiendo", lambda fn: con_otra_caja(fn, nombres)),
+        ):
+            sin_cache = correr(lambda: escanear(InventarioSQLite(branch_id=1), nombres))
+            inventario = InventarioSQLite(branch_id=1, usar_cache=True)
+            con_cache = correr(lambda: escanear(inventario, nombres))
+            stats = inventario.cache.stats()
+            inventario.cache.close()
+            print(f"{escenario:<28}{sin_cache:>12.0f}{con_cache:>12.0f}"
+                  f"{con_cache / sin_cache:>8.1f}x{stats['hit_rate']:>10.0%}")
+    finally:
+        limpiar_bd_temporal(temp_dir)
+
+
+if __name__ == "__main__":
+    main()
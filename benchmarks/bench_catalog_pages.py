@@ -0,0 +1,64 @@
+"""
+Benchmark: recorrer el catálogo activo de una sucursal entero.
+
+- get_active_products: fetchall() de todo el catálogo y después recorrerlo
+- iter_active_products: páginas por keyset (CATALOG_PAGE_SIZE filas)
+
+Reporta el tiempo hasta la primera fila (lo que espera quien mira la
+pantalla), el tiempo total y el pico de memoria (tracemalloc).
+
+Uso: python benchmarks/bench_catalog_pages.py
+"""
+import time
+import tracemalloc
+
+from comun import crear_bd_temporal, limpiar_bd_temporal, sembrar_catalogo, repo
+
+
+TAMANIOS = (10_000, 100_000, 200_000)
+
+
+def recorrer(filas):
+    """
+    Returns: (segundos hasta la 1ra fila, segundos totales, pico de memoria en bytes)
+    La memoria se mide en una segunda pasada: tracemalloc hace más lento cada objeto creado.
+    """
+    inicio = time.perf_counter()
+    primera = None
+    for _ in filas():
+        if primera is None:
+            primera = time.perf_counter() - inicio
+    total = time.perf_counter() - inicio
+
+    tracemalloc.start()
+    for _ in filas():
+        pass
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return primera, total, pico
+
+
+def main():
+    print("=" * 76)
+    print(f"  BENCHMARK: listar el catálogo (páginas de {repo.CATALOG_PAGE_SIZE})")
+    print("=" * 76)
+    print(f"{'productos':>10}  {'método':<22}{'1ra fila':>11}{'total':>11}{'memoria pico':>15}")
+
+    for tamanio in TAMANIOS:
+        temp_dir = crear_bd_temporal(seed=False)
+        try:
+            sembrar_catalogo(tamanio)
+            for nombre, filas in (
+                ("get_active_products", lambda: repo.get_active_products(1)),
+                ("iter_active_products", lambda: repo.iter_active_products(1)),
+                ("  ... por precio", lambda: repo.iter_active_products(1, order_by="price")),
+            ):
+                primera, total, pico = recorrer(filas)
+                print(f"{tamanio:>10}  {nombre:<22}{primera * 1000:>8.1f} ms{total * 1000:>8.0f} ms"
+                      f"{pico / 1024 / 1024:>12.1f} MB")
+        finally:
+            limpiar_bd_temporal(temp_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark: llamadas por segundo al repository, con y sin pool de conexiones.
+
+"Sin pool" reproduce el patrón anterior: conexión nueva + PRAGMA foreign_keys
++ close() en cada llamada. "Con pool" usa las funciones reales del repository.
+
+Uso: python benchmarks/bench_connection_pool.py
+"""
+import threading
+import time
+
+from comun import crear_bd_temporal, limpiar_bd_temporal, medir, repo
+
+
+REPETICIONES = 5000
+THREADS = 8
+
+
+def get_product_by_name_sin_pool(name, branch_id):
+    """Versión anterior de get_product_by_name: abre y cierra su conexión"""
+    conn = repo._get_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        """SELECT p.id, p.name, bp.price, bp.stock
+           FROM product p
+           JOIN branch_product bp ON p.id = bp.product_id
+           WHERE p.name = ? AND bp.branch_id = ? AND bp.active = 1""",
+        (name, branch_id)
+    )
+    product = cursor.fetchone()
+    conn.close()
+    return product
+
+
+def medir_con_threads(fn, repeticiones, threads):
+    """Reparte `repeticiones` llamadas entre `threads` threads. Returns: llamadas/s"""
+    por_thread = repeticiones // threads
+
+    def trabajar():
+        for _ in range(por_thread):
+            fn()
+
+    workers = [threading.Thread(target=trabajar) for _ in range(threads)]
+    inicio = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return por_thread * threads / (time.perf_counter() - inicio)
+
+
+def main():
+    temp_dir = crear_bd_temporal()
+    try:
+        sin_pool = lambda: get_product_by_name_sin_pool("Coca Cola 500ml", 1)
+        con_pool = lambda: repo.get_product_by_name("Coca Cola 500ml", 1)
+
+        # Calentar (crea las conexiones del pool)
+        con_pool()
+
+        print("=" * 60)
+        print("  BENCHMARK: get_product_by_name (llamadas/segundo)")
+        print("=" * 60)
+        print(f"{'escenario':<24}{'sin pool':>12}{'con pool':>12}{'mejora':>10}")
+
+        antes = medir(sin_pool, REPETICIONES)
+        despues = medir(con_pool, REPETICIONES)
+        print(f"{'1 thread':<24}{antes:>12.0f}{despues:>12.0f}{despues / antes:>9.1f}x")
+
+        antes = medir_con_threads(sin_pool, REPETICIONES, THREADS)
+        despues = medir_con_threads(con_pool, REPETICIONES, THREADS)
+        print(f"{f'{THREADS} threads':<24}{antes:>12.0f}{despues:>12.0f}{despues / antes:>9.1f}x")
+
+        print(f"\nPool: {repo.get_pool().stats()}")
+    finally:
+        limpiar_bd_temporal(temp_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Benchmark: memoria de los objetos de dominio (tracemalloc).
+
+Mide lo que queda en memoria después de cargar, con las clases de antes
+(un __dict__ por instancia, un Producto nuevo por relación) y las de ahora
+(__slots__, un Producto internado por producto de la sucursal):
+
+- catálogo: un Producto por producto activo de la sucursal
+- relaciones: GestorProveedor con PROVEEDORES proveedores que venden todo
+  el catálogo (CATALOGO * PROVEEDORES relaciones)
+- carritos: CARRITOS carritos de ITEMS items
+
+"Antes" se reproduce acá con copias de las clases sin __slots__ y el
+_cargar original; "ahora" usa las clases y GestorProveedor del proyecto.
+
+Uso: python benchmarks/bench_domain_memory.py
+"""
+import sqlite3
+import time
+import tracemalloc
+
+from comun import crear_bd_temporal, limpiar_bd_temporal, sembrar_catalogo, repo
+from carrito import Carrito
+from gestor_proveedor import GestorProveedor
+from inventario_sqlite import InventarioSQLite
+from producto import Producto
+
+
+CATALOGO = 20_000
+PROVEEDORES = 5
+CARRITOS = 200
+ITEMS = 50
+
+
+# Las clases de antes: mismos atributos, con __dict__ por instancia
+class ProductoConDict:
+    def __init__(self, nombre, precio, stock, descuento=0.0):
+        self.nombre = nombre
+        self.precio = precio
+        self.stock = stock
+        self.descuento = descuento
+
+
+class ProveedorConDict:
+    def __init__(self, nombre):
+        self.nombre = nombre
+
+
+class ProductoProveedorConDict:
+    def __init__(self, producto, proveedor, precio_compra, stock_disponible):
+        self.producto = producto
+        self.proveedor = proveedor
+        self.precio_compra = precio_compra
+        self.stock_disponible = stock_disponible
+
+
+class ItemCarritoConDict:
+    def __init__(self, producto, cantidad):
+        self.producto = producto
+        self.cantidad = cantidad
+
+
+def cargar_relaciones_antes():
+    """El GestorProveedor._cargar original: un Producto nuevo por relación"""
+    relaciones = []
+    for proveedor_id, nombre_proveedor in repo.get_all_suppliers():
+        proveedor = ProveedorConDict(nombre_proveedor)
+        proveedor.id = proveedor_id
+        for relacion_id, _, nombre_producto, precio_compra, stock in repo.get_relations_by_supplier(proveedor_id):
+            _, name, price, stock_sucursal = repo.get_product_by_name(nombre_producto, 1)
+            rel = ProductoProveedorConDict(
+                ProductoConDict(name, price, stock_sucursal), proveedor, precio_compra, stock
+            )
+            rel.id_relacion = relacion_id
+            relaciones.append(rel)
+    return relaciones
+
+
+def cargar_carritos(clase_item, catalogo):
+    carritos = []
+    for c in range(CARRITOS):
+        items = {}
+        for i in range(ITEMS):
+            producto = catalogo[(c * ITEMS + i) % CATALOGO]
+            items[producto.nombre] = clase_item(producto, 1)
+        carritos.append(items)
+    return carritos
+
+
+def cargar_carritos_ahora(catalogo):
+    carritos = []
+    for c in range(CARRITOS):
+        carrito = Carrito()
+        for i in range(ITEMS):
+            carrito.agregar(catalogo[(c * ITEMS + i) % CATALOGO], 1)
+        carritos.append(carrito)
+    return carritos
+
+
+def memoria(fn):
+    """
+    Corre fn() con tracemalloc.
+    Returns: (resultado, MB que siguen en memoria, MB de pico, segundos)
+    """
+    tracemalloc.start()
+    try:
+        base = tracemalloc.get_traced_memory()[0]
+        inicio = time.perf_counter()
+        resultado = fn()
+        segundos = time.perf_counter() - inicio
+        actual, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return resultado, (actual - base) / 2**20, (pico - base) / 2**20, segundos
+
+
+def sembrar_proveedores():
+    """PROVEEDORES proveedores que venden todo el catálogo sintético"""
+    conn = sqlite3.connect(repo.DB_PATH)
+    try:
+        for p in range(PROVEEDORES):
+            supplier_id = conn.execute(
+                "INSERT INTO supplier (name, active) VALUES (?, 1)", (f"Proveedor Bench {p}",)
+            ).lastrowid
+            conn.execute(
+                """INSERT INTO product_supplier (product_id, supplier_id, purchase_price, available_stock)
+                   SELECT id, ?, 80, 500 FROM product WHERE category = 'Bench'""",
+                (supplier_id,)
+            )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def main():
+    print("=" * 72)
+    print(f"  BENCHMARK: memoria de objetos de dominio (catálogo de {CATALOGO}, "
+          f"{PROVEEDORES} proveedores)")
+    print("=" * 72)
+
+    temp_dir = crear_bd_temporal()
+    try:
+        sembrar_catalogo(CATALOGO)
+        sembrar_proveedores()
+        filas = repo.get_active_products(1)
+
+        catalogo_antes, cat_antes, _, _ = memoria(
+            lambda: [ProductoConDict(n, p, s) for n, p, s in filas])
+        carritos_antes, car_antes, _, _ = memoria(
+            lambda: cargar_carritos(ItemCarritoConDict, catalogo_antes))
+        relaciones_antes, rel_antes, pico_antes, seg_antes = memoria(cargar_relaciones_antes)
+        del catalogo_antes, carritos_antes, relaciones_antes
+
+        inventario = InventarioSQLite(branch_id=1)
+        catalogo, cat_ahora, _, _ = memoria(
+            lambda: [inventario.internar_producto(n, p, s) for n, p, s in filas])
+        assert all(isinstance(producto, Producto) for producto in catalogo)
+        carritos, car_ahora, _, _ = memoria(lambda: cargar_carritos_ahora(catalogo))
+        # Con el catálogo cargado, las relaciones reusan sus Producto
+        gestor, rel_ahora, pico_ahora, seg_ahora = memoria(lambda: GestorProveedor(inventario))
+        assert len(gestor.relaciones) == CATALOGO * PROVEEDORES
+
+        print(f"\n{'':<34}{'antes':>12}{'ahora':>12}{'ahorro':>10}")
+        for etiqueta, antes, ahora in (
+            (f"catálogo ({CATALOGO} productos)", cat_antes, cat_ahora),
+            (f"carritos ({CARRITOS} x {ITEMS} items)", car_antes, car_ahora),
+            (f"relaciones ({CATALOGO * PROVEEDORES})", rel_antes, rel_ahora),
+        ):
+            print(f"{etiqueta:<34}{antes:>9.1f} MB{ahora:>9.1f} MB{1 - ahora / antes:>9.0%}")
+        print(f"\n  Relaciones: pico {pico_antes:.1f} MB -> {pico_ahora:.1f} MB, "
+              f"carga {seg_antes:.1f} s -> {seg_ahora:.1f} s (con tracemalloc)")
+
+        # Sin el catálogo en memoria, GestorProveedor igual comparte un Producto por producto
+        del gestor, carritos, catalogo
+        _, solo_rel, _, _ = memoria(lambda: GestorProveedor(InventarioSQLite(branch_id=1)))
+        print(f"  Relaciones sin catálogo cargado: {solo_rel:.1f} MB")
+    finally:
+        limpiar_bd_temporal(temp_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Benchmark: ventas por segundo con N cajas concurrentes,
+cada venta en su transacción vs. group commit.
+
+Usa el perfil "safe" (synchronous=FULL): un fsync por COMMIT. Sobre un disco
+real la diferencia es mucho mayor que sobre tmpfs/SSD con caché de escritura.
+
+Uso: python benchmarks/bench_group_commit.py
+"""
+import threading
+import time
+
+from comun import crear_bd_temporal, limpiar_bd_temporal, sembrar_catalogo, repo
+from database.group_commit import GroupCommitWriter
+
+
+CAJAS = [1, 4, 16]
+VENTAS_POR_CAJA = 200
+ITEMS_POR_VENTA = 5
+
+
+def correr(process_sale, cajas, nombres):
+    """Cada caja hace VENTAS_POR_CAJA ventas. Returns: ventas/segundo"""
+    items = [
+        {"product_name": nombre, "quantity": 1, "price_at_sale": 100}
+        for nombre in nombres[:ITEMS_POR_VENTA]
+    ]
+
+    def caja(cash_register_id):
+        for i in range(VENTAS_POR_CAJA):
+            process_sale(1, cash_register_id, items, 500, "2026-03-05 10:00:00")
+
+    threads = [threading.Thread(target=caja, args=(1 + n % 2,)) for n in range(cajas)]
+    inicio = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return cajas * VENTAS_POR_CAJA / (time.perf_counter() - inicio)
+
+
+def main():
+    temp_dir = crear_bd_temporal()
+    try:
+        nombres = sembrar_catalogo(ITEMS_POR_VENTA)
+
+        print("=" * 64)
+        print("  BENCHMARK: ventas/segundo (perfil safe)")
+        print("=" * 64)
+        print(f"{'cajas':>6}{'1 tx por venta':>18}{'group commit':>16}{'lotes':>10}{'mejora':>10}")
+
+        for cajas in CAJAS:
+            directo = correr(repo.process_sale_atomic, cajas, nombres)
+            with GroupCommitWriter(max_batch_size=64, max_wait=0.0) as writer:
+                agrupado = correr(writer.process_sale, cajas, nombres)
+                lotes = writer.stats()["batches"]
+            print(f"{cajas:>6}{directo:>18.0f}{agrupado:>16.0f}{lotes:>10}{agrupado / directo:>9.1f}x")
+    finally:
+        limpiar_bd_temporal(temp_dir)
+
+
+if __name__ == "__main__":
+    main()
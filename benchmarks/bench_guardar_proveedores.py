@@ -0,0 +1,86 @@
+"""
+Benchmark: GestorProveedor.guardar() según cuántas relaciones cambiaron.
+
+- antes: set_supplier_stock para TODAS las relaciones en memoria (una
+  conexión y un COMMIT por relación), cambien o no.
+- ahora: guardar() escribe solo las relaciones modificadas, en una
+  transacción (set_supplier_stocks). Se informan las filas escritas y el
+  tiempo que devuelve guardar().
+
+RELACIONES relaciones (PROVEEDORES proveedores que venden todo el
+catálogo); para cada valor de CAMBIOS se modifican tantas relaciones y se
+guarda. Perfil de durabilidad por defecto del repository (un fsync por COMMIT).
+
+Uso: python benchmarks/bench_guardar_proveedores.py
+"""
+import sqlite3
+import time
+
+from comun import crear_bd_temporal, limpiar_bd_temporal, sembrar_catalogo, repo
+from gestor_proveedor import GestorProveedor
+from inventario_sqlite import InventarioSQLite
+
+
+CATALOGO = 2_000
+PROVEEDORES = 5
+RELACIONES = CATALOGO * PROVEEDORES
+CAMBIOS = [0, 1, 10, 100, 1_000, RELACIONES]
+
+
+def sembrar_proveedores():
+    conn = sqlite3.connect(repo.DB_PATH)
+    try:
+        for p in range(PROVEEDORES):
+            supplier_id = conn.execute(
+                "INSERT INTO supplier (name, active) VALUES (?, 1)", (f"Proveedor Bench {p}",)
+            ).lastrowid
+            conn.execute(
+                """INSERT INTO product_supplier (product_id, supplier_id, purchase_price, available_stock)
+                   SELECT id, ?, 80, 1000000 FROM product WHERE category = 'Bench'""",
+                (supplier_id,)
+            )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def guardar_antes(gestor):
+    """El guardar() de antes: un set_supplier_stock por relación"""
+    inicio = time.perf_counter()
+    for rel in gestor.relaciones:
+        if rel.id_relacion is not None:
+            repo.set_supplier_stock(rel.id_relacion, rel.stock_disponible)
+    return time.perf_counter() - inicio
+
+
+def main():
+    print("=" * 72)
+    print(f"  BENCHMARK: guardar() de {RELACIONES} relaciones (perfil {repo.DURABILITY_PROFILE})")
+    print("=" * 72)
+
+    temp_dir = crear_bd_temporal()
+    try:
+        sembrar_catalogo(CATALOGO)
+        sembrar_proveedores()
+        gestor = GestorProveedor(InventarioSQLite(branch_id=1))
+        assert len(gestor.relaciones) == RELACIONES
+
+        # Antes no importaba cuántas cambiaron: siempre escribía todas
+        seg_antes = guardar_antes(gestor)
+        print(f"\n  antes: {RELACIONES} escrituras siempre, {seg_antes * 1000:.0f} ms")
+
+        print(f"\n{'cambios':>10}{'escritas':>10}{'ahora':>14}{'por escritura':>16}")
+        for cambios in CAMBIOS:
+            for rel in gestor.relaciones[:cambios]:
+                rel.descontar_stock(1)
+            resultado = gestor.guardar()
+            assert resultado["escritas"] == cambios, resultado
+            por_escritura = resultado["segundos"] / cambios * 1e6 if cambios else 0.0
+            print(f"{cambios:>10}{resultado['escritas']:>10}{resultado['segundos'] * 1000:>11.2f} ms"
+                  f"{por_escritura:>13.1f} us")
+    finally:
+        limpiar_bd_temporal(temp_dir)
+
+
+if __name__ == "__main__":
+    main()
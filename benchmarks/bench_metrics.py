@@ -0,0 +1,51 @@
+"""
+Benchmark: costo de la instrumentación del repository (metrics.py).
+
+Compara la función sin decorar (__wrapped__), decorada con las métricas
+desactivadas (el caso por defecto) y con las métricas activadas, sobre la
+lectura más barata y más frecuente del repository.
+
+Uso: python benchmarks/bench_metrics.py
+"""
+from comun import crear_bd_temporal, limpiar_bd_temporal, medir, repo
+from database import metrics
+
+
+REPETICIONES = 50_000
+
+
+def main():
+    temp_dir = crear_bd_temporal()
+    try:
+        sin_decorar = repo.get_product_by_name.__wrapped__
+        decorada = repo.get_product_by_name
+
+        # Calentar el pool y el caché de sentencias
+        for _ in range(1000):
+            decorada("Coca Cola 500ml", 1)
+
+        base = medir(lambda: sin_decorar("Coca Cola 500ml", 1), REPETICIONES)
+        metrics.disable()
+        desactivadas = medir(lambda: decorada("Coca Cola 500ml", 1), REPETICIONES)
+        metrics.enable()
+        activadas = medir(lambda: decorada("Coca Cola 500ml", 1), REPETICIONES)
+        metrics.disable()
+
+        print("=" * 64)
+        print(f"  BENCHMARK: get_product_by_name x {REPETICIONES} (llamadas/segundo)")
+        print("=" * 64)
+        for nombre, valor in (("sin decorar", base), ("métricas desactivadas", desactivadas),
+                              ("métricas activadas", activadas)):
+            costo_us = (1 / valor - 1 / base) * 1e6
+            print(f"{nombre:<24}{valor:>12.0f}/s   {costo_us:+7.2f} µs por llamada")
+
+        latencia = metrics.snapshot()["get_product_by_name"]["latency"]
+        print(f"\np50={latencia['p50'] * 1e6:.1f}µs  p95={latencia['p95'] * 1e6:.1f}µs  "
+              f"p99={latencia['p99'] * 1e6:.1f}µs")
+    finally:
+        metrics.reset()
+        limpiar_bd_temporal(temp_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark: reposición automática de toda la sucursal.
+
+CATALOGO productos con stock entre 0 y 39 (la mitad por debajo del punto de
+reposición) y PROVEEDORES proveedores por producto con precios distintos.
+
+- antes: un ServicioCompra.reponer_producto por producto bajo el punto (lo
+  que hacía el gerente a mano desde main_gerente): obtener_producto, elegir
+  proveedor y una transacción por producto. Se mide sobre MUESTRA productos
+  y se extrapola.
+- ahora: PlanificadorReposicion. Se informa por separado la carga del
+  GestorProveedor, planificar() y ejecutar() (lotes de LOTE_COMPRAS).
+
+Uso: python benchmarks/bench_planificador.py
+"""
+import sqlite3
+import time
+
+from comun import crear_bd_temporal, limpiar_bd_temporal, sembrar_catalogo, repo
+from caja import Caja
+from gestor_proveedor import GestorProveedor
+from inventario_sqlite import InventarioSQLite
+from planificador_reposicion import LOTE_COMPRAS, PlanificadorReposicion
+from servicio_compra import ServicioCompra
+
+
+CATALOGO = 100_000
+PROVEEDORES = 3
+PUNTO = 20
+OBJETIVO = 60
+MUESTRA = 500
+
+
+def preparar():
+    """Stock 0..39 por producto, PROVEEDORES proveedores y saldo de sobra en la caja 1"""
+    conn = sqlite3.connect(repo.DB_PATH)
+    try:
+        conn.execute(
+            """UPDATE branch_product SET stock = product_id % 40
+               WHERE product_id IN (SELECT id FROM product WHERE category = 'Bench')"""
+        )
+        for p in range(PROVEEDORES):
+            supplier_id = conn.execute(
+                "INSERT INTO supplier (name, active) VALUES (?, 1)", (f"Proveedor Bench {p}",)
+            ).lastrowid
+            conn.execute(
+                """INSERT INTO product_supplier (product_id, supplier_id, purchase_price, available_stock)
+                   SELECT id, ?, 50 + (id * ?) % 97, 1000 FROM product WHERE category = 'Bench'""",
+                (supplier_id, p + 7)
+            )
+        conn.execute("UPDATE cash_register SET current_balance = 1e12 WHERE id = 1")
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def reponer_antes(inventario, servicio, productos):
+    """Un reponer_producto por producto. Returns: segundos"""
+    inicio = time.perf_counter()
+    for _, nombre, stock in productos:
+        servicio.reponer_producto(inventario.obtener_producto(nombre), OBJETIVO - stock)
+    return time.perf_counter() - inicio
+
+
+def main():
+    print("=" * 72)
+    print(f"  BENCHMARK: reposición automática ({CATALOGO} productos, {PROVEEDORES} proveedores c/u, "
+          f"perfil {repo.DURABILITY_PROFILE})")
+    print("=" * 72)
+
+    temp_dir = crear_bd_temporal()
+    try:
+        sembrar_catalogo(CATALOGO)
+        preparar()
+        inventario = InventarioSQLite(branch_id=1)
+        caja = Caja(1, 1)
+
+        inicio = time.perf_counter()
+        gestor = GestorProveedor(inventario)
+        seg_carga = time.perf_counter() - inicio
+
+        # antes: sobre una muestra de los que están bajo el punto
+        bajo_punto = list(repo.iter_products_below(1, PUNTO))
+        muestra = [fila for fila in bajo_punto if fila[1].startswith("Producto Bench")][:MUESTRA]
+        seg_muestra = reponer_antes(inventario, ServicioCompra(gestor, caja, inventario), muestra)
+
+        # ahora: sin los de la muestra, que ya quedaron repuestos
+        planificador = PlanificadorReposicion(gestor, caja, inventario)
+        plan = planificador.planificar(PUNTO, OBJETIVO)
+        resultado = planificador.ejecutar(plan)
+        assert resultado["error"] is None, resultado["error"]
+        assert not any(nombre.startswith("Producto Bench") for _, nombre, _ in repo.iter_products_below(1, PUNTO))
+
+        seg_antes = seg_muestra * len(bajo_punto) / len(muestra)
+        seg_ahora = seg_carga + plan.segundos + resultado["segundos"]
+        print(f"\n  productos bajo el punto: {len(bajo_punto)}, compras del plan: {len(plan.compras)}"
+              f" en {resultado['lotes']} lotes de hasta {LOTE_COMPRAS}")
+        print(f"\n  antes (reponer_producto de a uno): {seg_antes:8.1f} s*")
+        print(f"  ahora:                             {seg_ahora:8.2f} s  ({seg_antes / seg_ahora:.0f}x)")
+        print(f"    carga de proveedores {seg_carga:6.2f} s")
+        print(f"    planificar()         {plan.segundos:6.2f} s")
+        print(f"    ejecutar()           {resultado['segundos']:6.2f} s")
+        print(f"\n  * extrapolado de {len(muestra)} productos")
+    finally:
+        limpiar_bd_temporal(temp_dir)
+
+
+if __name__ == "__main__":
+    main()
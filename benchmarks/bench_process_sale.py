@@ -0,0 +1,144 @@
+"""
+Benchmark: tiempo con el write lock tomado en process_sale_atomic
+según el tamaño del carrito (1 a 200 items).
+
+"Item por item" es la versión anterior (SELECT + UPDATE por item y otra
+búsqueda por nombre + INSERT por sale_item) con los mismos efectos que la
+actual: stock disponible descontando reservas de otros carritos
+(_AVAILABLE_STOCK) y un movimiento de stock por producto en el historial.
+"Por lotes" es la función actual del repository. Ambas corren sobre la
+misma conexión del pool y el mismo esquema: lo único que cambia es
+resolver y escribir item por item o en lote (json_each + executemany).
+
+El lock se mide desde que se ejecuta BEGIN IMMEDIATE (trace callback)
+hasta que la función vuelve, es decir, incluye el COMMIT.
+
+Uso: python benchmarks/bench_process_sale.py
+"""
+import statistics
+import time
+
+from comun import crear_bd_temporal, limpiar_bd_temporal, sembrar_catalogo, repo
+
+
+TAMANIOS = [1, 5, 20, 60, 100, 200]
+REPETICIONES = 30
+
+
+def process_sale_item_por_item(branch_id, cash_register_id, items, total_amount, timestamp):
+    """process_sale_atomic con sentencias por item (sin session_id, como el bench)"""
+    with repo._connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            for item in items:
+                cursor.execute(
+                    f"""SELECT {repo._AVAILABLE_STOCK}, p.id
+                       FROM branch_product bp
+                       JOIN product p ON p.id = bp.product_id
+                       WHERE p.name = ? AND bp.branch_id = ? AND bp.active = 1""",
+                    (time.time(), None, item["product_name"], branch_id)
+                )
+                row = cursor.fetchone()
+                if row is None:
+                    raise ValueError("no encontrado")
+                current_stock, product_id = row
+                if current_stock < item["quantity"]:
+                    raise ValueError("stock insuficiente")
+                cursor.execute(
+                    """UPDATE branch_product SET stock = stock - ?
+                       WHERE branch_id = ? AND product_id = ?""",
+                    (item["quantity"], branch_id, product_id)
+                )
+            cursor.execute(
+                """INSERT INTO sale (branch_id, cash_register_id, total_amount, timestamp, member_id)
+                   VALUES (?, ?, ?, ?, NULL)""",
+                (branch_id, cash_register_id, total_amount, timestamp)
+            )
+            sale_id = cursor.lastrowid
+            for item in items:
+                cursor.execute("SELECT id FROM product WHERE name = ?", (item["product_name"],))
+                product_id = cursor.fetchone()[0]
+                cursor.execute(
+                    """INSERT INTO sale_item (sale_id, product_id, quantity, price_at_sale)
+                       VALUES (?, ?, ?, ?)""",
+                    (sale_id, product_id, item["quantity"], item["price_at_sale"])
+                )
+                cursor.execute(
+                    """INSERT INTO stock_movement (branch_id, product_id, delta, reason, reference, created_at)
+                       VALUES (?, ?, ?, 'sale', ?, ?)""",
+                    (branch_id, product_id, -item["quantity"], sale_id, time.time())
+                )
+            cursor.execute(
+                "UPDATE cash_register SET current_balance = current_balance + ? WHERE id = ?",
+                (total_amount, cash_register_id)
+            )
+            conn.commit()
+            return sale_id
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+
+def medir_lock(fn, items):
+    """
+    Ejecuta una venta y devuelve (ms con el lock tomado, sentencias ejecutadas).
+    """
+    marcas = {"begin": None, "sentencias": 0}
+
+    def trace(sql):
+        if marcas["begin"] is None and sql.startswith("BEGIN IMMEDIATE"):
+            marcas["begin"] = time.perf_counter()
+        elif marcas["begin"] is not None:
+            marcas["sentencias"] += 1
+
+    total = sum(item["quantity"] * item["price_at_sale"] for item in items)
+    with repo._connection() as conn:
+        conn.set_trace_callback(trace)
+        try:
+            fn(1, 1, items, total, "2026-03-05 10:00:00")
+            fin = time.perf_counter()
+        finally:
+            conn.set_trace_callback(None)
+    return (fin - marcas["begin"]) * 1000, marcas["sentencias"]
+
+
+def main():
+    temp_dir = crear_bd_temporal()
+    try:
+        nombres = sembrar_catalogo(max(TAMANIOS))
+
+        print("=" * 72)
+        print("  BENCHMARK: write lock en process_sale_atomic (mediana, ms)")
+        print("=" * 72)
+        print(f"{'items':>6}{'item x item':>14}{'sentencias':>12}{'por lotes':>12}{'sentencias':>12}{'mejora':>10}")
+
+        for tamanio in TAMANIOS:
+            items = [
+                {"product_name": nombre, "quantity": 1, "price_at_sale": 100}
+                for nombre in nombres[:tamanio]
+            ]
+            resultados = {}
+            for etiqueta, fn in (("antes", process_sale_item_por_item),
+                                 ("despues", repo.process_sale_atomic)):
+                mediciones = [medir_lock(fn, items) for _ in range(REPETICIONES)]
+                resultados[etiqueta] = (
+                    statistics.median(ms for ms, _ in mediciones),
+                    mediciones[0][1],
+                )
+
+            antes_ms, antes_sent = resultados["antes"]
+            despues_ms, despues_sent = resultados["despues"]
+            print(f"{tamanio:>6}{antes_ms:>14.3f}{antes_sent:>12}{despues_ms:>12.3f}"
+                  f"{despues_sent:>12}{antes_ms / despues_ms:>9.1f}x")
+
+        print("\n'sentencias' cuenta las ejecutadas con el lock tomado "
+              "(executemany cuenta una vez por fila en el trace).")
+    finally:
+        limpiar_bd_temporal(temp_dir)
+
+
+if __name__ == "__main__":
+    main()
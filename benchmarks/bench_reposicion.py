@@ -0,0 +1,112 @@
+"""
+Benchmark: elegir proveedor para reponer todo el catálogo.
+
+Para cada producto del catálogo se elige el proveedor más barato con al
+menos CANTIDAD unidades y se le descuenta (descontar_stock), en RONDAS
+pasadas: en las últimas los más baratos ya no alcanzan y hay que pasar al
+siguiente.
+
+- antes: lo que hacía ServicioCompra con buscar_por_producto lineal (recorre
+  todas las relaciones del gestor), filtrar por stock y min() por precio.
+  Es O(relaciones) por producto: se mide sobre MUESTRA productos y se
+  extrapola al catálogo.
+- ahora: GestorProveedor.mas_barato_con_stock (índice por producto
+  ordenado por precio), sobre el catálogo entero.
+
+Solo mide la elección en memoria: caja, BD y stock de la sucursal son los
+mismos con las dos.
+
+Uso: python benchmarks/bench_reposicion.py
+"""
+import sqlite3
+import time
+
+from comun import crear_bd_temporal, limpiar_bd_temporal, sembrar_catalogo, repo
+from gestor_proveedor import GestorProveedor
+from inventario_sqlite import InventarioSQLite
+
+
+CATALOGOS = [2_000, 20_000]
+PROVEEDORES = 5  # cada uno vende todo el catálogo
+CANTIDAD = 40
+RONDAS = 3
+MUESTRA = 100
+
+
+def sembrar_proveedores():
+    """PROVEEDORES proveedores con precios distintos por producto y poco stock (100)"""
+    conn = sqlite3.connect(repo.DB_PATH)
+    try:
+        for p in range(PROVEEDORES):
+            supplier_id = conn.execute(
+                "INSERT INTO supplier (name, active) VALUES (?, 1)", (f"Proveedor Bench {p}",)
+            ).lastrowid
+            conn.execute(
+                """INSERT INTO product_supplier (product_id, supplier_id, purchase_price, available_stock)
+                   SELECT id, ?, 50 + (id * ?) % 97, 100 FROM product WHERE category = 'Bench'""",
+                (supplier_id, p + 7)
+            )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def elegir_antes(gestor, producto, cantidad):
+    """La elección de antes en ServicioCompra.reponer_producto"""
+    relaciones = [r for r in gestor.relaciones if r.producto == producto]
+    con_stock = [r for r in relaciones if r.hay_stock(cantidad)]
+    return min(con_stock, key=lambda r: r.precio_compra) if con_stock else None
+
+
+def reponer(gestor, productos, elegir):
+    """RONDAS pasadas eligiendo y descontando. Returns: (segundos, costo total, sin proveedor)"""
+    costo = 0
+    sin_proveedor = 0
+    inicio = time.perf_counter()
+    for _ in range(RONDAS):
+        for producto in productos:
+            rel = elegir(gestor, producto, CANTIDAD)
+            if rel is None:
+                sin_proveedor += 1
+                continue
+            rel.descontar_stock(CANTIDAD)
+            costo += rel.precio_compra * CANTIDAD
+    return time.perf_counter() - inicio, costo, sin_proveedor
+
+
+def main():
+    print("=" * 72)
+    print(f"  BENCHMARK: reposición del catálogo ({PROVEEDORES} proveedores por producto, "
+          f"{RONDAS} rondas de {CANTIDAD})")
+    print("=" * 72)
+    print(f"\n{'catálogo':>10}{'relaciones':>12}{'antes':>14}{'ahora':>12}{'x':>10}")
+
+    for catalogo in CATALOGOS:
+        temp_dir = crear_bd_temporal()
+        try:
+            nombres = sembrar_catalogo(catalogo)
+            sembrar_proveedores()
+            inventario = InventarioSQLite(branch_id=1)
+            productos = [inventario.obtener_producto(nombre) for nombre in nombres]
+
+            # Las dos elecciones tienen que coincidir (sobre gestores iguales)
+            muestra = productos[:MUESTRA]
+            gestor_antes = GestorProveedor(inventario)
+            seg_antes, costo_antes, sin_antes = reponer(gestor_antes, muestra, elegir_antes)
+            gestor = GestorProveedor(inventario)
+            _, costo_muestra, sin_muestra = reponer(
+                gestor, muestra, GestorProveedor.mas_barato_con_stock)
+            assert (costo_antes, sin_antes) == (costo_muestra, sin_muestra)
+
+            gestor = GestorProveedor(inventario)
+            seg_ahora, _, _ = reponer(gestor, productos, GestorProveedor.mas_barato_con_stock)
+            seg_antes_total = seg_antes * catalogo / MUESTRA
+            print(f"{catalogo:>10}{len(gestor.relaciones):>12}{seg_antes_total:>11.1f} s*"
+                  f"{seg_ahora * 1000:>9.0f} ms{seg_antes_total / seg_ahora:>9.0f}x")
+        finally:
+            limpiar_bd_temporal(temp_dir)
+    print(f"\n  * extrapolado de {MUESTRA} productos")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,494 @@
+"""
+Microbenchmarks: cada función pública de producto_repository, a varias escalas.
+
+Por qué existe:
+Los demás benchmarks miden escenarios (una venta, la carga de N cajas).
+Este da un número base por función y muestra cómo crece con los datos. Así
+cualquier cambio de rendimiento en producto_repository.py se verifica
+contra la corrida anterior, función por función.
+
+Cómo funciona:
+- Por cada escala (cantidad de productos) arma una BD temporal sintética:
+  el catálogo, con código de barras y proveedores (RELACIONES_POR_PRODUCTO
+  cada uno), socios, ventas con sus items y su historial de stock,
+  reservas abiertas y un snapshot del historial.
+- Mide cada función con llamadas representativas: mediana y p95 de hasta
+  MAX_REPETICIONES llamadas, cortando a los PRESUPUESTO segundos.
+  - Las que escriben pagan su COMMIT (perfil --perfil).
+  - Las que necesitan algo por hacer (compactar, barrer vencidas) lo
+    preparan antes de cada llamada, fuera del tiempo medido.
+- Falla si hay una función pública sin microbenchmark, igual que
+  test_query_plans.py.
+- Guarda el resultado en --salida y lo compara con la base guardada
+  (--base). Termina con código 1 si alguna función empeoró más de
+  --umbral, ignorando diferencias de menos de MINIMO_US.
+  - Contra el ruido de la máquina, cada función se compara descontando el
+    ritmo general de la corrida (ritmo). Si la corrida entera vino más
+    lenta, eso cuenta como una regresión aparte, "(todas)".
+  - Lo que parece una regresión se vuelve a medir antes de contarlo.
+
+La base depende de la máquina. Para compararse en otra (ej: CI), primero
+hay que generar la base ahí con --guardar-base.
+
+Uso:
+    python benchmarks/bench_repository.py
+    python benchmarks/bench_repository.py --escalas 1000,10000 --umbral 0.5
+    python benchmarks/bench_repository.py --guardar-base
+"""
+import argparse
+import inspect
+import itertools
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import time
+from datetime import datetime
+
+from comun import crear_bd_temporal, limpiar_bd_temporal, sembrar_catalogo, repo
+
+
+ESCALAS = (1_000, 10_000, 100_000)
+MAX_REPETICIONES = 200
+CALENTAMIENTO = 3
+PRESUPUESTO = 0.3  # segundos por función
+RELACIONES_POR_PRODUCTO = 2
+PROVEEDORES = 10
+ITEMS_POR_VENTA = 3
+# Empeoramiento relativo que cuenta como regresión. Entre dos corridas
+# iguales en una máquina compartida hay funciones que varían ±30%
+UMBRAL = 0.5
+REINTENTOS = 3
+# Diferencias menores a esto son ruido del reloj y del scheduler, no regresiones
+MINIMO_US = 50.0
+# Funciones comparables necesarias para estimar el ritmo general de la corrida
+MINIMO_PARA_RITMO = 10
+BASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline_repository.json")
+
+# Funciones del repository que no ejecutan queries de datos
+INFRAESTRUCTURA = {"get_pool", "close_pool"}
+
+TIMESTAMP = "2026-03-05 10:00:00"
+
+
+# ---------- Datos sintéticos ----------
+
+def sembrar(escala):
+    """
+    Agrega a la BD temporal (ya con los datos semilla) `escala` productos en
+    la sucursal 1 y los datos que cuelgan de ellos.
+    Returns: dict con los nombres e ids que usan las llamadas
+    """
+    nombres = sembrar_catalogo(escala, branch_ids=(1,))
+    conn = sqlite3.connect(repo.DB_PATH)
+    try:
+        ids = [row[0] for row in conn.execute(
+            "SELECT id FROM product WHERE category = 'Bench' ORDER BY id")]
+        conn.execute("UPDATE product SET barcode = printf('778%010d', id) WHERE category = 'Bench'")
+
+        # Proveedores: cada producto lo venden RELACIONES_POR_PRODUCTO de ellos
+        proveedores = [
+            conn.execute("INSERT INTO supplier (name, active) VALUES (?, 1)",
+                         (f"Proveedor Bench {p}",)).lastrowid
+            for p in range(PROVEEDORES)
+        ]
+        conn.executemany(
+            """INSERT INTO product_supplier (product_id, supplier_id, purchase_price, available_stock)
+               VALUES (?, ?, 80, 500)""",
+            ((product_id, proveedores[(i + r) % PROVEEDORES])
+             for i, product_id in enumerate(ids) for r in range(RELACIONES_POR_PRODUCTO))
+        )
+        # Proveedor sin relaciones: create_product_supplier_relation le agrega productos
+        proveedor_nuevo = conn.execute(
+            "INSERT INTO supplier (name, active) VALUES ('Proveedor Micro', 1)").lastrowid
+
+        conn.executemany(
+            "INSERT INTO member (name, dni, password) VALUES (?, ?, 'hash')",
+            ((f"Socio Bench {i}", f"{i:08d}") for i in range(escala))
+        )
+
+        # Una venta por producto, de ITEMS_POR_VENTA items, con su historial
+        primera_venta = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM sale").fetchone()[0]
+        conn.executemany(
+            """INSERT INTO sale (branch_id, cash_register_id, total_amount, timestamp)
+               VALUES (1, 1, 300, ?)""",
+            ((TIMESTAMP,) for _ in range(escala))
+        )
+        vendidos = [
+            (primera_venta + v, ids[(v * ITEMS_POR_VENTA + i) % escala])
+            for v in range(escala) for i in range(ITEMS_POR_VENTA)
+        ]
+        conn.executemany(
+            "INSERT INTO sale_item (sale_id, product_id, quantity, price_at_sale) VALUES (?, ?, 1, 100)",
+            vendidos
+        )
+        conn.executemany(
+            """INSERT INTO stock_movement (branch_id, product_id, delta, reason, reference, created_at)
+               VALUES (1, ?, -1, 'sale', ?, ?)""",
+            ((product_id, sale_id, time.time()) for sale_id, product_id in vendidos)
+        )
+        conn.execute(
+            """UPDATE branch_product SET stock = stock - vendidos.cantidad
+               FROM (SELECT product_id, COUNT(*) AS cantidad FROM sale_item
+                     WHERE sale_id >= ? GROUP BY product_id) AS vendidos
+               WHERE branch_product.branch_id = 1 AND branch_product.product_id = vendidos.product_id""",
+            (primera_venta,)
+        )
+
+        # Reservas abiertas de otros carritos (una cada 10 productos)
+        conn.executemany(
+            """INSERT INTO stock_reservation (branch_id, product_id, session_id, quantity, expires_at)
+               VALUES (1, ?, ?, 1, ?)""",
+            ((product_id, f"abierta-{i}", time.time() + 3600) for i, product_id in enumerate(ids[::10]))
+        )
+        conn.commit()
+        medio = escala // 2
+        relacion = conn.execute(
+            "SELECT id FROM product_supplier WHERE product_id = ? LIMIT 1", (ids[medio],)
+        ).fetchone()[0]
+        # Una relación por producto para las compras en lote (20 productos desde el del medio)
+        compras = [row[0] for row in conn.execute(
+            """SELECT MIN(id) FROM product_supplier WHERE product_id BETWEEN ? AND ?
+               GROUP BY product_id""",
+            (ids[medio], ids[min(medio + 19, escala - 1)])
+        )]
+    finally:
+        conn.close()
+
+    # Como al abrir main_gerente: el historial sembrado queda compactado
+    repo.snapshot_stock_ledger(1)
+    return {
+        "nombres": nombres, "ids": ids, "medio": medio, "relacion": relacion,
+        "compras": compras,
+        "proveedor": proveedores[0], "proveedor_nuevo": proveedor_nuevo, "venta": primera_venta + medio,
+    }
+
+
+# ---------- Llamadas ----------
+
+def llamadas(datos):
+    """
+    Una llamada representativa por función del repository (las que tienen
+    variantes con otro camino de ejecución, una por variante).
+    Returns: lista de (nombre, fn, preparar) — preparar (o None) corre antes
+    de cada fn() y no se mide
+    """
+    nombres, ids, medio = datos["nombres"], datos["ids"], datos["medio"]
+    nombre, product_id = nombres[medio], ids[medio]
+    escala = len(nombres)
+    contador = itertools.count()
+    activo = itertools.cycle((False, True))
+    codigos = itertools.cycle(("7780000000000", f"778{product_id:010d}"))
+    reservado = itertools.cycle((1, 2))
+    # Productos todavía no asignados a la sucursal 2 ni al proveedor nuevo
+    sin_norte = iter(ids)
+    sin_proveedor = iter(ids)
+
+    def carrito():
+        """ITEMS_POR_VENTA productos distintos, rotando por el catálogo"""
+        base = next(contador) * ITEMS_POR_VENTA
+        return [{"product_name": nombres[(base + i) % escala], "quantity": 1, "price_at_sale": 100}
+                for i in range(ITEMS_POR_VENTA)]
+
+    def lote():
+        base = next(contador) * 20
+        return [(nombres[(base + i) % escala], 1) for i in range(20)]
+
+    def mover_stock():
+        repo.adjust_stock_bulk(1, [(nombres[(next(contador) * 100 + i) % escala], 1) for i in range(100)])
+
+    def reservar_venta():
+        repo.reserve_stock(1, "micro-venta", nombres[next(contador) % escala], 1)
+
+    def reservar_tres():
+        for i in range(3):
+            repo.reserve_stock(1, "micro-liberar", nombres[(medio + i) % escala], 1)
+
+    def reponer_proveedores():
+        """Stock de proveedor y saldo de caja para que las compras nunca fallen"""
+        repo.set_supplier_stocks([(relation_id, 1000) for relation_id in datos["compras"]])
+        repo.update_cash_register_balance(1, 80 * 20)
+
+    def vencer():
+        with repo._connection(1) as conn:
+            conn.executemany(
+                """INSERT INTO stock_reservation (branch_id, product_id, session_id, quantity, expires_at)
+                   VALUES (1, ?, ?, 1, ?)""",
+                ((ids[i], f"vencida-{next(contador)}", time.time() - 1) for i in range(100))
+            )
+            conn.commit()
+
+    return [
+        ("process_sale_atomic", lambda: repo.process_sale_atomic(1, 1, carrito(), 300, TIMESTAMP), None),
+        ("get_cash_registers_by_branch", lambda: repo.get_cash_registers_by_branch(1), None),
+        ("create_product", lambda: repo.create_product(f"Micro {next(contador)}", "Micro"), None),
+        ("create_product_with_branch", lambda: repo.create_product_with_branch(
+            f"Micro Sucursal {next(contador)}", "Micro", 1, 100, 10), None),
+        ("assign_product_to_branch", lambda: repo.assign_product_to_branch(2, next(sin_norte), 120, 5), None),
+        # En la sucursal 2: en la 1 dejaría inactivo un producto que venden los carritos
+        ("set_product_active", lambda: repo.set_product_active(2, 1, next(activo)), None),
+        ("get_active_products", lambda: repo.get_active_products(1), None),
+        ("get_active_products_page", lambda: repo.get_active_products_page(
+            1, (nombre, product_id), 50), None),
+        ("get_active_products_page (precio, categoría)", lambda: repo.get_active_products_page(
+            1, (100, product_id), 50, category="Bench", order_by="price", descending=True), None),
+        ("get_active_products_page (categoría)", lambda: repo.get_active_products_page(
+            1, (nombre, product_id), 50, category="Bench"), None),
+        ("iter_active_products", lambda: sum(1 for _ in repo.iter_active_products(1)), None),
+        ("get_product_by_name", lambda: repo.get_product_by_name(nombre, 1), None),
+        ("get_product_by_barcode", lambda: repo.get_product_by_barcode(f"778{product_id:010d}", 1), None),
+        ("set_product_barcode", lambda: repo.set_product_barcode(product_id, next(codigos)), None),
+        ("search_by_name", lambda: repo.search_by_name(f"Bench {medio:06d}"[:10], 1), None),
+        ("search_by_name (corto, LIKE)", lambda: repo.search_by_name("Be", 1), None),
+        ("get_product_id_by_name", lambda: repo.get_product_id_by_name(nombre), None),
+        ("adjust_stock_bulk", lambda: repo.adjust_stock_bulk(1, lote()), None),
+        ("update_branch_product_stock", lambda: repo.update_branch_product_stock(1, nombre, 5), None),
+        ("get_branch_product_stock", lambda: repo.get_branch_product_stock(1, nombre), None),
+        ("snapshot_stock_ledger", lambda: repo.snapshot_stock_ledger(1), mover_stock),
+        ("get_stock_at", lambda: repo.get_stock_at(1, nombre), None),
+        ("get_stock_movements", lambda: repo.get_stock_movements(1, nombre), None),
+        ("get_stock_drift", lambda: repo.get_stock_drift(1), None),
+        ("reserve_stock", lambda: repo.reserve_stock(1, "micro", nombre, next(reservado)), None),
+        ("get_available_stock", lambda: repo.get_available_stock(1, nombre), None),
+        ("process_sale_atomic (con reservas)", lambda: repo.process_sale_atomic(
+            1, 1, carrito(), 300, TIMESTAMP, session_id="micro-venta"), reservar_venta),
+        ("release_reservation", lambda: repo.release_reservation(1, "micro-liberar", nombre), reservar_tres),
+        ("release_reservation (todas)", lambda: repo.release_reservation(1, "micro-liberar"), reservar_tres),
+        ("sweep_expired_reservations", lambda: repo.sweep_expired_reservations(1), vencer),
+        ("create_member", lambda: repo.create_member(
+            "Socio Micro", f"M{next(contador):08d}", "hash"), None),
+        ("get_member_by_name", lambda: repo.get_member_by_name(f"Socio Bench {medio}"), None),
+        ("get_member_by_dni", lambda: repo.get_member_by_dni(f"{medio:08d}"), None),
+        ("create_sale", lambda: repo.create_sale(1, 1, 100, TIMESTAMP), None),
+        ("create_sale_item", lambda: repo.create_sale_item(datos["venta"], product_id, 1, 100), None),
+        ("update_cash_register_balance", lambda: repo.update_cash_register_balance(1, 10), None),
+        ("get_cash_register_balance", lambda: repo.get_cash_register_balance(1), None),
+        ("create_supplier", lambda: repo.create_supplier(f"Proveedor Micro {next(contador)}"), None),
+        ("get_supplier_by_name", lambda: repo.get_supplier_by_name("Proveedor Bench 5"), None),
+        ("get_all_suppliers", lambda: repo.get_all_suppliers(), None),
+        ("create_product_supplier_relation", lambda: repo.create_product_supplier_relation(
+            next(sin_proveedor), datos["proveedor_nuevo"], 90, 50), None),
+        ("get_relations_by_product", lambda: repo.get_relations_by_product(product_id), None),
+        ("get_relations_by_supplier", lambda: repo.get_relations_by_supplier(datos["proveedor"]), None),
+        ("get_supplier_relations_page", lambda: repo.get_supplier_relations_page(1, page_size=100), None),
+        ("iter_supplier_relations", lambda: sum(1 for _ in repo.iter_supplier_relations(1)), None),
+        ("get_products_below_page", lambda: repo.get_products_below_page(1, 10**9, page_size=100), None),
+        ("iter_products_below", lambda: sum(1 for _ in repo.iter_products_below(1, 10**9)), None),
+        ("set_supplier_stock", lambda: repo.set_supplier_stock(datos["relacion"], 40), None),
+        ("set_supplier_stocks", lambda: repo.set_supplier_stocks(
+            [(datos["relacion"] + i, 40) for i in range(100)]), None),
+        ("update_supplier_stock", lambda: repo.update_supplier_stock(datos["relacion"], -1), None),
+        ("restock_from_supplier", lambda: repo.restock_from_supplier(
+            1, 1, datos["compras"][0], 1), reponer_proveedores),
+        ("restock_from_suppliers", lambda: repo.restock_from_suppliers(
+            1, 1, [(relation_id, 1) for relation_id in datos["compras"]]), reponer_proveedores),
+        ("reconcile_supplier_restocks", lambda: repo.reconcile_supplier_restocks(1), None),
+    ]
+
+
+def sin_microbenchmark(nombres_medidos):
+    """Funciones públicas del repository que no están en llamadas()"""
+    publicas = {
+        nombre for nombre, obj in inspect.getmembers(repo, inspect.isfunction)
+        if obj.__module__ == repo.__name__ and not nombre.startswith("_")
+    }
+    medidas = {nombre.split(" (")[0] for nombre in nombres_medidos}
+    return sorted(publicas - INFRAESTRUCTURA - medidas)
+
+
+# ---------- Medición ----------
+
+def cronometrar(fn, preparar):
+    """
+    Llama a fn() hasta MAX_REPETICIONES veces o PRESUPUESTO segundos (mínimo 5),
+    después de CALENTAMIENTO llamadas sin medir (cachés de páginas y de sentencias).
+    Returns: dict con mediana y p95 en microsegundos y las repeticiones
+    """
+    for _ in range(CALENTAMIENTO):
+        if preparar is not None:
+            preparar()
+        fn()
+    tiempos = []
+    limite = time.perf_counter() + PRESUPUESTO
+    while len(tiempos) < MAX_REPETICIONES and (len(tiempos) < 5 or time.perf_counter() < limite):
+        if preparar is not None:
+            preparar()
+        inicio = time.perf_counter()
+        fn()
+        tiempos.append(time.perf_counter() - inicio)
+    tiempos.sort()
+    return {
+        "mediana_us": statistics.median(tiempos) * 1e6,
+        "p95_us": tiempos[min(len(tiempos) - 1, int(0.95 * len(tiempos)))] * 1e6,
+        "repeticiones": len(tiempos),
+    }
+
+
+def ritmo(base, actual):
+    """
+    Qué tan más lenta (>1) o rápida (<1) vino esta corrida que la base en
+    general: la mediana de actual/base de todas las funciones medidas en las
+    dos. Una función que empeora sola no lo mueve; una máquina (o un momento)
+    más lento sí. Con pocas funciones (--funciones) no se puede separar una
+    de la otra: 1.0.
+    """
+    cocientes = [
+        medida["mediana_us"] / base["funciones"][nombre]["mediana_us"]
+        for nombre, medida in actual["funciones"].items() if nombre in base["funciones"]
+    ]
+    return statistics.median(cocientes) if len(cocientes) >= MINIMO_PARA_RITMO else 1.0
+
+
+def empeoro(base, actual, nombre, umbral, factor):
+    """
+    True si la mediana de `nombre`, descontado el ritmo general de la corrida
+    (`factor`), empeoró más de `umbral` y más de MINIMO_US respecto de la base.
+    """
+    if base is None or nombre not in base["funciones"]:
+        return False
+    antes = base["funciones"][nombre]["mediana_us"]
+    ahora = actual["funciones"][nombre]["mediana_us"] / factor
+    return ahora > antes * (1 + umbral) and ahora - antes > MINIMO_US
+
+
+def medir_escala(escala, filtro=None, base=None, umbral=UMBRAL):
+    """
+    Mide cada función sobre una BD de `escala` productos. Si hay base, lo
+    que parece una regresión se vuelve a medir (hasta REINTENTOS veces) y
+    queda la mejor medición: una sola corrida ruidosa no falla.
+
+    Returns:
+        dict: {"funciones": {función: resultado de cronometrar}}
+    """
+    temp_dir = crear_bd_temporal()
+    try:
+        datos = sembrar(escala)
+        resultado = {"funciones": {}}
+        medibles = [(nombre, fn, preparar) for nombre, fn, preparar in llamadas(datos)
+                    if not filtro or filtro in nombre]
+        for nombre, fn, preparar in medibles:
+            medida = resultado["funciones"][nombre] = cronometrar(fn, preparar)
+            print(f"  {nombre:<48}{medida['mediana_us']:>12.1f} us{medida['p95_us']:>12.1f} us")
+
+        for _ in range(REINTENTOS if base else 0):
+            factor = ritmo(base, resultado)
+            sospechosas = [(nombre, fn, preparar) for nombre, fn, preparar in medibles
+                           if empeoro(base, resultado, nombre, umbral, factor)]
+            for nombre, fn, preparar in sospechosas:
+                otra = cronometrar(fn, preparar)
+                if otra["mediana_us"] < resultado["funciones"][nombre]["mediana_us"]:
+                    resultado["funciones"][nombre] = otra
+                print(f"  {nombre:<48}{otra['mediana_us']:>12.1f} us{otra['p95_us']:>12.1f} us"
+                      "  (re-medida)")
+        return resultado
+    finally:
+        limpiar_bd_temporal(temp_dir)
+
+
+# ---------- Comparación con la base ----------
+
+def regresiones(base, actual, umbral):
+    """
+    Compara dos corridas escala por escala (solo lo que está en las dos).
+
+    Returns:
+        list: (escala, función, mediana base, mediana actual sin el ritmo
+        general) de lo que empeoró; función "(todas)" si la corrida entera
+        vino más de `umbral` más lenta
+    """
+    peores = []
+    for escala, medidas in actual["resultados"].items():
+        base_escala = base["resultados"].get(escala)
+        if base_escala is None:
+            continue
+        factor = ritmo(base_escala, medidas)
+        if factor > 1 + umbral:
+            peores.append((escala, "(todas)", 1.0, factor))
+        for nombre, medida in medidas["funciones"].items():
+            if empeoro(base_escala, medidas, nombre, umbral, factor):
+                peores.append((escala, nombre, base_escala["funciones"][nombre]["mediana_us"],
+                               medida["mediana_us"] / factor))
+    return peores
+
+
+def argumentos():
+    parser = argparse.ArgumentParser(description="Microbenchmarks de producto_repository")
+    parser.add_argument("--escalas", default=",".join(str(e) for e in ESCALAS),
+                        help="cantidades de productos, separadas por coma")
+    parser.add_argument("--funciones", help="solo las funciones cuyo nombre contiene este texto")
+    parser.add_argument("--perfil", default="safe", help="perfil de durabilidad")
+    parser.add_argument("--umbral", type=float, default=UMBRAL,
+                        help="empeoramiento relativo de la mediana que cuenta como regresión")
+    parser.add_argument("--base", default=BASE, help="JSON con la corrida de referencia")
+    parser.add_argument("--guardar-base", action="store_true",
+                        help="guardar esta corrida como la nueva base (no compara)")
+    parser.add_argument("--salida", default="repository_micro.json", help="JSON con el resultado")
+    return parser.parse_args()
+
+
+def main():
+    args = argumentos()
+    escalas = [int(e) for e in args.escalas.split(",")]
+
+    faltan = sin_microbenchmark(nombre for nombre, _, _ in llamadas(
+        {"nombres": ["x"], "ids": [1], "medio": 0, "relacion": 1, "proveedor": 1,
+         "proveedor_nuevo": 1, "venta": 1}))
+    if faltan:
+        print(f"Funciones del repository sin microbenchmark: {faltan}")
+        return 2
+
+    base = None
+    if not args.guardar_base and os.path.exists(args.base):
+        with open(args.base, "r", encoding="utf-8") as f:
+            base = json.load(f)
+        if base["perfil"] != args.perfil:
+            print(f"  Aviso: la base se midió con el perfil {base['perfil']}")
+
+    perfil_original = repo.DURABILITY_PROFILE
+    repo.DURABILITY_PROFILE = args.perfil
+    resultados = {}
+    try:
+        for escala in escalas:
+            print("=" * 72)
+            print(f"  MICROBENCHMARKS: {escala} productos (perfil {args.perfil})")
+            print("=" * 72)
+            print(f"  {'función':<48}{'mediana':>15}{'p95':>15}")
+            base_escala = base["resultados"].get(str(escala)) if base else None
+            resultados[str(escala)] = medir_escala(escala, args.funciones, base_escala, args.umbral)
+    finally:
+        repo.DURABILITY_PROFILE = perfil_original
+
+    corrida = {
+        "benchmark": "repository_micro",
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "entorno": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "plataforma": platform.platform(),
+        },
+        "perfil": args.perfil,
+        "resultados": resultados,
+    }
+    destino = args.base if args.guardar_base else args.salida
+    with open(destino, "w", encoding="utf-8") as f:
+        json.dump(corrida, f, indent=2, sort_keys=True)
+    print(f"\n  Resultado en {destino}")
+    if base is None:
+        if not args.guardar_base:
+            print(f"  Sin base en {args.base}: generarla con --guardar-base")
+        return 0
+
+    peores = regresiones(base, corrida, args.umbral)
+    print(f"\n  Regresiones (mediana más de {args.umbral:.0%} peor que la base, "
+          f"y más de {MINIMO_US:.0f} us, descontado el ritmo general):")
+    for escala, nombre, antes, ahora in peores:
+        print(f"    [{escala:>7}] {nombre:<48}{antes:>10.1f} -> {ahora:>10.1f} us ({ahora / antes - 1:+.0%})")
+    if not peores:
+        print("    ninguna")
+    return 1 if peores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""
+Benchmark: costo de reservar stock mientras se arma el carrito.
+
+- sin reservas: SesionVenta valida con el stock leído y cobra
+- con reservas: cada agregar_producto es además una transacción corta
+  (reserve_stock) y la venta descuenta lo reservado por otros carritos
+- con reservas y muchas abiertas: igual, con RESERVAS_ABIERTAS reservas de
+  otros carritos en la tabla (el costo no debe crecer con la tabla)
+- barrido: sweep_expired_reservations sobre VENCIDAS reservas vencidas
+
+Uso: python benchmarks/bench_reservations.py
+"""
+import sqlite3
+import time
+
+from comun import crear_bd_temporal, limpiar_bd_temporal, sembrar_catalogo, repo
+from carrito import Carrito
+from inventario_sqlite import InventarioSQLite
+from registro_ventas import RegistroVentas
+from sesion_venta import SesionVenta
+
+
+TAMANIOS_CARRITO = (5, 20, 50)
+CARRITOS = 20
+CATALOGO = 5_000
+RESERVAS_ABIERTAS = 20_000
+VENCIDAS = 50_000
+
+
+def armar_y_cobrar(nombres, items, reservar_stock):
+    """Arma CARRITOS carritos de `items` productos y los cobra. Returns: ms por carrito"""
+    inventario = InventarioSQLite(branch_id=1)
+    registro = RegistroVentas(branch_id=1, cash_register_id=1)
+    inicio = time.perf_counter()
+    for c in range(CARRITOS):
+        sesion = SesionVenta(inventario, registro, reservar_stock=reservar_stock)
+        sesion.iniciar_venta(Carrito())
+        for i in range(items):
+            assert sesion.agregar_producto(nombres[(c * items + i) % CATALOGO], 1).exito
+        sesion.confirmar_pago("efectivo")
+    return (time.perf_counter() - inicio) * 1000 / CARRITOS
+
+
+def insertar_reservas(cantidad, expires_at, prefijo):
+    """Reservas de otros carritos, repartidas en el catálogo, con una conexión propia"""
+    conn = sqlite3.connect(repo.DB_PATH)
+    try:
+        conn.executemany(
+            """INSERT INTO stock_reservation (branch_id, product_id, session_id, quantity, expires_at)
+               VALUES (1, ?, ?, 1, ?)""",
+            ((1 + i % CATALOGO, f"{prefijo}-{i}", expires_at) for i in range(cantidad))
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def main():
+    print("=" * 72)
+    print(f"  BENCHMARK: reservas de stock ({CARRITOS} carritos por fila, perfil {repo.DURABILITY_PROFILE})")
+    print("=" * 72)
+    print(f"{'items':>6}{'sin reservas':>15}{'con reservas':>15}{f'+{RESERVAS_ABIERTAS} abiertas':>18}"
+          f"{'por item':>11}")
+
+    # Con los datos semilla: la venta necesita la sucursal y su caja
+    temp_dir = crear_bd_temporal()
+    try:
+        nombres = sembrar_catalogo(CATALOGO)
+        filas = []
+        for items in TAMANIOS_CARRITO:
+            sin = armar_y_cobrar(nombres, items, reservar_stock=False)
+            con = armar_y_cobrar(nombres, items, reservar_stock=True)
+            filas.append((items, sin, con))
+
+        insertar_reservas(RESERVAS_ABIERTAS, time.time() + 3600, "abierta")
+        for items, sin, con in filas:
+            abiertas = armar_y_cobrar(nombres, items, reservar_stock=True)
+            print(f"{items:>6}{sin:>12.1f} ms{con:>12.1f} ms{abiertas:>15.1f} ms"
+                  f"{(con - sin) / items:>8.2f} ms")
+
+        insertar_reservas(VENCIDAS, time.time() - 1, "vencida")
+        inicio = time.perf_counter()
+        borradas = repo.sweep_expired_reservations(1)
+        barrido = (time.perf_counter() - inicio) * 1000
+        assert borradas == VENCIDAS
+        print(f"\n  Barrido de {borradas} vencidas: {barrido:.0f} ms "
+              f"(quedan {RESERVAS_ABIERTAS} vigentes)")
+    finally:
+        limpiar_bd_temporal(temp_dir)
+
+
+if __name__ == "__main__":
+    main()
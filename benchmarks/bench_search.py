@@ -0,0 +1,78 @@
+"""
+Benchmark: búsquedas por segundo del buscador de la caja (search_by_name),
+con la consulta LIKE '%texto%' anterior y con el índice FTS5 trigram.
+
+Para cada tamaño de catálogo (1k, 10k, 100k productos) se miden textos que
+coinciden con muchos productos, con pocos y con ninguno. LIKE recorre el
+catálogo entero siempre; FTS5 solo lee los productos que coinciden, pero
+ordenarlos por relevancia cuesta: con miles de coincidencias puede ser más
+lento que LIKE (se muestra también con limit=LIMITE, como una lista de
+sugerencias).
+
+Uso: python benchmarks/bench_search.py
+"""
+from comun import crear_bd_temporal, limpiar_bd_temporal, medir, sembrar_catalogo, repo
+
+
+TAMANIOS = (1_000, 10_000, 100_000)
+# Los nombres sintéticos son "Producto Bench 000000" .. "Producto Bench 099999"
+TEXTOS = (
+    ("muchos", "ch 00"),
+    ("pocos", "00042"),
+    ("ninguno", "yerba"),
+)
+DURACION_OBJETIVO = 0.5
+# Lo que entra en la lista de sugerencias del buscador
+LIMITE = 20
+
+
+def buscar_like(texto, branch_id):
+    """La consulta de search_by_name antes del índice FTS5."""
+    with repo._connection(branch_id) as conn:
+        results = conn.execute(
+            """SELECT p.name
+               FROM product p
+               JOIN branch_product bp ON p.id = bp.product_id
+               WHERE p.name LIKE ? AND bp.branch_id = ? AND bp.active = 1""",
+            (f"%{texto}%", branch_id)
+        ).fetchall()
+    return [row[0] for row in results]
+
+
+def medir_busqueda(fn, texto):
+    """Búsquedas/segundo, repitiendo lo suficiente para ~DURACION_OBJETIVO segundos."""
+    fn(texto, 1)
+    repeticiones = 1
+    while True:
+        valor = medir(lambda: fn(texto, 1), repeticiones)
+        if repeticiones / valor >= DURACION_OBJETIVO:
+            return valor
+        repeticiones *= 4
+
+
+def main():
+    print("=" * 72)
+    print("  BENCHMARK: search_by_name, LIKE vs FTS5 trigram (búsquedas/segundo)")
+    print("=" * 72)
+    print(f"{'catálogo':>9}  {'texto':<18}{'resultados':>11}{'LIKE':>11}{'FTS5':>10}{'mejora':>8}{'limit':>9}")
+
+    for tamanio in TAMANIOS:
+        temp_dir = crear_bd_temporal(seed=False)
+        try:
+            sembrar_catalogo(tamanio)
+            for etiqueta, texto in TEXTOS:
+                resultados = repo.search_by_name(texto, 1)
+                assert sorted(resultados) == sorted(buscar_like(texto, 1))
+                like = medir_busqueda(buscar_like, texto)
+                fts = medir_busqueda(repo.search_by_name, texto)
+                limitada = medir_busqueda(
+                    lambda t, b: repo.search_by_name(t, b, limit=LIMITE), texto
+                )
+                print(f"{tamanio:>9}  {etiqueta + ' (' + texto + ')':<18}{len(resultados):>11}"
+                      f"{like:>11.0f}{fts:>10.0f}{fts / like:>7.1f}x{limitada:>9.0f}")
+        finally:
+            limpiar_bd_temporal(temp_dir)
+
+
+if __name__ == "__main__":
+    main()
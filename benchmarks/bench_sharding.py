@@ -0,0 +1,109 @@
+"""
+Benchmark: ventas por segundo de TODA la cadena según cuántas sucursales
+venden a la vez, con un solo archivo vs. un archivo por sucursal.
+
+Con un solo archivo todas las cajas comparten un write lock (el total no
+crece con las sucursales); con sharding cada sucursal tiene el suyo y sus
+fsync corren en paralelo. Perfil "safe" (synchronous=FULL), 2 cajas por sucursal.
+
+Cada caja es un proceso (como --modo procesos de bench_carga_cajas.py): con
+threads todas comparten el GIL de un solo intérprete y el trabajo en Python
+de cada venta se serializa igual, así que el paralelismo de los fsync no
+llega a verse. El tiempo va desde que todas pasan la barrera hasta que
+termina la última.
+
+Uso: python benchmarks/bench_sharding.py
+"""
+import multiprocessing
+import time
+
+from comun import crear_bd_temporal, crear_sucursales, limpiar_bd_temporal, sembrar_catalogo, repo
+from database import sharding
+
+
+SUCURSALES = [1, 2, 4, 8]
+CAJAS_POR_SUCURSAL = 2
+VENTAS_POR_CAJA = 150
+ITEMS_POR_VENTA = 5
+
+
+def _proceso_caja(db_path, sharding_activo, cash_register_id, branch_id, items, barrera, cola):
+    """Una caja: VENTAS_POR_CAJA ventas en su sucursal. Pone (inicio, fin) en la cola."""
+    repo.DB_PATH = db_path
+    repo.SHARDING = sharding_activo
+    try:
+        barrera.wait(60)
+        inicio = time.time()
+        for _ in range(VENTAS_POR_CAJA):
+            repo.process_sale_atomic(branch_id, cash_register_id, items, 500, "2026-03-05 10:00:00")
+        cola.put((inicio, time.time()))
+    except Exception as e:
+        # Avisar al proceso principal en vez de dejarlo esperando en la cola
+        cola.put(f"caja {cash_register_id}: {type(e).__name__} {e}")
+    finally:
+        repo.close_pool()
+
+
+def correr(cajas, nombres):
+    """Cada caja (un proceso) hace VENTAS_POR_CAJA ventas en su sucursal. Returns: ventas/segundo"""
+    items = [
+        {"product_name": nombre, "quantity": 1, "price_at_sale": 100}
+        for nombre in nombres[:ITEMS_POR_VENTA]
+    ]
+    # El proceso principal suelta sus conexiones: los hijos abren las suyas
+    repo.close_pool()
+    contexto = multiprocessing.get_context("spawn")
+    barrera = contexto.Barrier(len(cajas))
+    cola = contexto.Queue()
+    procesos = [
+        contexto.Process(
+            target=_proceso_caja,
+            args=(repo.DB_PATH, repo.SHARDING, cash_register_id, branch_id, items, barrera, cola)
+        )
+        for cash_register_id, branch_id in cajas
+    ]
+    for p in procesos:
+        p.start()
+    resultados = [cola.get() for _ in procesos]
+    for p in procesos:
+        p.join()
+    fallas = [r for r in resultados if isinstance(r, str)]
+    if fallas:
+        raise RuntimeError("; ".join(fallas))
+    duracion = max(fin for _, fin in resultados) - min(inicio for inicio, _ in resultados)
+    return len(cajas) * VENTAS_POR_CAJA / duracion
+
+
+def medir_sucursales(cantidad):
+    """Returns: (ventas/s con un archivo, ventas/s con un archivo por sucursal)"""
+    temp_dir = crear_bd_temporal(seed=False)
+    try:
+        cajas = crear_sucursales(cantidad, CAJAS_POR_SUCURSAL)
+        nombres = sembrar_catalogo(ITEMS_POR_VENTA, branch_ids=range(1, cantidad + 1))
+
+        un_archivo = correr(cajas, nombres)
+
+        repo.close_pool()
+        sharding.split_into_shards(repo.DB_PATH)
+        repo.SHARDING = True
+        por_sucursal = correr(cajas, nombres)
+        return un_archivo, por_sucursal
+    finally:
+        repo.SHARDING = False
+        limpiar_bd_temporal(temp_dir)
+
+
+def main():
+    print("=" * 64)
+    print(f"  BENCHMARK: ventas/segundo de la cadena ({CAJAS_POR_SUCURSAL} cajas por sucursal, "
+          f"un proceso por caja, {multiprocessing.cpu_count()} CPUs)")
+    print("=" * 64)
+    print(f"{'sucursales':>10}{'un archivo':>14}{'por sucursal':>16}{'mejora':>10}")
+
+    for cantidad in SUCURSALES:
+        un_archivo, por_sucursal = medir_sucursales(cantidad)
+        print(f"{cantidad:>10}{un_archivo:>14.0f}{por_sucursal:>16.0f}{por_sucursal / un_archivo:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
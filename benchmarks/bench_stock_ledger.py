@@ -0,0 +1,88 @@
+"""
+Benchmark: costo del historial de stock.
+
+- checkout: process_sale_atomic con y sin anotar movimientos (sin =
+  _record_movements reemplazado por una función vacía solo acá), por
+  tamaño de carrito. Mediana de REPETICIONES ventas, COMMIT incluido.
+- stock en un instante: un producto con HISTORIAL movimientos, sumando todo
+  el historial (sin snapshot) y desde el snapshot con una cola de COLA.
+
+Uso: python benchmarks/bench_stock_ledger.py
+"""
+import statistics
+import time
+
+from comun import crear_bd_temporal, limpiar_bd_temporal, sembrar_catalogo, repo
+
+
+TAMANIOS = [1, 5, 20, 60]
+REPETICIONES = 200
+CATALOGO = 2_000
+HISTORIAL = 100_000
+COLA = 50
+
+
+def medianas_ms(tamanio, nombres):
+    """
+    Medianas de REPETICIONES ventas de `tamanio` items, sin y con historial.
+    Se alternan venta a venta: el ruido del disco afecta igual a las dos.
+    """
+    original = repo._record_movements
+    tiempos = {False: [], True: []}
+    for r in range(REPETICIONES):
+        for con_historial in (False, True):
+            items = [
+                {"product_name": nombres[(r * tamanio + i) % CATALOGO], "quantity": 1,
+                 "price_at_sale": 100}
+                for i in range(tamanio)
+            ]
+            repo._record_movements = original if con_historial else (lambda *args, **kwargs: None)
+            try:
+                inicio = time.perf_counter()
+                repo.process_sale_atomic(1, 1, items, 100 * tamanio, "2026-03-05 10:00:00")
+                tiempos[con_historial].append(time.perf_counter() - inicio)
+            finally:
+                repo._record_movements = original
+    return statistics.median(tiempos[False]) * 1000, statistics.median(tiempos[True]) * 1000
+
+
+def medir_consulta(nombre, repeticiones=50):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        repo.get_stock_at(1, nombre)
+    return (time.perf_counter() - inicio) * 1000 / repeticiones
+
+
+def main():
+    print("=" * 72)
+    print(f"  BENCHMARK: historial de stock (perfil {repo.DURABILITY_PROFILE})")
+    print("=" * 72)
+
+    temp_dir = crear_bd_temporal()
+    try:
+        nombres = sembrar_catalogo(CATALOGO)
+
+        print(f"\n  Checkout (mediana de {REPETICIONES} ventas)")
+        print(f"{'items':>8}{'sin historial':>16}{'con historial':>16}{'extra':>10}")
+        for tamanio in TAMANIOS:
+            sin, con = medianas_ms(tamanio, nombres)
+            print(f"{tamanio:>8}{sin:>13.3f} ms{con:>13.3f} ms{(con - sin) / sin:>9.0%}")
+
+        # Un producto con un historial largo (movimientos de a una unidad)
+        nombre = nombres[0]
+        repo.adjust_stock_bulk(1, ((nombre, 1) for _ in range(HISTORIAL)))
+        sin_snapshot = medir_consulta(nombre)
+
+        repo.snapshot_stock_ledger(1)
+        repo.adjust_stock_bulk(1, ((nombre, -1) for _ in range(COLA)))
+        con_snapshot = medir_consulta(nombre)
+
+        print(f"\n  Stock en un instante de un producto con {HISTORIAL} movimientos")
+        print(f"    todo el historial:       {sin_snapshot:8.3f} ms")
+        print(f"    snapshot + cola de {COLA}:  {con_snapshot:8.3f} ms")
+    finally:
+        limpiar_bd_temporal(temp_dir)
+
+
+if __name__ == "__main__":
+    main()
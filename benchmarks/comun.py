@@ -0,0 +1,112 @@
+"""
+Utilidades compartidas por los benchmarks.
+
+Igual que test_concurrency.py, cada benchmark trabaja sobre una BD temporal
+(nunca toca supermercado.db): se crea con schema.sql + migraciones, se cargan los datos
+semilla de init_db y se parchea repo.DB_PATH para apuntar a ella.
+
+Uso: python benchmarks/<bench>.py
+"""
+import os
+import sys
+import shutil
+import sqlite3
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from database import producto_repository as repo
+from database import migrations
+from database.init_db import _seed_data
+
+
+SCHEMA_PATH = os.path.join(ROOT_DIR, "database", "schema.sql")
+
+
+def crear_bd_temporal(nombre="bench.db", seed=True):
+    """
+    Crea una BD temporal con el schema (y opcionalmente los datos semilla)
+    y apunta el repository a ella.
+    Returns: directorio temporal (pasarlo a limpiar_bd_temporal)
+    """
+    temp_dir = tempfile.mkdtemp()
+    db_path = os.path.join(temp_dir, nombre)
+    repo.DB_PATH = db_path
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA foreign_keys = ON")
+    cursor = conn.cursor()
+    with open(SCHEMA_PATH, "r", encoding="utf-8") as f:
+        cursor.executescript(f.read())
+    migrations.migrate(conn)
+    if seed:
+        _seed_data(cursor)
+    conn.commit()
+    conn.close()
+    return temp_dir
+
+
+def limpiar_bd_temporal(temp_dir):
+    """Cierra el pool, borra la BD temporal y restaura el path original"""
+    repo.close_pool()
+    repo.DB_PATH = os.path.join(ROOT_DIR, "supermercado.db")
+    shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def medir(fn, repeticiones):
+    """
+    Ejecuta fn() `repeticiones` veces.
+    Returns: llamadas por segundo
+    """
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        fn()
+    return repeticiones / (time.perf_counter() - inicio)
+
+
+def sembrar_catalogo(cantidad, branch_ids=(1,), stock=1_000_000, precio=100, prefijo="Producto Bench"):
+    """
+    Agrega `cantidad` productos sintéticos activos en cada sucursal indicada.
+    Usa una conexión propia y executemany (rápido aun con 100k productos).
+    Returns: lista de nombres creados
+    """
+    nombres = [f"{prefijo} {i:06d}" for i in range(cantidad)]
+    conn = sqlite3.connect(repo.DB_PATH)
+    try:
+        conn.executemany(
+            "INSERT INTO product (name, category) VALUES (?, 'Bench')",
+            ((nombre,) for nombre in nombres)
+        )
+        for branch_id in branch_ids:
+            conn.execute(
+                """INSERT INTO branch_product (branch_id, product_id, price, stock, active)
+                   SELECT ?, id, ?, ?, 1 FROM product WHERE category = 'Bench'""",
+                (branch_id, precio, stock)
+            )
+        conn.commit()
+    finally:
+        conn.close()
+    return nombres
+
+
+def crear_sucursales(cantidad, cajas_por_sucursal):
+    """
+    Crea `cantidad` sucursales con `cajas_por_sucursal` cajas cada una (sobre
+    una BD sin datos semilla, las sucursales quedan con ids 1..cantidad).
+    Returns: lista de (cash_register_id, branch_id)
+    """
+    conn = sqlite3.connect(repo.DB_PATH)
+    try:
+        for branch_id in range(1, cantidad + 1):
+            conn.execute("INSERT INTO branch (name) VALUES (?)", (f"Sucursal Bench {branch_id}",))
+            conn.executemany(
+                "INSERT INTO cash_register (branch_id, current_balance) VALUES (?, 0)",
+                [(branch_id,)] * cajas_por_sucursal
+            )
+        conn.commit()
+        return conn.execute("SELECT id, branch_id FROM cash_register ORDER BY id").fetchall()
+    finally:
+        conn.close()
@@ -15,9 +15,12 @@ class Caja:
     Usa la tabla cash_register del nuevo schema.
     """
 
-    def __init__(self, cash_register_id=1):
+    def __init__(self, cash_register_id=1, branch_id=None):
         # ID de la caja registradora con la que trabaja esta instancia
         self.cash_register_id = cash_register_id
+        # Sucursal de la caja (opcional): con sharding el repository la
+        # averigua solo, pero si se conoce se ahorra esa búsqueda
+        self.branch_id = branch_id
 
     def ingresar(self, monto):
         """
@@ -25,7 +28,8 @@ class Caja:
         Se llama después de confirmar una venta.
         """
         producto_repository.update_cash_register_balance(
-            self.cash_register_id, monto  # positivo = ingreso
+            self.cash_register_id, monto,  # positivo = ingreso
+            branch_id=self.branch_id
         )
 
     def obtener_saldo(self):
@@ -33,7 +37,9 @@ class Caja:
         Obtiene el saldo actual de esta caja registradora.
         Returns: saldo (float)
         """
-        return producto_repository.get_cash_register_balance(self.cash_register_id)
+        return producto_repository.get_cash_register_balance(
+            self.cash_register_id, branch_id=self.branch_id
+        )
 
     def retirar(self, monto):
         """
@@ -46,7 +52,8 @@ class Caja:
             raise ValueError("Saldo insuficiente")
 
         producto_repository.update_cash_register_balance(
-            self.cash_register_id, -monto  # negativo = retiro
+            self.cash_register_id, -monto,  # negativo = retiro
+            branch_id=self.branch_id
         )
         return self.obtener_saldo()
 
@@ -9,7 +9,10 @@ class ItemCarrito:
     - En inventario: un producto tiene STOCK
     - En carrito: un producto tiene CANTIDAD que quiero comprar
     - NO duplicamos datos (precio, nombre), guardamos referencia al objeto Producto
+    - __slots__: sin __dict__ por item (un carrito grande tiene cientos)
     """
+
+    __slots__ = ("producto", "cantidad")
     
     def __init__(self, producto, cantidad):
         """
@@ -59,9 +62,15 @@ class Carrito:
     - No se repiten productos (si agregas pan dos veces, incrementa cantidad)
     """
     
-    def __init__(self):
+    def __init__(self, reservas=None):
+        """
+        Args:
+            reservas (ReservaStock): Reservas de stock del carrito (opcional).
+                Si hay, quitar/vaciar/modificar_cantidad las liberan o ajustan.
+        """
         # Dict: {"pan": ItemCarrito(...), "leche": ItemCarrito(...)}
         self.items = {}
+        self.reservas = reservas
     
     def agregar(self, producto, cantidad):
         """
@@ -97,6 +106,8 @@ class Carrito:
         """
         if nombre in self.items:
             del self.items[nombre]
+            if self.reservas is not None:
+                self.reservas.liberar(nombre)
             return True
         return False
     
@@ -107,11 +118,18 @@ class Carrito:
         Args:
             nombre (str): Nombre del producto
             nueva_cantidad (int): Nueva cantidad (si es 0, elimina el producto)
+        
+        Returns:
+            bool: False si no existía o (con reservas) no hay stock para la nueva cantidad
         """
         if nombre in self.items:
             if nueva_cantidad <= 0:
                 self.quitar(nombre)
             else:
+                if self.reservas is not None:
+                    ok, _ = self.reservas.reservar(nombre, nueva_cantidad)
+                    if not ok:
+                        return False
                 self.items[nombre].cantidad = nueva_cantidad
             return True
         return False
@@ -127,8 +145,10 @@ class Carrito:
         return sum(item.calcular_subtotal() for item in self.items.values())
     
     def vaciar(self):
-        """Elimina todos los items del carrito."""
+        """Elimina todos los items del carrito (y libera sus reservas)."""
         self.items.clear()
+        if self.reservas is not None:
+            self.reservas.liberar_todo()
     
     def listar(self):
         """
@@ -0,0 +1,218 @@
+"""
+Variante asyncio del repository.
+
+# Por qué existe:
+# Todas las funciones de producto_repository son bloqueantes. Llamarlas desde
+# una corutina frena el event loop entero mientras SQLite trabaja (o espera
+# un lock). Acá se exponen las mismas operaciones como corutinas.
+#
+# Cómo funciona:
+# - Un ThreadPoolExecutor acotado (max_workers) corre las funciones del
+#   repository. Cada tarea toma su conexión del pool ANTES de llamar a la
+#   función; como el pool es reentrante por thread, la función usa esa misma
+#   conexión y así sabemos cuál interrumpir.
+# - Timeout por llamada (timeout=...) o por defecto (default_timeout).
+# - Cancelación: si la corutina se cancela (o vence el timeout) y la tarea
+#   todavía no empezó, no se ejecuta; si ya está corriendo, se llama a
+#   conn.interrupt() y SQLite aborta la sentencia en curso. Las escrituras
+#   hacen ROLLBACK al interrumpirse, así nunca quedan a medias. Si está
+#   esperando entre dos reintentos (no hay sentencia que interrumpir), no
+#   hace el siguiente ni el COMMIT (retry.cancellable). Ojo: si la venta ya
+#   estaba confirmando, la cancelación llega tarde y la venta queda hecha.
+#
+# Uso:
+#   async with AsyncRepository(max_workers=8) as repo_aio:
+#       producto = await repo_aio.get_product_by_name("Coca Cola 500ml", 1, timeout=2.0)
+"""
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from database import producto_repository
+from database import retry
+
+
+class _Job:
+    """
+    Conexión en uso por una tarea del executor.
+    El lock evita interrumpir una conexión que ya volvió al pool
+    (y que podría estar atendiendo OTRA tarea).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.conn = None
+        self.cancelled = False
+
+    def interrupt(self):
+        with self.lock:
+            self.cancelled = True
+            if self.conn is not None:
+                self.conn.interrupt()
+
+
+class AsyncRepository:
+    """
+    Operaciones del repository como corutinas, sobre un executor acotado.
+    """
+
+    def __init__(self, max_workers=8, default_timeout=None):
+        """
+        Args:
+            max_workers (int): Threads del executor (= máximo de consultas simultáneas).
+                Debe ser <= producto_repository.POOL_SIZE para no esperar conexiones.
+            default_timeout (float | None): Segundos por llamada si no se indica otro
+        """
+        self.max_workers = max_workers
+        self.default_timeout = default_timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="repo-aio"
+        )
+
+    # ---------- Núcleo ----------
+
+    async def run(self, fn, *args, timeout=None, **kwargs):
+        """
+        Ejecuta cualquier función bloqueante que use el repository (ej: un método
+        de InventarioSQLite) en el executor, con timeout y cancelación.
+
+        Con sharding, la conexión que se interrumpe es la del archivo compartido:
+        para funciones que consultan una sucursal usar run_for_branch().
+
+        Raises:
+            asyncio.TimeoutError: Si se supera el timeout (la consulta se interrumpe)
+            asyncio.CancelledError: Si la corutina se cancela
+        """
+        return await self._submit(fn, args, kwargs, timeout)
+
+    async def run_for_branch(self, branch_id, fn, *args, timeout=None, **kwargs):
+        """
+        Igual que run(), para funciones que trabajan sobre UNA sucursal
+        (ej: InventarioSQLite.obtener_producto). Con sharding toma de antemano
+        la conexión del archivo de esa sucursal, así el timeout y la
+        cancelación interrumpen la consulta correcta.
+        """
+        return await self._submit(fn, args, kwargs, timeout, branch_id)
+
+    async def _submit(self, fn, args, kwargs, timeout, branch_id=None):
+        """
+        Núcleo de run(). branch_id indica qué conexión tomar de antemano: con
+        sharding, la de la sucursal que va a usar fn (la que hay que interrumpir).
+        """
+        if timeout is None:
+            timeout = self.default_timeout
+
+        job = _Job()
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            self._executor,
+            functools.partial(self._execute, job, fn, args, kwargs, branch_id)
+        )
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            job.interrupt()
+            raise
+
+    @staticmethod
+    def _execute(job, fn, args, kwargs, branch_id=None):
+        """Corre en un thread del executor, con la conexión del pool ya tomada."""
+        with producto_repository._connection(branch_id) as conn:
+            with job.lock:
+                if job.cancelled:
+                    raise asyncio.CancelledError()
+                job.conn = conn
+            try:
+                with retry.cancellable(lambda: job.cancelled):
+                    return fn(*args, **kwargs)
+            finally:
+                with job.lock:
+                    job.conn = None
+
+    async def aclose(self):
+        """Espera las tareas en curso y libera los threads del executor."""
+        await asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(self._executor.shutdown, wait=True)
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+
+    # ---------- Productos ----------
+
+    async def get_active_products(self, branch_id, timeout=None):
+        """Ver producto_repository.get_active_products"""
+        return await self._submit(
+            producto_repository.get_active_products, (branch_id,), {}, timeout, branch_id
+        )
+
+    async def get_product_by_name(self, name, branch_id, timeout=None):
+        """Ver producto_repository.get_product_by_name"""
+        return await self._submit(
+            producto_repository.get_product_by_name, (name, branch_id), {}, timeout, branch_id
+        )
+
+    async def search_by_name(self, partial_name, branch_id, timeout=None):
+        """Ver producto_repository.search_by_name"""
+        return await self._submit(
+            producto_repository.search_by_name, (partial_name, branch_id), {}, timeout, branch_id
+        )
+
+    # ---------- Ventas ----------
+
+    async def process_sale_atomic(self, branch_id, cash_register_id, items, total_amount,
+                                  timestamp, member_id=None, session_id=None, timeout=None):
+        """Ver producto_repository.process_sale_atomic"""
+        return await self._submit(
+            producto_repository.process_sale_atomic,
+            (branch_id, cash_register_id, items, total_amount, timestamp, member_id, session_id), {},
+            timeout, branch_id
+        )
+
+    # ---------- Socios ----------
+
+    async def get_member_by_name(self, name, timeout=None):
+        """Ver producto_repository.get_member_by_name"""
+        return await self.run(producto_repository.get_member_by_name, name, timeout=timeout)
+
+    async def get_member_by_dni(self, dni, timeout=None):
+        """Ver producto_repository.get_member_by_dni"""
+        return await self.run(producto_repository.get_member_by_dni, dni, timeout=timeout)
+
+    # ---------- Proveedores ----------
+
+    async def get_all_suppliers(self, timeout=None):
+        """Ver producto_repository.get_all_suppliers"""
+        return await self.run(producto_repository.get_all_suppliers, timeout=timeout)
+
+    async def get_relations_by_product(self, product_id, timeout=None):
+        """Ver producto_repository.get_relations_by_product"""
+        return await self.run(
+            producto_repository.get_relations_by_product, product_id, timeout=timeout
+        )
+
+    async def get_relations_by_supplier(self, supplier_id, timeout=None):
+        """Ver producto_repository.get_relations_by_supplier"""
+        return await self.run(
+            producto_repository.get_relations_by_supplier, supplier_id, timeout=timeout
+        )
+
+    async def create_product_supplier_relation(self, product_id, supplier_id, purchase_price,
+                                               initial_stock=0, timeout=None):
+        """Ver producto_repository.create_product_supplier_relation"""
+        return await self.run(
+            producto_repository.create_product_supplier_relation,
+            product_id, supplier_id, purchase_price, initial_stock,
+            timeout=timeout
+        )
+
+    async def update_supplier_stock(self, relation_id, quantity_delta, timeout=None):
+        """Ver producto_repository.update_supplier_stock"""
+        return await self.run(
+            producto_repository.update_supplier_stock, relation_id, quantity_delta,
+            timeout=timeout
+        )
@@ -0,0 +1,163 @@
+"""
+Autocompletado por prefijo de los nombres del catálogo activo de una sucursal.
+
+# Por qué existe:
+# La búsqueda del cajero (vender_producto) consulta la BD (search_by_name).
+# Para sugerir nombres mientras se escribe, una consulta por tecla, hace
+# falta una respuesta en microsegundos, en memoria
+# (InventarioSQLite.sugerir). main.py muestra primero las sugerencias; la
+# búsqueda completa (si no hay, o el cajero la pide) sigue yendo a la BD.
+#
+# Cómo funciona:
+# - Dos listas paralelas ordenadas: _keys (el nombre en minúsculas desde el
+#   comienzo de cada palabra) y _names (el nombre original). "Coca Cola 500ml"
+#   aparece 3 veces: "coca cola 500ml", "cola 500ml", "500ml", así que "cola"
+#   también lo encuentra. Las 3 entradas de _names apuntan al MISMO str.
+# - complete(prefix): bisect al primer key >= prefix y avanzar mientras el
+#   key empiece con prefix: O(log n + resultados), sin recorrer el catálogo.
+# - Listas y no un trie de dicts: con 200k nombres un trie son millones de
+#   dicts (cientos de MB); acá son 2 punteros por entrada más los sufijos.
+# - Actualización incremental: add/remove insertan o sacan con bisect (el
+#   memmove de la lista tarda microsegundos con 200k entradas), sin
+#   reconstruir. producto_repository avisa (_catalog_listeners) cuando se
+#   crea, asigna, activa o desactiva un producto, y cada índice abierto de
+#   esa sucursal se actualiza solo.
+#
+# Límite: el aviso es del proceso. Los cambios hechos desde OTRO proceso
+# (ej: main_gerente.py) no llegan hasta llamar a rebuild().
+"""
+import bisect
+import threading
+
+from database import producto_repository
+
+
+DEFAULT_LIMIT = 10
+
+
+def _word_keys(name):
+    """
+    Claves de un nombre: el nombre en minúsculas desde el comienzo de cada palabra.
+    Ej: "Coca Cola 500ml" → ["coca cola 500ml", "cola 500ml", "500ml"]
+    """
+    key = " ".join(name.casefold().split())
+    keys = [key]
+    start = key.find(" ")
+    while start != -1:
+        keys.append(key[start + 1:])
+        start = key.find(" ", start + 1)
+    return keys
+
+
+class ProductAutocomplete:
+    """
+    Índice de prefijos de UNA sucursal (seguro entre threads).
+    Se construye con iter_active_products y se mantiene con los avisos del repository.
+    """
+
+    def __init__(self, branch_id):
+        """
+        Args:
+            branch_id (int): Sucursal cuyo catálogo activo se indexa
+        """
+        self.branch_id = branch_id
+        self._lock = threading.Lock()
+        self._keys = []
+        self._names = []
+        self._size = 0
+        self.rebuild()
+        producto_repository._catalog_listeners.append(self._on_catalog_change)
+
+    def complete(self, prefix, limit=DEFAULT_LIMIT):
+        """
+        Nombres con alguna palabra que empieza con `prefix` (sin distinguir
+        mayúsculas), en orden alfabético de la palabra que coincidió.
+
+        Args:
+            prefix (str): Lo que escribió el cajero (una o más palabras)
+            limit (int): Máximo de nombres a devolver
+
+        Returns:
+            list: Nombres sin repetir (un nombre puede coincidir en 2 palabras)
+        """
+        key = " ".join(prefix.casefold().split())
+        if not key or limit <= 0:
+            return []
+
+        results = []
+        seen = set()
+        with self._lock:
+            i = bisect.bisect_left(self._keys, key)
+            while i < len(self._keys) and self._keys[i].startswith(key):
+                name = self._names[i]
+                if name not in seen:
+                    seen.add(name)
+                    results.append(name)
+                    if len(results) == limit:
+                        break
+                i += 1
+        return results
+
+    def add(self, name):
+        """Agrega un nombre al índice (no hace nada si ya estaba)."""
+        with self._lock:
+            if self._find(_word_keys(name)[0], name) is not None:
+                return
+            for key in _word_keys(name):
+                i = bisect.bisect_right(self._keys, key)
+                self._keys.insert(i, key)
+                self._names.insert(i, name)
+            self._size += 1
+
+    def remove(self, name):
+        """Saca un nombre del índice (no hace nada si no estaba)."""
+        with self._lock:
+            if self._find(_word_keys(name)[0], name) is None:
+                return
+            for key in _word_keys(name):
+                i = self._find(key, name)
+                del self._keys[i]
+                del self._names[i]
+            self._size -= 1
+
+    def rebuild(self):
+        """Vuelve a cargar el índice completo desde la BD."""
+        unique = {row[0] for row in producto_repository.iter_active_products(self.branch_id)}
+        entries = sorted((key, name) for name in unique for key in _word_keys(name))
+        keys = [key for key, _ in entries]
+        names = [name for _, name in entries]
+        with self._lock:
+            self._keys = keys
+            self._names = names
+            self._size = len(unique)
+
+    def __len__(self):
+        """Cantidad de nombres indexados."""
+        return self._size
+
+    def close(self):
+        """Deja de recibir los avisos del repository."""
+        try:
+            producto_repository._catalog_listeners.remove(self._on_catalog_change)
+        except ValueError:
+            pass
+
+    # ---------- Internos ----------
+
+    def _find(self, key, name):
+        """Posición de la entrada (key, name) o None (con self._lock tomado)."""
+        i = bisect.bisect_left(self._keys, key)
+        while i < len(self._keys) and self._keys[i] == key:
+            if self._names[i] == name:
+                return i
+            i += 1
+        return None
+
+    def _on_catalog_change(self, branch_id, name, active):
+        """Listener de producto_repository._catalog_listeners."""
+        if branch_id != self.branch_id:
+            return
+        if active:
+            self.add(name)
+        else:
+            self.remove(name)
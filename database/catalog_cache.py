@@ -0,0 +1,156 @@
+"""
+Caché en memoria del catálogo activo de una sucursal, validada con PRAGMA data_version.
+
+# Por qué existe:
+# SesionVenta.agregar_producto llama a InventarioSQLite.obtener_producto en
+# cada escaneo: un carrito de 40 items son 40 consultas por datos que casi
+# no cambian entre un escaneo y el siguiente.
+#
+# Cómo funciona:
+# - name → (product_id, name, price, stock) se carga la primera vez que se
+#   pide cada producto (también se recuerda "no existe / inactivo"). Lo mismo
+#   para código de barras → tupla, en su propio espacio de claves.
+# - Antes de cada lectura se consulta PRAGMA data_version en una conexión
+#   PROPIA de la caché (solo lectura, fuera del pool). SQLite cambia ese
+#   número cuando CUALQUIER otra conexión confirma cambios en el archivo:
+#   otras cajas, el gerente, otro proceso. Si cambió, se vacía la caché.
+#   Por eso la conexión no puede ser del pool: data_version no cambia con
+#   los COMMIT de la misma conexión.
+# - Consultar data_version no lee páginas de la BD: es mucho más barato que
+#   el JOIN product/branch_product de get_product_by_name.
+# - Con sharding se vigilan los dos archivos (sucursal y compartido).
+#
+# Costo: en un solo archivo, cualquier venta de cualquier sucursal vacía la
+# caché (el contador es del archivo, no de la tabla). Se vuelve a llenar de a
+# un producto, así que invalidar es barato; con sharding solo la invalidan
+# los cambios de la propia sucursal o del catálogo compartido.
+"""
+import threading
+
+from database import producto_repository
+from database import sharding
+
+
+class CatalogCache:
+    """
+    Caché del catálogo activo de UNA sucursal (segura entre threads).
+    """
+
+    def __init__(self, branch_id):
+        """
+        Args:
+            branch_id (int): Sucursal cuyo catálogo se guarda
+        """
+        self.branch_id = branch_id
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._conn = None
+        self._conn_key = None
+        self._version = None
+        # Sube cada vez que se vacía la caché (por versión o por invalidate())
+        self._generation = 0
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get_product(self, name):
+        """
+        Igual que producto_repository.get_product_by_name(name, branch_id),
+        sin ir a la BD si nada cambió desde la última vez.
+        Returns: (product_id, name, price, stock) o None
+        """
+        return self._get(("name", name), producto_repository.get_product_by_name, name)
+
+    def get_product_by_barcode(self, barcode):
+        """
+        Igual que producto_repository.get_product_by_barcode(barcode, branch_id),
+        sin ir a la BD si nada cambió desde la última vez.
+        Returns: (product_id, name, price, stock) o None
+        """
+        return self._get(
+            ("barcode", barcode), producto_repository.get_product_by_barcode, barcode
+        )
+
+    def invalidate(self):
+        """Vacía la caché (ej: después de un cambio que se quiere ver sí o sí)."""
+        with self._lock:
+            self._clear()
+            self._stats["invalidations"] += 1
+
+    def stats(self):
+        """
+        Returns: dict con hits, misses, invalidations, size y hit_rate
+        """
+        with self._lock:
+            result = dict(self._stats)
+            result["size"] = len(self._entries)
+        lookups = result["hits"] + result["misses"]
+        result["hit_rate"] = result["hits"] / lookups if lookups else 0.0
+        return result
+
+    def close(self):
+        """Cierra la conexión propia de la caché."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+            self._conn = None
+            self._conn_key = None
+            self._version = None
+            self._clear()
+
+    def _get(self, key, fetch, value):
+        """Busca key en la caché; si no está, la carga con fetch(value, branch_id)."""
+        with self._lock:
+            self._validate()
+            if key in self._entries:
+                self._stats["hits"] += 1
+                return self._entries[key]
+            self._stats["misses"] += 1
+            generation = self._generation
+
+        # Leer fuera del lock: otros threads siguen usando la caché mientras tanto
+        row = fetch(value, self.branch_id)
+
+        with self._lock:
+            # Solo guardar si nadie vació la caché mientras leíamos. Se leyó
+            # DESPUÉS de validar la versión: si hubo un cambio en el medio, la
+            # fila es más nueva que la versión y la próxima validación lo detecta.
+            if self._generation == generation:
+                self._entries[key] = row
+        return row
+
+    # ---------- Internos (con self._lock tomado) ----------
+
+    def _validate(self):
+        """Vacía la caché si la BD cambió desde la última validación."""
+        version = self._read_version()
+        if version != self._version:
+            if self._version is not None:
+                self._stats["invalidations"] += 1
+            self._clear()
+            self._version = version
+
+    def _clear(self):
+        self._entries.clear()
+        self._generation += 1
+
+    def _read_version(self):
+        """data_version de los archivos que afectan al catálogo de la sucursal."""
+        key = (producto_repository.DB_PATH, producto_repository.SHARDING)
+        if self._conn_key != key:
+            # Cambió la BD (ej: los tests apuntan a una temporal) o el sharding
+            if self._conn is not None:
+                self._conn.close()
+            if producto_repository.SHARDING:
+                self._conn = producto_repository._get_shard_connection(self.branch_id)
+            else:
+                self._conn = producto_repository._get_connection()
+            self._conn_key = key
+            self._version = None
+            self._clear()
+
+        version = (key, self._conn.execute("PRAGMA main.data_version").fetchone()[0])
+        if producto_repository.SHARDING:
+            shared = self._conn.execute(
+                f"PRAGMA {sharding.SHARED_ALIAS}.data_version"
+            ).fetchone()[0]
+            version += (shared,)
+        return version
@@ -0,0 +1,146 @@
+"""
+Pool de conexiones SQLite reutilizables, seguro para múltiples threads.
+
+# Por qué existe:
+# Antes cada función del repository abría una conexión nueva, ejecutaba
+# PRAGMA foreign_keys = ON y la cerraba. Con 20 cajas por sucursal ese costo
+# fijo (connect + pragma) dominaba la latencia de cada consulta.
+#
+# Cómo funciona:
+# - Se crean conexiones de forma perezosa, hasta `size` en total.
+# - Cada thread recibe SU conexión mientras la tenga prestada; si vuelve a
+#   pedir una (llamadas anidadas) recibe la misma, así no se bloquea a sí mismo.
+# - Al devolverla, si quedó una transacción abierta se hace ROLLBACK
+#   (mismo efecto que tenía conn.close() antes).
+# - Las conexiones no se cierran entre llamadas, así conservan su caché de
+#   sentencias preparadas (cached_statements de sqlite3).
+# - close() cierra todo; el repository lo registra con atexit.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+
+class ConnectionPool:
+    """
+    Pool acotado de conexiones a UNA base de datos SQLite.
+    """
+
+    def __init__(self, factory, size=20, timeout=30.0):
+        """
+        Args:
+            factory (callable): Función sin argumentos que crea una conexión nueva
+            size (int): Máximo de conexiones abiertas al mismo tiempo
+            timeout (float): Segundos que se espera por una conexión libre
+        """
+        if size < 1:
+            raise ValueError("El tamaño del pool debe ser al menos 1.")
+
+        self._factory = factory
+        self.size = size
+        self.timeout = timeout
+        # PID del proceso dueño: tras un fork las conexiones heredadas no sirven
+        self.pid = os.getpid()
+
+        self._cond = threading.Condition()
+        self._idle = []          # conexiones libres (LIFO: la más reciente está "caliente")
+        self._all = set()        # todas las conexiones creadas por este pool
+        self._closed = False
+        self._local = threading.local()
+
+    def acquire(self):
+        """
+        Presta una conexión al thread actual.
+        Si el thread ya tiene una prestada, devuelve la misma (reentrante).
+
+        Raises:
+            sqlite3.OperationalError: Si el pool está cerrado o no se libera
+                ninguna conexión dentro del timeout.
+        """
+        held = getattr(self._local, "conn", None)
+        if held is not None:
+            self._local.depth += 1
+            return held
+
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise sqlite3.OperationalError("El pool de conexiones está cerrado.")
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if len(self._all) < self.size:
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise sqlite3.OperationalError(
+                        f"No hay conexiones libres en el pool (tamaño {self.size})."
+                    )
+                self._cond.wait(remaining)
+
+            if conn is None:
+                # Reservamos el lugar antes de conectar para no pasarnos del tamaño
+                conn = self._factory()
+                self._all.add(conn)
+
+        self._local.conn = conn
+        self._local.depth = 1
+        return conn
+
+    def release(self, conn):
+        """
+        Devuelve una conexión prestada con acquire().
+        Solo vuelve al pool cuando el thread suelta su último préstamo.
+        """
+        if getattr(self._local, "conn", None) is not conn:
+            raise RuntimeError("La conexión no pertenece a este thread.")
+
+        self._local.depth -= 1
+        if self._local.depth > 0:
+            return
+
+        self._local.conn = None
+
+        # Si quedó una transacción a medias (error antes del commit), descartarla
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            healthy = True
+        except sqlite3.Error:
+            healthy = False
+
+        with self._cond:
+            if self._closed or not healthy:
+                self._all.discard(conn)
+                conn.close()
+            else:
+                self._idle.append(conn)
+            self._cond.notify()
+
+    def close(self):
+        """
+        Cierra el pool: cierra las conexiones libres ya mismo y las prestadas
+        cuando se devuelvan. Se puede llamar más de una vez.
+        """
+        with self._cond:
+            self._closed = True
+            for conn in self._idle:
+                self._all.discard(conn)
+                conn.close()
+            self._idle.clear()
+            self._cond.notify_all()
+
+    def stats(self):
+        """
+        Estado actual del pool.
+        Returns: dict con size, open (creadas) e idle (libres)
+        """
+        with self._cond:
+            return {
+                "size": self.size,
+                "open": len(self._all),
+                "idle": len(self._idle),
+            }
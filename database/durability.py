@@ -0,0 +1,96 @@
+"""
+Perfiles de durabilidad para las conexiones SQLite.
+
+# Por qué existe:
+# En el modo por defecto de SQLite (rollback journal) una caja que está
+# confirmando una venta bloquea a las demás incluso para LEER stock o saldos.
+# Con WAL (write-ahead log) los lectores leen la última versión confirmada
+# mientras un escritor trabaja: nunca esperan un commit.
+#
+# Perfiles:
+# - "safe":   WAL + synchronous=FULL   → fsync en cada commit (no se pierde ninguna venta)
+# - "fast":   WAL + synchronous=NORMAL → fsync solo en los checkpoints; un corte de luz
+#             puede perder las últimas ventas confirmadas, pero la BD nunca se corrompe
+# - "legacy": rollback journal + FULL  → comportamiento anterior (para comparar)
+#
+# Para ajustar cache_size, mmap_size o busy_timeout se parte de un perfil:
+#   dataclasses.replace(get_profile("fast"), mmap_size=256 * 1024 * 1024)
+"""
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class DurabilityProfile:
+    """
+    Conjunto de PRAGMAs que se aplican a cada conexión nueva.
+
+    Atributos:
+        name (str): Nombre del perfil (solo informativo).
+        journal_mode (str): "WAL" o "DELETE" (rollback journal clásico).
+        synchronous (str): "FULL", "NORMAL" u "OFF".
+        cache_size (int): Caché de páginas; negativo = KiB (-8000 ≈ 8 MB).
+        mmap_size (int): Bytes de la BD leídos vía memory-map (0 = desactivado).
+        busy_timeout (float | None): Segundos de espera por un lock.
+            None = usar CONNECTION_TIMEOUT del repository.
+    """
+    name: str
+    journal_mode: str = "WAL"
+    synchronous: str = "FULL"
+    cache_size: int = -8000
+    mmap_size: int = 0
+    busy_timeout: float | None = None
+
+
+PROFILES = {
+    "safe": DurabilityProfile(name="safe", journal_mode="WAL", synchronous="FULL"),
+    "fast": DurabilityProfile(
+        name="fast",
+        journal_mode="WAL",
+        synchronous="NORMAL",
+        cache_size=-16000,
+        mmap_size=64 * 1024 * 1024,
+    ),
+    "legacy": DurabilityProfile(name="legacy", journal_mode="DELETE", synchronous="FULL"),
+}
+
+
+def get_profile(profile):
+    """
+    Resuelve un perfil por nombre (o lo devuelve tal cual si ya es un DurabilityProfile).
+
+    Raises:
+        ValueError: Si el nombre no corresponde a ningún perfil.
+    """
+    if isinstance(profile, DurabilityProfile):
+        return profile
+    try:
+        return PROFILES[profile]
+    except KeyError:
+        raise ValueError(
+            f"Perfil de durabilidad desconocido: '{profile}'. "
+            f"Opciones: {', '.join(PROFILES)}"
+        ) from None
+
+
+def apply_profile(conn, profile, default_busy_timeout):
+    """
+    Aplica los PRAGMAs del perfil a una conexión abierta.
+    journal_mode es persistente en el archivo; el resto es por conexión.
+
+    Args:
+        conn (sqlite3.Connection): Conexión recién creada
+        profile (DurabilityProfile | str): Perfil a aplicar
+        default_busy_timeout (float): Segundos si el perfil no define busy_timeout
+    """
+    profile = get_profile(profile)
+    busy_timeout = profile.busy_timeout
+    if busy_timeout is None:
+        busy_timeout = default_busy_timeout
+
+    # busy_timeout primero: cambiar a WAL necesita un lock breve sobre el archivo
+    conn.execute(f"PRAGMA busy_timeout = {int(busy_timeout * 1000)}")
+    conn.execute(f"PRAGMA journal_mode = {profile.journal_mode}")
+    conn.execute(f"PRAGMA synchronous = {profile.synchronous}")
+    conn.execute(f"PRAGMA cache_size = {int(profile.cache_size)}")
+    conn.execute(f"PRAGMA mmap_size = {int(profile.mmap_size)}")
+    return conn
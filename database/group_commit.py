@@ -0,0 +1,251 @@
+"""
+Escritor de ventas con "group commit" (opcional).
+
+# Por qué existe:
+# Con process_sale_atomic cada venta es una transacción con su propio fsync.
+# En horas pico la cantidad de fsyncs por segundo limita cuántas ventas
+# puede confirmar la sucursal.
+#
+# Cómo funciona:
+# - Las cajas encolan sus ventas (submit / process_sale) y esperan el resultado.
+# - UN thread escritor toma ventas de la cola y las confirma por lotes:
+#   hasta `max_batch_size` ventas o hasta `max_wait` segundos desde la primera.
+#   Con max_wait=0 el lote es lo que se acumuló en la cola mientras se
+#   confirmaba el anterior (nunca se demora una venta a propósito); un
+#   max_wait chico (1-5 ms) solo conviene con discos de fsync lento.
+# - Todo el lote es UNA transacción (un solo fsync), pero cada venta corre
+#   dentro de su propio SAVEPOINT: si una falla (ej: stock insuficiente) se
+#   deshace solo esa venta y las vecinas del lote se confirman igual.
+# - Cada caja recibe SU sale_id o SU excepción, igual que con process_sale_atomic.
+#   Solo los errores de la venta (stock, validación) quedan en su SAVEPOINT:
+#   "BD ocupada" deshace el lote y se reintenta entero (RETRY_POLICY).
+#
+# Uso:
+#   writer = GroupCommitWriter(max_batch_size=50, max_wait=0.0)
+#   registro = RegistroVentas(branch_id=1, cash_register_id=1, group_commit=writer)
+#   ...
+#   writer.close()
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from database import metrics
+from database import producto_repository
+from database import retry
+
+
+# Marca para que el escritor termine después de vaciar la cola
+_STOP = object()
+
+
+class GroupCommitWriter:
+    """
+    Thread escritor que confirma ventas de muchas cajas en lotes.
+    """
+
+    def __init__(self, max_batch_size=50, max_wait=0.0):
+        """
+        Args:
+            max_batch_size (int): Máximo de ventas por transacción
+            max_wait (float): Segundos máximos que la primera venta de un lote
+                espera a que lleguen otras
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size debe ser al menos 1.")
+        if max_wait < 0:
+            raise ValueError("max_wait no puede ser negativo.")
+
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+
+        self._queue = queue.Queue()
+        self._closed = False
+        self._close_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {"batches": 0, "sales": 0, "failed": 0}
+
+        self._thread = threading.Thread(
+            target=self._run, name="group-commit-writer", daemon=True
+        )
+        self._thread.start()
+
+    # ---------- API para las cajas ----------
+
+    def submit(self, branch_id, cash_register_id, items, total_amount, timestamp, member_id=None,
+               session_id=None):
+        """
+        Encola una venta. Mismos argumentos que process_sale_atomic.
+        Returns: Future que se resuelve con el sale_id (o con la excepción)
+        """
+        future = Future()
+        sale = (branch_id, cash_register_id, items, total_amount, timestamp, member_id, session_id)
+        # El lock evita encolar después del _STOP (la venta quedaría sin responder)
+        with self._close_lock:
+            if self._closed:
+                raise RuntimeError("El escritor de group commit está cerrado.")
+            self._queue.put((sale, future))
+        return future
+
+    def process_sale(self, branch_id, cash_register_id, items, total_amount, timestamp,
+                     member_id=None, session_id=None):
+        """
+        Versión bloqueante de submit(): mismo contrato que process_sale_atomic.
+        Returns: sale_id
+        Raises: ValueError si stock insuficiente (solo para ESTA venta)
+        """
+        future = self.submit(
+            branch_id, cash_register_id, items, total_amount, timestamp, member_id, session_id
+        )
+        return future.result()
+
+    def close(self):
+        """Confirma las ventas pendientes y detiene el thread escritor."""
+        with self._close_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join()
+
+    def stats(self):
+        """
+        Returns: dict con batches (transacciones), sales (confirmadas) y failed
+        """
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # ---------- Thread escritor ----------
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+
+            batch = [first]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining > 0:
+                        entry = self._queue.get(timeout=remaining)
+                    else:
+                        entry = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stopping = True
+                    break
+                batch.append(entry)
+
+            self._commit_batch(batch)
+
+    def _commit_batch(self, batch):
+        """
+        Confirma un lote en UNA transacción, con un SAVEPOINT por venta.
+        Los futures se resuelven recién después del COMMIT: una caja nunca
+        recibe un sale_id que todavía no es durable.
+        """
+        # Preparar fuera del lock (igual que process_sale_atomic)
+        prepared = []
+        for sale, future in batch:
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                items = sale[2]
+                prepared.append((sale, future, producto_repository._prepare_sale_items(items)))
+            except Exception as e:
+                future.set_exception(e)
+
+        if not prepared:
+            return
+
+        # Con sharding cada sucursal es otro archivo (otro lock, otro COMMIT):
+        # el lote se parte en una transacción por sucursal
+        by_branch = {}
+        for entry in prepared:
+            key = entry[0][0] if producto_repository.SHARDING else None
+            by_branch.setdefault(key, []).append(entry)
+
+        for branch_id, group in by_branch.items():
+            self._commit_group(branch_id, group)
+
+    def _commit_group(self, branch_id, prepared):
+        """Confirma las ventas preparadas de un lote que van al mismo archivo."""
+        try:
+            # Si la BD está ocupada se reintenta el lote entero con la
+            # política del repository (ninguna venta quedó confirmada)
+            with metrics.measure("group_commit"):
+                results = producto_repository._call_with_retry(
+                    "group_commit", self._write_group, branch_id, prepared
+                )
+        except Exception as e:
+            # Falló el lote entero (lock, disco, COMMIT): nadie quedó confirmado
+            for _, future, _ in prepared:
+                future.set_exception(e)
+            with self._stats_lock:
+                self._stats["failed"] += len(prepared)
+            return
+
+        failed = 0
+        for future, sale_id, error in results:
+            if error is not None:
+                failed += 1
+                future.set_exception(error)
+            else:
+                future.set_result(sale_id)
+
+        with self._stats_lock:
+            self._stats["batches"] += 1
+            self._stats["sales"] += len(results) - failed
+            self._stats["failed"] += failed
+
+    @staticmethod
+    def _write_group(branch_id, prepared):
+        """
+        Una transacción con un SAVEPOINT por venta.
+        Returns: lista de (future, sale_id, error) — los futures se resuelven
+        recién después del COMMIT
+        """
+        results = []
+        with producto_repository._connection(branch_id) as conn:
+            cursor = conn.cursor()
+            try:
+                producto_repository._begin_immediate(cursor)
+                for sale, future, (quantities, names_json) in prepared:
+                    (sale_branch_id, cash_register_id, items, total_amount, timestamp,
+                     member_id, session_id) = sale
+                    cursor.execute("SAVEPOINT sale")
+                    try:
+                        sale_id = producto_repository._apply_sale(
+                            cursor, sale_branch_id, cash_register_id, items, quantities,
+                            names_json, total_amount, timestamp, member_id, session_id
+                        )
+                    except Exception as e:
+                        # BD ocupada no es un error de esta venta: se deshace el
+                        # lote entero y call_with_retry lo reintenta completo
+                        if retry.is_busy(e):
+                            raise
+                        # Deshacer SOLO esta venta; el resto del lote sigue
+                        cursor.execute("ROLLBACK TO sale")
+                        cursor.execute("RELEASE sale")
+                        results.append((future, None, e))
+                    else:
+                        cursor.execute("RELEASE sale")
+                        results.append((future, sale_id, None))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+        return results
@@ -1,6 +1,11 @@
 import sqlite3
 import os
 
+from database import durability
+from database import migrations
+from database import producto_repository
+from database import sharding
+
 
 def init_database():
     """
@@ -10,6 +15,16 @@ def init_database():
     - 2 cajas registradoras por sucursal (4 total)
     - 1 usuario owner (acceso global)
     - ~35 productos con precios y stock diferentes por sucursal
+
+    Después aplica las migraciones pendientes (ver migrations.py), así un
+    supermercado.db viejo se actualiza en el lugar sin perder datos.
+
+    Aplica el perfil de durabilidad del repository (WAL por defecto), así el
+    archivo queda en modo WAL desde el primer uso.
+
+    Si producto_repository.SHARDING está activo, crea además el archivo de
+    cada sucursal, mueve ahí sus filas (ver sharding.py) y resuelve las
+    compras a proveedores interrumpidas (reconcile_supplier_restocks).
     """
     base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     db_path = os.path.join(base_dir, "supermercado.db")
@@ -17,6 +32,7 @@ def init_database():
 
     connection = sqlite3.connect(db_path, timeout=20.0)
     connection.execute("PRAGMA foreign_keys = ON")
+    durability.apply_profile(connection, producto_repository.DURABILITY_PROFILE, 20.0)
     connection.isolation_level = None
     cursor = connection.cursor()
 
@@ -27,6 +43,9 @@ def init_database():
         cursor.executescript(schema)
         connection.execute("PRAGMA foreign_keys = ON")
 
+        # Actualizar BD existentes (o recién creadas) a la última versión del schema
+        migrations.migrate(connection)
+
         cursor.execute("SELECT COUNT(*) FROM branch")
         if cursor.fetchone()[0] == 0:
             _seed_data(cursor)
@@ -35,6 +54,12 @@ def init_database():
     finally:
         connection.close()
 
+    # Con sharding, las filas de cada sucursal (semilla incluida) van a su archivo,
+    # y las compras a proveedores que quedaron a medias se resuelven
+    if producto_repository.SHARDING:
+        for branch_id in sharding.split_into_shards(db_path):
+            producto_repository.reconcile_supplier_restocks(branch_id)
+
 
 def _seed_data(cursor):
     """
@@ -123,10 +148,11 @@ def _seed_data(cursor):
         ("Alfajor Triple", "Snacks"),
     ]
 
-    for name, category in products:
+    # Códigos de barras de prueba: 779 (Argentina) + 0000000 + id del producto
+    for product_id, (name, category) in enumerate(products, 1):
         cursor.execute(
-            "INSERT INTO product (name, category) VALUES (?, ?)",
-            (name, category)
+            "INSERT INTO product (name, category, barcode) VALUES (?, ?, ?)",
+            (name, category, _ean13(f"7790000000{product_id:02d}"))
         )
 
     # ---- Asignar productos a sucursales ----
@@ -189,3 +215,16 @@ def _seed_data(cursor):
                VALUES (?, ?, ?, ?, ?)""",
             (2, pid, pn, sn, an)
         )
+
+
+def _ean13(first_12_digits):
+    """
+    Completa un EAN-13 con su dígito verificador.
+    Args: first_12_digits (str): los 12 primeros dígitos
+    Returns: str de 13 dígitos
+    """
+    total = sum(
+        int(digit) * (3 if position % 2 else 1)
+        for position, digit in enumerate(first_12_digits)
+    )
+    return first_12_digits + str((10 - total % 10) % 10)
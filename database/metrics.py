@@ -0,0 +1,319 @@
+"""
+Métricas de latencia por función del repository (opcional).
+
+# Por qué existe:
+# Bajo carga no hay forma de saber cuál de las funciones del repository es
+# lenta, ni si el tiempo se va esperando el write lock o ejecutando SQL.
+#
+# Qué registra, por función:
+# - calls / errors
+# - latencia total: p50, p95, p99 y suma
+# - en las transaccionales (las que toman el write lock): espera del lock
+#   (BEGIN IMMEDIATE + backoff de reintentos) y ejecución (el resto), por separado
+#
+# Los percentiles salen de las últimas RESERVOIR_SIZE llamadas de cada función
+# (ventana móvil, memoria acotada); calls, errors y sumas son acumulados.
+#
+# Costo: desactivado (por defecto), cada llamada paga solo un chequeo de un
+# bool. Activado, dos lecturas de reloj y un lock corto por llamada.
+#
+# Uso:
+#   metrics.enable()
+#   metrics.snapshot()["process_sale_atomic"]["latency"]["p95"]
+#   flusher = metrics.MetricsFlusher("metricas.prom", interval=15, fmt="prometheus")
+#   flusher.start() ... flusher.stop()
+"""
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+# Cantidad de latencias recientes que se guardan por función para los percentiles
+RESERVOIR_SIZE = 2048
+
+_enabled = False
+_lock = threading.Lock()
+_functions = {}
+_local = threading.local()
+
+
+class _FunctionStats:
+    """Acumulados y ventana de latencias de una función."""
+
+    __slots__ = ("calls", "errors", "transactions", "latency", "lock_wait", "execution",
+                 "latency_sum", "lock_wait_sum", "execution_sum")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.transactions = 0
+        self.latency = deque(maxlen=RESERVOIR_SIZE)
+        self.lock_wait = deque(maxlen=RESERVOIR_SIZE)
+        self.execution = deque(maxlen=RESERVOIR_SIZE)
+        self.latency_sum = 0.0
+        self.lock_wait_sum = 0.0
+        self.execution_sum = 0.0
+
+
+# ---------- Activación ----------
+
+def enable():
+    """Empieza a registrar métricas (no borra lo ya registrado)."""
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    """Deja de registrar métricas. Lo registrado sigue disponible en snapshot()."""
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    """Borra todas las métricas registradas."""
+    with _lock:
+        _functions.clear()
+
+
+# ---------- Registro ----------
+
+def instrument(fn):
+    """
+    Decorador: registra llamadas, errores y latencia de fn con su nombre.
+    Desactivado, solo agrega el chequeo de _enabled.
+    """
+    name = fn.__name__
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not _enabled:
+            return fn(*args, **kwargs)
+        with measure(name):
+            return fn(*args, **kwargs)
+
+    wrapper._instrumented = True
+    return wrapper
+
+
+class _Call:
+    """Una llamada en curso: acumula su espera de lock."""
+
+    __slots__ = ("name", "lock_wait", "transactional")
+
+    def __init__(self, name):
+        self.name = name
+        self.lock_wait = 0.0
+        self.transactional = False
+
+
+@contextmanager
+def measure(name):
+    """
+    Mide un bloque como una llamada a `name` (ej: el lote del group commit,
+    que no es una función del repository). Las esperas de lock que ocurren
+    adentro se le asignan a este bloque. Desactivado, no registra nada.
+    """
+    call = _Call(name)
+    parent = getattr(_local, "current", None)
+    _local.current = call
+    failed = False
+    start = time.perf_counter()
+    try:
+        yield call
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        _local.current = parent
+        if _enabled:
+            _record(call, elapsed, failed)
+
+
+def add_lock_wait(seconds):
+    """
+    Suma tiempo de espera del write lock a la llamada medida en curso en este
+    thread (la llaman _begin_immediate y los reintentos). La marca como transaccional.
+    """
+    if not _enabled:
+        return
+    current = getattr(_local, "current", None)
+    if current is not None:
+        current.lock_wait += seconds
+        current.transactional = True
+
+
+def _record(call, elapsed, failed):
+    with _lock:
+        stats = _functions.get(call.name)
+        if stats is None:
+            stats = _functions[call.name] = _FunctionStats()
+        stats.calls += 1
+        stats.errors += int(failed)
+        stats.latency.append(elapsed)
+        stats.latency_sum += elapsed
+        if call.transactional:
+            execution = max(elapsed - call.lock_wait, 0.0)
+            stats.transactions += 1
+            stats.lock_wait.append(call.lock_wait)
+            stats.execution.append(execution)
+            stats.lock_wait_sum += call.lock_wait
+            stats.execution_sum += execution
+
+
+# ---------- Consulta ----------
+
+def _percentiles(samples, total):
+    """p50/p95/p99 (nearest-rank) de la ventana y la suma acumulada, en segundos."""
+    ordered = sorted(samples)
+    result = {"sum": total}
+    for label, q in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99)):
+        if ordered:
+            index = min(len(ordered) - 1, max(0, int(q * len(ordered) + 0.5) - 1))
+            result[label] = ordered[index]
+        else:
+            result[label] = 0.0
+    return result
+
+
+def snapshot():
+    """
+    Foto de las métricas actuales (tiempos en segundos).
+
+    Returns:
+        dict: {función: {calls, errors, latency: {p50, p95, p99, sum},
+               y si es transaccional: transactions, lock_wait: {...}, execution: {...}}}
+    """
+    with _lock:
+        copies = {
+            name: (stats.calls, stats.errors, stats.transactions,
+                   list(stats.latency), list(stats.lock_wait), list(stats.execution),
+                   stats.latency_sum, stats.lock_wait_sum, stats.execution_sum)
+            for name, stats in _functions.items()
+        }
+
+    result = {}
+    for name, (calls, errors, transactions, latency, lock_wait, execution,
+               latency_sum, lock_wait_sum, execution_sum) in sorted(copies.items()):
+        entry = {
+            "calls": calls,
+            "errors": errors,
+            "latency": _percentiles(latency, latency_sum),
+        }
+        if transactions:
+            entry["transactions"] = transactions
+            entry["lock_wait"] = _percentiles(lock_wait, lock_wait_sum)
+            entry["execution"] = _percentiles(execution, execution_sum)
+        result[name] = entry
+    return result
+
+
+def to_json(data=None):
+    """snapshot() como texto JSON."""
+    return json.dumps(snapshot() if data is None else data, indent=2, sort_keys=True)
+
+
+def to_prometheus(data=None):
+    """
+    snapshot() en formato de texto de Prometheus: contadores de llamadas y
+    errores, y un summary (quantiles 0.5/0.95/0.99 + _sum + _count) por medida.
+    """
+    data = snapshot() if data is None else data
+    lines = [
+        "# TYPE repository_calls_total counter",
+        *(f'repository_calls_total{{function="{name}"}} {entry["calls"]}'
+          for name, entry in data.items()),
+        "# TYPE repository_errors_total counter",
+        *(f'repository_errors_total{{function="{name}"}} {entry["errors"]}'
+          for name, entry in data.items()),
+    ]
+
+    for measure_name, count_key in (("latency", "calls"), ("lock_wait", "transactions"),
+                                    ("execution", "transactions")):
+        metric = f"repository_{measure_name}_seconds"
+        lines.append(f"# TYPE {metric} summary")
+        for name, entry in data.items():
+            if measure_name not in entry:
+                continue
+            values = entry[measure_name]
+            for label, q in (("p50", "0.5"), ("p95", "0.95"), ("p99", "0.99")):
+                lines.append(f'{metric}{{function="{name}",quantile="{q}"}} {values[label]:.9f}')
+            lines.append(f'{metric}_sum{{function="{name}"}} {values["sum"]:.9f}')
+            lines.append(f'{metric}_count{{function="{name}"}} {entry[count_key]}')
+    return "\n".join(lines) + "\n"
+
+
+def write(path, fmt="json"):
+    """
+    Escribe snapshot() en un archivo, de forma atómica (archivo temporal +
+    os.replace): quien lo lee nunca ve un archivo a medio escribir.
+
+    Args:
+        path (str): Archivo destino
+        fmt (str): "json" o "prometheus"
+    """
+    if fmt == "json":
+        text = to_json()
+    elif fmt == "prometheus":
+        text = to_prometheus()
+    else:
+        raise ValueError(f"Formato de métricas desconocido: '{fmt}'. Opciones: json, prometheus")
+
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(temp_path, path)
+
+
+class MetricsFlusher:
+    """
+    Thread que escribe las métricas en un archivo cada `interval` segundos
+    (ej: para que lo lea el node_exporter de Prometheus o un dashboard).
+    """
+
+    def __init__(self, path, interval=60.0, fmt="json"):
+        """
+        Args:
+            path (str): Archivo destino
+            interval (float): Segundos entre escrituras
+            fmt (str): "json" o "prometheus"
+        """
+        if fmt not in ("json", "prometheus"):
+            raise ValueError(f"Formato de métricas desconocido: '{fmt}'. Opciones: json, prometheus")
+        self.path = path
+        self.interval = interval
+        self.fmt = fmt
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Arranca el thread (una sola vez)."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="metrics-flusher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Detiene el thread y escribe una última vez."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        write(self.path, self.fmt)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            write(self.path, self.fmt)
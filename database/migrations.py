@@ -0,0 +1,279 @@
+"""
+Migraciones versionadas del schema, usando PRAGMA user_version.
+
+# Cómo funciona:
+# - schema.sql crea las tablas base (versión 0) con CREATE TABLE IF NOT EXISTS.
+# - Cada migración tiene un número creciente y un script SQL.
+# - migrate() aplica, en orden, solo las migraciones con número mayor a
+#   user_version. Cada una corre en SU transacción junto con el
+#   "PRAGMA user_version = N", así una migración que falla no deja la BD
+#   a medio migrar ni con la versión adelantada.
+#
+# Para agregar una migración: sumar una tupla al final de MIGRATIONS.
+# Nunca modificar una migración ya publicada (las BD existentes no la repiten).
+"""
+
+
+# (versión, descripción, script SQL)
+MIGRATIONS = [
+    (
+        1,
+        "Índices de los caminos calientes y UNIQUE en product.name",
+        """
+        -- Búsqueda por nombre exacto (get_product_by_name, process_sale_atomic, ...)
+        -- UNIQUE: el nombre identifica al producto en todo el sistema.
+        -- Falla si ya hay nombres duplicados (hay que resolverlos a mano).
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_product_name ON product(name);
+
+        -- Login de socios (get_member_by_name)
+        CREATE INDEX IF NOT EXISTS idx_member_name ON member(name);
+
+        -- Reportes de ventas por sucursal y fecha
+        CREATE INDEX IF NOT EXISTS idx_sale_branch_timestamp ON sale(branch_id, timestamp);
+
+        -- Items de una venta (y chequeo de FK al borrar ventas)
+        CREATE INDEX IF NOT EXISTS idx_sale_item_sale ON sale_item(sale_id);
+
+        -- Productos de un proveedor (get_relations_by_supplier)
+        CREATE INDEX IF NOT EXISTS idx_product_supplier_supplier ON product_supplier(supplier_id);
+
+        -- Cajas de una sucursal (get_cash_registers_by_branch)
+        CREATE INDEX IF NOT EXISTS idx_cash_register_branch ON cash_register(branch_id);
+
+        -- Proveedor por nombre (get_supplier_by_name, GestorProveedor.agregar_relacion)
+        CREATE INDEX IF NOT EXISTS idx_supplier_name ON supplier(name);
+        """,
+    ),
+    (
+        2,
+        "Índice FTS5 (trigram) de product.name para search_by_name",
+        """
+        -- Tabla FTS de "contenido externo": no duplica los nombres, indexa los
+        -- de product. trigram permite buscar cualquier subcadena de 3+ letras
+        -- (lo mismo que LIKE '%texto%', pero con índice). Requiere SQLite 3.34+.
+        CREATE VIRTUAL TABLE IF NOT EXISTS product_fts USING fts5(
+            name, content='product', content_rowid='id', tokenize='trigram'
+        );
+
+        -- Triggers: el índice se mantiene solo con cada INSERT/DELETE/UPDATE de product
+        CREATE TRIGGER IF NOT EXISTS product_fts_insert AFTER INSERT ON product BEGIN
+            INSERT INTO product_fts (rowid, name) VALUES (new.id, new.name);
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS product_fts_delete AFTER DELETE ON product BEGIN
+            INSERT INTO product_fts (product_fts, rowid, name) VALUES ('delete', old.id, old.name);
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS product_fts_update AFTER UPDATE OF name ON product BEGIN
+            INSERT INTO product_fts (product_fts, rowid, name) VALUES ('delete', old.id, old.name);
+            INSERT INTO product_fts (rowid, name) VALUES (new.id, new.name);
+        END;
+
+        -- Indexar los productos que ya existían
+        INSERT INTO product_fts (product_fts) VALUES ('rebuild');
+        """,
+    ),
+    (
+        3,
+        "Código de barras (EAN-13/SKU) único por producto",
+        """
+        -- NULL = producto sin código (los existentes). UNIQUE admite varios NULL.
+        ALTER TABLE product ADD COLUMN barcode TEXT;
+
+        -- Escaneo en caja (get_product_by_barcode): una búsqueda por índice
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_product_barcode ON product(barcode);
+        """,
+    ),
+    (
+        4,
+        "Índices para listar el catálogo por páginas (keyset)",
+        """
+        -- get_active_products_page con categoría, ordenado por nombre
+        CREATE INDEX IF NOT EXISTS idx_product_category_name ON product(category, name);
+
+        -- get_active_products_page ordenado por precio: cada página sigue
+        -- el índice desde la última fila, sin ordenar la sucursal entera
+        CREATE INDEX IF NOT EXISTS idx_branch_product_branch_price
+            ON branch_product(branch_id, price, product_id);
+        """,
+    ),
+    (
+        5,
+        "Reservas de stock con vencimiento (carritos abiertos)",
+        """
+        -- Unidades apartadas por un carrito abierto (session_id) hasta expires_at
+        -- (segundos epoch). Una fila vencida ya no cuenta aunque siga en la tabla.
+        CREATE TABLE IF NOT EXISTS stock_reservation (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            branch_id INTEGER NOT NULL,
+            product_id INTEGER NOT NULL,
+            session_id TEXT NOT NULL,
+            quantity INTEGER NOT NULL CHECK (quantity > 0),
+            expires_at REAL NOT NULL,
+            UNIQUE(branch_id, session_id, product_id)
+        );
+
+        -- Reservado de un producto (stock disponible = stock - reservas vigentes)
+        CREATE INDEX IF NOT EXISTS idx_stock_reservation_product
+            ON stock_reservation(branch_id, product_id, expires_at);
+
+        -- Barrido de vencidas: un rango del índice, sin recorrer la tabla
+        CREATE INDEX IF NOT EXISTS idx_stock_reservation_expiry
+            ON stock_reservation(branch_id, expires_at);
+        """,
+    ),
+    (
+        6,
+        "Historial de movimientos de stock (solo se agrega) y snapshots",
+        """
+        -- Cada cambio de branch_product.stock deja una fila: delta con signo,
+        -- motivo ('opening', 'sale', 'restock', 'purchase', 'adjust') y la
+        -- venta que lo causó (reference = sale.id, si aplica). Nunca se
+        -- modifica ni se borra.
+        CREATE TABLE IF NOT EXISTS stock_movement (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            branch_id INTEGER NOT NULL,
+            product_id INTEGER NOT NULL,
+            delta INTEGER NOT NULL,
+            reason TEXT NOT NULL,
+            reference INTEGER,
+            created_at REAL NOT NULL
+        );
+
+        -- Historial de un producto desde un movimiento (cola después del snapshot)
+        CREATE INDEX IF NOT EXISTS idx_stock_movement_product
+            ON stock_movement(branch_id, product_id, id);
+
+        -- Stock de un producto contando TODOS sus movimientos hasta movement_id
+        -- inclusive (los crea snapshot_stock_ledger, created_at = cuándo)
+        CREATE TABLE IF NOT EXISTS stock_snapshot (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            branch_id INTEGER NOT NULL,
+            product_id INTEGER NOT NULL,
+            stock INTEGER NOT NULL,
+            movement_id INTEGER NOT NULL,
+            created_at REAL NOT NULL
+        );
+
+        -- Último snapshot de un producto (hasta un instante)
+        CREATE INDEX IF NOT EXISTS idx_stock_snapshot_product
+            ON stock_snapshot(branch_id, product_id, movement_id);
+
+        -- Hasta qué movimiento llegó la última compactación de la sucursal
+        CREATE INDEX IF NOT EXISTS idx_stock_snapshot_branch
+            ON stock_snapshot(branch_id, movement_id);
+
+        -- El stock con el que nace una fila de branch_product (alta, seed,
+        -- asignación a otra sucursal) es su primer movimiento. NOT EXISTS:
+        -- al repartir en shards las filas llegan con su historial ya copiado.
+        CREATE TRIGGER IF NOT EXISTS branch_product_opening_stock
+        AFTER INSERT ON branch_product
+        WHEN new.stock != 0 AND NOT EXISTS (
+            SELECT 1 FROM stock_movement
+            WHERE branch_id = new.branch_id AND product_id = new.product_id
+        )
+        BEGIN
+            INSERT INTO stock_movement (branch_id, product_id, delta, reason, reference, created_at)
+            VALUES (new.branch_id, new.product_id, new.stock, 'opening', NULL,
+                    CAST(strftime('%s', 'now') AS REAL));
+        END;
+
+        -- El stock que ya existía es la apertura del historial
+        INSERT INTO stock_movement (branch_id, product_id, delta, reason, reference, created_at)
+        SELECT branch_id, product_id, stock, 'opening', NULL, CAST(strftime('%s', 'now') AS REAL)
+        FROM branch_product
+        WHERE stock != 0;
+        """,
+    ),
+    (
+        7,
+        "Apertura del historial de stock con milisegundos",
+        """
+        -- strftime('%s') redondea al segundo y los demás movimientos usan
+        -- time.time(): en una consulta a un instante, el orden entre la
+        -- apertura y un movimiento del mismo segundo dependía del redondeo.
+        -- julianday('now') tiene milisegundos; se pasa a segundos epoch.
+        DROP TRIGGER IF EXISTS branch_product_opening_stock;
+
+        CREATE TRIGGER IF NOT EXISTS branch_product_opening_movement
+        AFTER INSERT ON branch_product
+        WHEN new.stock != 0 AND NOT EXISTS (
+            SELECT 1 FROM stock_movement
+            WHERE branch_id = new.branch_id AND product_id = new.product_id
+        )
+        BEGIN
+            INSERT INTO stock_movement (branch_id, product_id, delta, reason, reference, created_at)
+            VALUES (new.branch_id, new.product_id, new.stock, 'opening', NULL,
+                    (julianday('now') - 2440587.5) * 86400.0);
+        END;
+        """,
+    ),
+    (
+        8,
+        "Compras a proveedores pendientes de confirmar (sharding)",
+        """
+        -- Con sharding, una compra descuenta al proveedor en el archivo
+        -- compartido y cobra/recibe en el de la sucursal: dos COMMIT. Entre
+        -- uno y otro queda anotada acá (supplier_deltas = JSON de pares
+        -- [relation_id, cantidad]); si la sucursal nunca la confirma,
+        -- reconcile_supplier_restocks le devuelve el stock al proveedor.
+        CREATE TABLE IF NOT EXISTS supplier_restock_pending (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            branch_id INTEGER NOT NULL,
+            supplier_deltas TEXT NOT NULL,
+            created_at REAL NOT NULL
+        );
+
+        CREATE INDEX IF NOT EXISTS idx_supplier_restock_pending_branch
+            ON supplier_restock_pending(branch_id, id);
+        """,
+    ),
+]
+
+
+def current_version(conn):
+    """Devuelve la versión de schema guardada en la BD (PRAGMA user_version)."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def latest_version():
+    """Devuelve la versión a la que lleva migrate()."""
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def migrate(conn):
+    """
+    Aplica las migraciones pendientes sobre una conexión abierta.
+    Las tablas base (schema.sql) ya deben existir.
+
+    Args:
+        conn (sqlite3.Connection): Conexión a la BD a migrar
+
+    Returns:
+        list: Números de las migraciones aplicadas (vacía si ya estaba al día)
+
+    Raises:
+        sqlite3.Error: Si una migración falla (queda en la versión anterior)
+    """
+    applied = []
+    version = current_version(conn)
+
+    for number, description, script in MIGRATIONS:
+        if number <= version:
+            continue
+
+        try:
+            # executescript confirma cualquier transacción pendiente antes de empezar;
+            # el BEGIN ... COMMIT del script hace atómica la migración + su versión
+            conn.executescript(
+                f"BEGIN IMMEDIATE;\n{script}\nPRAGMA user_version = {number};\nCOMMIT;"
+            )
+        except Exception:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+
+        applied.append(number)
+        version = number
+
+    return applied
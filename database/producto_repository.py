@@ -9,31 +9,284 @@ All functions interact with the new multi-branch schema (English table names).
 # - member: socios del negocio
 # - supplier / product_supplier: proveedores y sus relaciones con productos
 # - cash_register: cajas registradoras por sucursal
+# - stock_reservation: unidades apartadas por carritos abiertos (con vencimiento)
+# - stock_movement / stock_snapshot: historial de cada cambio de stock y su
+#   compactación (ver STOCK LEDGER)
 #
 # CONCURRENCIA:
 # process_sale_atomic() usa BEGIN IMMEDIATE para evitar race conditions.
-# El timeout de 30s permite que una conexión espere si otra tiene el lock.
+# Si otra conexión tiene el lock, las escrituras esperan poco por intento y se
+# reintentan con backoff (RETRY_POLICY, ver retry.py) hasta agotar su presupuesto.
+# Con WAL (perfiles "safe" y "fast") los lectores nunca esperan ese lock.
+#
+# CONEXIONES:
+# Todas las funciones piden prestada una conexión del pool (ver connection_pool.py)
+# con `with _connection() as conn:`. La conexión no se cierra al terminar:
+# vuelve al pool con su caché de sentencias preparadas intacta.
+#
+# SHARDING (opcional, ver sharding.py):
+# Las funciones que reciben branch_id piden la conexión de ESA sucursal con
+# `_connection(branch_id)`; las de caja la buscan con _branch_of_cash_register.
+# Sin SHARDING, branch_id no cambia nada: todo va al mismo archivo.
+#
+# MÉTRICAS (opcional, ver metrics.py):
+# Toda función pública lleva @metrics.instrument (llamadas, errores, latencia);
+# _begin_immediate reporta la espera del write lock. Se activa con metrics.enable().
 """
+import atexit
+import functools
+import itertools
+import json
 import sqlite3
 import os
+import threading
+import time
+from contextlib import contextmanager
+
+from database import durability
+from database import metrics
+from database import retry
+from database import sharding
+from database.connection_pool import ConnectionPool
 
 
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))
 DB_PATH = os.path.join(BASE_DIR, 'supermercado.db')
 
-# Timeout de 30s: si otra conexión tiene el lock, esperamos en vez de fallar
+# Timeout de 30s: espera máxima por una conexión libre del pool, y por el lock
+# de la BD fuera de los reintentos (lecturas, o RETRY_POLICY None) si el
+# perfil de durabilidad no define su busy_timeout
 CONNECTION_TIMEOUT = 30.0
 
+# Reintentos de las escrituras cuando la BD está ocupada (ver retry.py).
+# Con una política, cada intento espera el lock solo attempt_timeout segundos
+# (solo dentro de la escritura: las lecturas esperan el busy_timeout del
+# perfil); con None se espera el busy_timeout del perfil en un único intento.
+RETRY_POLICY = retry.RetryPolicy()
+
+# Máximo de conexiones abiertas por proceso (ej: 20 cajas por sucursal)
+POOL_SIZE = 20
+
+# Perfil de durabilidad aplicado a cada conexión: "safe", "fast", "legacy"
+# o un DurabilityProfile propio (ver durability.py)
+DURABILITY_PROFILE = "safe"
+
+# Sharding por sucursal (ver sharding.py). Con False todo vive en DB_PATH.
+# Con True, las tablas de cada sucursal viven en su propio archivo y cada
+# sucursal tiene su propio pool (y su propio write lock).
+SHARDING = False
+
+# Pools del proceso: None = archivo compartido, branch_id = archivo de la sucursal
+_pools = {}
+_pool_lock = threading.Lock()
+
+# Con sharding: caja → sucursal dueña (para las funciones que solo reciben la caja)
+_register_branches = {}
+
+# Funciones fn(branch_id, name, active) avisadas cuando un producto entra o
+# sale del catálogo activo de una sucursal (ej: autocomplete.ProductAutocomplete)
+_catalog_listeners = []
+
 
 def _get_connection():
     """
-    Crea una conexión a la BD con foreign keys habilitadas.
+    Crea una conexión NUEVA a la BD con foreign keys habilitadas
+    y el perfil de durabilidad (WAL, synchronous, caché) ya aplicado.
     Timeout de 30s para soportar concurrencia (una caja espera si otra está en transacción).
+    El pool la usa como fábrica; check_same_thread=False porque una conexión
+    libre puede prestarse a cualquier thread (nunca a dos a la vez).
     """
-    conn = sqlite3.connect(DB_PATH, timeout=CONNECTION_TIMEOUT)
+    conn = sqlite3.connect(DB_PATH, timeout=CONNECTION_TIMEOUT, check_same_thread=False)
     conn.execute("PRAGMA foreign_keys = ON")
+    durability.apply_profile(conn, DURABILITY_PROFILE, CONNECTION_TIMEOUT)
     return conn
 
+
+def _get_shard_connection(branch_id):
+    """
+    Igual que _get_connection, pero sobre el archivo de una sucursal con el
+    compartido adjunto (ver sharding.py). El perfil se aplica después del
+    ATTACH para que journal_mode valga para los dos archivos.
+
+    Raises:
+        ValueError: Si la sucursal no tiene archivo (crearlo con sharding.split_into_shards)
+    """
+    path = sharding.shard_path(DB_PATH, branch_id)
+    if not os.path.exists(path):
+        raise ValueError(f"No existe la BD de la sucursal {branch_id}: {path}")
+
+    conn = sqlite3.connect(path, timeout=CONNECTION_TIMEOUT, check_same_thread=False)
+    conn.executescript(sharding.SHARD_SCHEMA)
+    conn.execute(f"ATTACH DATABASE ? AS {sharding.SHARED_ALIAS}", (DB_PATH,))
+    conn.execute("PRAGMA foreign_keys = ON")
+    durability.apply_profile(conn, DURABILITY_PROFILE, CONNECTION_TIMEOUT)
+    return conn
+
+
+def _profile_busy_timeout():
+    """Segundos que una conexión espera el lock fuera de los reintentos (los del perfil)."""
+    busy_timeout = durability.get_profile(DURABILITY_PROFILE).busy_timeout
+    return CONNECTION_TIMEOUT if busy_timeout is None else busy_timeout
+
+
+@contextmanager
+def _attempt_busy_timeout(conn):
+    """
+    Mientras dura el bloque, con RETRY_POLICY, conn espera el lock solo
+    attempt_timeout por intento (el resto de la espera la maneja
+    retry.call_with_retry, con backoff). Al salir vuelve al busy_timeout del
+    perfil: las lecturas, que no se reintentan, siguen esperando lo normal.
+    """
+    if RETRY_POLICY is None:
+        yield
+        return
+    conn.execute(f"PRAGMA busy_timeout = {int(RETRY_POLICY.attempt_timeout * 1000)}")
+    try:
+        yield
+    finally:
+        conn.execute(f"PRAGMA busy_timeout = {int(_profile_busy_timeout() * 1000)}")
+
+
+def get_pool(branch_id=None):
+    """
+    Devuelve el pool de conexiones del proceso, creándolo si hace falta.
+    Si cambió DB_PATH, POOL_SIZE o DURABILITY_PROFILE (ej: los tests apuntan a
+    una BD temporal) o el proceso fue forkeado, se cierra el pool viejo y se
+    crea uno nuevo.
+
+    Args:
+        branch_id (int | None): Con SHARDING, el pool del archivo de esa
+            sucursal. Sin sharding (o con None) el del archivo compartido.
+    """
+    key = branch_id if SHARDING else None
+    with _pool_lock:
+        pool = _pools.get(key)
+        if (pool is None
+                or pool.db_path != DB_PATH
+                or pool.size != POOL_SIZE
+                or pool.profile != DURABILITY_PROFILE
+                or pool.pid != os.getpid()):
+            if pool is not None and pool.pid == os.getpid():
+                pool.close()
+            if key is None:
+                factory = _get_connection
+            else:
+                factory = lambda: _get_shard_connection(key)
+            pool = ConnectionPool(factory, size=POOL_SIZE, timeout=CONNECTION_TIMEOUT)
+            pool.db_path = DB_PATH
+            pool.profile = DURABILITY_PROFILE
+            _pools[key] = pool
+            _register_branches.clear()
+        return pool
+
+
+def close_pool():
+    """
+    Cierra todas las conexiones de los pools. Se ejecuta automáticamente al salir
+    del proceso; la próxima llamada al repository crea pools nuevos.
+    """
+    with _pool_lock:
+        for pool in _pools.values():
+            if pool.pid == os.getpid():
+                pool.close()
+        _pools.clear()
+        _register_branches.clear()
+
+
+atexit.register(close_pool)
+
+
+@contextmanager
+def _connection(branch_id=None):
+    """
+    Presta una conexión del pool durante el bloque `with`.
+    Si el bloque termina sin commit, el pool hace ROLLBACK al devolverla.
+    Con SHARDING, branch_id elige el archivo de la sucursal.
+    Dentro de _call_with_retry la conexión espera el lock solo un intento
+    (ver _attempt_busy_timeout).
+    """
+    pool = get_pool(branch_id)
+    conn = pool.acquire()
+    shortened = _retry_scope.__dict__.get("conns")
+    try:
+        if shortened is None or conn in shortened:
+            yield conn
+            return
+        shortened.add(conn)
+        try:
+            with _attempt_busy_timeout(conn):
+                yield conn
+        finally:
+            shortened.discard(conn)
+    finally:
+        pool.release(conn)
+
+
+# Conexiones con el busy_timeout corto del thread que está dentro de
+# _call_with_retry (conns es None fuera de un reintento)
+_retry_scope = threading.local()
+
+
+def _call_with_retry(operation, fn, *args, **kwargs):
+    """
+    retry.call_with_retry con RETRY_POLICY. Mientras corre fn, las conexiones
+    que presta _connection() en este thread esperan el lock solo
+    attempt_timeout por intento.
+    """
+    previous = _retry_scope.__dict__.get("conns")
+    if previous is None:
+        _retry_scope.conns = set()
+    try:
+        return retry.call_with_retry(RETRY_POLICY, operation, fn, *args, **kwargs)
+    finally:
+        _retry_scope.conns = previous
+
+
+def _retry_on_busy(fn):
+    """
+    Decorador de las escrituras: si la BD está ocupada, reintenta la función
+    entera con backoff según RETRY_POLICY (leída en cada llamada).
+    Solo sirve para funciones que son UNA transacción completa: al fallar
+    hacen ROLLBACK y repetirlas no duplica nada.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        return _call_with_retry(fn.__name__, fn, *args, **kwargs)
+    return wrapper
+
+
+def _branch_of_cash_register(cash_register_id, branch_id=None):
+    """
+    Sucursal a la que hay que ir a buscar una caja.
+    Sin sharding no importa (todo está en el mismo archivo). Con sharding, si
+    quien llama no la sabe, se busca la caja en el archivo de cada sucursal
+    y se recuerda (las cajas no cambian de sucursal).
+    Returns: branch_id, o None si la caja no existe
+    """
+    if branch_id is not None or not SHARDING:
+        return branch_id
+
+    with _pool_lock:
+        if cash_register_id in _register_branches:
+            return _register_branches[cash_register_id]
+
+    with _connection() as conn:
+        branch_ids = [row[0] for row in conn.execute("SELECT id FROM branch")]
+
+    for candidate in branch_ids:
+        if not os.path.exists(sharding.shard_path(DB_PATH, candidate)):
+            continue
+        with _connection(candidate) as conn:
+            found = conn.execute(
+                "SELECT 1 FROM cash_register WHERE id = ?", (cash_register_id,)
+            ).fetchone()
+        if found:
+            with _pool_lock:
+                _register_branches[cash_register_id] = candidate
+            return candidate
+    return None
+
+
 # ===========================
 # ATOMIC SALE TRANSACTION
 # Esta es la función clave para concurrencia.
@@ -41,17 +294,26 @@ def _get_connection():
 # Así, entre "verificar stock" y "reducir stock", nadie más puede modificar la BD.
 # ===========================
 
-def process_sale_atomic(branch_id, cash_register_id, items, total_amount, timestamp, member_id=None):
+@metrics.instrument
+@_retry_on_busy
+def process_sale_atomic(branch_id, cash_register_id, items, total_amount, timestamp, member_id=None,
+                        session_id=None):
     """
     Procesa una venta completa en UNA SOLA transacción atómica.
 
     FLUJO ATÓMICO (todo dentro de BEGIN IMMEDIATE ... COMMIT):
-      1. Verificar stock de CADA producto
-      2. Reducir stock de CADA producto
+      1. Verificar stock de TODOS los productos (una sola query), sin contar
+         las unidades reservadas por OTROS carritos (ver reserve_stock)
+      2. Reducir stock de cada producto (UPDATE condicional con executemany)
+         y borrar las reservas del carrito que se vende
       3. Crear registro de venta (sale)
-      4. Crear items de venta (sale_item) con price_at_sale congelado
+      4. Crear items de venta (sale_item) con price_at_sale congelado (executemany)
+         y los movimientos de stock de la venta (stock_movement, executemany)
       5. Actualizar saldo de la caja registradora
 
+    La cantidad de sentencias es fija (no crece con el carrito), así el
+    write lock se mantiene el menor tiempo posible aun con 200 items.
+
     Si algún producto no tiene stock suficiente → ROLLBACK completo,
     la BD queda exactamente como estaba antes.
 
@@ -62,119 +324,216 @@ def process_sale_atomic(branch_id, cash_register_id, items, total_amount, timest
         total_amount (float): Monto total de la venta
         timestamp (str): Fecha/hora ISO
         member_id (int|None): ID del socio (None si no aplica)
+        session_id (str|None): Carrito cuyas reservas se consumen con esta venta
+            (None: venta sin reservas; respeta igual las de los demás)
 
     Returns:
         int: sale_id de la venta creada
 
     Raises:
         ValueError: Si stock insuficiente para algún producto
-        sqlite3.OperationalError: Si hay un error de BD (timeout, etc)
+        retry.DatabaseBusyError: Si la BD siguió ocupada todo el presupuesto de RETRY_POLICY
+        sqlite3.OperationalError: Si hay otro error de BD
     """
-    conn = _get_connection()
-    cursor = conn.cursor()
+    # Todo lo que no necesita la BD se prepara ANTES de tomar el lock
+    quantities, names_json = _prepare_sale_items(items)
 
-    try:
-        # BEGIN IMMEDIATE: toma el write lock AHORA, no espera al primer write.
-        # Esto evita que otra transacción modifique el stock entre nuestro SELECT y UPDATE.
-        cursor.execute("BEGIN IMMEDIATE")
+    with _connection(branch_id) as conn:
+        cursor = conn.cursor()
 
-        # --- Paso 1 y 2: Verificar y reducir stock de cada producto ---
-        for item in items:
-            product_name = item["product_name"]
-            quantity = item["quantity"]
+        try:
+            # BEGIN IMMEDIATE: toma el write lock AHORA, no espera al primer write.
+            # Esto evita que otra transacción modifique el stock entre nuestro SELECT y UPDATE.
+            _begin_immediate(cursor)
 
-            # Verificar stock actual (con el lock tomado, este valor es confiable)
-            cursor.execute(
-                """SELECT bp.stock, p.id
-                   FROM branch_product bp
-                   JOIN product p ON p.id = bp.product_id
-                   WHERE p.name = ? AND bp.branch_id = ? AND bp.active = 1""",
-                (product_name, branch_id)
+            sale_id = _apply_sale(
+                cursor, branch_id, cash_register_id, items, quantities, names_json,
+                total_amount, timestamp, member_id, session_id
             )
-            row = cursor.fetchone()
 
-            if row is None:
-                raise ValueError(
-                    f"Producto '{product_name}' no encontrado o inactivo en sucursal {branch_id}"
-                )
+            # Todo OK → aplicar todos los cambios de golpe (salvo que la caja
+            # ya haya dado la venta por vencida, ver retry.cancellable)
+            retry.raise_if_cancelled("process_sale_atomic")
+            conn.commit()
+            return sale_id
 
-            current_stock, product_id = row
+        except Exception:
+            # Si ALGO falla (stock insuficiente, FK invalido, lo que sea)
+            # → deshacer TODO. La BD queda como si nada hubiera pasado.
+            conn.rollback()
+            raise
 
-            if current_stock < quantity:
-                raise ValueError(
-                    f"Stock insuficiente de '{product_name}'. "
-                    f"Disponible: {current_stock}, solicitado: {quantity}"
-                )
+        finally:
+            # Liberar el cursor antes de devolver la conexión al pool
+            # (el lock ya se liberó con el COMMIT o el ROLLBACK)
+            cursor.close()
 
-            # Reducir stock (seguro porque tenemos el lock)
-            cursor.execute(
-                """UPDATE branch_product SET stock = stock - ?
-                   WHERE branch_id = ? AND product_id = ?""",
-                (quantity, branch_id, product_id)
-            )
 
-        # --- Paso 3: Crear el registro de venta ---
-        cursor.execute(
-            """INSERT INTO sale (branch_id, cash_register_id, total_amount, timestamp, member_id)
-               VALUES (?, ?, ?, ?, ?)""",
-            (branch_id, cash_register_id, total_amount, timestamp, member_id)
-        )
-        sale_id = cursor.lastrowid
+# El tokenizer trigram de FTS5 no puede buscar textos de menos de 3 caracteres
+_TRIGRAM_MIN_LENGTH = 3
 
-        # --- Paso 4: Crear sale_items con precio congelado ---
-        for item in items:
-            product_name = item["product_name"]
-            quantity = item["quantity"]
-            price_at_sale = item["price_at_sale"]
+# Stock disponible de la fila "bp" de branch_product: el stock menos lo
+# reservado por carritos vigentes, salvo el del carrito indicado (parámetros:
+# ahora, session_id; con session_id NULL cuentan todas las reservas).
+# Es una búsqueda por idx_stock_reservation_product por producto.
+_AVAILABLE_STOCK = """bp.stock - COALESCE((
+               SELECT SUM(r.quantity) FROM stock_reservation r
+               WHERE r.branch_id = bp.branch_id AND r.product_id = bp.product_id
+                 AND r.expires_at > ? AND r.session_id IS NOT ?), 0)"""
 
-            cursor.execute(
-                "SELECT id FROM product WHERE name = ?",
-                (product_name,)
+
+def _begin_immediate(cursor, shared=False):
+    """
+    BEGIN IMMEDIATE sobre el archivo de la conexión.
+    Con SHARDING, un BEGIN IMMEDIATE tomaría el write lock de TODOS los archivos
+    adjuntos (también el compartido) y las sucursales volverían a esperarse
+    entre sí. Un UPDATE que no toca ninguna fila abre la escritura (y toma el
+    lock) solo en "main": el archivo de la sucursal. Con shared=True, solo en
+    el archivo compartido (las compras a proveedores, ver _restock_sharded).
+    """
+    start = time.perf_counter()
+    try:
+        if not SHARDING:
+            cursor.execute("BEGIN IMMEDIATE")
+            return
+        cursor.execute("BEGIN")
+        if shared:
+            cursor.execute(f"UPDATE {sharding.SHARED_ALIAS}.product_supplier "
+                           "SET available_stock = available_stock WHERE 0")
+        else:
+            cursor.execute("UPDATE main.cash_register SET current_balance = current_balance WHERE 0")
+    finally:
+        # Todo lo que tarda el BEGIN es espera del write lock (ver metrics.py)
+        metrics.add_lock_wait(time.perf_counter() - start)
+
+
+def _prepare_sale_items(items):
+    """
+    Prepara, sin tocar la BD, lo que process_sale_atomic necesita:
+    cantidades totales por producto (un mismo producto puede venir en varios items)
+    y la lista de nombres en JSON para resolverlos con UNA sola query.
+    Returns: (quantities, names_json)
+    """
+    quantities = {}
+    for item in items:
+        name = item["product_name"]
+        quantities[name] = quantities.get(name, 0) + item["quantity"]
+    return quantities, json.dumps(list(quantities))
+
+
+def _apply_sale(cursor, branch_id, cash_register_id, items, quantities, names_json,
+                total_amount, timestamp, member_id, session_id=None):
+    """
+    Pasos 1 a 5 de una venta, dentro de una transacción YA abierta con el
+    write lock tomado. No hace COMMIT ni ROLLBACK: eso lo decide quien llama
+    (process_sale_atomic, o el escritor de group commit con un SAVEPOINT por venta).
+    Returns: sale_id
+    Raises: ValueError si un producto no existe o no tiene stock suficiente
+    """
+    # --- Paso 1: Verificar stock de TODOS los productos con una sola query ---
+    # json_each() recibe la lista como UN parámetro: la sentencia preparada
+    # es la misma para cualquier tamaño de carrito (se reutiliza del caché).
+    # CROSS JOIN fija el orden: recorrer los nombres pedidos y buscar cada uno
+    # por índice, en vez de recorrer todo el catálogo de la sucursal.
+    # El "stock" es el disponible: descuenta lo reservado por otros carritos.
+    cursor.execute(
+        f"""SELECT p.name, p.id, {_AVAILABLE_STOCK}
+           FROM json_each(?) AS requested
+           CROSS JOIN product p ON p.name = requested.value
+           CROSS JOIN branch_product bp
+                ON bp.branch_id = ? AND bp.product_id = p.id
+           WHERE bp.active = 1""",
+        (time.time(), session_id, names_json, branch_id)
+    )
+    found = {name: (product_id, stock) for name, product_id, stock in cursor.fetchall()}
+
+    # Validar en el orden de los items, descontando lo ya pedido por items
+    # anteriores: mismo error (y mismo mensaje) que la versión item por item
+    remaining = {name: stock for name, (_, stock) in found.items()}
+    for item in items:
+        product_name = item["product_name"]
+        quantity = item["quantity"]
+
+        if product_name not in found:
+            raise ValueError(
+                f"Producto '{product_name}' no encontrado o inactivo en sucursal {branch_id}"
             )
-            product_id = cursor.fetchone()[0]
 
-            cursor.execute(
-                """INSERT INTO sale_item (sale_id, product_id, quantity, price_at_sale)
-                   VALUES (?, ?, ?, ?)""",
-                (sale_id, product_id, quantity, price_at_sale)
+        current_stock = remaining[product_name]
+        if current_stock < quantity:
+            raise ValueError(
+                f"Stock insuficiente de '{product_name}'. "
+                f"Disponible: {current_stock}, solicitado: {quantity}"
             )
+        remaining[product_name] = current_stock - quantity
+
+    # --- Paso 2: Reducir stock con un UPDATE condicional por producto ---
+    # "stock >= ?" es una segunda barrera: si alguna fila no se actualiza,
+    # el total de filas no coincide y se hace ROLLBACK.
+    cursor.executemany(
+        """UPDATE branch_product SET stock = stock - ?
+           WHERE branch_id = ? AND product_id = ? AND stock >= ?""",
+        [
+            (quantity, branch_id, found[name][0], quantity)
+            for name, quantity in quantities.items()
+        ]
+    )
+    if cursor.rowcount != len(quantities):
+        raise ValueError("Stock insuficiente: el stock cambió durante la venta.")
 
-        # --- Paso 5: Actualizar saldo de la caja ---
+    # Lo reservado por este carrito ya salió del stock: sus reservas se borran
+    # en la misma transacción (si la venta falla, siguen vigentes)
+    if session_id is not None:
         cursor.execute(
-            """UPDATE cash_register SET current_balance = current_balance + ?
-               WHERE id = ?""",
-            (total_amount, cash_register_id)
+            "DELETE FROM stock_reservation WHERE branch_id = ? AND session_id = ?",
+            (branch_id, session_id)
         )
 
-        # Todo OK → aplicar todos los cambios de golpe
-        conn.commit()
-        return sale_id
+    # --- Paso 3: Crear el registro de venta ---
+    cursor.execute(
+        """INSERT INTO sale (branch_id, cash_register_id, total_amount, timestamp, member_id)
+           VALUES (?, ?, ?, ?, ?)""",
+        (branch_id, cash_register_id, total_amount, timestamp, member_id)
+    )
+    sale_id = cursor.lastrowid
+
+    # --- Paso 4: Crear sale_items con precio congelado ---
+    # Los product_id ya se resolvieron en el paso 1: no se vuelve a buscar por nombre
+    cursor.executemany(
+        """INSERT INTO sale_item (sale_id, product_id, quantity, price_at_sale)
+           VALUES (?, ?, ?, ?)""",
+        [
+            (sale_id, found[item["product_name"]][0], item["quantity"], item["price_at_sale"])
+            for item in items
+        ]
+    )
+    _record_movements(
+        cursor, branch_id,
+        [(found[name][0], -quantity) for name, quantity in quantities.items()],
+        "sale", sale_id
+    )
 
-    except Exception:
-        # Si ALGO falla (stock insuficiente, FK invalido, lo que sea)
-        # → deshacer TODO. La BD queda como si nada hubiera pasado.
-        conn.rollback()
-        raise
+    # --- Paso 5: Actualizar saldo de la caja ---
+    cursor.execute(
+        """UPDATE cash_register SET current_balance = current_balance + ?
+           WHERE id = ?""",
+        (total_amount, cash_register_id)
+    )
 
-    finally:
-        # Siempre cerrar la conexión (libera el lock para otras cajas)
-        conn.close()
+    return sale_id
 
 
+@metrics.instrument
 def get_cash_registers_by_branch(branch_id):
     """
     Obtiene todas las cajas registradoras de una sucursal.
     Returns: lista de (id, current_balance)
     """
-    conn = _get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT id, current_balance FROM cash_register WHERE branch_id = ?",
-        (branch_id,)
-    )
-    results = cursor.fetchall()
-    conn.close()
-    return results
+    with _connection(branch_id) as conn:
+        return conn.execute(
+            "SELECT id, current_balance FROM cash_register WHERE branch_id = ?",
+            (branch_id,)
+        ).fetchall()
 
 
 # ===========================
@@ -182,155 +541,335 @@ def get_cash_registers_by_branch(branch_id):
 # Producto es global; precio, stock y active dependen de la sucursal.
 # ===========================
 
-def create_product(name, category=None):
+@metrics.instrument
+@_retry_on_busy
+def create_product(name, category=None, barcode=None):
     """
     Crea un producto global (sin precio ni stock — eso va en branch_product).
+    barcode: código de barras (EAN-13/SKU) opcional, único entre productos.
     Returns: product_id
     """
-    conn = _get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO product (name, category) VALUES (?, ?)",
-        (name, category)
-    )
-    product_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
-    return product_id
+    with _connection() as conn:
+        cursor = conn.execute(
+            "INSERT INTO product (name, category, barcode) VALUES (?, ?, ?)",
+            (name, category, barcode)
+        )
+        conn.commit()
+        return cursor.lastrowid
 
 
-def create_product_with_branch(name, category, branch_id, price, initial_stock):
+@metrics.instrument
+@_retry_on_busy
+def create_product_with_branch(name, category, branch_id, price, initial_stock, barcode=None):
     """
     Crea un producto global Y lo asocia a una sucursal en un solo paso.
     Útil para seeding y para cuando se crea un producto desde una sucursal específica.
     Returns: product_id
     """
-    conn = _get_connection()
-    cursor = conn.cursor()
-    try:
+    with _connection(branch_id) as conn:
         # Crear producto global
-        cursor.execute(
-            "INSERT INTO product (name, category) VALUES (?, ?)",
-            (name, category)
+        cursor = conn.execute(
+            "INSERT INTO product (name, category, barcode) VALUES (?, ?, ?)",
+            (name, category, barcode)
         )
         product_id = cursor.lastrowid
 
         # Asociar a la sucursal con precio y stock
-        cursor.execute(
+        conn.execute(
             """INSERT INTO branch_product (branch_id, product_id, price, stock, active)
                VALUES (?, ?, ?, ?, 1)""",
             (branch_id, product_id, price, initial_stock)
         )
         conn.commit()
-    finally:
-        conn.close()
+        _notify_catalog(conn, branch_id, product_id, True)
     return product_id
 
 
+@metrics.instrument
+@_retry_on_busy
 def assign_product_to_branch(branch_id, product_id, price, stock=0, active=1):
     """
     Asigna un producto existente a una sucursal (crea la fila en branch_product).
     Esto permite que el mismo producto esté en múltiples sucursales con precios diferentes.
     """
-    conn = _get_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute(
+    with _connection(branch_id) as conn:
+        conn.execute(
             """INSERT INTO branch_product (branch_id, product_id, price, stock, active)
                VALUES (?, ?, ?, ?, ?)""",
             (branch_id, product_id, price, stock, active)
         )
         conn.commit()
-    finally:
-        conn.close()
+        if active:
+            _notify_catalog(conn, branch_id, product_id, True)
+
+
+@metrics.instrument
+@_retry_on_busy
+def set_product_active(branch_id, product_id, active):
+    """
+    Activa o desactiva un producto en una sucursal (branch_product.active).
+    Los productos inactivos no se venden ni aparecen en las búsquedas.
+    Returns: filas afectadas (0 si el producto no está asignado a la sucursal)
+    """
+    with _connection(branch_id) as conn:
+        cursor = conn.execute(
+            "UPDATE branch_product SET active = ? WHERE branch_id = ? AND product_id = ?",
+            (1 if active else 0, branch_id, product_id)
+        )
+        conn.commit()
+        if cursor.rowcount:
+            _notify_catalog(conn, branch_id, product_id, bool(active))
+        return cursor.rowcount
 
 
+def _notify_catalog(conn, branch_id, product_id, active):
+    """
+    Avisa a los _catalog_listeners que el producto entró (active=True) o salió
+    del catálogo activo de la sucursal. Se llama después del COMMIT.
+    Sin listeners no hace nada (ni siquiera busca el nombre).
+    """
+    if not _catalog_listeners:
+        return
+    row = conn.execute("SELECT name FROM product WHERE id = ?", (product_id,)).fetchone()
+    if row is None:
+        return
+    for listener in list(_catalog_listeners):
+        listener(branch_id, row[0], active)
+
+
+@metrics.instrument
 def get_active_products(branch_id):
     """
     Obtiene todos los productos activos en una sucursal específica.
     Returns: lista de (name, price, stock)
     """
-    conn = _get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        """SELECT p.name, bp.price, bp.stock
-           FROM product p
-           JOIN branch_product bp ON p.id = bp.product_id
-           WHERE bp.branch_id = ? AND bp.active = 1""",
-        (branch_id,)
-    )
-    products = cursor.fetchall()
-    conn.close()
-    return products
+    with _connection(branch_id) as conn:
+        return conn.execute(
+            """SELECT p.name, bp.price, bp.stock
+               FROM product p
+               JOIN branch_product bp ON p.id = bp.product_id
+               WHERE bp.branch_id = ? AND bp.active = 1""",
+            (branch_id,)
+        ).fetchall()
+
+
+# Filas por página de iter_active_products
+CATALOG_PAGE_SIZE = 500
+
+# Órdenes de get_active_products_page: (tablas, columna de orden, desempate
+# único, posición de la columna de orden en la fila devuelta).
+# La página siguiente arranca DESPUÉS de la última fila (keyset), así cada
+# página es una búsqueda por índice y no un OFFSET que relee lo anterior.
+_CATALOG_ORDERS = {
+    "name": ("product p CROSS JOIN branch_product bp ON bp.product_id = p.id",
+             "p.name", "p.id", 1),
+    "price": ("branch_product bp CROSS JOIN product p ON p.id = bp.product_id",
+              "bp.price", "bp.product_id", 2),
+}
+
+
+@metrics.instrument
+def get_active_products_page(branch_id, after=None, page_size=CATALOG_PAGE_SIZE,
+                             category=None, order_by="name", descending=False):
+    """
+    Una página del catálogo activo de una sucursal (paginación por keyset).
+
+    Args:
+        branch_id (int): Sucursal
+        after (tuple | None): (valor de orden, product_id) de la última fila de
+            la página anterior; None = primera página
+        page_size (int): Máximo de filas
+        category (str | None): Solo productos de esa categoría
+        order_by (str): "name" o "price"
+        descending (bool): Orden descendente
 
+    Returns:
+        lista de (product_id, name, price, stock)
 
+    Raises:
+        ValueError: Si order_by no existe o page_size no es positivo
+    """
+    if order_by not in _CATALOG_ORDERS:
+        raise ValueError(f"Orden '{order_by}' no soportado: {sorted(_CATALOG_ORDERS)}")
+    if page_size <= 0:
+        raise ValueError("page_size debe ser positivo")
+
+    tables, sort_column, tie_column, _ = _CATALOG_ORDERS[order_by]
+    direction = "DESC" if descending else "ASC"
+    conditions = ["bp.branch_id = ?", "bp.active = 1"]
+    params = [branch_id]
+    if category is not None:
+        conditions.append("p.category = ?")
+        params.append(category)
+    if after is not None:
+        conditions.append(f"({sort_column}, {tie_column}) {'<' if descending else '>'} (?, ?)")
+        params.extend(after)
+    params.append(page_size)
+
+    with _connection(branch_id) as conn:
+        return conn.execute(
+            f"""SELECT p.id, p.name, bp.price, bp.stock
+                FROM {tables}
+                WHERE {" AND ".join(conditions)}
+                ORDER BY {sort_column} {direction}, {tie_column} {direction}
+                LIMIT ?""",
+            params
+        ).fetchall()
+
+
+def iter_active_products(branch_id, page_size=CATALOG_PAGE_SIZE, category=None,
+                         order_by="name", descending=False):
+    """
+    Recorre el catálogo activo de una sucursal de a páginas (generador).
+    A diferencia de get_active_products, nunca tiene más de `page_size`
+    filas en memoria y la primera fila llega sin esperar al resto.
+    Cada página es una llamada (y una métrica) de get_active_products_page.
+
+    Yields: (name, price, stock), como get_active_products
+    """
+    after = None
+    while True:
+        page = get_active_products_page(
+            branch_id, after, page_size, category, order_by, descending
+        )
+        for product_id, name, price, stock in page:
+            yield name, price, stock
+        if len(page) < page_size:
+            return
+        last = page[-1]
+        after = (last[_CATALOG_ORDERS[order_by][3]], last[0])
+
+
+@metrics.instrument
 def get_product_by_name(name, branch_id):
     """
     Obtiene un producto por nombre exacto en una sucursal específica.
     El precio viene de branch_product (no de product, que no tiene precio).
     Returns: (product_id, name, price, stock) o None
     """
-    conn = _get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        """SELECT p.id, p.name, bp.price, bp.stock
-           FROM product p
-           JOIN branch_product bp ON p.id = bp.product_id
-           WHERE p.name = ? AND bp.branch_id = ? AND bp.active = 1""",
-        (name, branch_id)
-    )
-    product = cursor.fetchone()
-    conn.close()
-    return product
+    with _connection(branch_id) as conn:
+        return conn.execute(
+            """SELECT p.id, p.name, bp.price, bp.stock
+               FROM product p
+               JOIN branch_product bp ON p.id = bp.product_id
+               WHERE p.name = ? AND bp.branch_id = ? AND bp.active = 1""",
+            (name, branch_id)
+        ).fetchone()
+
+
+@metrics.instrument
+def get_product_by_barcode(barcode, branch_id):
+    """
+    Obtiene un producto por código de barras en una sucursal específica.
+    Es el camino del escáner: busca por idx_product_barcode y por
+    (branch_id, product_id), sin comparar nombres.
+    Returns: (product_id, name, price, stock) o None
+    """
+    with _connection(branch_id) as conn:
+        return conn.execute(
+            """SELECT p.id, p.name, bp.price, bp.stock
+               FROM product p
+               JOIN branch_product bp ON bp.branch_id = ? AND bp.product_id = p.id
+               WHERE p.barcode = ? AND bp.active = 1""",
+            (branch_id, barcode)
+        ).fetchone()
+
+
+@metrics.instrument
+@_retry_on_busy
+def set_product_barcode(product_id, barcode):
+    """
+    Asigna (o borra, con None) el código de barras de un producto.
+    Returns: filas afectadas (0 si el producto no existe)
+    Raises: sqlite3.IntegrityError si otro producto ya tiene ese código
+    """
+    with _connection() as conn:
+        cursor = conn.execute(
+            "UPDATE product SET barcode = ? WHERE id = ?",
+            (barcode, product_id)
+        )
+        conn.commit()
+        return cursor.rowcount
 
 
-def search_by_name(partial_name, branch_id):
+@metrics.instrument
+def search_by_name(partial_name, branch_id, limit=None):
     """
     Búsqueda parcial de productos por nombre (case-insensitive) en una sucursal.
-    Solo retorna productos activos en esa sucursal.
+    Solo retorna productos activos en esa sucursal, los más relevantes primero.
+
+    Con 3 letras o más usa el índice FTS5 trigram (product_fts, migración 2):
+    busca la subcadena sin recorrer todo el catálogo. Con menos letras el
+    trigram no sirve y se usa LIKE (recorre el catálogo, como antes).
+
+    Args:
+        partial_name (str): Texto a buscar en cualquier parte del nombre
+        branch_id (int): Sucursal
+        limit (int | None): Máximo de resultados (None = todos)
+
     Returns: lista de nombres
     """
-    conn = _get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        """SELECT p.name
-           FROM product p
-           JOIN branch_product bp ON p.id = bp.product_id
-           WHERE p.name LIKE ? AND bp.branch_id = ? AND bp.active = 1""",
-        (f"%{partial_name}%", branch_id)
-    )
-    results = cursor.fetchall()
-    conn.close()
+    text = partial_name.strip()
+    row_limit = -1 if limit is None else limit
+
+    with _connection(branch_id) as conn:
+        if len(text) >= _TRIGRAM_MIN_LENGTH:
+            # Frase entre comillas: el texto se busca literal (sin operadores FTS).
+            # CROSS JOIN: recorrer los matches del índice y buscar cada uno por id.
+            results = conn.execute(
+                """SELECT p.name
+                   FROM product_fts
+                   CROSS JOIN product p ON p.id = product_fts.rowid
+                   CROSS JOIN branch_product bp
+                        ON bp.branch_id = ? AND bp.product_id = p.id
+                   WHERE product_fts MATCH ? AND bp.active = 1
+                   ORDER BY product_fts.rank, p.name
+                   LIMIT ?""",
+                (branch_id, '"' + text.replace('"', '""') + '"', row_limit)
+            ).fetchall()
+        else:
+            results = conn.execute(
+                """SELECT p.name
+                   FROM product p
+                   JOIN branch_product bp ON p.id = bp.product_id
+                   WHERE p.name LIKE ? AND bp.branch_id = ? AND bp.active = 1
+                   ORDER BY p.name
+                   LIMIT ?""",
+                (f"%{text}%", branch_id, row_limit)
+            ).fetchall()
     return [row[0] for row in results]
 
 
+@metrics.instrument
 def get_product_id_by_name(name):
     """
     Obtiene el ID de un producto global por su nombre.
     No depende de sucursal porque product es global.
     Returns: product_id o None
     """
-    conn = _get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT id FROM product WHERE name = ?",
-        (name,)
-    )
-    result = cursor.fetchone()
-    conn.close()
+    with _connection() as conn:
+        result = conn.execute(
+            "SELECT id FROM product WHERE name = ?",
+            (name,)
+        ).fetchone()
     return result[0] if result else None
 
 
-def update_branch_product_stock(branch_id, product_name, quantity_delta):
+@metrics.instrument
+@_retry_on_busy
+def update_branch_product_stock(branch_id, product_name, quantity_delta, reason=None):
     """
-    Modifica el stock de un producto en una sucursal (suma o resta).
+    Modifica el stock de un producto en una sucursal (suma o resta) y lo
+    anota en stock_movement, en la misma transacción.
     quantity_delta positivo = aumentar, negativo = reducir.
+    reason: motivo del movimiento (None: "restock" si suma, "adjust" si resta)
     Returns: rows affected
     """
-    conn = _get_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute(
+    if reason is None:
+        reason = "restock" if quantity_delta > 0 else "adjust"
+
+    with _connection(branch_id) as conn:
+        cursor = conn.execute(
             """UPDATE branch_product
                SET stock = stock + ?
                WHERE branch_id = ?
@@ -338,28 +877,556 @@ def update_branch_product_stock(branch_id, product_name, quantity_delta):
             (quantity_delta, branch_id, product_name)
         )
         rows = cursor.rowcount
+        # Un delta 0 no cambia el stock: no ensucia el historial
+        if rows and quantity_delta:
+            conn.execute(
+                """INSERT INTO stock_movement
+                       (branch_id, product_id, delta, reason, reference, created_at)
+                   SELECT ?, id, ?, ?, NULL, ? FROM product WHERE name = ?""",
+                (branch_id, quantity_delta, reason, time.time(), product_name)
+            )
         conn.commit()
-    finally:
-        conn.close()
     return rows
 
 
+# Filas de adjust_stock_bulk que se validan y escriben juntas (memoria acotada
+# aunque el archivo de la entrega tenga millones de líneas)
+BULK_CHUNK_SIZE = 500
+
+
+@metrics.instrument
+def adjust_stock_bulk(branch_id, rows, all_or_nothing=False, reason="adjust"):
+    """
+    Ajusta el stock de muchos productos de una sucursal en UNA transacción
+    (una entrega de proveedor, un recuento de inventario).
+
+    `rows` puede ser una lista o un generador: se consume de a
+    BULK_CHUNK_SIZE filas, así un archivo enorme nunca está entero en memoria.
+    Cada tanda se valida con una sola query (stock actual de sus productos)
+    y se escribe con un executemany. Las filas inválidas no se aplican y se
+    informan; el resto sí (salvo all_or_nothing=True).
+
+    El write lock se toma al empezar y se mantiene hasta consumir todo
+    `rows`: un generador lento frena las ventas de la sucursal mientras tanto.
+    Solo se reintenta tomar el lock (antes de leer la primera fila); un
+    generador a medio consumir no se puede repetir.
+
+    Args:
+        branch_id (int): Sucursal
+        rows (iterable): Filas (product_name, quantity_delta), tuplas o listas; delta positivo = aumentar
+        all_or_nothing (bool): Si alguna fila falla, no aplicar ninguna
+        reason (str): Motivo de los movimientos de stock (ej: "restock" para una entrega)
+
+    Returns:
+        dict: {"applied": filas aplicadas,
+               "failures": [(número de fila desde 1, product_name, delta, motivo), ...]}
+
+    Raises:
+        retry.DatabaseBusyError: Si no se consiguió el write lock en todo el presupuesto de RETRY_POLICY
+    """
+    applied = 0
+    failures = []
+    rows = iter(rows)
+
+    with _connection(branch_id) as conn:
+        cursor = conn.cursor()
+        try:
+            with _attempt_busy_timeout(conn):
+                retry.call_with_retry(
+                    RETRY_POLICY, "adjust_stock_bulk", _begin_immediate_or_rollback, conn, cursor
+                )
+            row_number = 0
+            while True:
+                chunk = list(itertools.islice(rows, BULK_CHUNK_SIZE))
+                if not chunk:
+                    break
+                updates = _validate_stock_chunk(cursor, branch_id, chunk, row_number, failures)
+                row_number += len(chunk)
+
+                cursor.executemany(
+                    """UPDATE branch_product SET stock = stock + ?
+                       WHERE branch_id = ? AND product_id = ? AND stock + ? >= 0""",
+                    [(delta, branch_id, product_id, delta) for product_id, delta in updates]
+                )
+                if cursor.rowcount != len(updates):
+                    raise ValueError("El stock cambió durante el ajuste.")
+                _record_movements(cursor, branch_id, updates, reason)
+                applied += len(updates)
+
+            if failures and all_or_nothing:
+                conn.rollback()
+                return {"applied": 0, "failures": failures}
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    return {"applied": applied, "failures": failures}
+
+
+def _begin_immediate_or_rollback(conn, cursor):
+    """
+    _begin_immediate que, si la BD está ocupada, deja la conexión sin
+    transacción abierta (con SHARDING el BEGIN ya corrió) para poder reintentar.
+    """
+    try:
+        _begin_immediate(cursor)
+    except sqlite3.OperationalError:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+
+
+def _validate_stock_chunk(cursor, branch_id, chunk, first_row, failures):
+    """
+    Valida una tanda de adjust_stock_bulk contra el stock actual (incluye lo
+    que ya aplicaron las tandas anteriores de la misma transacción).
+    Un mismo producto puede repetirse: se valida con el stock acumulado.
+    Agrega las filas inválidas a `failures` (en orden de fila), incluidas las
+    de tipo incorrecto (ej: un nombre que llegó como lista de un CSV mal
+    parseado): no pueden cortar la tanda entera con un TypeError.
+    Returns: lista de (product_id, delta) a aplicar, en orden
+    """
+    chunk_failures = []
+    parsed = []
+    for offset, row in enumerate(chunk, 1):
+        # Solo tuplas o listas: un string de 2 caracteres también se desempaqueta
+        if not isinstance(row, (tuple, list)) or len(row) != 2:
+            chunk_failures.append((first_row + offset, None, None, "fila mal formada"))
+            continue
+        product_name, delta = row
+        if not isinstance(product_name, str):
+            chunk_failures.append((first_row + offset, product_name, delta, "el nombre debe ser un texto"))
+            continue
+        if isinstance(delta, bool) or not isinstance(delta, int):
+            chunk_failures.append((first_row + offset, product_name, delta, "la cantidad debe ser un entero"))
+            continue
+        parsed.append((first_row + offset, product_name, delta))
+
+    names_json = json.dumps(list({product_name for _, product_name, _ in parsed}))
+    cursor.execute(
+        """SELECT p.name, p.id, bp.stock
+           FROM json_each(?) AS requested
+           CROSS JOIN product p ON p.name = requested.value
+           CROSS JOIN branch_product bp
+                ON bp.branch_id = ? AND bp.product_id = p.id""",
+        (names_json, branch_id)
+    )
+    found = {name: [product_id, stock] for name, product_id, stock in cursor.fetchall()}
+
+    updates = []
+    for row_number, product_name, delta in parsed:
+        if product_name not in found:
+            chunk_failures.append((
+                row_number, product_name, delta,
+                f"producto no encontrado en sucursal {branch_id}"
+            ))
+            continue
+        product_id, stock = found[product_name]
+        if stock + delta < 0:
+            chunk_failures.append((
+                row_number, product_name, delta,
+                f"el stock quedaría negativo (disponible: {stock})"
+            ))
+            continue
+        found[product_name][1] = stock + delta
+        updates.append((product_id, delta))
+
+    failures.extend(sorted(chunk_failures, key=lambda failure: failure[0]))
+    return updates
+
+
+@metrics.instrument
 def get_branch_product_stock(branch_id, product_name):
     """
     Obtiene el stock actual de un producto en una sucursal.
     Returns: cantidad (int) o None si no se encuentra
     """
-    conn = _get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        """SELECT bp.stock
-           FROM branch_product bp
-           JOIN product p ON p.id = bp.product_id
-           WHERE p.name = ? AND bp.branch_id = ? AND bp.active = 1""",
-        (product_name, branch_id)
+    with _connection(branch_id) as conn:
+        row = conn.execute(
+            """SELECT bp.stock
+               FROM branch_product bp
+               JOIN product p ON p.id = bp.product_id
+               WHERE p.name = ? AND bp.branch_id = ? AND bp.active = 1""",
+            (product_name, branch_id)
+        ).fetchone()
+    return row[0] if row else None
+
+
+# ===========================
+# STOCK LEDGER
+# branch_product.stock es el contador que usan las ventas; stock_movement es
+# el historial de cada cambio (solo se agrega). Lo escriben, en la MISMA
+# transacción que el contador: process_sale_atomic, update_branch_product_stock,
+# adjust_stock_bulk y el trigger de apertura de branch_product (migración 6).
+#
+# Stock en un instante = último snapshot hasta ese instante + suma de los
+# movimientos posteriores (la "cola"). snapshot_stock_ledger compacta: guarda
+# un snapshot de cada producto que se movió desde la corrida anterior, así
+# la cola nunca es más larga que lo movido entre dos corridas.
+# ===========================
+
+# Stock según el historial de la fila "bp" de branch_product hasta un
+# instante (parámetros: el instante, 3 veces). Con snapshot: el snapshot más
+# la cola (índices de snapshot y de movimientos). Sin snapshot todavía: la
+# suma de todo el historial del producto.
+_LEDGER_STOCK = """COALESCE(
+               (SELECT s.stock + COALESCE((
+                        SELECT SUM(m.delta) FROM stock_movement m
+                        WHERE m.branch_id = s.branch_id AND m.product_id = s.product_id
+                          AND m.id > s.movement_id AND m.created_at <= ?), 0)
+                FROM stock_snapshot s
+                WHERE s.branch_id = bp.branch_id AND s.product_id = bp.product_id
+                  AND s.created_at <= ?
+                ORDER BY s.movement_id DESC LIMIT 1),
+               (SELECT COALESCE(SUM(m.delta), 0) FROM stock_movement m
+                WHERE m.branch_id = bp.branch_id AND m.product_id = bp.product_id
+                  AND m.created_at <= ?))"""
+
+
+def _record_movements(cursor, branch_id, movements, reason, reference=None):
+    """
+    Anota movimientos de stock dentro de la transacción de quien llama.
+    movements: lista de (product_id, delta); los delta 0 no se anotan
+    """
+    now = time.time()
+    cursor.executemany(
+        """INSERT INTO stock_movement (branch_id, product_id, delta, reason, reference, created_at)
+           VALUES (?, ?, ?, ?, ?, ?)""",
+        [(branch_id, product_id, delta, reason, reference, now) for product_id, delta in movements if delta]
     )
-    row = cursor.fetchone()
-    conn.close()
+
+
+@metrics.instrument
+def get_stock_at(branch_id, product_name, at=None):
+    """
+    Stock de un producto según el historial, en un instante.
+
+    Args:
+        branch_id (int): Sucursal
+        product_name (str): Nombre del producto
+        at (float|None): Instante en segundos epoch (None: ahora)
+
+    Returns:
+        int: Stock en ese instante, o None si el producto no está en la sucursal
+    """
+    at = time.time() if at is None else at
+    with _connection(branch_id) as conn:
+        row = conn.execute(
+            f"""SELECT {_LEDGER_STOCK}
+               FROM branch_product bp
+               JOIN product p ON p.id = bp.product_id
+               WHERE p.name = ? AND bp.branch_id = ?""",
+            (at, at, at, product_name, branch_id)
+        ).fetchone()
+    return row[0] if row else None
+
+
+@metrics.instrument
+def get_stock_movements(branch_id, product_name, after_id=0, limit=100):
+    """
+    Historial de un producto en orden, de a páginas (para auditar o reproducir).
+    after_id: devolver los movimientos con id mayor (el último id de la página anterior)
+    Returns: lista de (id, delta, reason, reference, created_at)
+    """
+    with _connection(branch_id) as conn:
+        return conn.execute(
+            """SELECT m.id, m.delta, m.reason, m.reference, m.created_at
+               FROM stock_movement m
+               WHERE m.branch_id = ?
+                 AND m.product_id = (SELECT id FROM product WHERE name = ?)
+                 AND m.id > ?
+               ORDER BY m.id
+               LIMIT ?""",
+            (branch_id, product_name, after_id, limit)
+        ).fetchall()
+
+
+@metrics.instrument
+def get_stock_drift(branch_id):
+    """
+    Auditoría: productos de la sucursal cuyo contador (branch_product.stock)
+    no coincide con su historial. Un cambio de stock que no pasó por el
+    repository (ej: un UPDATE a mano) aparece acá.
+    Returns: lista de (name, stock, ledger_stock)
+    """
+    now = time.time()
+    with _connection(branch_id) as conn:
+        rows = conn.execute(
+            f"""SELECT p.name, bp.stock, {_LEDGER_STOCK}
+               FROM branch_product bp
+               JOIN product p ON p.id = bp.product_id
+               WHERE bp.branch_id = ?""",
+            (now, now, now, branch_id)
+        )
+        # Se compara acá: en un WHERE, SQLite calcularía el historial dos veces
+        return sorted(row for row in rows if row[1] != row[2])
+
+
+@metrics.instrument
+@_retry_on_busy
+def snapshot_stock_ledger(branch_id):
+    """
+    Compacta el historial de una sucursal: un snapshot por cada producto con
+    movimientos desde la corrida anterior (los demás ya tienen uno al día).
+    Pensada para correr periódicamente (ej: al abrir main_gerente, o cada
+    noche): entre dos corridas, la cola de un producto es lo que se movió.
+
+    Cada snapshot se calcula con el HISTORIAL (snapshot anterior + cola), no
+    copiando el contador: así no esconde una diferencia (ver get_stock_drift).
+
+    Returns:
+        int: Snapshots creados
+    """
+    with _connection(branch_id) as conn:
+        cursor = conn.cursor()
+        try:
+            # Sin otras escrituras en el medio: ningún movimiento con id menor
+            # puede aparecer después de esta corrida
+            _begin_immediate(cursor)
+            watermark = cursor.execute(
+                "SELECT COALESCE(MAX(movement_id), 0) FROM stock_snapshot WHERE branch_id = ?",
+                (branch_id,)
+            ).fetchone()[0]
+            # Todo movimiento hasta watermark ya está en el último snapshot de
+            # su producto: el stock nuevo es ese snapshot + lo posterior.
+            # Los "+" descartan el índice por producto (que evitaría ordenar
+            # para el GROUP BY): se recorre solo el rango de ids nuevo por
+            # clave primaria, no todo el historial de la sucursal
+            cursor.execute(
+                """INSERT INTO stock_snapshot (branch_id, product_id, stock, movement_id, created_at)
+                   SELECT m.branch_id, m.product_id,
+                          COALESCE((SELECT s.stock FROM stock_snapshot s
+                                    WHERE s.branch_id = m.branch_id AND s.product_id = m.product_id
+                                    ORDER BY s.movement_id DESC LIMIT 1), 0) + SUM(m.delta),
+                          MAX(m.id), ?
+                   FROM stock_movement m
+                   WHERE m.id > ? AND +m.branch_id = ?
+                   GROUP BY +m.product_id""",
+                (time.time(), watermark, branch_id)
+            )
+            created = cursor.rowcount
+            conn.commit()
+            return created
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+
+# ===========================
+# STOCK RESERVATIONS
+# Un carrito abierto aparta las unidades que tiene cargadas hasta que se
+# vende, se vacía o vence (expires_at). Así dos cajas no venden la última
+# unidad dos veces: la segunda se entera al agregar, no al cobrar.
+# Una reserva vencida deja de contar en el acto (todas las consultas filtran
+# expires_at > ahora); borrarla es solo limpieza, de a tandas chicas.
+# ===========================
+
+# Segundos que dura una reserva sin actividad del carrito
+RESERVATION_TTL = 300.0
+
+# Reservas vencidas que borra cada reserve_stock de paso (costo acotado
+# por llamada; sweep_expired_reservations borra todas)
+RESERVATION_SWEEP_BATCH = 100
+
+
+def _reservable_row(cursor, branch_id, session_id, product_name, now, product_id=None):
+    """
+    (product_id, disponible para el carrito) de un producto activo de la
+    sucursal, o None si no existe o está inactivo. Con product_id no se
+    busca por nombre (solo branch_product, por su clave).
+    """
+    if product_id is not None:
+        return cursor.execute(
+            f"""SELECT bp.product_id, {_AVAILABLE_STOCK}
+               FROM branch_product bp
+               WHERE bp.branch_id = ? AND bp.product_id = ? AND bp.active = 1""",
+            (now, session_id, branch_id, product_id)
+        ).fetchone()
+    return cursor.execute(
+        f"""SELECT bp.product_id, {_AVAILABLE_STOCK}
+           FROM product p
+           JOIN branch_product bp ON bp.branch_id = ? AND bp.product_id = p.id
+           WHERE p.name = ? AND bp.active = 1""",
+        (now, session_id, branch_id, product_name)
+    ).fetchone()
+
+
+@metrics.instrument
+@_retry_on_busy
+def reserve_stock(branch_id, session_id, product_name, quantity, ttl=RESERVATION_TTL, product_id=None):
+    """
+    Fija cuántas unidades de un producto tiene apartadas un carrito (el TOTAL
+    del carrito para ese producto, no un incremento) y renueva el vencimiento
+    de todas las reservas del carrito. quantity=0 libera el producto.
+
+    Args:
+        branch_id (int): Sucursal
+        session_id (str): Identificador del carrito
+        product_name (str): Nombre del producto
+        quantity (int): Unidades que el carrito quiere tener apartadas
+        ttl (float): Segundos hasta que vencen las reservas del carrito
+        product_id (int | None): Si ya se conoce (escáner, caché), se reserva
+            por id sin volver a buscar el nombre
+
+    Returns:
+        tuple: (ok, available) — available son las unidades que este carrito
+        puede tener (stock menos lo reservado por OTROS carritos). Si ok es
+        False no se cambió nada; (False, 0) si el producto no existe o está inactivo.
+
+    Raises:
+        ValueError: Si quantity es negativa
+    """
+    if quantity < 0:
+        raise ValueError("La cantidad a reservar no puede ser negativa.")
+
+    now = time.time()
+    with _connection(branch_id) as conn:
+        cursor = conn.cursor()
+        try:
+            # Primero sin lock (en WAL la lectura no espera a nadie): un
+            # escaneo rechazado no toma el write lock de la sucursal
+            row = _reservable_row(cursor, branch_id, session_id, product_name, now, product_id)
+            if row is None or row[1] < quantity:
+                return False, max(row[1], 0) if row else 0
+
+            # Con lock, se vuelve a leer: entre calcular el disponible y
+            # reservar, ninguna otra caja puede reservar ni vender
+            _begin_immediate(cursor)
+            row = _reservable_row(cursor, branch_id, session_id, product_name, now, product_id)
+            if row is None or row[1] < quantity:
+                conn.rollback()
+                return False, max(row[1], 0) if row else 0
+            product_id, available = row
+
+            if quantity > 0:
+                cursor.execute(
+                    """INSERT INTO stock_reservation
+                           (branch_id, product_id, session_id, quantity, expires_at)
+                       VALUES (?, ?, ?, ?, ?)
+                       ON CONFLICT (branch_id, session_id, product_id)
+                       DO UPDATE SET quantity = excluded.quantity""",
+                    (branch_id, product_id, session_id, quantity, now + ttl)
+                )
+            else:
+                cursor.execute(
+                    """DELETE FROM stock_reservation
+                       WHERE branch_id = ? AND session_id = ? AND product_id = ?""",
+                    (branch_id, session_id, product_id)
+                )
+
+            # El carrito sigue en uso: ninguna de sus reservas vence todavía
+            cursor.execute(
+                "UPDATE stock_reservation SET expires_at = ? WHERE branch_id = ? AND session_id = ?",
+                (now + ttl, branch_id, session_id)
+            )
+            _delete_expired_reservations(cursor, branch_id, now, RESERVATION_SWEEP_BATCH)
+
+            conn.commit()
+            return True, available
+
+        except Exception:
+            conn.rollback()
+            raise
+
+        finally:
+            cursor.close()
+
+
+@metrics.instrument
+@_retry_on_busy
+def release_reservation(branch_id, session_id, product_name=None, product_id=None):
+    """
+    Libera las reservas de un carrito: las de un producto (por product_id si
+    se conoce, si no por nombre), o todas.
+    Returns: reservas borradas
+    """
+    with _connection(branch_id) as conn:
+        if product_id is not None:
+            cursor = conn.execute(
+                """DELETE FROM stock_reservation
+                   WHERE branch_id = ? AND session_id = ? AND product_id = ?""",
+                (branch_id, session_id, product_id)
+            )
+        elif product_name is None:
+            cursor = conn.execute(
+                "DELETE FROM stock_reservation WHERE branch_id = ? AND session_id = ?",
+                (branch_id, session_id)
+            )
+        else:
+            cursor = conn.execute(
+                """DELETE FROM stock_reservation
+                   WHERE branch_id = ? AND session_id = ?
+                     AND product_id = (SELECT id FROM product WHERE name = ?)""",
+                (branch_id, session_id, product_name)
+            )
+        conn.commit()
+        return cursor.rowcount
+
+
+@metrics.instrument
+@_retry_on_busy
+def sweep_expired_reservations(branch_id, now=None):
+    """
+    Borra todas las reservas vencidas de una sucursal (un rango de
+    idx_stock_reservation_expiry). No cambia ningún disponible: las vencidas
+    ya no contaban.
+
+    Args:
+        branch_id (int): Sucursal
+        now (float|None): Instante de corte en segundos epoch (None: ahora)
+
+    Returns:
+        int: Reservas borradas
+    """
+    with _connection(branch_id) as conn:
+        cursor = conn.cursor()
+        try:
+            deleted = _delete_expired_reservations(
+                cursor, branch_id, time.time() if now is None else now
+            )
+            conn.commit()
+            return deleted
+        finally:
+            cursor.close()
+
+
+def _delete_expired_reservations(cursor, branch_id, now, limit=None):
+    """Borra reservas vencidas (hasta `limit`, o todas). Returns: filas borradas"""
+    if limit is None:
+        cursor.execute(
+            "DELETE FROM stock_reservation WHERE branch_id = ? AND expires_at <= ?",
+            (branch_id, now)
+        )
+    else:
+        cursor.execute(
+            """DELETE FROM stock_reservation WHERE id IN (
+                   SELECT id FROM stock_reservation
+                   WHERE branch_id = ? AND expires_at <= ? LIMIT ?)""",
+            (branch_id, now, limit)
+        )
+    return cursor.rowcount
+
+
+@metrics.instrument
+def get_available_stock(branch_id, product_name, session_id=None):
+    """
+    Stock de un producto que todavía se puede vender o reservar: el stock
+    menos las reservas vigentes de los carritos (salvo las de session_id).
+    Returns: cantidad (int) o None si no se encuentra
+    """
+    with _connection(branch_id) as conn:
+        row = conn.execute(
+            f"""SELECT {_AVAILABLE_STOCK}
+               FROM branch_product bp
+               JOIN product p ON p.id = bp.product_id
+               WHERE p.name = ? AND bp.branch_id = ? AND bp.active = 1""",
+            (time.time(), session_id, product_name, branch_id)
+        ).fetchone()
     return row[0] if row else None
 
 
@@ -367,56 +1434,49 @@ def get_branch_product_stock(branch_id, product_name):
 # MEMBERS (antes: socios)
 # ===========================
 
+@metrics.instrument
+@_retry_on_busy
 def create_member(name, dni, password_hash):
     """
     Inserta un nuevo miembro/socio.
     Returns: member_id
     """
-    conn = _get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        """INSERT INTO member (name, dni, password, active)
-           VALUES (?, ?, ?, 1)""",
-        (name, dni, password_hash)
-    )
-    member_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
-    return member_id
+    with _connection() as conn:
+        cursor = conn.execute(
+            """INSERT INTO member (name, dni, password, active)
+               VALUES (?, ?, ?, 1)""",
+            (name, dni, password_hash)
+        )
+        conn.commit()
+        return cursor.lastrowid
 
 
+@metrics.instrument
 def get_member_by_name(name):
     """
     Obtiene un miembro/socio por nombre exacto.
     Returns: (id, name, dni, password, active) o None
     """
-    conn = _get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        """SELECT id, name, dni, password, active
-           FROM member WHERE name = ? AND active = 1""",
-        (name,)
-    )
-    member = cursor.fetchone()
-    conn.close()
-    return member
+    with _connection() as conn:
+        return conn.execute(
+            """SELECT id, name, dni, password, active
+               FROM member WHERE name = ? AND active = 1""",
+            (name,)
+        ).fetchone()
 
 
+@metrics.instrument
 def get_member_by_dni(dni):
     """
     Obtiene un miembro/socio por DNI.
     Returns: (id, name, dni, password, active) o None
     """
-    conn = _get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        """SELECT id, name, dni, password, active
-           FROM member WHERE dni = ? AND active = 1""",
-        (dni,)
-    )
-    member = cursor.fetchone()
-    conn.close()
-    return member
+    with _connection() as conn:
+        return conn.execute(
+            """SELECT id, name, dni, password, active
+               FROM member WHERE dni = ? AND active = 1""",
+            (dni,)
+        ).fetchone()
 
 
 # ===========================
@@ -424,6 +1484,8 @@ def get_member_by_dni(dni):
 # Cada venta pertenece a una sucursal y una caja.
 # ===========================
 
+@metrics.instrument
+@_retry_on_busy
 def create_sale(branch_id, cash_register_id, total_amount, timestamp, member_id=None):
     """
     Registra una nueva venta.
@@ -431,78 +1493,72 @@ def create_sale(branch_id, cash_register_id, total_amount, timestamp, member_id=
     member_id es nullable (no todas las ventas son de socios).
     Returns: sale_id
     """
-    conn = _get_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute(
+    with _connection(branch_id) as conn:
+        cursor = conn.execute(
             """INSERT INTO sale (branch_id, cash_register_id, total_amount, timestamp, member_id)
                VALUES (?, ?, ?, ?, ?)""",
             (branch_id, cash_register_id, total_amount, timestamp, member_id)
         )
-        sale_id = cursor.lastrowid
         conn.commit()
-    finally:
-        conn.close()
-    return sale_id
+        return cursor.lastrowid
 
 
-def create_sale_item(sale_id, product_id, quantity, price_at_sale):
+@metrics.instrument
+@_retry_on_busy
+def create_sale_item(sale_id, product_id, quantity, price_at_sale, branch_id=None):
     """
     Inserta un item en una venta.
     price_at_sale congela el precio al momento de la venta (historial correcto).
+    Con SHARDING, branch_id es obligatorio (los sale_id se repiten entre sucursales).
     Returns: sale_item_id
     """
-    conn = _get_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute(
+    if SHARDING and branch_id is None:
+        raise ValueError("Con sharding, create_sale_item necesita el branch_id de la venta.")
+
+    with _connection(branch_id) as conn:
+        cursor = conn.execute(
             """INSERT INTO sale_item (sale_id, product_id, quantity, price_at_sale)
                VALUES (?, ?, ?, ?)""",
             (sale_id, product_id, quantity, price_at_sale)
         )
-        item_id = cursor.lastrowid
         conn.commit()
-    finally:
-        conn.close()
-    return item_id
+        return cursor.lastrowid
 
 
 # ===========================
 # CASH REGISTER (antes: caja)
 # ===========================
 
-def update_cash_register_balance(cash_register_id, amount_delta):
+@metrics.instrument
+@_retry_on_busy
+def update_cash_register_balance(cash_register_id, amount_delta, branch_id=None):
     """
     Modifica el saldo de una caja registradora.
     amount_delta positivo = ingreso, negativo = retiro.
+    branch_id es opcional: con SHARDING evita buscar la sucursal de la caja.
     """
-    conn = _get_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute(
+    with _connection(_branch_of_cash_register(cash_register_id, branch_id)) as conn:
+        conn.execute(
             """UPDATE cash_register
                SET current_balance = current_balance + ?
                WHERE id = ?""",
             (amount_delta, cash_register_id)
         )
         conn.commit()
-    finally:
-        conn.close()
 
 
-def get_cash_register_balance(cash_register_id):
+@metrics.instrument
+def get_cash_register_balance(cash_register_id, branch_id=None):
     """
     Obtiene el saldo actual de una caja registradora.
+    branch_id es opcional: con SHARDING evita buscar la sucursal de la caja.
     Returns: saldo (float)
     """
-    conn = _get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT current_balance FROM cash_register WHERE id = ?",
-        (cash_register_id,)
-    )
-    result = cursor.fetchone()
-    conn.close()
+    with _connection(_branch_of_cash_register(cash_register_id, branch_id)) as conn:
+        result = conn.execute(
+            "SELECT current_balance FROM cash_register WHERE id = ?",
+            (cash_register_id,)
+        ).fetchone()
     return result[0] if result else 0
 
 
@@ -510,140 +1566,631 @@ def get_cash_register_balance(cash_register_id):
 # SUPPLIERS (antes: proveedores)
 # ===========================
 
+@metrics.instrument
+@_retry_on_busy
 def create_supplier(name):
     """
     Crea un nuevo proveedor.
     Returns: supplier_id
     """
-    conn = _get_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute(
+    with _connection() as conn:
+        cursor = conn.execute(
             "INSERT INTO supplier (name, active) VALUES (?, 1)",
             (name,)
         )
-        supplier_id = cursor.lastrowid
         conn.commit()
-    finally:
-        conn.close()
-    return supplier_id
+        return cursor.lastrowid
 
 
+@metrics.instrument
 def get_supplier_by_name(name):
     """
     Obtiene un proveedor por nombre.
     Returns: (id, name) o None
     """
-    conn = _get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT id, name FROM supplier WHERE name = ? AND active = 1",
-        (name,)
-    )
-    result = cursor.fetchone()
-    conn.close()
-    return result
+    with _connection() as conn:
+        return conn.execute(
+            "SELECT id, name FROM supplier WHERE name = ? AND active = 1",
+            (name,)
+        ).fetchone()
 
 
+@metrics.instrument
 def get_all_suppliers():
     """
     Obtiene todos los proveedores activos.
     Returns: lista de (id, name)
     """
-    conn = _get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, name FROM supplier WHERE active = 1")
-    results = cursor.fetchall()
-    conn.close()
-    return results
+    with _connection() as conn:
+        return conn.execute("SELECT id, name FROM supplier WHERE active = 1").fetchall()
 
 
+@metrics.instrument
+@_retry_on_busy
 def create_product_supplier_relation(product_id, supplier_id, purchase_price, initial_stock=0):
     """
     Crea una relación entre producto y proveedor.
     Returns: relation_id
     """
-    conn = _get_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute(
+    with _connection() as conn:
+        cursor = conn.execute(
             """INSERT INTO product_supplier (product_id, supplier_id, purchase_price, available_stock)
                VALUES (?, ?, ?, ?)""",
             (product_id, supplier_id, purchase_price, initial_stock)
         )
-        relation_id = cursor.lastrowid
         conn.commit()
-    finally:
-        conn.close()
-    return relation_id
+        return cursor.lastrowid
 
 
+@metrics.instrument
 def get_relations_by_product(product_id):
     """
     Obtiene todos los proveedores que venden un producto.
     Returns: lista de (relation_id, product_id, supplier_id, supplier_name, purchase_price, available_stock)
     """
-    conn = _get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        """SELECT ps.id, ps.product_id, ps.supplier_id, s.name, ps.purchase_price, ps.available_stock
-           FROM product_supplier ps
-           JOIN supplier s ON ps.supplier_id = s.id
-           WHERE ps.product_id = ?""",
-        (product_id,)
-    )
-    results = cursor.fetchall()
-    conn.close()
-    return results
+    with _connection() as conn:
+        return conn.execute(
+            """SELECT ps.id, ps.product_id, ps.supplier_id, s.name, ps.purchase_price, ps.available_stock
+               FROM product_supplier ps
+               JOIN supplier s ON ps.supplier_id = s.id
+               WHERE ps.product_id = ?""",
+            (product_id,)
+        ).fetchall()
 
 
+@metrics.instrument
 def get_relations_by_supplier(supplier_id):
     """
     Obtiene todos los productos que un proveedor vende.
     Returns: lista de (relation_id, product_id, product_name, purchase_price, available_stock)
     """
-    conn = _get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        """SELECT ps.id, ps.product_id, p.name, ps.purchase_price, ps.available_stock
-           FROM product_supplier ps
-           JOIN product p ON ps.product_id = p.id
-           WHERE ps.supplier_id = ?""",
-        (supplier_id,)
-    )
-    results = cursor.fetchall()
-    conn.close()
-    return results
+    with _connection() as conn:
+        return conn.execute(
+            """SELECT ps.id, ps.product_id, p.name, ps.purchase_price, ps.available_stock
+               FROM product_supplier ps
+               JOIN product p ON ps.product_id = p.id
+               WHERE ps.supplier_id = ?""",
+            (supplier_id,)
+        ).fetchall()
 
 
+# Filas por página de iter_supplier_relations
+SUPPLIER_PAGE_SIZE = 2000
+
+
+@metrics.instrument
+def get_supplier_relations_page(branch_id, after_id=0, page_size=SUPPLIER_PAGE_SIZE):
+    """
+    Una página de las relaciones producto-proveedor de proveedores activos
+    cuyo producto está activo en la sucursal, con los datos del producto en
+    la sucursal (paginación por keyset sobre product_supplier.id).
+
+    Es la carga de GestorProveedor en una sola query por página: sin una
+    consulta por proveedor ni una por producto.
+
+    Args:
+        branch_id (int): Sucursal (de ahí salen precio y stock del producto)
+        after_id (int): product_supplier.id de la última fila de la página anterior
+        page_size (int): Máximo de filas
+
+    Returns:
+        lista de (relation_id, supplier_id, product_id, product_name, price,
+        stock, purchase_price, available_stock), ordenada por relation_id
+
+    Raises:
+        ValueError: Si page_size no es positivo
+    """
+    if page_size <= 0:
+        raise ValueError("page_size debe ser positivo")
+    with _connection(branch_id) as conn:
+        # CROSS JOIN fija el orden: se recorre product_supplier por rowid desde
+        # after_id y el resto se busca por clave primaria / (branch_id, product_id)
+        return conn.execute(
+            """SELECT ps.id, ps.supplier_id, p.id, p.name, bp.price, bp.stock,
+                      ps.purchase_price, ps.available_stock
+               FROM product_supplier ps
+               CROSS JOIN supplier s ON s.id = ps.supplier_id
+               CROSS JOIN product p ON p.id = ps.product_id
+               CROSS JOIN branch_product bp ON bp.branch_id = ? AND bp.product_id = ps.product_id
+               WHERE ps.id > ? AND s.active = 1 AND bp.active = 1
+               ORDER BY ps.id
+               LIMIT ?""",
+            (branch_id, after_id, page_size)
+        ).fetchall()
+
+
+def iter_supplier_relations(branch_id, page_size=SUPPLIER_PAGE_SIZE):
+    """
+    Recorre las relaciones producto-proveedor de una sucursal de a páginas
+    (generador, ver get_supplier_relations_page). Nunca tiene más de
+    `page_size` filas en memoria ni retiene una conexión entre páginas.
+
+    Yields: (relation_id, supplier_id, product_id, product_name, price,
+    stock, purchase_price, available_stock)
+    """
+    after_id = 0
+    while True:
+        page = get_supplier_relations_page(branch_id, after_id, page_size)
+        yield from page
+        if len(page) < page_size:
+            return
+        after_id = page[-1][0]
+
+
+# Filas por página de iter_products_below
+REORDER_PAGE_SIZE = 5000
+
+
+@metrics.instrument
+def get_products_below_page(branch_id, reorder_point, after_id=0, page_size=REORDER_PAGE_SIZE):
+    """
+    Una página de los productos activos de la sucursal con stock por debajo
+    del punto de reposición (paginación por keyset sobre product_id).
+
+    Recorre branch_product de la sucursal en el orden de su UNIQUE
+    (branch_id, product_id): una pasada por el catálogo, sin ordenar.
+
+    Args:
+        branch_id (int): Sucursal
+        reorder_point (int): Se devuelven los productos con stock < reorder_point
+        after_id (int): product_id de la última fila de la página anterior
+        page_size (int): Máximo de filas
+
+    Returns:
+        lista de (product_id, name, stock), ordenada por product_id
+
+    Raises:
+        ValueError: Si page_size no es positivo
+    """
+    if page_size <= 0:
+        raise ValueError("page_size debe ser positivo")
+    with _connection(branch_id) as conn:
+        return conn.execute(
+            """SELECT bp.product_id, p.name, bp.stock
+               FROM branch_product bp
+               CROSS JOIN product p ON p.id = bp.product_id
+               WHERE bp.branch_id = ? AND bp.product_id > ?
+                 AND bp.active = 1 AND bp.stock < ?
+               ORDER BY bp.product_id
+               LIMIT ?""",
+            (branch_id, after_id, reorder_point, page_size)
+        ).fetchall()
+
+
+def iter_products_below(branch_id, reorder_point, page_size=REORDER_PAGE_SIZE):
+    """
+    Recorre los productos a reponer de una sucursal de a páginas (generador,
+    ver get_products_below_page).
+
+    Yields: (product_id, name, stock)
+    """
+    after_id = 0
+    while True:
+        page = get_products_below_page(branch_id, reorder_point, after_id, page_size)
+        yield from page
+        if len(page) < page_size:
+            return
+        after_id = page[-1][0]
+
+
+@metrics.instrument
+@_retry_on_busy
 def set_supplier_stock(relation_id, quantity):
     """
     Establece el stock disponible de una relación producto-proveedor a un valor fijo.
     """
-    conn = _get_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute(
+    with _connection() as conn:
+        conn.execute(
             "UPDATE product_supplier SET available_stock = ? WHERE id = ?",
             (quantity, relation_id)
         )
         conn.commit()
-    finally:
-        conn.close()
 
 
+@metrics.instrument
+@_retry_on_busy
+def set_supplier_stocks(stocks):
+    """
+    Establece el stock disponible de muchas relaciones producto-proveedor en
+    UNA transacción (un executemany y un solo COMMIT, en vez de uno por fila).
+
+    Args:
+        stocks (list): Pares (relation_id, quantity). Tiene que ser una lista
+            (no un generador): si la BD está ocupada se reintenta entera.
+
+    Returns:
+        int: Filas actualizadas (las relaciones que ya no existen no cuentan)
+    """
+    if not stocks:
+        return 0
+    with _connection() as conn:
+        cursor = conn.executemany(
+            "UPDATE product_supplier SET available_stock = ? WHERE id = ?",
+            [(quantity, relation_id) for relation_id, quantity in stocks]
+        )
+        conn.commit()
+        return cursor.rowcount
+
+
+@metrics.instrument
+@_retry_on_busy
 def update_supplier_stock(relation_id, quantity_delta):
     """
     Modifica el stock disponible de una relación producto-proveedor.
     quantity_delta positivo = aumentar, negativo = reducir.
     """
-    conn = _get_connection()
-    cursor = conn.cursor()
-    try:
-        cursor.execute(
+    with _connection() as conn:
+        conn.execute(
             "UPDATE product_supplier SET available_stock = available_stock + ? WHERE id = ?",
             (quantity_delta, relation_id)
         )
         conn.commit()
+
+
+@metrics.instrument
+@_retry_on_busy
+def restock_from_supplier(branch_id, cash_register_id, relation_id, quantity):
+    """
+    Compra `quantity` unidades a un proveedor en UNA transacción IMMEDIATE:
+    descuenta el costo de la caja, el stock del proveedor
+    (product_supplier.available_stock) y suma el stock de la sucursal,
+    con su movimiento en el historial ("purchase").
+
+    Antes eran tres pasos con conexiones distintas (Caja.retirar, el stock
+    del proveedor en memoria y update_branch_product_stock): un corte en el
+    medio dejaba la plata retirada y el stock sin recibir.
+    Con SHARDING el proveedor y la caja están en archivos distintos: ver
+    _restock_sharded.
+
+    Args:
+        branch_id (int): Sucursal que recibe el stock
+        cash_register_id (int): Caja de esa sucursal que paga
+        relation_id (int): Relación producto-proveedor (product_supplier.id)
+        quantity (int): Unidades a comprar
+
+    Returns:
+        float: Costo total (purchase_price de la BD * quantity)
+
+    Raises:
+        ValueError: Si la relación o la caja no existen, el producto no está
+            en la sucursal, el proveedor no tiene stock o la caja no tiene saldo
+        retry.DatabaseBusyError: Si la BD siguió ocupada todo el presupuesto de RETRY_POLICY
+    """
+    return _restock(branch_id, cash_register_id, [(relation_id, quantity)])
+
+
+@metrics.instrument
+@_retry_on_busy
+def restock_from_suppliers(branch_id, cash_register_id, purchases):
+    """
+    Igual que restock_from_supplier para muchas compras a la vez (reponer
+    muchos productos, o un producto de varios proveedores): todas o ninguna,
+    en UNA transacción, con un executemany por tabla.
+
+    Args:
+        branch_id (int): Sucursal que recibe el stock
+        cash_register_id (int): Caja de esa sucursal que paga
+        purchases (list): Pares (relation_id, quantity). Tiene que ser una
+            lista (no un generador): si la BD está ocupada se reintenta entera.
+
+    Returns:
+        float: Costo total de todas las compras
+
+    Raises:
+        ValueError: Como restock_from_supplier, por la primera compra que no
+            se puede hacer (no se aplica ninguna)
+        retry.DatabaseBusyError: Si la BD siguió ocupada todo el presupuesto de RETRY_POLICY
+    """
+    return _restock(branch_id, cash_register_id, purchases)
+
+
+def _restock(branch_id, cash_register_id, purchases):
+    """
+    Núcleo de restock_from_supplier(s). Valida lo que no necesita la BD
+    antes de tomar el lock; después, todo en una transacción.
+
+    Con SHARDING, product_supplier está en el archivo compartido y en modo WAL
+    un COMMIT no es atómico entre dos archivos (ver sharding.py): la compra
+    va por _restock_sharded.
+    """
+    for relation_id, quantity in purchases:
+        if isinstance(quantity, bool) or not isinstance(quantity, int) or quantity <= 0:
+            raise ValueError(f"Cantidad inválida para la relación {relation_id}: {quantity}")
+    if not purchases:
+        return 0.0
+    ids_json = json.dumps(list({relation_id for relation_id, _ in purchases}))
+
+    with _connection(branch_id) as conn:
+        if SHARDING:
+            return _restock_sharded(conn, branch_id, cash_register_id, purchases, ids_json)
+        cursor = conn.cursor()
+        try:
+            _begin_immediate(cursor)
+            cost = _apply_restock(cursor, branch_id, cash_register_id, purchases, ids_json)
+            conn.commit()
+            return cost
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+
+def _apply_restock(cursor, branch_id, cash_register_id, purchases, ids_json):
+    """
+    Compras de _restock dentro de una transacción YA abierta con el write
+    lock tomado. No hace COMMIT ni ROLLBACK.
+    Returns: costo total
+    Raises: ValueError si alguna compra no se puede hacer
+    """
+    supplier_deltas, branch_deltas, cost = _resolve_restock(cursor, branch_id, purchases, ids_json)
+    _charge_restock(cursor, branch_id, cash_register_id, cost)
+    _take_supplier_stock(cursor, supplier_deltas)
+    _receive_restock(cursor, branch_id, branch_deltas)
+    return cost
+
+
+def _resolve_restock(cursor, branch_id, purchases, ids_json):
+    """
+    Paso 1 de una compra: las relaciones pedidas, con su producto en la
+    sucursal (una query), validadas en orden. El costo se suma en centavos
+    enteros (sumando floats, 0.1 + 0.1 + 0.1 pasa de 0.3).
+    Returns: ({relation_id: cantidad}, {product_id: cantidad}, costo total)
+    Raises: ValueError si alguna compra no se puede hacer
+    """
+    cursor.execute(
+        """SELECT ps.id, ps.product_id, p.name, ps.purchase_price, ps.available_stock, bp.id
+           FROM json_each(?) AS requested
+           CROSS JOIN product_supplier ps ON ps.id = requested.value
+           CROSS JOIN product p ON p.id = ps.product_id
+           LEFT JOIN branch_product bp ON bp.branch_id = ? AND bp.product_id = ps.product_id""",
+        (ids_json, branch_id)
+    )
+    found = {row[0]: row[1:] for row in cursor.fetchall()}
+
+    # Validar en orden, descontando lo ya pedido por compras anteriores
+    remaining = {relation_id: row[3] for relation_id, row in found.items()}
+    supplier_deltas = {}
+    branch_deltas = {}
+    cost_cents = 0
+    for relation_id, quantity in purchases:
+        if relation_id not in found:
+            raise ValueError(f"Relación producto-proveedor {relation_id} no encontrada")
+        product_id, product_name, purchase_price, _, branch_product_id = found[relation_id]
+        if branch_product_id is None:
+            raise ValueError(f"Producto '{product_name}' no asignado a la sucursal {branch_id}")
+        if remaining[relation_id] < quantity:
+            raise ValueError(
+                f"Stock insuficiente del proveedor de '{product_name}'. "
+                f"Disponible: {remaining[relation_id]}, solicitado: {quantity}"
+            )
+        remaining[relation_id] -= quantity
+        supplier_deltas[relation_id] = supplier_deltas.get(relation_id, 0) + quantity
+        branch_deltas[product_id] = branch_deltas.get(product_id, 0) + quantity
+        cost_cents += round(purchase_price * 100) * quantity
+    return supplier_deltas, branch_deltas, cost_cents / 100
+
+
+def _charge_restock(cursor, branch_id, cash_register_id, cost):
+    """
+    Paso 2: cobrar de la caja, solo si alcanza el saldo (UPDATE condicional).
+    El saldo se compara al centavo: después de varios cobros un saldo de 0.3
+    puede estar guardado como 0.29999999999999993.
+    Raises: ValueError si la caja no existe o no tiene saldo
+    """
+    cursor.execute(
+        """UPDATE cash_register SET current_balance = current_balance - ?
+           WHERE id = ? AND branch_id = ? AND ROUND(current_balance * 100) >= ?""",
+        (cost, cash_register_id, branch_id, round(cost * 100))
+    )
+    if cursor.rowcount != 1:
+        cursor.execute(
+            "SELECT current_balance FROM cash_register WHERE id = ? AND branch_id = ?",
+            (cash_register_id, branch_id)
+        )
+        row = cursor.fetchone()
+        if row is None:
+            raise ValueError(f"Caja {cash_register_id} no encontrada en sucursal {branch_id}")
+        raise ValueError(f"Saldo insuficiente. Necesita: ${cost:.2f}, saldo: ${row[0]:.2f}")
+
+
+def _take_supplier_stock(cursor, supplier_deltas):
+    """
+    Paso 3: descontar al proveedor ("available_stock >= ?" como en las ventas).
+    Raises: ValueError si otro lo compró entre la validación y el UPDATE
+    """
+    cursor.executemany(
+        """UPDATE product_supplier SET available_stock = available_stock - ?
+           WHERE id = ? AND available_stock >= ?""",
+        [(quantity, relation_id, quantity) for relation_id, quantity in supplier_deltas.items()]
+    )
+    if cursor.rowcount != len(supplier_deltas):
+        raise ValueError("Stock insuficiente: el stock del proveedor cambió durante la compra.")
+
+
+def _receive_restock(cursor, branch_id, branch_deltas):
+    """Paso 4: sumar el stock de la sucursal y anotarlo en el historial."""
+    cursor.executemany(
+        "UPDATE branch_product SET stock = stock + ? WHERE branch_id = ? AND product_id = ?",
+        [(quantity, branch_id, product_id) for product_id, quantity in branch_deltas.items()]
+    )
+    _record_movements(cursor, branch_id, list(branch_deltas.items()), "purchase")
+
+
+# Segundos que una compra con sharding puede quedar reservada en el archivo
+# compartido sin confirmarse antes de que reconcile_supplier_restocks la
+# anule: una compra en curso tarda milisegundos; una más vieja quedó cortada.
+RESTOCK_PENDING_MAX_AGE = 300.0
+
+
+def _restock_sharded(conn, branch_id, cash_register_id, purchases, ids_json):
+    """
+    _restock con SHARDING: tres transacciones de UN archivo cada una, así
+    ningún COMMIT depende de la atomicidad entre archivos.
+
+    1. Compartido: validar, descontar al proveedor y anotar la compra en
+       supplier_restock_pending (la reserva).
+    2. Sucursal: confirmarla en supplier_restock_outcome (solo si sigue
+       pendiente y nadie la anuló), cobrar y recibir el stock.
+    3. Compartido: borrar la reserva.
+
+    Si el paso 2 falla, la reserva se anula en el acto (_cancel_supplier_restock,
+    con reintentos). Si ni así se puede anular, el error deja de ser "BD
+    ocupada": _retry_on_busy no repite la compra (volvería a descontar al
+    proveedor) y la reserva la anula reconcile_supplier_restocks.
+    Si el proceso se corta entre 1 y 2, la anula reconcile_supplier_restocks;
+    si se corta entre 2 y 3, la compra ya está hecha y reconcile solo borra la
+    reserva.
+    """
+    cursor = conn.cursor()
+    try:
+        try:
+            _begin_immediate(cursor, shared=True)
+            supplier_deltas, branch_deltas, cost = _resolve_restock(cursor, branch_id, purchases, ids_json)
+            _take_supplier_stock(cursor, supplier_deltas)
+            cursor.execute(
+                """INSERT INTO supplier_restock_pending (branch_id, supplier_deltas, created_at)
+                   VALUES (?, ?, ?)""",
+                (branch_id, json.dumps(list(supplier_deltas.items())), time.time())
+            )
+            restock_id = cursor.lastrowid
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+        try:
+            _begin_immediate(cursor)
+            cursor.execute(
+                """INSERT OR IGNORE INTO supplier_restock_outcome (restock_id, committed)
+                   SELECT id, 1 FROM supplier_restock_pending WHERE id = ?""",
+                (restock_id,)
+            )
+            if cursor.rowcount != 1:
+                raise ValueError(f"La compra {restock_id} fue anulada mientras se hacía.")
+            _charge_restock(cursor, branch_id, cash_register_id, cost)
+            _receive_restock(cursor, branch_id, branch_deltas)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            try:
+                retry.call_with_retry(
+                    RETRY_POLICY, "restock_cancel", _cancel_supplier_restock, cursor, restock_id
+                )
+            except sqlite3.Error as cancel_error:
+                # Queda pendiente (la anula reconcile_supplier_restocks): un
+                # error que no es "BD ocupada", así nadie reintenta la compra.
+                # El mensaje no copia el de e ("database is locked" lo haría reintentable)
+                raise sqlite3.OperationalError(
+                    f"La compra {restock_id} quedó reservada sin confirmar y no se pudo "
+                    f"anular ({type(cancel_error).__name__}); la anula reconcile_supplier_restocks"
+                ) from e
+            raise
+
+        try:
+            _begin_immediate(cursor, shared=True)
+            cursor.execute("DELETE FROM supplier_restock_pending WHERE id = ?", (restock_id,))
+            conn.commit()
+        except sqlite3.Error:
+            # La compra ya está hecha: reconcile_supplier_restocks borra la reserva
+            conn.rollback()
+        return cost
     finally:
-        conn.close()
+        cursor.close()
+
+
+def _cancel_supplier_restock(cursor, restock_id):
+    """
+    Anula una compra pendiente en una transacción del archivo compartido:
+    le devuelve el stock al proveedor y borra la reserva. Si otra conexión
+    ya la resolvió, no hace nada.
+    Returns: True si la anuló
+    """
+    try:
+        _begin_immediate(cursor, shared=True)
+        row = cursor.execute(
+            "SELECT supplier_deltas FROM supplier_restock_pending WHERE id = ?", (restock_id,)
+        ).fetchone()
+        if row is not None:
+            cursor.executemany(
+                "UPDATE product_supplier SET available_stock = available_stock + ? WHERE id = ?",
+                [(quantity, relation_id) for relation_id, quantity in json.loads(row[0])]
+            )
+            cursor.execute("DELETE FROM supplier_restock_pending WHERE id = ?", (restock_id,))
+        cursor.connection.commit()
+    except Exception:
+        cursor.connection.rollback()
+        raise
+    return row is not None
+
+
+@metrics.instrument
+@_retry_on_busy
+def reconcile_supplier_restocks(branch_id, min_age=RESTOCK_PENDING_MAX_AGE):
+    """
+    Resuelve las compras a proveedores de una sucursal que quedaron a medias
+    (solo pasa con SHARDING, ver _restock_sharded). init_database la llama al
+    arrancar, para cada sucursal.
+
+    Solo mira las reservadas hace más de min_age segundos: las más nuevas
+    pueden ser compras en curso de otras cajas que siguen andando. Las que la
+    sucursal confirmó quedan hechas y se borra su reserva. Las demás se
+    marcan anuladas en la sucursal (así ya no se pueden confirmar) y el
+    proveedor recupera el stock.
+
+    Args:
+        branch_id (int): Sucursal
+        min_age (float): Segundos desde que se reservó una compra para darla por cortada
+
+    Returns:
+        int: Compras anuladas (el stock devuelto a los proveedores)
+
+    Raises:
+        retry.DatabaseBusyError: Si la BD siguió ocupada todo el presupuesto de RETRY_POLICY
+            (cada paso es idempotente: reintentar no devuelve dos veces)
+    """
+    cancelled = 0
+    with _connection(branch_id) as conn:
+        cursor = conn.cursor()
+        try:
+            # Sin sharding la compra es una sola transacción: nunca queda nada pendiente
+            pending = [row[0] for row in cursor.execute(
+                """SELECT id FROM supplier_restock_pending
+                   WHERE branch_id = ? AND created_at <= ? ORDER BY id""",
+                (branch_id, time.time() - min_age)
+            ).fetchall()]
+
+            for restock_id in pending:
+                # Primero la sucursal: lo que diga supplier_restock_outcome es definitivo
+                _begin_immediate(cursor)
+                cursor.execute(
+                    "INSERT OR IGNORE INTO supplier_restock_outcome (restock_id, committed) VALUES (?, 0)",
+                    (restock_id,)
+                )
+                committed = cursor.execute(
+                    "SELECT committed FROM supplier_restock_outcome WHERE restock_id = ?", (restock_id,)
+                ).fetchone()[0]
+                conn.commit()
+
+                if not committed:
+                    cancelled += _cancel_supplier_restock(cursor, restock_id)
+                    continue
+                _begin_immediate(cursor, shared=True)
+                cursor.execute("DELETE FROM supplier_restock_pending WHERE id = ?", (restock_id,))
+                conn.commit()
+
+            # Resultados de compras ya resueltas (ya no tienen reserva)
+            if SHARDING:
+                _begin_immediate(cursor)
+                cursor.execute(
+                    """DELETE FROM supplier_restock_outcome WHERE NOT EXISTS (
+                           SELECT 1 FROM supplier_restock_pending
+                           WHERE supplier_restock_pending.id = supplier_restock_outcome.restock_id)"""
+                )
+                conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+    return cancelled
@@ -0,0 +1,216 @@
+"""
+Reintentos con backoff cuando la BD está ocupada (SQLITE_BUSY / SQLITE_LOCKED).
+
+# Por qué existe:
+# Con un busy_timeout de 30s una caja puede quedar congelada hasta 30s
+# esperando el write lock, y nadie se entera de que hay contención.
+#
+# Cómo funciona:
+# - Cada intento espera poco el lock (attempt_timeout, vía busy_timeout solo
+#   mientras dura la escritura: las lecturas esperan lo del perfil).
+# - Si la operación falla porque la BD está ocupada, se reintenta ENTERA
+#   (las escrituras del repository son una transacción completa que hace
+#   ROLLBACK al fallar) después de un backoff exponencial con jitter:
+#   espera al azar entre 0 y min(max_delay, base_delay * 2^intento).
+#   El jitter evita que las cajas que chocaron reintenten todas juntas.
+# - Si se agota el presupuesto total (budget) → DatabaseBusyError.
+# - Si quien pidió la operación ya no espera el resultado (timeout o
+#   cancelación en aio_repository), no se hace otro intento:
+#   OperationCancelledError (ver cancellable()).
+# - Por cada función se cuentan reintentos, tiempo esperado y presupuestos
+#   agotados (stats()): la contención se ve subir antes de que se formen colas.
+#
+# Uso:
+#   producto_repository.RETRY_POLICY = RetryPolicy(budget=3.0)
+#   retry.stats()["process_sale_atomic"]  # {"calls": ..., "retries": ..., ...}
+"""
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+from database import metrics
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    Política de reintentos (inmutable: se comparte entre threads).
+
+    Atributos:
+        attempt_timeout (float): Segundos que SQLite espera el lock en cada intento
+        base_delay (float): Backoff del primer reintento (segundos, antes del jitter)
+        max_delay (float): Tope del backoff de un reintento
+        budget (float): Segundos totales desde el primer intento; después se abandona
+    """
+    attempt_timeout: float = 0.05
+    base_delay: float = 0.005
+    max_delay: float = 0.25
+    budget: float = 10.0
+
+    def backoff(self, retry_number):
+        """Espera antes del reintento número retry_number (0 = primero), con jitter completo."""
+        cap = min(self.max_delay, self.base_delay * (2 ** retry_number))
+        return random.uniform(0, cap)
+
+
+class DatabaseBusyError(sqlite3.OperationalError):
+    """
+    La BD siguió ocupada durante todo el presupuesto de reintentos.
+    Hereda de sqlite3.OperationalError: el código que ya atrapaba ese error
+    (ej: las cajas que muestran "intente de nuevo") lo sigue atrapando.
+    """
+
+    def __init__(self, operation, retries, elapsed):
+        super().__init__(
+            f"BD ocupada: '{operation}' no consiguió el lock en {elapsed:.2f}s "
+            f"({retries} reintentos)"
+        )
+        self.operation = operation
+        self.retries = retries
+        self.elapsed = elapsed
+
+
+class OperationCancelledError(sqlite3.OperationalError):
+    """
+    La operación se cortó porque quien la pidió ya no espera el resultado
+    (ver cancellable()). No es contención: no se reintenta.
+    """
+
+    def __init__(self, operation):
+        super().__init__(f"Operación cancelada: '{operation}'")
+        self.operation = operation
+
+
+# Códigos primarios de SQLite que indican contención (no un error real):
+# SQLITE_BUSY = 5, SQLITE_LOCKED = 6
+_BUSY_CODES = {5, 6}
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+# Chequeo de cancelación del thread actual (ver cancellable())
+_cancellation = threading.local()
+
+
+def is_busy(error):
+    """True si el error es "la BD está ocupada" (vale la pena reintentar)."""
+    if not isinstance(error, sqlite3.OperationalError) or isinstance(error, DatabaseBusyError):
+        return False
+    code = getattr(error, "sqlite_errorcode", None)
+    if code is not None:
+        # Los códigos extendidos (ej: SQLITE_BUSY_SNAPSHOT) guardan el primario en el byte bajo
+        return code & 0xFF in _BUSY_CODES
+    message = str(error)
+    return "database is locked" in message or "database table is locked" in message
+
+
+@contextmanager
+def cancellable(is_cancelled):
+    """
+    Mientras dura el bloque, las operaciones de ESTE thread consultan
+    is_cancelled() antes de cada intento (y las escrituras, antes del COMMIT):
+    si devuelve True se cortan con OperationCancelledError.
+
+    Hace falta porque conn.interrupt() solo aborta una sentencia en curso:
+    durante el backoff entre intentos no hay ninguna, y el intento siguiente
+    confirmaría una venta que la caja ya dio por vencida.
+
+    Args:
+        is_cancelled (callable): Sin argumentos; True si ya no hay que seguir
+    """
+    previous = getattr(_cancellation, "check", None)
+    _cancellation.check = is_cancelled
+    try:
+        yield
+    finally:
+        _cancellation.check = previous
+
+
+def raise_if_cancelled(operation):
+    """
+    Corta la operación si el bloque cancellable() de este thread la canceló.
+    Raises: OperationCancelledError
+    """
+    check = getattr(_cancellation, "check", None)
+    if check is not None and check():
+        raise OperationCancelledError(operation)
+
+
+def call_with_retry(policy, operation, fn, *args, **kwargs):
+    """
+    Ejecuta fn(*args, **kwargs) reintentando mientras la BD esté ocupada.
+
+    Args:
+        policy (RetryPolicy | None): Política a usar (None = un solo intento)
+        operation (str): Nombre con el que se cuentan las estadísticas
+
+    Returns:
+        Lo que devuelva fn
+
+    Raises:
+        DatabaseBusyError: Si se agota el presupuesto
+        OperationCancelledError: Si se canceló antes de un intento (ver cancellable())
+        Cualquier otro error de fn, sin reintentar
+    """
+    if policy is None:
+        raise_if_cancelled(operation)
+        return fn(*args, **kwargs)
+
+    start = time.monotonic()
+    retries = 0
+    while True:
+        raise_if_cancelled(operation)
+        attempt_start = time.monotonic()
+        try:
+            result = fn(*args, **kwargs)
+        except sqlite3.OperationalError as e:
+            if not is_busy(e):
+                _record(operation, retries, attempt_start - start, exhausted=False)
+                raise
+            elapsed = time.monotonic() - start
+            delay = policy.backoff(retries)
+            if elapsed + delay + policy.attempt_timeout > policy.budget:
+                _record(operation, retries, elapsed, exhausted=True)
+                raise DatabaseBusyError(operation, retries, elapsed) from e
+            metrics.add_lock_wait(delay)
+            time.sleep(delay)
+            retries += 1
+            continue
+
+        # Tiempo perdido por contención: todo lo que pasó antes del intento exitoso
+        # (sin contar su propia duración, que es trabajo útil)
+        _record(operation, retries, attempt_start - start, exhausted=False)
+        return result
+
+
+def _record(operation, retries, waited, exhausted):
+    with _stats_lock:
+        entry = _stats.get(operation)
+        if entry is None:
+            entry = _stats[operation] = {
+                "calls": 0, "retries": 0, "wait_seconds": 0.0, "exhausted": 0,
+            }
+        entry["calls"] += 1
+        entry["retries"] += retries
+        entry["wait_seconds"] += waited
+        entry["exhausted"] += int(exhausted)
+
+
+def stats():
+    """
+    Returns: {operación: {calls, retries, wait_seconds, exhausted}}
+    - retries: reintentos por BD ocupada
+    - wait_seconds: tiempo perdido por contención (intentos fallidos + backoff)
+    - exhausted: llamadas que terminaron en DatabaseBusyError
+    """
+    with _stats_lock:
+        return {operation: dict(entry) for operation, entry in _stats.items()}
+
+
+def reset_stats():
+    """Pone los contadores en cero (ej: al empezar un turno o un benchmark)."""
+    with _stats_lock:
+        _stats.clear()
@@ -1,3 +1,7 @@
+-- Tablas base (versión 0 del schema).
+-- Índices y cambios posteriores van en database/migrations.py (PRAGMA user_version),
+-- así las BD existentes se actualizan en el lugar con init_database().
+
 -- Habilitar foreign keys en SQLite (necesario para que las restricciones funcionen)
 PRAGMA foreign_keys = ON;
 
@@ -0,0 +1,262 @@
+"""
+Sharding por sucursal: un archivo SQLite por sucursal (opcional).
+
+# Por qué existe:
+# SQLite tiene UN write lock por archivo. Con todas las sucursales en
+# supermercado.db, una venta de la Sucursal Norte espera a que termine la
+# de la Sucursal Centro aunque no compartan ni una fila.
+#
+# Cómo se reparten las tablas:
+# - Archivo compartido (DB_PATH): catálogo global y datos de toda la cadena
+#   (branch, user, product, member, supplier, product_supplier).
+# - Un archivo por sucursal (supermercado_branch_<id>.db): las tablas que
+#   siempre se filtran por sucursal (branch_product, cash_register, sale,
+#   sale_item, stock_reservation, stock_movement, stock_snapshot). Se llaman igual y tienen las mismas columnas.
+#
+# Cómo se usa:
+# Cada conexión de una sucursal abre SU archivo como "main" y adjunta el
+# compartido con ATTACH ... AS shared. SQLite resuelve los nombres sin
+# prefijo buscando primero en main y después en los adjuntos, así las MISMAS
+# queries del repository funcionan sin cambios: branch_product sale de la
+# sucursal, product del catálogo compartido. Una venta solo escribe tablas de
+# la sucursal, entonces solo toma el write lock de SU archivo.
+#
+# Limitaciones (a propósito):
+# - SQLite no valida FOREIGN KEY entre archivos: en los shards no hay FK hacia
+#   product, member ni branch (sí entre sale_item → sale → cash_register).
+# - En modo WAL un COMMIT que escribe en los dos archivos (ej:
+#   create_product_with_branch) es atómico en cada archivo, no entre ambos.
+#   Las compras a proveedores no escriben los dos a la vez: reservan el
+#   stock del proveedor en el compartido (supplier_restock_pending), cobran
+#   y reciben en la sucursal (supplier_restock_outcome) y, si se cortan en
+#   el medio, reconcile_supplier_restocks devuelve la reserva al arrancar
+#   (las que tienen más de RESTOCK_PENDING_MAX_AGE: las nuevas pueden ser
+#   compras en curso de otra caja).
+# - Los ids de sale/sale_item son únicos dentro de la sucursal; la clave
+#   global de una venta es (branch_id, sale_id).
+#
+# Activarlo:
+#   producto_repository.SHARDING = True
+#   sharding.split_into_shards(producto_repository.DB_PATH)  # mueve las filas existentes
+"""
+import os
+import sqlite3
+
+
+# Nombre con el que se adjunta el archivo compartido en cada conexión de sucursal
+SHARED_ALIAS = "shared"
+
+# Tablas que viven en el archivo de cada sucursal, en orden de dependencias
+SHARD_TABLES = (
+    "branch_product", "cash_register", "sale", "sale_item", "stock_reservation",
+    "stock_movement", "stock_snapshot",
+)
+
+# Mismas tablas que schema.sql (+ índices de migrations.py) sin las FK que
+# apuntan al archivo compartido. Idempotente: se aplica al abrir cada shard,
+# así una tabla agregada acá aparece también en los shards existentes.
+SHARD_SCHEMA = """
+CREATE TABLE IF NOT EXISTS branch_product (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    branch_id INTEGER NOT NULL,
+    product_id INTEGER NOT NULL,
+    price REAL NOT NULL,
+    stock INTEGER NOT NULL DEFAULT 0,
+    active INTEGER NOT NULL DEFAULT 1,
+    UNIQUE(branch_id, product_id)
+);
+
+CREATE TABLE IF NOT EXISTS cash_register (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    branch_id INTEGER NOT NULL,
+    current_balance REAL NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS sale (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    branch_id INTEGER NOT NULL,
+    cash_register_id INTEGER NOT NULL,
+    total_amount REAL NOT NULL,
+    timestamp TEXT NOT NULL,
+    member_id INTEGER,
+    FOREIGN KEY (cash_register_id) REFERENCES cash_register(id)
+);
+
+CREATE TABLE IF NOT EXISTS sale_item (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sale_id INTEGER NOT NULL,
+    product_id INTEGER NOT NULL,
+    quantity INTEGER NOT NULL,
+    price_at_sale REAL NOT NULL,
+    FOREIGN KEY (sale_id) REFERENCES sale(id)
+);
+
+CREATE TABLE IF NOT EXISTS stock_reservation (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    branch_id INTEGER NOT NULL,
+    product_id INTEGER NOT NULL,
+    session_id TEXT NOT NULL,
+    quantity INTEGER NOT NULL CHECK (quantity > 0),
+    expires_at REAL NOT NULL,
+    UNIQUE(branch_id, session_id, product_id)
+);
+
+CREATE TABLE IF NOT EXISTS stock_movement (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    branch_id INTEGER NOT NULL,
+    product_id INTEGER NOT NULL,
+    delta INTEGER NOT NULL,
+    reason TEXT NOT NULL,
+    reference INTEGER,
+    created_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS stock_snapshot (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    branch_id INTEGER NOT NULL,
+    product_id INTEGER NOT NULL,
+    stock INTEGER NOT NULL,
+    movement_id INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_sale_branch_timestamp ON sale(branch_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_sale_item_sale ON sale_item(sale_id);
+CREATE INDEX IF NOT EXISTS idx_cash_register_branch ON cash_register(branch_id);
+CREATE INDEX IF NOT EXISTS idx_branch_product_branch_price
+    ON branch_product(branch_id, price, product_id);
+CREATE INDEX IF NOT EXISTS idx_stock_reservation_product
+    ON stock_reservation(branch_id, product_id, expires_at);
+CREATE INDEX IF NOT EXISTS idx_stock_reservation_expiry
+    ON stock_reservation(branch_id, expires_at);
+CREATE INDEX IF NOT EXISTS idx_stock_movement_product
+    ON stock_movement(branch_id, product_id, id);
+CREATE INDEX IF NOT EXISTS idx_stock_snapshot_product
+    ON stock_snapshot(branch_id, product_id, movement_id);
+CREATE INDEX IF NOT EXISTS idx_stock_snapshot_branch
+    ON stock_snapshot(branch_id, movement_id);
+
+-- Segundos epoch con milisegundos, como time.time() de los demás movimientos
+-- (migración 7; el trigger anterior redondeaba al segundo)
+DROP TRIGGER IF EXISTS branch_product_opening_stock;
+CREATE TRIGGER IF NOT EXISTS branch_product_opening_movement
+AFTER INSERT ON branch_product
+WHEN new.stock != 0 AND NOT EXISTS (
+    SELECT 1 FROM stock_movement
+    WHERE branch_id = new.branch_id AND product_id = new.product_id
+)
+BEGIN
+    INSERT INTO stock_movement (branch_id, product_id, delta, reason, reference, created_at)
+    VALUES (new.branch_id, new.product_id, new.stock, 'opening', NULL,
+            (julianday('now') - 2440587.5) * 86400.0);
+END;
+
+-- Solo en los shards: qué pasó con cada compra de supplier_restock_pending
+-- (archivo compartido). committed = 1 la confirmó la sucursal, 0 la anuló
+-- reconcile_supplier_restocks; la PRIMARY KEY impide las dos cosas a la vez.
+CREATE TABLE IF NOT EXISTS supplier_restock_outcome (
+    restock_id INTEGER PRIMARY KEY,
+    committed INTEGER NOT NULL
+);
+"""
+
+
+def shard_path(db_path, branch_id):
+    """
+    Ruta del archivo de una sucursal, al lado del compartido.
+    Ej: /datos/supermercado.db → /datos/supermercado_branch_2.db
+    """
+    stem, ext = os.path.splitext(db_path)
+    return f"{stem}_branch_{int(branch_id)}{ext or '.db'}"
+
+
+def create_shard(db_path, branch_id):
+    """
+    Crea (o completa) el archivo de una sucursal con SHARD_SCHEMA.
+
+    Args:
+        db_path (str): Ruta del archivo compartido
+        branch_id (int): Sucursal
+
+    Returns:
+        str: Ruta del archivo de la sucursal
+    """
+    path = shard_path(db_path, branch_id)
+    conn = sqlite3.connect(path)
+    try:
+        conn.executescript(SHARD_SCHEMA)
+    finally:
+        conn.close()
+    return path
+
+
+def split_into_shards(db_path):
+    """
+    Crea el archivo de cada sucursal de la tabla branch y MUEVE ahí sus filas
+    de SHARD_TABLES (conservando los ids). Las tablas quedan vacías en el
+    archivo compartido. Se puede volver a correr: solo mueve lo que falte
+    (ej: después de init_database() sobre una BD nueva).
+
+    Args:
+        db_path (str): Ruta del archivo compartido
+
+    Returns:
+        dict: {branch_id: ruta del archivo de la sucursal}
+    """
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        conn.execute("PRAGMA foreign_keys = ON")
+        branch_ids = [row[0] for row in conn.execute("SELECT id FROM branch ORDER BY id")]
+        paths = {}
+
+        for branch_id in branch_ids:
+            path = create_shard(db_path, branch_id)
+            paths[branch_id] = path
+
+            conn.execute("ATTACH DATABASE ? AS shard", (path,))
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    _move_branch_rows(conn, branch_id)
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+            finally:
+                conn.execute("DETACH DATABASE shard")
+    finally:
+        conn.close()
+    return paths
+
+
+def _move_branch_rows(conn, branch_id):
+    """Copia las filas de una sucursal al shard adjunto y las borra de main."""
+    sales = "SELECT id FROM main.sale WHERE branch_id = ?"
+
+    # INSERT OR IGNORE: si una corrida anterior ya copió la fila (mismo id),
+    # no se duplica; el DELETE de abajo termina de moverla.
+    # El historial va ANTES que branch_product: así el trigger de apertura
+    # del shard ve que el producto ya tiene movimientos y no agrega otro.
+    conn.execute("INSERT OR IGNORE INTO shard.stock_movement SELECT * FROM main.stock_movement "
+                 "WHERE branch_id = ?", (branch_id,))
+    conn.execute("INSERT OR IGNORE INTO shard.stock_snapshot SELECT * FROM main.stock_snapshot "
+                 "WHERE branch_id = ?", (branch_id,))
+    conn.execute("INSERT OR IGNORE INTO shard.branch_product SELECT * FROM main.branch_product "
+                 "WHERE branch_id = ?", (branch_id,))
+    conn.execute("INSERT OR IGNORE INTO shard.cash_register SELECT * FROM main.cash_register "
+                 "WHERE branch_id = ?", (branch_id,))
+    conn.execute("INSERT OR IGNORE INTO shard.sale SELECT * FROM main.sale "
+                 "WHERE branch_id = ?", (branch_id,))
+    conn.execute(f"INSERT OR IGNORE INTO shard.sale_item SELECT * FROM main.sale_item "
+                 f"WHERE sale_id IN ({sales})", (branch_id,))
+    conn.execute("INSERT OR IGNORE INTO shard.stock_reservation SELECT * FROM main.stock_reservation "
+                 "WHERE branch_id = ?", (branch_id,))
+
+    # Borrar en orden inverso a las FK del archivo compartido
+    conn.execute("DELETE FROM main.stock_reservation WHERE branch_id = ?", (branch_id,))
+    conn.execute("DELETE FROM main.stock_snapshot WHERE branch_id = ?", (branch_id,))
+    conn.execute("DELETE FROM main.stock_movement WHERE branch_id = ?", (branch_id,))
+    conn.execute(f"DELETE FROM main.sale_item WHERE sale_id IN ({sales})", (branch_id,))
+    conn.execute("DELETE FROM main.sale WHERE branch_id = ?", (branch_id,))
+    conn.execute("DELETE FROM main.cash_register WHERE branch_id = ?", (branch_id,))
+    conn.execute("DELETE FROM main.branch_product WHERE branch_id = ?", (branch_id,))
@@ -3,11 +3,19 @@
 # Gestiona relaciones producto-proveedor desde SQLite.
 # Usa las tablas supplier y product_supplier del nuevo schema.
 
+import time
+from bisect import insort
+from operator import attrgetter
+
 from database import producto_repository
 from producto_proveedor import ProductoProveedor
 from proveedor import Proveedor
 
 
+# Orden de las relaciones de cada producto en el índice
+_por_precio = attrgetter("precio_compra")
+
+
 class GestorProveedor:
     """
     Gestiona relaciones producto-proveedor desde SQLite.
@@ -19,50 +27,89 @@ class GestorProveedor:
         self.inventario = inventario
         self.relaciones = []
         self._proveedores_cache = {}
+        # Índice {product_id: relaciones del producto ordenadas por precio_compra}
+        # y {nombre: product_id} para llegar a él desde un Producto. El orden
+        # depende solo del precio: descontar_stock no lo invalida
+        self._por_producto = {}
+        self._producto_ids = {}
+        # Relaciones con cambios sin guardar: cada ProductoProveedor se agrega
+        # al marcarse modificado (ver ProductoProveedor.modificado)
+        self._modificadas = set()
+        # Resultado del último guardar(): {"escritas": n, "segundos": s}
+        self.ultimo_guardado = None
         self._cargar()
 
     def _cargar(self):
-        """Carga todas las relaciones desde SQLite usando tablas en inglés"""
+        """
+        Carga todas las relaciones desde SQLite en bloque: una query para los
+        proveedores y las relaciones de a páginas (iter_supplier_relations),
+        en vez de una query por proveedor y otra por relación.
+        """
         self.relaciones = []
         self._proveedores_cache = {}
+        self._por_producto = {}
+        self._producto_ids = {}
+        self._modificadas = set()
 
         # Obtener todos los proveedores activos (tabla supplier)
-        todos_proveedores = producto_repository.get_all_suppliers()
-
-        for proveedor_id, nombre_proveedor in todos_proveedores:
+        proveedores_por_id = {}
+        for proveedor_id, nombre_proveedor in producto_repository.get_all_suppliers():
             # Crear objeto Proveedor una sola vez
-            proveedor_obj = Proveedor(nombre_proveedor)
-            proveedor_obj.id = proveedor_id
+            proveedor_obj = Proveedor(nombre_proveedor, id=proveedor_id)
+            proveedores_por_id[proveedor_id] = proveedor_obj
             self._proveedores_cache[nombre_proveedor] = proveedor_obj
 
-            # Obtener relaciones de este proveedor (tabla product_supplier)
-            relaciones_bd = producto_repository.get_relations_by_supplier(proveedor_id)
-
-            for relacion_id, producto_id, nombre_producto, precio_compra, stock_disponible in relaciones_bd:
-                # Obtener objeto Producto desde el inventario
-                producto = self.inventario.obtener_producto(nombre_producto)
-
-                if producto:
-                    rel = ProductoProveedor(
-                        producto=producto,
-                        proveedor=proveedor_obj,
-                        precio_compra=precio_compra,
-                        stock_disponible=stock_disponible
-                    )
-                    rel.id_relacion = relacion_id
-                    self.relaciones.append(rel)
+        # Relaciones con el producto de la sucursal ya resuelto (solo
+        # proveedores activos y productos activos en la sucursal)
+        filas = producto_repository.iter_supplier_relations(self.inventario.branch_id)
+        for relacion_id, proveedor_id, producto_id, nombre, precio, stock, precio_compra, stock_disponible in filas:
+            proveedor_obj = proveedores_por_id.get(proveedor_id)
+            if proveedor_obj is None:
+                # Proveedor dado de alta entre las dos lecturas: entra en la próxima carga
+                continue
+            # Mismo objeto Producto (internado) para todos los proveedores del producto
+            producto = self.inventario.internar_producto(nombre, precio, stock)
+            rel = ProductoProveedor(
+                producto=producto,
+                proveedor=proveedor_obj,
+                precio_compra=precio_compra,
+                stock_disponible=stock_disponible,
+                id_relacion=relacion_id,
+                pendientes=self._modificadas
+            )
+            self.relaciones.append(rel)
+            self._producto_ids[nombre] = producto_id
+            self._por_producto.setdefault(producto_id, []).append(rel)
+
+        # Un sort por producto al final (estable: a igual precio, la relación más vieja primero)
+        for relaciones_producto in self._por_producto.values():
+            relaciones_producto.sort(key=_por_precio)
 
     def guardar(self):
         """
-        Persiste cambios en la BD.
-        Usa set_supplier_stock para actualizar stock del proveedor.
+        Persiste en la BD el stock de las relaciones que cambiaron desde la
+        carga o el último guardar (ProductoProveedor.modificado), todas en una
+        sola transacción (set_supplier_stocks). Solo recorre las modificadas
+        (self._modificadas), no todo el catálogo. Si la escritura falla, las
+        relaciones siguen marcadas y el próximo guardar las vuelve a intentar.
+
+        Returns:
+            dict: {"escritas": relaciones escritas, "segundos": lo que tardó}.
+                También queda en self.ultimo_guardado.
         """
-        for rel in self.relaciones:
-            if hasattr(rel, 'id_relacion'):
-                producto_repository.set_supplier_stock(
-                    rel.id_relacion,
-                    rel.stock_disponible
-                )
+        inicio = time.perf_counter()
+        # Por id: las filas se escriben siempre en el mismo orden
+        modificadas = sorted(
+            (rel for rel in self._modificadas if rel.id_relacion is not None),
+            key=attrgetter("id_relacion")
+        )
+        escritas = producto_repository.set_supplier_stocks(
+            [(rel.id_relacion, rel.stock_disponible) for rel in modificadas]
+        )
+        for rel in modificadas:
+            rel.modificado = False
+        self.ultimo_guardado = {"escritas": escritas, "segundos": time.perf_counter() - inicio}
+        return self.ultimo_guardado
 
     def agregar_relacion(self, nombre_producto, nombre_proveedor, precio_compra, stock_inicial=0):
         """Agrega una nueva relación producto-proveedor a SQLite"""
@@ -93,8 +140,7 @@ class GestorProveedor:
             raise ValueError(f"No se pudo obtener producto '{nombre_producto}'")
 
         if nombre_proveedor not in self._proveedores_cache:
-            proveedor = Proveedor(nombre_proveedor)
-            proveedor.id = proveedor_id
+            proveedor = Proveedor(nombre_proveedor, id=proveedor_id)
             self._proveedores_cache[nombre_proveedor] = proveedor
         else:
             proveedor = self._proveedores_cache[nombre_proveedor]
@@ -103,11 +149,48 @@ class GestorProveedor:
             producto=producto,
             proveedor=proveedor,
             precio_compra=precio_compra,
-            stock_disponible=stock_inicial
+            stock_disponible=stock_inicial,
+            id_relacion=relacion_id,
+            pendientes=self._modificadas
         )
-        rel.id_relacion = relacion_id
         self.relaciones.append(rel)
+        self._producto_ids[producto.nombre] = producto_id
+        insort(self._por_producto.setdefault(producto_id, []), rel, key=_por_precio)
 
     def buscar_por_producto(self, producto):
-        """Retorna todas las relaciones (proveedores que venden este producto)"""
-        return [r for r in self.relaciones if r.producto == producto]
+        """
+        Retorna todas las relaciones (proveedores que venden este producto),
+        de la más barata a la más cara.
+        """
+        producto_id = self._producto_ids.get(producto.nombre)
+        return list(self._por_producto.get(producto_id, ()))
+
+    def buscar_por_producto_id(self, producto_id):
+        """
+        Como buscar_por_producto, por product_id (para quien ya tiene los ids
+        de la BD, ej: el planificador de reposición). Las relaciones van de la
+        más barata a la más cara.
+        """
+        return list(self._por_producto.get(producto_id, ()))
+
+    def mas_barato_con_stock(self, producto, cantidad):
+        """
+        Relación más barata del producto cuyo proveedor tiene al menos `cantidad`.
+
+        Va directo a las relaciones del producto (sin recorrer las de todo el
+        catálogo) y las mira de la más barata a la más cara: corta en la
+        primera con stock. El stock se lee en el momento, así que lo que ya
+        se descontó con descontar_stock se respeta sin reordenar nada.
+
+        Args:
+            producto (Producto): Producto a reponer
+            cantidad (int): Unidades que tiene que tener el proveedor
+
+        Returns:
+            ProductoProveedor, o None si ningún proveedor tiene stock suficiente
+        """
+        producto_id = self._producto_ids.get(producto.nombre)
+        for rel in self._por_producto.get(producto_id, ()):
+            if rel.hay_stock(cantidad):
+                return rel
+        return None
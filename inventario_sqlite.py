@@ -3,10 +3,27 @@
 # Gestiona el inventario de productos para una sucursal específica.
 # Usa branch_product para obtener precio, stock y estado por sucursal.
 
+import csv
+
 from database import producto_repository
+from database.autocomplete import DEFAULT_LIMIT, ProductAutocomplete
+from database.catalog_cache import CatalogCache
 from producto import Producto
 
 
+# Largos de los códigos que entrega un lector: EAN-8, UPC-A, EAN-13, GTIN-14
+LARGOS_CODIGO_DE_BARRAS = (8, 12, 13, 14)
+
+
+def es_codigo_de_barras(texto):
+    """
+    True si el texto parece un código de barras escaneado (solo dígitos, largo
+    de EAN/UPC) y no un nombre escrito por el cajero.
+    """
+    texto = texto.strip()
+    return texto.isascii() and texto.isdigit() and len(texto) in LARGOS_CODIGO_DE_BARRAS
+
+
 class InventarioSQLite:
     """
     Inventario vinculado a una sucursal.
@@ -14,23 +31,107 @@ class InventarioSQLite:
     así las queries solo traen productos de esa sucursal.
     """
 
-    def __init__(self, branch_id=1):
+    def __init__(self, branch_id=1, usar_cache=False, usar_autocompletar=False):
         # La sucursal con la que trabaja este inventario
         self.branch_id = branch_id
+        # Caché opcional del catálogo para obtener_producto (ver catalog_cache.py):
+        # sigue viendo los cambios de precio y stock de otras cajas y del gerente
+        self.cache = CatalogCache(branch_id) if usar_cache else None
+        # Índice de prefijos opcional para sugerir() mientras se escribe (ver
+        # autocomplete.py): se actualiza solo cuando se crean, activan o
+        # desactivan productos en ESTE proceso
+        self.autocompletar = ProductAutocomplete(branch_id) if usar_autocompletar else None
+        # Productos internados {nombre: Producto}: un solo objeto por producto
+        # de la sucursal mientras su precio y stock no cambien, compartido por
+        # carritos y relaciones con proveedores. Crece como mucho hasta el
+        # tamaño del catálogo de la sucursal
+        self._productos = {}
+        # {nombre: product_id} de lo obtenido por obtener_producto(_por_codigo):
+        # las reservas van por id sin volver a buscar el nombre
+        self._ids = {}
+
+    def close(self):
+        """
+        Libera lo que el inventario tiene abierto: el índice de autocompletado
+        deja de recibir los avisos del repository (si no, queda registrado
+        para siempre) y la caché cierra su conexión.
+        """
+        if self.autocompletar is not None:
+            self.autocompletar.close()
+        if self.cache is not None:
+            self.cache.close()
+
+    def internar_producto(self, name, price, stock):
+        """
+        Devuelve EL Producto de la sucursal con ese nombre, precio y stock.
+
+        Así GestorProveedor no crea un Producto por relación. Es público para
+        quien ya leyó las filas de la BD por su cuenta (ej: la carga en bloque
+        de GestorProveedor) y no debe volver a consultarlas.
+
+        Un Producto internado no se modifica nunca: si el precio o el stock
+        cambiaron se crea otro y reemplaza al anterior. Los carritos abiertos
+        siguen con el objeto que tenían, al precio al que se agregó el item
+        (el que se cobra como price_at_sale).
+        """
+        producto = self._productos.get(name)
+        if producto is None or producto.precio != price or producto.stock != stock:
+            producto = Producto(nombre=name, precio=price, stock=stock)
+            self._productos[name] = producto
+        return producto
 
-    def mostrar_productos(self):
+    def mostrar_productos(self, categoria=None, orden="name"):
         """
         Muestra todos los productos activos en la sucursal actual.
         Precio y stock vienen de branch_product (no de product).
+        Se recorre de a páginas: la primera línea sale enseguida y la memoria
+        no crece con el tamaño del catálogo.
+
+        Args:
+            categoria (str | None): Solo esa categoría
+            orden (str): "name" o "price"
         """
-        productos = producto_repository.get_active_products(self.branch_id)
+        productos = producto_repository.iter_active_products(
+            self.branch_id, category=categoria, order_by=orden
+        )
         for name, price, stock in productos:
-            print(f"{name} - Precio: ${price:.2f}")     
+            print(f"{name} - Precio: ${price:.2f}")
+
+    def exportar_catalogo(self, ruta, categoria=None, orden="name"):
+        """
+        Escribe el catálogo activo de la sucursal en un CSV (nombre, precio, stock),
+        de a páginas: sirve para catálogos de cientos de miles de productos.
+
+        Args:
+            ruta (str): Archivo CSV a crear
+            categoria (str | None): Solo esa categoría
+            orden (str): "name" o "price"
+
+        Returns:
+            int: Cantidad de productos exportados
+        """
+        productos = producto_repository.iter_active_products(
+            self.branch_id, category=categoria, order_by=orden
+        )
+        cantidad = 0
+        with open(ruta, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["nombre", "precio", "stock"])
+            for fila in productos:
+                writer.writerow(fila)
+                cantidad += 1
+        return cantidad
 
     def vender_producto(self, texto, cantidad=0):   
         """
         Búsqueda parcial de productos por nombre en la sucursal actual.
-        Solo retorna productos activos en esta sucursal.
+        Solo retorna productos activos en esta sucursal, los más relevantes
+        primero (índice FTS5 trigram; con menos de 3 letras, LIKE).
+
+        Siempre va a la BD, aun con autocompletado: el índice en memoria solo
+        encuentra comienzos de palabra, corta en pocos resultados y no ve los
+        cambios de otros procesos (ej: un producto desactivado desde
+        main_gerente). Para sugerencias mientras se escribe, ver sugerir().
 
         Args:
             texto (str): Texto para buscar parcialmente
@@ -41,6 +142,28 @@ class InventarioSQLite:
         """
         return producto_repository.search_by_name(texto, self.branch_id)
 
+    def sugerir(self, texto, limite=DEFAULT_LIMIT):
+        """
+        Sugerencias de nombres mientras el cajero escribe (una por tecla).
+        Con autocompletado responde en memoria con los nombres que tienen una
+        palabra que empieza con el texto; sin él, busca en la BD.
+
+        Son solo sugerencias: el índice puede estar atrasado respecto de otros
+        procesos, así que el producto elegido se confirma con obtener_producto
+        (que lo rechaza si ya no está activo) y la búsqueda completa es
+        vender_producto.
+
+        Args:
+            texto (str): Lo escrito hasta ahora
+            limite (int): Máximo de sugerencias
+
+        Returns:
+            list: Nombres sugeridos
+        """
+        if self.autocompletar is not None:
+            return self.autocompletar.complete(texto, limite)
+        return producto_repository.search_by_name(texto, self.branch_id, limit=limite)
+
     def obtener_producto(self, nombre):
         """
         Obtiene un producto por nombre exacto en la sucursal actual.
@@ -49,27 +172,65 @@ class InventarioSQLite:
         Args:
             nombre (str): Nombre exacto del producto
 
+        Returns:
+            Producto: Objeto Producto si existe y está activo, None si no.
+                El mismo objeto mientras no cambien precio ni stock (ver internar_producto).
+        """
+        if self.cache is not None:
+            producto = self.cache.get_product(nombre)
+        else:
+            producto = producto_repository.get_product_by_name(nombre, self.branch_id)
+
+        if not producto:
+            return None
+
+        id_, name, price, stock = producto
+        self._ids[name] = id_
+        return self.internar_producto(name, price, stock)
+
+    def obtener_producto_por_codigo(self, codigo):
+        """
+        Obtiene un producto por código de barras en la sucursal actual.
+        Con caché, un código ya escaneado no vuelve a la BD.
+
+        Args:
+            codigo (str): Código de barras (EAN-13 u otro SKU)
+
         Returns:
             Producto: Objeto Producto si existe y está activo, None si no
         """
-        producto = producto_repository.get_product_by_name(nombre, self.branch_id)
+        codigo = codigo.strip()
+        if self.cache is not None:
+            producto = self.cache.get_product_by_barcode(codigo)
+        else:
+            producto = producto_repository.get_product_by_barcode(codigo, self.branch_id)
 
         if not producto:
             return None
 
         id_, name, price, stock = producto
-        return Producto(nombre=name, precio=price, stock=stock)
+        self._ids[name] = id_
+        return self.internar_producto(name, price, stock)
 
-    def aumentar_stock(self, nombre, cantidad):
+    def producto_id(self, nombre):
+        """
+        product_id de un producto ya obtenido con obtener_producto u
+        obtener_producto_por_codigo (sin ir a la BD).
+        Returns: int, o None si todavía no se obtuvo
+        """
+        return self._ids.get(nombre)
+
+    def aumentar_stock(self, nombre, cantidad, motivo="restock"):
         """
         Aumenta el stock de un producto en la sucursal actual.
         Modifica branch_product.stock sumando la cantidad.
+        motivo: se guarda en el historial de stock ("restock", "purchase", ...)
         """
         if cantidad <= 0:
             raise ValueError("La cantidad a aumentar debe ser positiva.")
 
         rows = producto_repository.update_branch_product_stock(
-            self.branch_id, nombre, cantidad  # positivo = aumentar
+            self.branch_id, nombre, cantidad, motivo  # positivo = aumentar
         )
 
         if rows == 0:
@@ -109,6 +270,24 @@ class InventarioSQLite:
                 f"No se pudo actualizar stock de '{nombre}' en sucursal {self.branch_id}."
             )
 
+    def ajustar_stock_lote(self, filas, todo_o_nada=False):
+        """
+        Ajusta el stock de muchos productos de la sucursal en una sola
+        transacción (ej: una entrega de 400 líneas, un recuento de inventario).
+        Ver producto_repository.adjust_stock_bulk.
+
+        Args:
+            filas (iterable): (nombre, cantidad) — cantidad positiva suma, negativa resta.
+                Puede ser un generador (ej: leyendo el archivo de la entrega línea por línea)
+            todo_o_nada (bool): Si alguna fila falla, no aplicar ninguna
+
+        Returns:
+            dict: {"applied": filas aplicadas, "failures": [(fila, nombre, cantidad, motivo), ...]}
+        """
+        return producto_repository.adjust_stock_bulk(
+            self.branch_id, filas, all_or_nothing=todo_o_nada
+        )
+
     # Alias para compatibilidad con el resto del proyecto
     def reducir_stock(self, nombre, cantidad):
         self.disminuir_stock(nombre, cantidad)
\ No newline at end of file
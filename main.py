@@ -9,7 +9,7 @@
 from database.init_db import init_database
 from registro_socio import RegistroSocio
 from sesion_venta import SesionVenta
-from inventario_sqlite import InventarioSQLite
+from inventario_sqlite import InventarioSQLite, es_codigo_de_barras
 from registro_ventas import RegistroVentas
 from carrito import Carrito
 from ticket import Ticket
@@ -25,13 +25,15 @@ def main():
     CASH_REGISTER_ID = 1     # Caja 1 de esa sucursal
 
     # --- Inyectar branch_id en todos los servicios ---
-    inventario = InventarioSQLite(branch_id=BRANCH_ID)
+    # Caché para obtener_producto/escaneos e índice en memoria para sugerir nombres
+    inventario = InventarioSQLite(branch_id=BRANCH_ID, usar_cache=True, usar_autocompletar=True)
     registro_socio = RegistroSocio()
     registro_ventas = RegistroVentas(branch_id=BRANCH_ID, cash_register_id=CASH_REGISTER_ID)
-    caja = Caja(cash_register_id=CASH_REGISTER_ID)
+    caja = Caja(cash_register_id=CASH_REGISTER_ID, branch_id=BRANCH_ID)
 
     carrito = Carrito()
-    sesion = SesionVenta(inventario, registro_ventas)
+    # Lo que entra al carrito queda reservado: otra caja no puede venderlo
+    sesion = SesionVenta(inventario, registro_ventas, reservar_stock=True)
     sesion.iniciar_venta(carrito)
 
     socio_autenticado = None
@@ -56,22 +58,47 @@ def main():
 
         # ---------------- AGREGAR PRODUCTO ----------------
         elif opcion == "2":
-            texto = input("\nIngrese el nombre del producto: ")
-            resultados = inventario.vender_producto(texto,cantidad=0)
+            texto = input("\nIngrese el nombre o escanee el código del producto: ")
+
+            # Código escaneado: va directo a la sesión, sin buscar por nombre
+            if es_codigo_de_barras(texto):
+                resultado = sesion.agregar_producto(texto, 1)
+                print(resultado.mensaje)
+                continue
+
+            # Primero las sugerencias del índice en memoria (sin ir a la BD);
+            # si no hay, o el cajero no encuentra el suyo, la búsqueda completa
+            resultados = inventario.sugerir(texto)
+            sugerencias = bool(resultados)
+            if not sugerencias:
+                resultados = inventario.vender_producto(texto, cantidad=0)
 
             if not resultados:
                 print("Producto no encontrado.")
                 continue
 
-            if len(resultados) == 1:
+            if len(resultados) == 1 and not sugerencias:
                 nombre_elegido = resultados[0]
             else:
                 print("\nResultados encontrados:")
                 for i, nombre in enumerate(resultados, 1):
                     print(f"{i}. {nombre}")
+                if sugerencias:
+                    print("0. Buscar en todo el catálogo")
 
                 try:
                     opcion_elegida = int(input("Elija una opción: "))
+                    if sugerencias and opcion_elegida == 0:
+                        resultados = inventario.vender_producto(texto, cantidad=0)
+                        if not resultados:
+                            print("Producto no encontrado.")
+                            continue
+                        print("\nResultados encontrados:")
+                        for i, nombre in enumerate(resultados, 1):
+                            print(f"{i}. {nombre}")
+                        opcion_elegida = int(input("Elija una opción: "))
+                    if opcion_elegida < 1:
+                        raise IndexError(opcion_elegida)
                     nombre_elegido = resultados[opcion_elegida - 1]
                 except (ValueError, IndexError):
                     print("Opción no válida.")
@@ -198,6 +225,8 @@ def main():
 
             except ValueError as e:
                 print(f"\n Error: {e}")
+                # La venta no se hizo: liberar lo que el carrito tenía reservado
+                carrito.vaciar()
 
             break
 
@@ -205,6 +234,9 @@ def main():
         else:
             print(" Opción no válida.")
 
+    # Deja de recibir avisos del catálogo y cierra la conexión de la caché
+    inventario.close()
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
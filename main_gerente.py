@@ -5,12 +5,45 @@
 # para comprar mercadería y actualizar inventario.
 #
 # Uso: python main_gerente.py
+#   Con "auto" como nombre de producto se repone toda la sucursal de una vez
+#   (ver planificador_reposicion.py).
 
+from database import producto_repository
 from database.init_db import init_database
 from inventario_sqlite import InventarioSQLite
 from caja import Caja
 from gestor_proveedor import GestorProveedor
 from servicio_compra import ServicioCompra
+from planificador_reposicion import PlanificadorReposicion
+
+
+def reponer_automatico(planificador):
+    """Pide punto de reposición y stock objetivo, muestra el plan y lo ejecuta si se confirma."""
+    try:
+        punto = int(input("Punto de reposición (reponer lo que tenga menos de): "))
+        texto_objetivo = input(f"Stock objetivo (vacío = {2 * punto}): ").strip()
+        objetivo = int(texto_objetivo) if texto_objetivo else None
+        plan = planificador.planificar(punto, objetivo)
+    except ValueError as e:
+        print(f"Error: {e}\n")
+        return
+
+    print(f"{plan.productos} productos por debajo de {punto}: "
+          f"{len(plan.compras)} compras, costo ${plan.costo_total:.2f} "
+          f"(plan armado en {plan.segundos:.2f} s)")
+    if plan.sin_cubrir:
+        print(f"{len(plan.sin_cubrir)} productos no se reponen enteros "
+              f"(sin proveedor, sin stock del proveedor o sin saldo)")
+    if not plan.compras or input("¿Ejecutar el plan? (s/N): ").strip().lower() != "s":
+        print()
+        return
+
+    resultado = planificador.ejecutar(plan)
+    print(f"✓ {resultado['compras']} compras en {resultado['lotes']} transacciones. "
+          f"Costo: ${resultado['costo']:.2f} ({resultado['segundos']:.2f} s)")
+    if resultado["error"]:
+        print(f"Error: {resultado['error']} ({len(resultado['pendientes'])} compras sin hacer)")
+    print()
 
 
 def main():
@@ -22,18 +55,25 @@ def main():
     CASH_REGISTER_ID = 1
 
     inventario = InventarioSQLite(branch_id=BRANCH_ID)
-    caja = Caja(cash_register_id=CASH_REGISTER_ID)
+    caja = Caja(cash_register_id=CASH_REGISTER_ID, branch_id=BRANCH_ID)
     gestor_proveedor = GestorProveedor(inventario)
     servicio_compra = ServicioCompra(gestor_proveedor, caja, inventario)
+    planificador = PlanificadorReposicion(gestor_proveedor, caja, inventario)
+
+    # Compactar el historial de stock de la sucursal (snapshots al día)
+    producto_repository.snapshot_stock_ledger(BRANCH_ID)
 
     print("=== Reposición de stock (gerente) ===\n")
     print("Saldo en caja:", caja.obtener_saldo())
     
 
     while True:
-        nombre = input("Nombre del producto a reponer (vacío para salir): ").strip()
+        nombre = input("Nombre del producto a reponer (\"auto\": toda la sucursal, vacío para salir): ").strip()
         if not nombre:
             break
+        if nombre.lower() == "auto":
+            reponer_automatico(planificador)
+            continue
         producto = inventario.obtener_producto(nombre)
         if not producto:
             print("Producto no encontrado. Use el nombre exacto del inventario.\n")
@@ -0,0 +1,184 @@
+# planificador_reposicion.py
+#
+# Reposición automática de toda una sucursal.
+#
+# Por qué existe:
+# En main_gerente se repone de a un producto: nombre, cantidad, compra. Con
+# un catálogo de 100k productos eso es imposible a mano, y hacerlo en un
+# bucle (una query de proveedores y una transacción por producto) tarda
+# minutos.
+#
+# Cómo funciona:
+# - planificar(): una pasada por los productos activos con stock por debajo
+#   del punto de reposición (iter_products_below, de a páginas). Para cada
+#   uno se pide lo que falta hasta el stock objetivo, a los proveedores del
+#   índice de GestorProveedor (cargado en bloque, ordenado por precio): al
+#   más barato lo que tenga, y el resto al siguiente. Ninguna query por
+#   producto. Con el saldo de la caja como presupuesto, van primero los
+#   productos con menos stock. El presupuesto se cuenta en centavos enteros:
+#   restando floats, 0.3 - 0.1 - 0.1 deja 0.0999... y el plan se corre del
+#   saldo (restock_from_suppliers compara el saldo al centavo, igual que acá).
+# - ejecutar(): compra el plan en lotes de LOTE_COMPRAS con
+#   restock_from_suppliers (una transacción por lote: caja, proveedor y
+#   stock juntos). Si un lote falla (stock, BD ocupada o error de SQLite),
+#   los anteriores quedan hechos y el resultado dice qué quedó pendiente.
+#
+# Uso:
+#   planificador = PlanificadorReposicion(gestor_proveedor, caja, inventario)
+#   plan = planificador.planificar(punto_reposicion=20, stock_objetivo=100)
+#   resultado = planificador.ejecutar(plan)
+
+import sqlite3
+import time
+from dataclasses import dataclass, field
+
+from database import producto_repository, retry
+
+
+# Compras por transacción en ejecutar(): acota cuánto tiempo se tiene el
+# write lock de la sucursal (las cajas esperan mientras tanto)
+LOTE_COMPRAS = 2000
+
+
+def _centavos(monto):
+    """Monto en centavos enteros (precios y saldos son de a centavo)"""
+    return round(monto * 100)
+
+
+@dataclass
+class PlanReposicion:
+    """
+    Compras a hacer para reponer una sucursal.
+
+    Atributos:
+        compras (list): (ProductoProveedor, cantidad) en orden de prioridad
+        costo_total (float): Lo que cuestan todas las compras
+        sin_cubrir (dict): {nombre: unidades que faltan} de los productos que
+            no se pudieron reponer enteros (sin proveedor, sin stock o sin saldo)
+        productos (int): Productos por debajo del punto de reposición
+        segundos (float): Lo que tardó planificar()
+    """
+    compras: list = field(default_factory=list)
+    costo_total: float = 0.0
+    sin_cubrir: dict = field(default_factory=dict)
+    productos: int = 0
+    segundos: float = 0.0
+
+
+class PlanificadorReposicion:
+    """
+    Arma y ejecuta un plan de compras para todos los productos de la
+    sucursal que están por debajo del punto de reposición.
+    """
+
+    def __init__(self, gestor_proveedor, caja, inventario):
+        self.gestor_proveedor = gestor_proveedor
+        self.caja = caja
+        self.inventario = inventario
+
+    def planificar(self, punto_reposicion, stock_objetivo=None, presupuesto=None):
+        """
+        Arma el plan de compras (no toca la BD).
+
+        Args:
+            punto_reposicion (int): Se reponen los productos con stock menor a este
+            stock_objetivo (int | None): Stock al que se lleva cada producto
+                (None: el doble del punto de reposición)
+            presupuesto (float | None): Máximo a gastar (None: el saldo de la caja)
+
+        Returns:
+            PlanReposicion
+
+        Raises:
+            ValueError: Si el punto de reposición no es positivo o el objetivo es menor
+        """
+        inicio = time.perf_counter()
+        if punto_reposicion <= 0:
+            raise ValueError("El punto de reposición debe ser positivo.")
+        if stock_objetivo is None:
+            stock_objetivo = 2 * punto_reposicion
+        if stock_objetivo < punto_reposicion:
+            raise ValueError("El stock objetivo no puede ser menor que el punto de reposición.")
+        if presupuesto is None:
+            presupuesto = self.caja.obtener_saldo()
+
+        # Los más urgentes primero (sin stock antes que con poco): si no alcanza
+        # el presupuesto, lo que queda afuera es lo menos urgente
+        productos = sorted(
+            producto_repository.iter_products_below(self.inventario.branch_id, punto_reposicion),
+            key=lambda fila: (fila[2], fila[0])
+        )
+
+        plan = PlanReposicion(productos=len(productos))
+        restante = _centavos(presupuesto)
+        total = 0
+        for producto_id, nombre, stock in productos:
+            falta = stock_objetivo - stock
+            # Cada relación es de un solo producto: su stock no lo comparte otro pedido del plan
+            for rel in self.gestor_proveedor.buscar_por_producto_id(producto_id):
+                if falta == 0:
+                    break
+                precio = _centavos(rel.precio_compra)
+                cantidad = min(falta, rel.stock_disponible)
+                if precio > 0:
+                    cantidad = min(cantidad, restante // precio)
+                if cantidad <= 0:
+                    continue
+                plan.compras.append((rel, cantidad))
+                total += precio * cantidad
+                restante -= precio * cantidad
+                falta -= cantidad
+            if falta:
+                plan.sin_cubrir[nombre] = falta
+
+        plan.costo_total = total / 100
+        plan.segundos = time.perf_counter() - inicio
+        return plan
+
+    def ejecutar(self, plan, tamanio_lote=LOTE_COMPRAS):
+        """
+        Compra el plan en lotes, cada uno en una transacción
+        (restock_from_suppliers). Si un lote falla (ej: otro proceso se llevó
+        el stock de un proveedor, la BD siguió ocupada o un error de SQLite),
+        se corta ahí: los lotes anteriores quedan hechos y el resto se informa
+        como pendiente. El resultado se devuelve igual: sin él, quien llama no
+        sabría qué lotes ya se pagaron.
+
+        Args:
+            plan (PlanReposicion): Resultado de planificar()
+            tamanio_lote (int): Compras por transacción
+
+        Returns:
+            dict: {"compras": compras hechas, "lotes": transacciones hechas,
+                   "costo": lo gastado, "pendientes": compras sin hacer,
+                   "error": mensaje del lote que falló o None, "segundos": lo que tardó}
+        """
+        inicio = time.perf_counter()
+        resultado = {"compras": 0, "lotes": 0, "costo": 0.0, "pendientes": [], "error": None}
+        for desde in range(0, len(plan.compras), tamanio_lote):
+            lote = plan.compras[desde:desde + tamanio_lote]
+            try:
+                costo = producto_repository.restock_from_suppliers(
+                    self.inventario.branch_id, self.caja.cash_register_id,
+                    [(rel.id_relacion, cantidad) for rel, cantidad in lote]
+                )
+            except (ValueError, retry.DatabaseBusyError, sqlite3.Error) as e:
+                # El lote que falló se deshizo entero (una transacción)
+                resultado["pendientes"] = plan.compras[desde:]
+                resultado["error"] = str(e)
+                break
+            for rel, cantidad in lote:
+                rel.descontar_stock_guardado(cantidad)
+            resultado["compras"] += len(lote)
+            resultado["lotes"] += 1
+            resultado["costo"] += costo
+        resultado["segundos"] = time.perf_counter() - inicio
+        return resultado
+
+    def reponer(self, punto_reposicion, stock_objetivo=None):
+        """
+        planificar() + ejecutar() con el saldo de la caja.
+        Returns: (PlanReposicion, resultado de ejecutar())
+        """
+        plan = self.planificar(punto_reposicion, stock_objetivo)
+        return plan, self.ejecutar(plan)
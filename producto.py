@@ -1,4 +1,8 @@
 class Producto:
+    # Sin __dict__ por instancia: el catálogo y las relaciones con proveedores
+    # pueden tener cientos de miles (ver también InventarioSQLite.internar_producto)
+    __slots__ = ("nombre", "precio", "stock", "descuento")
+
     def __init__(self,nombre,precio,stock,descuento=0.0):
         self.nombre = nombre
         self.precio = precio
@@ -1,9 +1,45 @@
 class ProductoProveedor:
-    def __init__(self, producto, proveedor, precio_compra, stock_disponible):
+    __slots__ = ("producto", "proveedor", "precio_compra", "_stock_disponible", "_modificado",
+                 "_pendientes", "id_relacion")
+
+    def __init__(self, producto, proveedor, precio_compra, stock_disponible, id_relacion=None,
+                 pendientes=None):
         self.producto = producto
         self.proveedor = proveedor
         self.precio_compra = precio_compra
-        self.stock_disponible = stock_disponible
+        self._stock_disponible = stock_disponible
+        # Conjunto de relaciones sin guardar del GestorProveedor dueño (o None):
+        # la relación se agrega al marcarse modificada y sale al desmarcarse,
+        # así guardar() no recorre todo el catálogo para encontrarlas
+        self._pendientes = pendientes
+        # True si el stock cambió desde que se leyó o guardó (ver GestorProveedor.guardar)
+        self._modificado = False
+        # id en la tabla product_supplier (None si todavía no se guardó)
+        self.id_relacion = id_relacion
+
+    @property
+    def modificado(self):
+        return self._modificado
+
+    @modificado.setter
+    def modificado(self, valor):
+        self._modificado = valor
+        if self._pendientes is not None:
+            if valor:
+                self._pendientes.add(self)
+            else:
+                self._pendientes.discard(self)
+
+    @property
+    def stock_disponible(self):
+        return self._stock_disponible
+
+    @stock_disponible.setter
+    def stock_disponible(self, valor):
+        # Cualquier cambio (descontar_stock, agregar_stock o asignación directa) marca la relación
+        if valor != self._stock_disponible:
+            self._stock_disponible = valor
+            self.modificado = True
         
     def hay_stock(self,cantidad):
         return self.stock_disponible >= cantidad
@@ -13,6 +49,17 @@ class ProductoProveedor:
             raise ValueError(f"Stock insuficiente de {self.producto.nombre}. Disponible: {self.stock_disponible}")
         self.stock_disponible -= cantidad
         
+    def descontar_stock_guardado(self, cantidad):
+        """
+        Descuenta en memoria lo que una compra ya descontó en la BD (ver
+        producto_repository.restock_from_supplier): no queda pendiente para
+        GestorProveedor.guardar(). Si la relación ya tenía otros cambios sin
+        guardar, esos siguen pendientes.
+        """
+        pendiente = self.modificado
+        self.descontar_stock(cantidad)
+        self.modificado = pendiente
+
     def agregar_stock(self,cantidad):
         self.stock_disponible += cantidad
         
@@ -1,6 +1,10 @@
 class Proveedor:
-    def __init__(self, nombre):
+    __slots__ = ("nombre", "id")
+
+    def __init__(self, nombre, id=None):
         self.nombre = nombre
+        # id en la tabla supplier (None si todavía no se guardó)
+        self.id = id
         
     def to_dict(self):
         return {
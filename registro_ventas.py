@@ -15,10 +15,13 @@ class RegistroVentas:
     Si algo falla, NADA se modifica (ROLLBACK automático).
     """
 
-    def __init__(self, branch_id=1, cash_register_id=1):
+    def __init__(self, branch_id=1, cash_register_id=1, group_commit=None):
         # Sucursal y caja a las que se asocian las ventas
         self.branch_id = branch_id
         self.cash_register_id = cash_register_id
+        # GroupCommitWriter opcional: si se pasa, la venta se confirma en lote
+        # con las de otras cajas (un fsync por lote en vez de uno por venta)
+        self.group_commit = group_commit
 
     def registrar_venta(
         self,
@@ -29,7 +32,8 @@ class RegistroVentas:
         total,
         metodo_pago,
         es_socio,
-        socio_id=None
+        socio_id=None,
+        sesion_reserva=None
     ):
         """
         Registra una venta completa de forma atómica.
@@ -47,6 +51,8 @@ class RegistroVentas:
             metodo_pago (str): "efectivo" o "tarjeta"
             es_socio (bool): True si es socio
             socio_id (int): ID del socio (None si no aplica)
+            sesion_reserva (str): Carrito cuyas reservas de stock consume la
+                venta (ver ReservaStock; None si el carrito no reserva)
 
         Returns:
             int: sale_id de la venta creada
@@ -54,6 +60,25 @@ class RegistroVentas:
         Raises:
             ValueError: Si stock insuficiente para algún producto
         """
+        venta = self._armar_venta(items, total, socio_id, sesion_reserva)
+
+        # UNA sola llamada atómica: todo o nada
+        # Si stock insuficiente → ValueError + ROLLBACK (nada se modifica)
+        # Si todo OK → stock reducido + venta creada + caja actualizada
+        # Con group commit la garantía es la misma, solo cambia quién hace el COMMIT.
+        process_sale = producto_repository.process_sale_atomic
+        if self.group_commit is not None:
+            process_sale = self.group_commit.process_sale
+
+        return process_sale(**venta)
+
+    def _armar_venta(self, items, total, socio_id, sesion_reserva=None):
+        """
+        Arma los argumentos de process_sale_atomic a partir de los items del carrito
+        (compartido con RegistroVentasAsync).
+        Returns: dict con branch_id, cash_register_id, items, total_amount, timestamp,
+        member_id, session_id
+        """
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
         # Convertir items al formato que espera process_sale_atomic
@@ -66,16 +91,56 @@ class RegistroVentas:
                 "price_at_sale": item["precio"]
             })
 
-        # UNA sola llamada atómica: todo o nada
-        # Si stock insuficiente → ValueError + ROLLBACK (nada se modifica)
-        # Si todo OK → stock reducido + venta creada + caja actualizada
-        sale_id = producto_repository.process_sale_atomic(
+        return dict(
             branch_id=self.branch_id,
             cash_register_id=self.cash_register_id,
             items=atomic_items,
             total_amount=total,
             timestamp=timestamp,
-            member_id=socio_id
+            member_id=socio_id,
+            session_id=sesion_reserva
         )
 
-        return sale_id
+
+class RegistroVentasAsync(RegistroVentas):
+    """
+    Versión asyncio de RegistroVentas: la venta atómica corre en el executor
+    de AsyncRepository y no frena el event loop. Misma garantía todo-o-nada.
+    """
+
+    def __init__(self, repositorio, branch_id=1, cash_register_id=1):
+        """
+        Args:
+            repositorio (AsyncRepository): Repository asíncrono a usar
+            branch_id (int): Sucursal de las ventas
+            cash_register_id (int): Caja que procesa las ventas
+        """
+        super().__init__(branch_id=branch_id, cash_register_id=cash_register_id)
+        self.repositorio = repositorio
+
+    async def registrar_venta(
+        self,
+        items,
+        subtotal,
+        iva,
+        descuento,
+        total,
+        metodo_pago,
+        es_socio,
+        socio_id=None,
+        sesion_reserva=None,
+        timeout=None
+    ):
+        """
+        Igual que RegistroVentas.registrar_venta, como corutina.
+
+        Returns:
+            int: sale_id de la venta creada
+
+        Raises:
+            ValueError: Si stock insuficiente para algún producto
+            asyncio.TimeoutError: Si se supera el timeout (si no llegó al COMMIT,
+                la venta hace ROLLBACK)
+        """
+        venta = self._armar_venta(items, total, socio_id, sesion_reserva)
+        return await self.repositorio.process_sale_atomic(**venta, timeout=timeout)
@@ -0,0 +1,93 @@
+# reserva_stock.py
+#
+# Reservas de stock de UN carrito abierto (ver producto_repository.reserve_stock).
+#
+# Por qué existe:
+# Sin reservas, dos cajas pueden cargar la última unidad de un producto y la
+# segunda se entera recién al cobrar (process_sale_atomic falla con el
+# cliente esperando). Con reservas, lo que está en un carrito queda apartado
+# y la otra caja lo ve al agregar.
+#
+# Cómo funciona:
+# - Cada carrito tiene su `sesion` (uuid) y reserva el TOTAL que tiene de cada
+#   producto; cada reserva renueva el vencimiento de todas las del carrito.
+# - Carrito.quitar/vaciar/modificar_cantidad liberan o ajustan la reserva.
+# - Al cobrar, la venta borra las reservas de la sesión en su misma transacción.
+# - Un carrito abandonado no bloquea nada para siempre: sus reservas vencen
+#   a los `ttl` segundos sin actividad.
+
+import uuid
+
+from database import producto_repository
+
+
+class ReservaStock:
+    """
+    Reservas de un carrito en una sucursal.
+    Recuerda qué productos tiene apartados para no ir a la BD cuando no hay
+    nada que liberar (ej: vaciar el carrito después de cobrar).
+    """
+
+    def __init__(self, branch_id=1, ttl=None):
+        """
+        Args:
+            branch_id (int): Sucursal del carrito
+            ttl (float): Segundos sin actividad hasta que vencen las reservas
+                (None: producto_repository.RESERVATION_TTL)
+        """
+        self.branch_id = branch_id
+        self.ttl = ttl if ttl is not None else producto_repository.RESERVATION_TTL
+        self.sesion = uuid.uuid4().hex
+        # {nombre: cantidad} apartada por este carrito
+        self.reservado = {}
+        # {nombre: product_id} de lo que se reservó por id: ajustar o liberar
+        # esas reservas tampoco busca el nombre en la BD
+        self._ids = {}
+
+    def reservar(self, nombre, cantidad, producto_id=None):
+        """
+        Fija cuántas unidades de un producto tiene apartadas el carrito (el
+        total, no un incremento).
+
+        Args:
+            nombre (str): Nombre del producto
+            cantidad (int): Total a tener apartado
+            producto_id (int | None): Si ya se conoce (escáner, caché), la
+                reserva no busca el nombre en la BD
+
+        Returns:
+            tuple: (ok, disponible) — disponible es lo que este carrito puede
+            tener del producto (stock menos lo apartado por otros carritos)
+        """
+        if producto_id is not None:
+            self._ids[nombre] = producto_id
+        ok, disponible = producto_repository.reserve_stock(
+            self.branch_id, self.sesion, nombre, cantidad, self.ttl,
+            product_id=self._ids.get(nombre)
+        )
+        if ok:
+            if cantidad > 0:
+                self.reservado[nombre] = cantidad
+            else:
+                self.reservado.pop(nombre, None)
+        return ok, disponible
+
+    def liberar(self, nombre):
+        """Libera la reserva de un producto (si tenía)."""
+        if self.reservado.pop(nombre, None) is not None:
+            producto_repository.release_reservation(
+                self.branch_id, self.sesion, nombre, product_id=self._ids.get(nombre)
+            )
+
+    def liberar_todo(self):
+        """Libera todas las reservas del carrito (si tenía)."""
+        if self.reservado:
+            self.reservado.clear()
+            producto_repository.release_reservation(self.branch_id, self.sesion)
+
+    def consumidas(self):
+        """
+        La venta se confirmó: sus reservas ya se borraron dentro de la misma
+        transacción, no queda nada por liberar.
+        """
+        self.reservado.clear()
@@ -1,4 +1,6 @@
-from inventario_sqlite import InventarioSQLite
+from database import producto_repository
+
+
 class ServicioCompra:
     """
     Caso de uso: compra a proveedores (reposición de stock).
@@ -26,15 +28,14 @@ class ServicioCompra:
         if not relaciones:
             raise ValueError(f"No hay proveedores para el producto {producto.nombre}")
 
-        # --- Filtrar los que tienen stock suficiente ---
-        con_stock = [r for r in relaciones if r.hay_stock(cantidad)]
-        if not con_stock:
+        # --- Elegir el más barato entre los que tienen stock suficiente ---
+        # El gestor tiene las relaciones de cada producto ordenadas por precio:
+        # no hace falta filtrar todas y después buscar el mínimo.
+        proveedor_elegido = self.gestor_proveedor.mas_barato_con_stock(producto, cantidad)
+        if proveedor_elegido is None:
             raise ValueError(
                 f"Ningún proveedor tiene stock suficiente de {producto.nombre} (solicitado: {cantidad})"
             )
-
-        # --- Elegir el más barato (misma lógica que antes) ---
-        proveedor_elegido = min(con_stock, key=lambda r: r.precio_compra)
         costo_total = proveedor_elegido.precio_compra * cantidad
 
         # --- Validar saldo en caja antes de tocar nada ---
@@ -47,12 +48,64 @@ class ServicioCompra:
                 f"Necesita: ${costo_total:.2f}, saldo: ${self.caja.obtener_saldo():.2f}"
             )
 
-        # --- Orden de operaciones: retirar → descontar proveedor → agregar al producto ---
-        # Si fallara algo después de retirar, quedaríamos con caja descontada y stock sin actualizar.
-        # Para un proyecto con BD sería un flujo transaccional; con JSON es aceptable así por ahora.
-        self.caja.retirar(costo_total)
-        proveedor_elegido.descontar_stock(cantidad)
-        self.inventario.aumentar_stock(producto.nombre, cantidad)
+        # --- Una sola transacción: caja, proveedor y stock de la sucursal ---
+        # Antes: caja.retirar() → descontar_stock() en memoria → aumentar_stock(),
+        # cada uno por su lado; un corte en el medio dejaba la caja descontada y
+        # el stock sin recibir. El repository repite los controles de saldo y de
+        # stock del proveedor con UPDATE condicionales: si otro proceso se adelantó,
+        # falla con ValueError y no queda nada a medias.
+        costo_total = producto_repository.restock_from_supplier(
+            self.inventario.branch_id, self.caja.cash_register_id,
+            proveedor_elegido.id_relacion, cantidad
+        )
+        proveedor_elegido.descontar_stock_guardado(cantidad)
+        return costo_total
+
+    def reponer_productos(self, pedidos):
+        """
+        Repone muchos productos en UNA transacción: todos o ninguno.
+        Cada producto se compra al proveedor más barato con stock suficiente
+        (teniendo en cuenta lo que ya se le pidió en este mismo lote).
+
+        Args:
+            pedidos (list): Pares (producto, cantidad)
+
+        Returns:
+            float: Costo total
+
+        Raises:
+            ValueError: Si alguna cantidad no es positiva, algún producto no
+                tiene proveedor con stock suficiente o no alcanza el saldo
+        """
+        compras = []
+        pedido_por_relacion = {}
+        for producto, cantidad in pedidos:
+            if cantidad <= 0:
+                raise ValueError("La cantidad a reponer debe ser positiva.")
+            elegido = None
+            for rel in self.gestor_proveedor.buscar_por_producto(producto):
+                if rel.hay_stock(pedido_por_relacion.get(rel, 0) + cantidad):
+                    elegido = rel
+                    break
+            if elegido is None:
+                raise ValueError(
+                    f"Ningún proveedor tiene stock suficiente de {producto.nombre} (solicitado: {cantidad})"
+                )
+            pedido_por_relacion[elegido] = pedido_por_relacion.get(elegido, 0) + cantidad
+            compras.append((elegido, cantidad))
+
+        costo_total = sum(rel.precio_compra * cantidad for rel, cantidad in compras)
+        saldo = self.caja.obtener_saldo()
+        if saldo < costo_total:
+            raise ValueError(
+                f"Capital insuficiente para reponer {len(compras)} productos. "
+                f"Necesita: ${costo_total:.2f}, saldo: ${saldo:.2f}"
+            )
 
+        costo_total = producto_repository.restock_from_suppliers(
+            self.inventario.branch_id, self.caja.cash_register_id,
+            [(rel.id_relacion, cantidad) for rel, cantidad in compras]
+        )
+        for rel, cantidad in compras:
+            rel.descontar_stock_guardado(cantidad)
         return costo_total
-            
\ No newline at end of file
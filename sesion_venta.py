@@ -1,8 +1,12 @@
 # sesion_venta.py
 
+import asyncio
 from dataclasses import dataclass
 from datetime import datetime
 
+from inventario_sqlite import es_codigo_de_barras
+from reserva_stock import ReservaStock
+
 
 @dataclass
 class ResultadoOperacion:
@@ -35,18 +39,25 @@ class SesionVenta:
     IVA = 0.21              # 21%
     RECARGO_TARJETA = 0.10  # 10%
     
-    def __init__(self, inventario, registro_venta, metodo_pago=None):
+    def __init__(self, inventario, registro_venta, metodo_pago=None, reservar_stock=False,
+                 ttl_reserva=None):
         """
         Args:
             inventario (Inventario): Gestiona productos y stock
             registro_venta (RegistroVentas): Guarda ventas en JSON
             metodo_pago (str): "efectivo" o "tarjeta" (opcional)
+            reservar_stock (bool): Si True, lo que se agrega al carrito queda
+                apartado para esta venta (ver reserva_stock.py)
+            ttl_reserva (float): Segundos sin actividad hasta que vencen las
+                reservas (None: el valor por defecto del repository)
         """
         self.inventario = inventario
         self.registro_venta = registro_venta
         self.carrito = None
         self.venta_cerrada = False
         self.metodo_pago = metodo_pago
+        self.reservar_stock = reservar_stock
+        self.ttl_reserva = ttl_reserva
     
     def iniciar_venta(self, carrito):
         """
@@ -58,27 +69,91 @@ class SesionVenta:
         """
         self.carrito = carrito
         self.venta_cerrada = False
+        if self.reservar_stock and carrito.reservas is None:
+            carrito.reservas = ReservaStock(self.inventario.branch_id, self.ttl_reserva)
     
     def agregar_producto(self, nombre_producto, cantidad):
         """
         Agrega producto al carrito CON VALIDACIÓN de stock.
         
         FLUJO:
-        1. Busca el producto en el inventario
+        1. Busca el producto en el inventario (por código si se escaneó uno)
         2. Valida que existe
-        3. Valida que hay stock suficiente (considerando lo que ya hay en el carrito)
+        3. Valida que hay stock suficiente (considerando lo que ya hay en el carrito
+           y, con reservas, lo apartado por otros carritos)
         4. Si todo OK, lo agrega al carrito
         
         Args:
-            nombre_producto (str): Nombre del producto
+            nombre_producto (str): Nombre del producto o código de barras escaneado
             cantidad (int): Cantidad a agregar
         
         Returns:
             ResultadoOperacion: Indica si se pudo agregar y el motivo
         """
-        # 1. Obtener el OBJETO Producto del inventario
-        producto = self.inventario.obtener_producto(nombre_producto)
+        # 1. Obtener el OBJETO Producto del inventario (y reservarlo)
+        producto, reserva = self._buscar_y_reservar(nombre_producto, cantidad)
+        return self._validar_y_agregar(producto, nombre_producto, cantidad, reserva)
+    
+    def _buscar_y_reservar(self, nombre_o_codigo, cantidad):
+        """
+        Pasos de agregar_producto que tocan la BD: buscar el producto y, si el
+        carrito reserva stock, apartar el total que quedaría en el carrito.
+        Solo se reserva si el pedido es válido (producto activo, cantidad
+        positiva): un escaneo rechazado no deja nada apartado.
+        
+        Returns:
+            tuple: (Producto | None, (ok, disponible) | None si no se reservó)
+        """
+        # obtener_producto/obtener_producto_por_codigo solo devuelven productos activos
+        producto = self._buscar_producto(nombre_o_codigo)
+        reservas = self.carrito.reservas
+        if producto is None or reservas is None or cantidad <= 0:
+            return producto, None
+        total = self.carrito.cantidad_de(producto.nombre) + cantidad
+        # Por id (el que trajo la búsqueda): escanear no vuelve a buscar el nombre
+        return producto, reservas.reservar(
+            producto.nombre, total, producto_id=self.inventario.producto_id(producto.nombre)
+        )
+    
+    def _restaurar_reservas(self):
+        """
+        Deja las reservas del carrito iguales a lo que tiene: libera lo que se
+        apartó para un agregado que no llegó al carrito (ej: un error o un
+        timeout después de reservar).
+        """
+        reservas = self.carrito.reservas
+        if reservas is None:
+            return
+        for nombre, reservado in list(reservas.reservado.items()):
+            en_carrito = self.carrito.cantidad_de(nombre)
+            if en_carrito == 0:
+                reservas.liberar(nombre)
+            elif en_carrito != reservado:
+                reservas.reservar(nombre, en_carrito)
+    
+    def _buscar_producto(self, nombre_o_codigo):
+        """
+        Paso 1 de agregar_producto. Un código de barras va directo al índice
+        de códigos (y a la caché del inventario), sin buscar por nombre.
+        
+        Returns:
+            Producto | None
+        """
+        if es_codigo_de_barras(nombre_o_codigo):
+            return self.inventario.obtener_producto_por_codigo(nombre_o_codigo)
+        return self.inventario.obtener_producto(nombre_o_codigo)
+    
+    def _validar_y_agregar(self, producto, nombre_producto, cantidad, reserva=None):
+        """
+        Pasos 2 a 5 de agregar_producto (compartidos con SesionVentaAsync).
+        
+        Args:
+            reserva (tuple | None): (ok, disponible) de ReservaStock.reservar;
+                None si el carrito no reserva (se valida con producto.stock)
         
+        Returns:
+            ResultadoOperacion: Indica si se pudo agregar y el motivo
+        """
         # 2. Validar que existe
         if not producto:
             return ResultadoOperacion(
@@ -86,16 +161,32 @@ class SesionVenta:
                 mensaje=f"❌ Producto '{nombre_producto}' no encontrado."
             )
         
+        if cantidad <= 0:
+            return ResultadoOperacion(
+                exito=False,
+                mensaje="❌ La cantidad debe ser positiva."
+            )
+        
+        # El carrito guarda por nombre: si se escaneó un código, usar el nombre real
+        nombre_producto = producto.nombre
+        
         # 3. Calcular cuánto queremos en total (lo del carrito + lo nuevo)
         cantidad_en_carrito = self.carrito.cantidad_de(nombre_producto)
         
         cantidad_total_deseada = cantidad_en_carrito + cantidad
         
-        # 4. Validar stock disponible
-        if producto.stock < cantidad_total_deseada:
+        # 4. Validar stock disponible (con reservas ya se validó al reservar,
+        #    contra el stock actual menos lo apartado por otros carritos)
+        if reserva is not None:
+            hay_stock, disponible = reserva
+        else:
+            disponible = producto.stock
+            hay_stock = disponible >= cantidad_total_deseada
+        
+        if not hay_stock:
             mensaje = (
                 f"❌ Stock insuficiente de {nombre_producto}.\n"
-                f"   Disponible: {producto.stock}\n"
+                f"   Disponible: {disponible}\n"
                 f"   Ya en carrito: {cantidad_en_carrito}\n"
                 f"   Solicitado: {cantidad}"
             )
@@ -103,7 +194,12 @@ class SesionVenta:
         
         # 5. Todo OK → Agregar al carrito
         # IMPORTANTE: Pasamos el OBJETO producto, no solo el nombre
-        self.carrito.agregar(producto, cantidad)
+        try:
+            self.carrito.agregar(producto, cantidad)
+        except Exception:
+            # Lo reservado para este agregado no quedó en el carrito
+            self._restaurar_reservas()
+            raise
         return ResultadoOperacion(
             exito=True,
             mensaje="Producto agregado al carrito correctamente."
@@ -188,6 +284,37 @@ class SesionVenta:
         Returns:
             tuple: (subtotal, iva, descuento, total)
         """
+        subtotal, iva, descuento, total, datos_venta = self._preparar_confirmacion(metodo_pago, socio)
+        
+        # Registrar venta ATÓMICAMENTE
+        # ANTES: se reducía stock aquí y se creaba la venta por separado (race condition)
+        # AHORA: todo se hace en UNA transacción dentro de registrar_venta()
+        self.registro_venta.registrar_venta(**datos_venta)
+        
+        # 6. Vaciar carrito y marcar como cerrada
+        self._cerrar_venta()
+        
+        return subtotal, iva, descuento, total
+    
+    def _cerrar_venta(self):
+        """
+        Paso 6 de confirmar_pago (compartido con SesionVentaAsync). Las
+        reservas ya se borraron con la venta: vaciar no vuelve a la BD.
+        """
+        if self.carrito.reservas is not None:
+            self.carrito.reservas.consumidas()
+        self.carrito.vaciar()
+        self.venta_cerrada = True
+    
+    def _preparar_confirmacion(self, metodo_pago, socio):
+        """
+        Pasos 1 a 5 de confirmar_pago hasta justo antes de registrar la venta
+        (compartidos con SesionVentaAsync).
+        
+        Returns:
+            tuple: (subtotal, iva, descuento, total, datos_venta) donde datos_venta
+            son los argumentos para registro_venta.registrar_venta()
+        """
         # 1. Validar que no esté cerrada
         if self.venta_cerrada:
             raise ValueError("La venta ya fue confirmada.")
@@ -202,14 +329,13 @@ class SesionVenta:
         # 4. Calcular totales
         subtotal, iva, descuento, total = self.calcular_totales(socio)
         
-        # 5. Registrar venta ATÓMICAMENTE
-        # ANTES: se reducía stock aquí y se creaba la venta por separado (race condition)
-        # AHORA: todo se hace en UNA transacción dentro de registrar_venta()
+        # 5. Armar los datos de la venta (snapshot de precios del carrito)
         items_dict = [item.to_dict() for item in self.carrito.listar()]
         
         socio_id = socio.id if socio else None
+        reservas = self.carrito.reservas
         
-        self.registro_venta.registrar_venta(
+        datos_venta = dict(
             items=items_dict,
             subtotal=subtotal,
             iva=iva,
@@ -217,11 +343,72 @@ class SesionVenta:
             total=total,
             metodo_pago=metodo_pago,
             es_socio=socio is not None,
-            socio_id=socio_id
+            socio_id=socio_id,
+            sesion_reserva=reservas.sesion if reservas is not None else None
         )
+        return subtotal, iva, descuento, total, datos_venta
+
+
+class SesionVentaAsync(SesionVenta):
+    """
+    Versión asyncio de SesionVenta para un front end asíncrono.
+    
+    Misma lógica (validación, totales, orden fiscal); solo cambian los pasos
+    que tocan la BD, que se ejecutan en el executor de AsyncRepository y
+    no frenan el event loop:
+    - agregar_producto()  → corutina (busca y reserva el producto en el executor)
+    - confirmar_pago()    → corutina (usa RegistroVentasAsync)
+    """
+    
+    def __init__(self, inventario, registro_venta, repositorio, metodo_pago=None,
+                 reservar_stock=False, ttl_reserva=None):
+        """
+        Args:
+            inventario (InventarioSQLite): Gestiona productos y stock
+            registro_venta (RegistroVentasAsync): Registra ventas sin bloquear
+            repositorio (AsyncRepository): Executor para las consultas del inventario
+            metodo_pago (str): "efectivo" o "tarjeta" (opcional)
+            reservar_stock (bool): Si True, lo que se agrega al carrito queda
+                apartado para esta venta (ver reserva_stock.py)
+            ttl_reserva (float): Segundos sin actividad hasta que vencen las
+                reservas (None: el valor por defecto del repository)
+        """
+        super().__init__(inventario, registro_venta, metodo_pago, reservar_stock, ttl_reserva)
+        self.repositorio = repositorio
+    
+    async def agregar_producto(self, nombre_producto, cantidad, timeout=None):
+        """
+        Igual que SesionVenta.agregar_producto, pero sin bloquear el event loop.
         
-        # 6. Vaciar carrito y marcar como cerrada
-        self.carrito.vaciar()
-        self.venta_cerrada = True
+        Returns:
+            ResultadoOperacion: Indica si se pudo agregar y el motivo
+        """
+        try:
+            producto, reserva = await self.repositorio.run_for_branch(
+                self.inventario.branch_id, self._buscar_y_reservar, nombre_producto, cantidad,
+                timeout=timeout
+            )
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            # La reserva pudo confirmarse antes del timeout: no dejarla apartada
+            if self.carrito.reservas is not None:
+                await self.repositorio.run_for_branch(
+                    self.inventario.branch_id, self._restaurar_reservas
+                )
+            raise
+        return self._validar_y_agregar(producto, nombre_producto, cantidad, reserva)
+    
+    async def confirmar_pago(self, metodo_pago, socio=None, timeout=None):
+        """
+        Igual que SesionVenta.confirmar_pago, pero sin bloquear el event loop.
+        Si la venta falla (stock insuficiente, timeout) el carrito queda intacto.
+        
+        Returns:
+            tuple: (subtotal, iva, descuento, total)
+        """
+        subtotal, iva, descuento, total, datos_venta = self._preparar_confirmacion(metodo_pago, socio)
+        
+        await self.registro_venta.registrar_venta(**datos_venta, timeout=timeout)
+        
+        self._cerrar_venta()
         
         return subtotal, iva, descuento, total
\ No newline at end of file
@@ -0,0 +1,265 @@
+"""
+Tests del repository asyncio (database/aio_repository.py) y de
+SesionVentaAsync / RegistroVentasAsync.
+
+ARQUITECTURA DEL TEST:
+- Igual que test_concurrency.py: BD temporal, repo.DB_PATH parcheado
+- Cada test corre su propio event loop con asyncio.run()
+- Verifica que el event loop sigue respondiendo mientras SQLite trabaja,
+  y que timeout y cancelación interrumpen la consulta en curso
+- Verifica que una venta que venció esperando el write lock no se confirma
+  después, cuando el lock se libera
+"""
+import os
+import sqlite3
+import sys
+import asyncio
+import time
+
+# Agregar root al path para importar modulos del proyecto
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database import producto_repository as repo
+from database.aio_repository import AsyncRepository
+from test_concurrency import setup_test_db, cleanup_test_db
+
+
+def slow_query():
+    """Consulta que tarda varios segundos (cuenta hasta 50 millones en SQL)"""
+    with repo._connection() as conn:
+        return conn.execute(
+            """WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 50000000)
+               SELECT COUNT(*) FROM n"""
+        ).fetchone()[0]
+
+
+def main():
+    print("=" * 60)
+    print("  TESTS ASYNCIO: REPOSITORY, SESION Y REGISTRO DE VENTAS")
+    print("=" * 60)
+
+    passed = 0
+    failed = 0
+
+    def test(name, fn):
+        nonlocal passed, failed
+        temp_dir = setup_test_db()
+        try:
+            asyncio.run(fn())
+            print(f"  [OK] {name}")
+            passed += 1
+        except Exception as e:
+            print(f"  [FAIL] {name}: {type(e).__name__} {e}")
+            failed += 1
+        finally:
+            cleanup_test_db(temp_dir)
+
+    # ========================================
+    # TEST 1: Mismos resultados que el repository sincronico
+    # ========================================
+    print("\n--- Test 1: Corutinas equivalentes al repository ---")
+
+    async def test_same_results():
+        async with AsyncRepository(max_workers=4) as repo_aio:
+            products, product, suppliers = await asyncio.gather(
+                repo_aio.get_active_products(1),
+                repo_aio.get_product_by_name("Producto Escaso", 1),
+                repo_aio.get_all_suppliers(),
+            )
+            assert products == repo.get_active_products(1), f"get_active_products: {products}"
+            assert product == repo.get_product_by_name("Producto Escaso", 1), f"producto: {product}"
+            assert suppliers == [], f"proveedores: {suppliers}"
+            assert await repo_aio.get_member_by_name("Nadie") is None
+
+            sale_id = await repo_aio.process_sale_atomic(
+                1, 1, [{"product_name": "Producto Escaso", "quantity": 2, "price_at_sale": 100}],
+                200, "2026-03-05 00:00:00"
+            )
+            assert sale_id > 0
+            assert repo.get_branch_product_stock(1, "Producto Escaso") == 3
+
+            try:
+                await repo_aio.process_sale_atomic(
+                    1, 1, [{"product_name": "Producto Escaso", "quantity": 9, "price_at_sale": 100}],
+                    900, "2026-03-05 00:00:01"
+                )
+                raise AssertionError("Deberia fallar por stock insuficiente")
+            except ValueError:
+                pass
+
+    test("Las corutinas devuelven lo mismo que las funciones sincronicas", test_same_results)
+
+    # ========================================
+    # TEST 2: El event loop no se bloquea
+    # ========================================
+    print("\n--- Test 2: El event loop sigue respondiendo ---")
+
+    async def test_loop_not_blocked():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        async with AsyncRepository(max_workers=2) as repo_aio:
+            task = asyncio.create_task(ticker())
+            try:
+                await repo_aio.run(slow_query, timeout=0.5)
+            except asyncio.TimeoutError:
+                pass
+            task.cancel()
+
+        assert ticks >= 20, f"El loop solo avanzo {ticks} veces en 0.5s"
+
+    test("El loop avanza mientras corre una consulta larga", test_loop_not_blocked)
+
+    # ========================================
+    # TEST 3: Timeout interrumpe la consulta y libera el worker
+    # ========================================
+    print("\n--- Test 3: Timeout por llamada ---")
+
+    async def test_timeout_interrupts():
+        async with AsyncRepository(max_workers=1) as repo_aio:
+            start = time.perf_counter()
+            try:
+                await repo_aio.run(slow_query, timeout=0.2)
+                raise AssertionError("Deberia haber vencido el timeout")
+            except asyncio.TimeoutError:
+                pass
+
+            # Con 1 solo worker, la siguiente llamada solo responde rapido
+            # si la consulta anterior se interrumpio de verdad
+            product = await repo_aio.get_product_by_name("Producto Abundante", 1, timeout=2.0)
+            elapsed = time.perf_counter() - start
+            assert product is not None
+            assert elapsed < 1.5, f"El worker quedo ocupado {elapsed:.2f}s"
+
+    test("El timeout interrumpe la consulta y libera el worker", test_timeout_interrupts)
+
+    # ========================================
+    # TEST 4: Cancelacion
+    # ========================================
+    print("\n--- Test 4: Cancelacion ---")
+
+    async def test_cancel():
+        async with AsyncRepository(max_workers=1) as repo_aio:
+            task = asyncio.create_task(repo_aio.run(slow_query))
+            await asyncio.sleep(0.1)
+            task.cancel()
+            try:
+                await task
+                raise AssertionError("La tarea deberia estar cancelada")
+            except asyncio.CancelledError:
+                pass
+
+            start = time.perf_counter()
+            balance = await repo_aio.run(repo.get_cash_register_balance, 1, timeout=2.0)
+            assert balance == 10000
+            assert time.perf_counter() - start < 1.5, "El worker no se libero tras cancelar"
+
+    test("Cancelar la corutina interrumpe la consulta", test_cancel)
+
+    async def test_timeout_while_retrying():
+        # Conexión del pool abierta antes: abrirla también necesita el lock
+        repo.get_cash_register_balance(1)
+        bloqueo = sqlite3.connect(repo.DB_PATH, timeout=5)
+        bloqueo.execute("BEGIN IMMEDIATE")
+        try:
+            async with AsyncRepository(max_workers=1) as repo_aio:
+                try:
+                    await repo_aio.process_sale_atomic(
+                        1, 1, [{"product_name": "Producto Abundante", "quantity": 1, "price_at_sale": 50}],
+                        50, "2026-03-05 00:00:00", timeout=0.3
+                    )
+                    raise AssertionError("Deberia haber vencido el timeout")
+                except asyncio.TimeoutError:
+                    pass
+                # La venta sigue reintentando en el worker: se libera el lock
+                await asyncio.sleep(0.2)
+                bloqueo.rollback()
+                await asyncio.sleep(0.5)
+        finally:
+            bloqueo.close()
+
+        assert repo.get_branch_product_stock(1, "Producto Abundante") == 100
+        assert repo.get_cash_register_balance(1) == 10000
+        with repo._connection() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM sale").fetchone()[0] == 0
+
+    test("Una venta vencida esperando el lock no se confirma después", test_timeout_while_retrying)
+
+    # ========================================
+    # TEST 5: SesionVentaAsync + RegistroVentasAsync
+    # ========================================
+    print("\n--- Test 5: Venta completa asincronica ---")
+
+    async def test_async_sale():
+        from carrito import Carrito
+        from inventario_sqlite import InventarioSQLite
+        from registro_ventas import RegistroVentasAsync
+        from sesion_venta import SesionVentaAsync
+
+        async with AsyncRepository(max_workers=4) as repo_aio:
+            registro = RegistroVentasAsync(repo_aio, branch_id=1, cash_register_id=2)
+            sesion = SesionVentaAsync(InventarioSQLite(branch_id=1), registro, repo_aio)
+            sesion.iniciar_venta(Carrito())
+
+            resultado = await sesion.agregar_producto("Producto Abundante", 4)
+            assert resultado.exito, resultado.mensaje
+            resultado = await sesion.agregar_producto("Producto Escaso", 6)
+            assert not resultado.exito, "Deberia rechazar: stock 5"
+            resultado = await sesion.agregar_producto("No Existe", 1)
+            assert not resultado.exito, "Deberia rechazar: producto inexistente"
+
+            subtotal, iva, descuento, total = await sesion.confirmar_pago("efectivo")
+            assert subtotal == 200, f"Subtotal: {subtotal}"
+            assert sesion.venta_cerrada and sesion.carrito.esta_vacio()
+
+        assert repo.get_branch_product_stock(1, "Producto Abundante") == 96
+        assert repo.get_cash_register_balance(2) == 10000 + total
+
+    test("SesionVentaAsync confirma la venta via RegistroVentasAsync", test_async_sale)
+
+    async def test_async_reservations():
+        from carrito import Carrito
+        from inventario_sqlite import InventarioSQLite
+        from registro_ventas import RegistroVentasAsync
+        from sesion_venta import SesionVentaAsync
+
+        async with AsyncRepository(max_workers=4) as repo_aio:
+            registro = RegistroVentasAsync(repo_aio, branch_id=1, cash_register_id=2)
+            sesiones = [
+                SesionVentaAsync(InventarioSQLite(branch_id=1), registro, repo_aio,
+                                 reservar_stock=True, ttl_reserva=60)
+                for _ in range(2)
+            ]
+            for sesion in sesiones:
+                sesion.iniciar_venta(Carrito())
+                assert sesion.carrito.reservas is not None, "El carrito deberia reservar"
+                assert sesion.carrito.reservas.ttl == 60, "Deberia usar ttl_reserva"
+
+            resultado = await sesiones[0].agregar_producto("Producto Escaso", 4)
+            assert resultado.exito, resultado.mensaje
+            resultado = await sesiones[1].agregar_producto("Producto Escaso", 2)
+            assert not resultado.exito, "Deberia rechazar: 4 de 5 apartados por el otro carrito"
+
+            await sesiones[0].confirmar_pago("efectivo")
+
+        assert repo.get_branch_product_stock(1, "Producto Escaso") == 1
+
+    test("SesionVentaAsync aparta stock con reservar_stock/ttl_reserva", test_async_reservations)
+
+    # ========================================
+    # RESUMEN
+    # ========================================
+    print(f"\n{'=' * 60}")
+    print(f"  RESULTADO: {passed} pasaron, {failed} fallaron")
+    print(f"{'=' * 60}")
+
+    return 0 if failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""
+Tests del autocompletado por prefijo (database/autocomplete.py).
+
+ARQUITECTURA DEL TEST:
+- Igual que test_concurrency.py: BD temporal, repo.DB_PATH parcheado
+- Verifica las coincidencias por comienzo de palabra y el límite
+- Verifica que crear, asignar, desactivar y reactivar productos con las
+  funciones del repository actualiza el índice sin reconstruirlo
+"""
+import os
+import sys
+import sqlite3
+
+# Agregar root al path para importar modulos del proyecto
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database import producto_repository as repo
+from database.autocomplete import ProductAutocomplete
+from inventario_sqlite import InventarioSQLite
+from test_concurrency import setup_test_db, cleanup_test_db
+
+
+def main():
+    print("=" * 60)
+    print("  TESTS DE AUTOCOMPLETADO POR PREFIJO")
+    print("=" * 60)
+
+    passed = 0
+    failed = 0
+
+    def test(name, fn):
+        nonlocal passed, failed
+        temp_dir = setup_test_db()
+        try:
+            fn()
+            print(f"  [OK] {name}")
+            passed += 1
+        except Exception as e:
+            print(f"  [FAIL] {name}: {type(e).__name__} {e}")
+            failed += 1
+        finally:
+            repo._catalog_listeners.clear()
+            cleanup_test_db(temp_dir)
+
+    # ========================================
+    # TEST 1: Coincidencias
+    # ========================================
+    print("\n--- Test 1: Prefijos de cada palabra ---")
+
+    def test_complete():
+        for name in ("Coca Cola 500ml", "Coca Cola Zero", "Cola de Pescado", "Leche Leche"):
+            repo.create_product_with_branch(name, "Test", 1, 100, 10)
+        index = ProductAutocomplete(1)
+
+        assert len(index) == 6, f"Tamaño: {len(index)}"
+        assert index.complete("COCA") == ["Coca Cola 500ml", "Coca Cola Zero"]
+        assert index.complete("coca cola z") == ["Coca Cola Zero"]
+        # "cola" coincide al comienzo de "Cola de Pescado" y en la 2da palabra de los Coca
+        assert sorted(index.complete("cola")) == ["Coca Cola 500ml", "Coca Cola Zero", "Cola de Pescado"]
+        assert index.complete("leche") == ["Leche Leche"], "Nombre repetido por coincidir 2 veces"
+        assert index.complete("cola", limit=1) == ["Coca Cola 500ml"]
+        assert index.complete("ola") == [], "No debe coincidir en el medio de una palabra"
+        assert index.complete("  ") == []
+        index.close()
+
+    test("Coincide al comienzo de cualquier palabra, sin repetir y con limite", test_complete)
+
+    # ========================================
+    # TEST 2: Actualización incremental
+    # ========================================
+    print("\n--- Test 2: Avisos del repository ---")
+
+    def test_incremental():
+        conn = sqlite3.connect(repo.DB_PATH)
+        conn.execute("INSERT INTO branch (name, address) VALUES ('Otra', 'Otra Addr')")
+        conn.commit()
+        conn.close()
+
+        index = ProductAutocomplete(1)
+        other_branch = ProductAutocomplete(2)
+
+        product_id = repo.create_product_with_branch("Yerba Mate 1kg", "Almacen", 1, 300, 10)
+        assert index.complete("mate") == ["Yerba Mate 1kg"], "No vio el producto creado"
+        assert other_branch.complete("mate") == [], "Lo agrego en otra sucursal"
+
+        repo.set_product_active(1, product_id, False)
+        assert index.complete("yerba") == [], "Sigue el producto desactivado"
+        repo.set_product_active(1, product_id, True)
+        assert index.complete("yerba") == ["Yerba Mate 1kg"], "No vio la reactivacion"
+
+        repo.assign_product_to_branch(2, product_id, 310, 5)
+        assert other_branch.complete("yerba") == ["Yerba Mate 1kg"], "No vio la asignacion"
+
+        index.close()
+        repo.set_product_active(1, product_id, False)
+        assert index.complete("yerba") == ["Yerba Mate 1kg"], "Cerrado, no deberia recibir avisos"
+        index.rebuild()
+        assert index.complete("yerba") == [] and len(index) == 2
+        other_branch.close()
+
+    def test_inventario():
+        repo.create_product_with_branch("Pescado Fresco", "Pescaderia", 1, 500, 10)
+        listeners = len(repo._catalog_listeners)
+        inventario = InventarioSQLite(branch_id=1, usar_autocompletar=True)
+        assert len(repo._catalog_listeners) == listeners + 1
+        # Sugerencias: solo comienzos de palabra, en memoria
+        assert inventario.sugerir("esc") == ["Producto Escaso"]
+        # La búsqueda del cajero va a la BD aun con el índice: también
+        # encuentra el texto en el medio de una palabra
+        assert sorted(inventario.vender_producto("esc")) == ["Pescado Fresco", "Producto Escaso"]
+        assert inventario.vender_producto("undan") == ["Producto Abundante"]
+        # close() saca el índice de los avisos del repository
+        inventario.close()
+        assert len(repo._catalog_listeners) == listeners
+
+        # Sin índice, sugerir() busca en la BD
+        assert InventarioSQLite(branch_id=1).sugerir("escado", limite=1) == ["Pescado Fresco"]
+
+    test("Crear, asignar, desactivar y reactivar actualizan el indice", test_incremental)
+    test("sugerir usa el indice; vender_producto siempre busca en la BD", test_inventario)
+
+    # ========================================
+    # RESUMEN
+    # ========================================
+    print(f"\n{'=' * 60}")
+    print(f"  RESULTADO: {passed} pasaron, {failed} fallaron")
+    print(f"{'=' * 60}")
+
+    return 0 if failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
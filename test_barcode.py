@@ -0,0 +1,162 @@
+"""
+Tests del escaneo por código de barras (product.barcode, migración 3).
+
+ARQUITECTURA DEL TEST:
+- Igual que test_concurrency.py: BD temporal, repo.DB_PATH parcheado
+- Verifica la búsqueda por código en el repository (única, por sucursal,
+  solo activos) y en InventarioSQLite con y sin caché
+- Verifica que SesionVenta.agregar_producto con un código no busca por
+  nombre (tampoco al reservar stock) y que el carrito junta lo escaneado
+  con lo agregado por nombre
+"""
+import os
+import re
+import sys
+import sqlite3
+
+# Agregar root al path para importar modulos del proyecto
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database import producto_repository as repo
+from carrito import Carrito
+from inventario_sqlite import InventarioSQLite, es_codigo_de_barras
+from sesion_venta import SesionVenta
+from test_concurrency import setup_test_db, cleanup_test_db
+
+
+CODIGO_ESCASO = "7790000000012"
+CODIGO_ABUNDANTE = "7790000000029"
+
+
+def setup_barcodes():
+    """Asigna códigos a los 2 productos de setup_test_db"""
+    repo.set_product_barcode(1, CODIGO_ESCASO)
+    repo.set_product_barcode(2, CODIGO_ABUNDANTE)
+
+
+def main():
+    print("=" * 60)
+    print("  TESTS DE CODIGO DE BARRAS")
+    print("=" * 60)
+
+    passed = 0
+    failed = 0
+
+    def test(name, fn):
+        nonlocal passed, failed
+        temp_dir = setup_test_db()
+        try:
+            setup_barcodes()
+            fn()
+            print(f"  [OK] {name}")
+            passed += 1
+        except Exception as e:
+            print(f"  [FAIL] {name}: {type(e).__name__} {e}")
+            failed += 1
+        finally:
+            cleanup_test_db(temp_dir)
+
+    # ========================================
+    # TEST 1: Repository
+    # ========================================
+    print("\n--- Test 1: Busqueda por codigo en el repository ---")
+
+    def test_repository():
+        assert repo.get_product_by_barcode(CODIGO_ESCASO, 1) == (1, "Producto Escaso", 100, 5)
+        assert repo.get_product_by_barcode("0000000000000", 1) is None
+
+        repo.set_product_active(1, 1, False)
+        assert repo.get_product_by_barcode(CODIGO_ESCASO, 1) is None, "Devolvio un inactivo"
+
+        try:
+            repo.set_product_barcode(2, CODIGO_ESCASO)
+            raise AssertionError("Permitio dos productos con el mismo codigo")
+        except sqlite3.IntegrityError:
+            pass
+
+        product_id = repo.create_product_with_branch(
+            "Yerba Mate 1kg", "Almacen", 1, 300, 10, barcode="7791234567898"
+        )
+        assert repo.get_product_by_barcode("7791234567898", 1)[0] == product_id
+
+    def test_detection():
+        assert es_codigo_de_barras(CODIGO_ESCASO) and es_codigo_de_barras(" 77912345 ")
+        assert not es_codigo_de_barras("Coca Cola 500ml")
+        assert not es_codigo_de_barras("500"), "Un numero corto no es un codigo"
+        assert not es_codigo_de_barras("７７９００００００００１２"), "Digitos no ASCII"
+
+    test("Codigo unico, por sucursal y solo productos activos", test_repository)
+    test("Distingue codigos escaneados de nombres", test_detection)
+
+    # ========================================
+    # TEST 2: Sesión de venta
+    # ========================================
+    print("\n--- Test 2: Escaneo en SesionVenta ---")
+
+    def test_scan_to_cart():
+        inventario = InventarioSQLite(branch_id=1, usar_cache=True)
+        sesion = SesionVenta(inventario, registro_venta=None)
+        sesion.iniciar_venta(Carrito())
+
+        # El camino del escáner no puede buscar por nombre
+        def by_name(*args):
+            raise AssertionError("El escaneo busco por nombre")
+
+        original = repo.get_product_by_name
+        repo.get_product_by_name = by_name
+        try:
+            for _ in range(3):
+                assert sesion.agregar_producto(CODIGO_ESCASO, 1).exito
+        finally:
+            repo.get_product_by_name = original
+
+        stats = inventario.cache.stats()
+        assert stats["misses"] == 1 and stats["hits"] == 2, f"Stats: {stats}"
+
+        # Por nombre y por código es el mismo item del carrito (y el mismo stock)
+        assert sesion.agregar_producto("Producto Escaso", 2).exito
+        assert sesion.carrito.cantidad_de("Producto Escaso") == 5
+        resultado = sesion.agregar_producto(CODIGO_ESCASO, 1)
+        assert not resultado.exito and "Stock insuficiente" in resultado.mensaje, resultado.mensaje
+
+        assert not sesion.agregar_producto("0000000000000", 1).exito
+        inventario.cache.close()
+
+    test("Escanear va por codigo y cache, y suma al mismo item del carrito", test_scan_to_cart)
+
+    def test_scan_with_reservations():
+        inventario = InventarioSQLite(branch_id=1, usar_cache=True)
+        sesion = SesionVenta(inventario, registro_venta=None, reservar_stock=True)
+        sesion.iniciar_venta(Carrito())
+
+        statements = []
+        with repo._connection(1) as conn:
+            conn.set_trace_callback(statements.append)
+            try:
+                for _ in range(3):
+                    assert sesion.agregar_producto(CODIGO_ESCASO, 1).exito
+                assert sesion.carrito.modificar_cantidad("Producto Escaso", 2)
+                sesion.carrito.quitar("Producto Escaso")
+            finally:
+                conn.set_trace_callback(None)
+
+        por_nombre = [s for s in statements if re.search(r"name\s*=", s)]
+        assert not por_nombre, f"Busco por nombre: {por_nombre}"
+        assert any("stock_reservation" in s for s in statements), "No reservo"
+        assert repo.get_available_stock(1, "Producto Escaso") == 5
+        inventario.cache.close()
+
+    test("Con reservas, escanear tampoco busca por nombre", test_scan_with_reservations)
+
+    # ========================================
+    # RESUMEN
+    # ========================================
+    print(f"\n{'=' * 60}")
+    print(f"  RESULTADO: {passed} pasaron, {failed} fallaron")
+    print(f"{'=' * 60}")
+
+    return 0 if failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""
+Tests del ajuste de stock en lote (producto_repository.adjust_stock_bulk).
+
+ARQUITECTURA DEL TEST:
+- Igual que test_concurrency.py: BD temporal, repo.DB_PATH parcheado
+- Verifica que las filas válidas se aplican en una transacción y que cada
+  fila inválida se informa con su número y motivo
+- Verifica el modo todo-o-nada y que un generador se consume de a tandas
+  (nunca entero en memoria)
+"""
+import os
+import sys
+
+# Agregar root al path para importar modulos del proyecto
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database import producto_repository as repo
+from inventario_sqlite import InventarioSQLite
+from test_concurrency import setup_test_db, cleanup_test_db
+
+
+def stock(name):
+    return repo.get_branch_product_stock(1, name)
+
+
+def main():
+    print("=" * 60)
+    print("  TESTS DE AJUSTE DE STOCK EN LOTE")
+    print("=" * 60)
+
+    passed = 0
+    failed = 0
+
+    def test(name, fn):
+        nonlocal passed, failed
+        temp_dir = setup_test_db()
+        try:
+            fn()
+            print(f"  [OK] {name}")
+            passed += 1
+        except Exception as e:
+            print(f"  [FAIL] {name}: {type(e).__name__} {e}")
+            failed += 1
+        finally:
+            cleanup_test_db(temp_dir)
+
+    # ========================================
+    # TEST 1: Filas válidas e inválidas
+    # Escaso = 5, Abundante = 100
+    # ========================================
+    print("\n--- Test 1: Aplicacion y fallas por fila ---")
+
+    def test_partial():
+        result = InventarioSQLite(branch_id=1).ajustar_stock_lote([
+            ("Producto Escaso", 10),      # 5 → 15
+            ("Producto Abundante", -30),  # 100 → 70
+            ("No Existe", 5),
+            ("Producto Escaso", -16),     # 15 - 16 < 0: falla con el stock acumulado
+            ("Producto Escaso", -15),     # 15 → 0
+            ("Producto Abundante", 2.5),
+            "fila rota",
+        ])
+        assert result["applied"] == 3, result
+        assert [(row, reason.split(" ")[0]) for row, _, _, reason in result["failures"]] == [
+            (3, "producto"), (4, "el"), (6, "la"), (7, "fila"),
+        ], result["failures"]
+        assert "disponible: 15" in result["failures"][1][3], result["failures"][1]
+        assert stock("Producto Escaso") == 0 and stock("Producto Abundante") == 70
+
+    def test_all_or_nothing():
+        result = repo.adjust_stock_bulk(
+            1, [("Producto Abundante", 50), ("Producto Escaso", -6)], all_or_nothing=True
+        )
+        assert result == {"applied": 0, "failures": [
+            (2, "Producto Escaso", -6, "el stock quedaría negativo (disponible: 5)")
+        ]}, result
+        assert stock("Producto Abundante") == 100, "Se aplico una fila con todo_o_nada"
+
+    def test_bad_types():
+        result = repo.adjust_stock_bulk(1, [
+            (["Producto Escaso"], 1),   # nombre sin hashear: antes cortaba la tanda
+            ("Producto Escaso", 1),
+            (None, 1),
+            "ab",                       # se desempaqueta, pero no es una fila
+            ("Producto Abundante", -1, "extra"),
+            ("Producto Abundante", -1),
+        ])
+        assert result["applied"] == 2, result
+        assert [(row, reason) for row, _, _, reason in result["failures"]] == [
+            (1, "el nombre debe ser un texto"), (3, "el nombre debe ser un texto"),
+            (4, "fila mal formada"), (5, "fila mal formada"),
+        ], result["failures"]
+        assert result["failures"][0][1:3] == (["Producto Escaso"], 1), result["failures"][0]
+        assert stock("Producto Escaso") == 6 and stock("Producto Abundante") == 99
+
+    test("Aplica las filas validas e informa cada fila invalida", test_partial)
+    test("Una fila de tipo incorrecto se informa sin cortar la tanda", test_bad_types)
+    test("Todo o nada: una falla no aplica ninguna fila", test_all_or_nothing)
+
+    # ========================================
+    # TEST 2: Generador más grande que una tanda
+    # ========================================
+    print("\n--- Test 2: Entrada en streaming ---")
+
+    def test_streaming():
+        ROWS = repo.BULK_CHUNK_SIZE * 4 + 7
+        read = {"rows": 0}
+        read_at_chunk = []
+
+        def delivery():
+            for i in range(ROWS):
+                read["rows"] += 1
+                yield ("Producto Escaso" if i % 2 else "Producto Abundante", 1)
+
+        # Cuántas filas se habían leído del generador al validar cada tanda
+        def trace(statement):
+            if "json_each" in statement:
+                read_at_chunk.append(read["rows"])
+
+        with repo._connection(1) as conn:
+            conn.set_trace_callback(trace)
+            try:
+                result = repo.adjust_stock_bulk(1, delivery())
+            finally:
+                conn.set_trace_callback(None)
+
+        assert result == {"applied": ROWS, "failures": []}, result
+        assert stock("Producto Escaso") == 5 + ROWS // 2
+        assert stock("Producto Abundante") == 100 + ROWS - ROWS // 2
+        expected = [min(ROWS, repo.BULK_CHUNK_SIZE * k) for k in range(1, 6)]
+        assert read_at_chunk == expected, f"Filas leidas por tanda: {read_at_chunk}"
+
+    test("Un generador se consume de a BULK_CHUNK_SIZE filas", test_streaming)
+
+    # ========================================
+    # RESUMEN
+    # ========================================
+    print(f"\n{'=' * 60}")
+    print(f"  RESULTADO: {passed} pasaron, {failed} fallaron")
+    print(f"{'=' * 60}")
+
+    return 0 if failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
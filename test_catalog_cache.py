@@ -0,0 +1,112 @@
+"""
+Tests de la caché del catálogo (database/catalog_cache.py) en InventarioSQLite.
+
+ARQUITECTURA DEL TEST:
+- Igual que test_concurrency.py: BD temporal, repo.DB_PATH parcheado
+- Verifica que los escaneos repetidos no van a la BD (hits) y que los
+  cambios de stock y precio hechos por OTRAS conexiones (otra caja, el
+  gerente desde otro proceso) se ven en el escaneo siguiente
+"""
+import os
+import sys
+import sqlite3
+
+# Agregar root al path para importar modulos del proyecto
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database import producto_repository as repo
+from inventario_sqlite import InventarioSQLite
+from test_concurrency import setup_test_db, cleanup_test_db
+
+
+def main():
+    print("=" * 60)
+    print("  TESTS DE CACHE DEL CATALOGO")
+    print("=" * 60)
+
+    passed = 0
+    failed = 0
+
+    def test(name, fn):
+        nonlocal passed, failed
+        temp_dir = setup_test_db()
+        try:
+            fn()
+            print(f"  [OK] {name}")
+            passed += 1
+        except Exception as e:
+            print(f"  [FAIL] {name}: {type(e).__name__} {e}")
+            failed += 1
+        finally:
+            cleanup_test_db(temp_dir)
+
+    print("\n--- Test 1: Escaneos repetidos ---")
+
+    def test_hits():
+        inventario = InventarioSQLite(branch_id=1, usar_cache=True)
+        for _ in range(40):
+            producto = inventario.obtener_producto("Producto Abundante")
+        assert producto.precio == 50 and producto.stock == 100
+        assert inventario.obtener_producto("No Existe") is None
+        assert inventario.obtener_producto("No Existe") is None
+
+        stats = inventario.cache.stats()
+        assert stats["misses"] == 2, f"Stats: {stats}"
+        assert stats["hits"] == 40, f"Stats: {stats}"
+        inventario.cache.close()
+
+    test("40 escaneos del mismo producto: 1 consulta, 39 hits (+ negativos)", test_hits)
+
+    print("\n--- Test 2: Cambios de otras conexiones ---")
+
+    def test_sees_other_registers():
+        inventario = InventarioSQLite(branch_id=1, usar_cache=True)
+        assert inventario.obtener_producto("Producto Abundante").stock == 100
+
+        # Otra caja vende (conexión del pool, no la de la caché)
+        repo.process_sale_atomic(
+            1, 2, [{"product_name": "Producto Abundante", "quantity": 3, "price_at_sale": 50}],
+            150, "2026-03-05 10:00:00"
+        )
+        assert inventario.obtener_producto("Producto Abundante").stock == 97, "No vio la venta"
+
+        # El gerente cambia el precio desde otro proceso (conexión independiente)
+        conn = sqlite3.connect(repo.DB_PATH)
+        conn.execute("UPDATE branch_product SET price = 55 WHERE product_id = 2")
+        conn.commit()
+        conn.close()
+        assert inventario.obtener_producto("Producto Abundante").precio == 55, "No vio el precio"
+
+        # Desactivar el producto en la sucursal: deja de encontrarse
+        conn = sqlite3.connect(repo.DB_PATH)
+        conn.execute("UPDATE branch_product SET active = 0 WHERE product_id = 2")
+        conn.commit()
+        conn.close()
+        assert inventario.obtener_producto("Producto Abundante") is None, "Sigue activo en la cache"
+
+        stats = inventario.cache.stats()
+        assert stats["invalidations"] == 3, f"Stats: {stats}"
+        inventario.cache.close()
+
+    def test_own_writes():
+        inventario = InventarioSQLite(branch_id=1, usar_cache=True)
+        assert inventario.obtener_producto("Producto Escaso").stock == 5
+        inventario.disminuir_stock("Producto Escaso", 2)
+        assert inventario.obtener_producto("Producto Escaso").stock == 3, "No vio su propia escritura"
+        inventario.cache.close()
+
+    test("Ve ventas de otra caja y cambios de precio/estado del gerente", test_sees_other_registers)
+    test("Ve las escrituras hechas por el mismo inventario", test_own_writes)
+
+    # ========================================
+    # RESUMEN
+    # ========================================
+    print(f"\n{'=' * 60}")
+    print(f"  RESULTADO: {passed} pasaron, {failed} fallaron")
+    print(f"{'=' * 60}")
+
+    return 0 if failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
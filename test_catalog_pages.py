@@ -0,0 +1,182 @@
+"""
+Tests del listado del catálogo por páginas (get_active_products_page e
+iter_active_products, paginación por keyset).
+
+ARQUITECTURA DEL TEST:
+- BD temporal con los datos semilla de init_db (35 productos, 2 sucursales)
+  y repo.DB_PATH parcheado, como en test_sharding.py
+- Verifica que recorrer por páginas da exactamente lo mismo que
+  get_active_products, con cada orden, filtro y tamaño de página
+- Verifica que ninguna página ordena la sucursal entera (sin TEMP B-TREE)
+"""
+import os
+import sys
+import csv
+import sqlite3
+import tempfile
+import shutil
+
+# Agregar root al path para importar modulos del proyecto
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database import producto_repository as repo
+from database import migrations
+from database import sharding
+from database.init_db import _seed_data
+from inventario_sqlite import InventarioSQLite
+
+
+def setup_test_db(sharded=False):
+    """
+    Crea una BD temporal con datos semilla (opcionalmente repartida en shards).
+    Devuelve el directorio temporal.
+    """
+    temp_dir = tempfile.mkdtemp()
+    db_path = os.path.join(temp_dir, "test_catalog_pages.db")
+    schema_path = os.path.join(os.path.dirname(__file__), "database", "schema.sql")
+
+    repo.DB_PATH = db_path
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA foreign_keys = ON")
+    cursor = conn.cursor()
+    with open(schema_path, "r", encoding="utf-8") as f:
+        cursor.executescript(f.read())
+    migrations.migrate(conn)
+    _seed_data(cursor)
+    conn.commit()
+    conn.close()
+
+    if sharded:
+        sharding.split_into_shards(db_path)
+        repo.SHARDING = True
+    return temp_dir
+
+
+def cleanup_test_db(temp_dir):
+    """Desactiva el sharding, limpia la BD temporal y restaura el path original"""
+    repo.close_pool()
+    repo.SHARDING = False
+    repo.DB_PATH = os.path.join(os.path.dirname(__file__), "supermercado.db")
+    shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def main():
+    print("=" * 60)
+    print("  TESTS DEL CATALOGO POR PAGINAS")
+    print("=" * 60)
+
+    passed = 0
+    failed = 0
+
+    def test(name, fn, sharded=False):
+        nonlocal passed, failed
+        temp_dir = setup_test_db(sharded)
+        try:
+            fn()
+            print(f"  [OK] {name}")
+            passed += 1
+        except Exception as e:
+            print(f"  [FAIL] {name}: {type(e).__name__} {e}")
+            failed += 1
+        finally:
+            cleanup_test_db(temp_dir)
+
+    # ========================================
+    # TEST 1: Mismo resultado que get_active_products
+    # ========================================
+    print("\n--- Test 1: Paginas completas y en orden ---")
+
+    def test_same_rows():
+        for branch_id in (1, 2):
+            everything = repo.get_active_products(branch_id)
+            for page_size in (1, 7, 34, 35, 500):
+                by_name = list(repo.iter_active_products(branch_id, page_size=page_size))
+                assert by_name == sorted(everything), f"Sucursal {branch_id}, paginas de {page_size}"
+
+                by_price = list(repo.iter_active_products(
+                    branch_id, page_size=page_size, order_by="price", descending=True
+                ))
+                assert sorted(by_price) == sorted(everything)
+                prices = [price for _, price, _ in by_price]
+                assert prices == sorted(prices, reverse=True), "No respeta el orden por precio"
+
+        # Arroz está inactivo en Norte
+        assert "Arroz 1kg" not in [name for name, _, _ in repo.iter_active_products(2)]
+
+    def test_category():
+        bebidas = list(repo.iter_active_products(1, page_size=3, category="Bebidas"))
+        assert len(bebidas) == 8, bebidas
+        assert [name for name, _, _ in bebidas] == sorted(name for name, _, _ in bebidas)
+        assert list(repo.iter_active_products(1, category="No Existe")) == []
+
+    def test_errors():
+        for kwargs in ({"order_by": "stock"}, {"page_size": 0}):
+            try:
+                next(repo.iter_active_products(1, **kwargs))
+                raise AssertionError(f"Acepto {kwargs}")
+            except ValueError:
+                pass
+
+    test("Por nombre y por precio, con cualquier tamaño de pagina", test_same_rows)
+    test("Igual con un archivo por sucursal (SHARDING)", test_same_rows, sharded=True)
+    test("Filtro por categoria", test_category)
+    test("Orden o tamaño de pagina invalidos", test_errors)
+
+    # ========================================
+    # TEST 2: Cada página es una búsqueda por índice
+    # ========================================
+    print("\n--- Test 2: Planes de las paginas ---")
+
+    def test_plans():
+        statements = []
+        with repo._connection(1) as conn:
+            conn.set_trace_callback(statements.append)
+            try:
+                for order_by in ("name", "price"):
+                    for category in (None, "Lacteos"):
+                        list(repo.iter_active_products(
+                            1, page_size=4, category=category, order_by=order_by
+                        ))
+            finally:
+                conn.set_trace_callback(None)
+
+            pages = [s for s in statements if "ORDER BY" in s]
+            assert len(pages) > 10, f"Solo {len(pages)} paginas"
+            for statement in pages:
+                plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {statement}")]
+                assert not any("TEMP B-TREE" in step for step in plan), f"Ordena en memoria: {plan}"
+
+    test("Ninguna pagina ordena el catalogo en memoria", test_plans)
+    test("Tampoco con un archivo por sucursal (SHARDING)", test_plans, sharded=True)
+
+    # ========================================
+    # TEST 3: Mostrar y exportar
+    # ========================================
+    print("\n--- Test 3: InventarioSQLite ---")
+
+    def test_export():
+        inventario = InventarioSQLite(branch_id=1)
+        with tempfile.TemporaryDirectory() as out_dir:
+            path = os.path.join(out_dir, "catalogo.csv")
+            count = inventario.exportar_catalogo(path, orden="price")
+            with open(path, newline="", encoding="utf-8") as f:
+                rows = list(csv.reader(f))
+        assert count == 35 and len(rows) == 36 and rows[0] == ["nombre", "precio", "stock"]
+        assert sorted((name, float(price), int(stock)) for name, price, stock in rows[1:]) == \
+            sorted(repo.get_active_products(1))
+
+    test("exportar_catalogo escribe el catalogo completo en CSV", test_export)
+
+    # ========================================
+    # RESUMEN
+    # ========================================
+    print(f"\n{'=' * 60}")
+    print(f"  RESULTADO: {passed} pasaron, {failed} fallaron")
+    print(f"{'=' * 60}")
+
+    return 0 if failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
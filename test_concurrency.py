@@ -22,11 +22,14 @@ import threading
 import tempfile
 import shutil
 import time
+import io
+import contextlib
 
 # Agregar root al path para importar modulos del proyecto
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from database import producto_repository as repo
+from database import migrations
 
 
 def setup_test_db():
@@ -48,6 +51,7 @@ def setup_test_db():
 
     with open(schema_path, "r", encoding="utf-8") as f:
         cursor.executescript(f.read())
+    migrations.migrate(conn)
     conn.execute("PRAGMA foreign_keys = ON")
 
     # Crear branch, cash registers y productos de prueba
@@ -77,6 +81,7 @@ def setup_test_db():
 def cleanup_test_db(temp_dir):
     """Limpia la BD temporal y restaura el path original"""
     original_db = os.path.join(os.path.dirname(__file__), "supermercado.db")
+    repo.close_pool()
     repo.DB_PATH = original_db
     shutil.rmtree(temp_dir, ignore_errors=True)
 
@@ -407,6 +412,411 @@ def main():
 
     test("Caja 1 y Caja 2 tienen balances independientes", test_independent_balances)
 
+    # ========================================
+    # TEST 7: Pool de conexiones acotado
+    # 10 threads comparten un pool de 3 conexiones: todos terminan
+    # y nunca hay más de 3 conexiones abiertas
+    # ========================================
+    print("\n--- Test 7: Pool de conexiones acotado ---")
+    print("    10 threads venden con POOL_SIZE=3.")
+
+    def test_bounded_pool():
+        temp_dir = setup_test_db()
+        original_size = repo.POOL_SIZE
+        repo.POOL_SIZE = 3
+        try:
+            results = []
+            lock = threading.Lock()
+
+            def sell(thread_id):
+                sale_id = repo.process_sale_atomic(
+                    branch_id=1,
+                    cash_register_id=1,
+                    items=[{"product_name": "Producto Abundante", "quantity": 1, "price_at_sale": 50}],
+                    total_amount=50,
+                    timestamp=f"2026-03-05 00:00:{thread_id:02d}"
+                )
+                with lock:
+                    results.append(sale_id)
+
+            threads = [threading.Thread(target=sell, args=(i,)) for i in range(10)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join(timeout=15)
+
+            assert len(results) == 10, f"Esperado 10 ventas, obtenido {len(results)}"
+            stats = repo.get_pool().stats()
+            assert stats["open"] <= 3, f"Conexiones abiertas: {stats['open']} (maximo 3)"
+
+            stock = repo.get_branch_product_stock(1, "Producto Abundante")
+            assert stock == 90, f"Stock final: esperado 90, obtenido {stock}"
+
+        finally:
+            repo.POOL_SIZE = original_size
+            cleanup_test_db(temp_dir)
+
+    test("10 threads comparten 3 conexiones sin exceder el pool", test_bounded_pool)
+
+    # ========================================
+    # TEST 8: Lectores no esperan a un escritor (WAL)
+    # Una caja mantiene una transacción de escritura abierta 1 segundo.
+    # Mientras tanto, otra caja lee stock y lista productos sin esperar.
+    # ========================================
+    print("\n--- Test 8: Lectores no bloqueados durante una escritura larga ---")
+    print("    Escritor con BEGIN EXCLUSIVE durante 1s. Lectores deben responder al instante.")
+
+    def test_readers_not_blocked():
+        temp_dir = setup_test_db()
+        try:
+            from inventario_sqlite import InventarioSQLite
+
+            lock_taken = threading.Event()
+            writer_errors = []
+            HOLD_SECONDS = 1.0
+
+            def long_writer():
+                conn = repo._get_connection()
+                try:
+                    # EXCLUSIVE es el peor caso: en modo rollback-journal
+                    # bloquea incluso a los lectores
+                    conn.execute("BEGIN EXCLUSIVE")
+                    conn.execute(
+                        "UPDATE branch_product SET stock = stock - 1 WHERE branch_id = 1 AND product_id = 2"
+                    )
+                    lock_taken.set()
+                    time.sleep(HOLD_SECONDS)
+                    conn.commit()
+                except Exception as e:
+                    writer_errors.append(str(e))
+                    lock_taken.set()
+                finally:
+                    conn.close()
+
+            writer = threading.Thread(target=long_writer)
+            writer.start()
+            assert lock_taken.wait(timeout=5), "El escritor no tomo el lock"
+
+            start = time.perf_counter()
+            stock_during = repo.get_branch_product_stock(1, "Producto Abundante")
+            balance_during = repo.get_cash_register_balance(1)
+            with contextlib.redirect_stdout(io.StringIO()) as output:
+                InventarioSQLite(branch_id=1).mostrar_productos()
+            elapsed = time.perf_counter() - start
+
+            writer.join(timeout=10)
+            assert not writer_errors, f"Escritor fallo: {writer_errors}"
+
+            assert elapsed < HOLD_SECONDS / 2, (
+                f"Los lectores esperaron {elapsed:.2f}s al escritor"
+            )
+            # Los lectores ven la ultima version confirmada (antes del UPDATE)
+            assert stock_during == 100, f"Stock durante la escritura: esperado 100, obtenido {stock_during}"
+            assert balance_during == 10000, f"Balance durante la escritura: {balance_during}"
+            assert "Producto Abundante" in output.getvalue(), "mostrar_productos no listo productos"
+
+            # Despues del commit, el cambio es visible
+            stock_after = repo.get_branch_product_stock(1, "Producto Abundante")
+            assert stock_after == 99, f"Stock despues del commit: esperado 99, obtenido {stock_after}"
+
+            with repo._connection() as conn:
+                mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+            assert mode == "wal", f"journal_mode esperado 'wal', obtenido '{mode}'"
+
+        finally:
+            cleanup_test_db(temp_dir)
+
+    test("Lectores no esperan a una transaccion de escritura larga (WAL)", test_readers_not_blocked)
+
+    # ========================================
+    # TEST 9: Mismo producto en varios items
+    # Stock=5: 3 + 3 del mismo producto debe fallar en el SEGUNDO item
+    # (disponible 2) y no modificar nada
+    # ========================================
+    print("\n--- Test 9: Producto repetido en el carrito ---")
+    print("    Producto Escaso (3) + Abundante (1) + Producto Escaso (3). Stock Escaso=5.")
+
+    def test_repeated_product():
+        temp_dir = setup_test_db()
+        try:
+            try:
+                repo.process_sale_atomic(
+                    branch_id=1,
+                    cash_register_id=1,
+                    items=[
+                        {"product_name": "Producto Escaso", "quantity": 3, "price_at_sale": 100},
+                        {"product_name": "Producto Abundante", "quantity": 1, "price_at_sale": 50},
+                        {"product_name": "Producto Escaso", "quantity": 3, "price_at_sale": 100},
+                    ],
+                    total_amount=650,
+                    timestamp="2026-03-05 00:00:00"
+                )
+                raise AssertionError("Deberia haber fallado por stock insuficiente")
+            except ValueError as e:
+                assert "Disponible: 2, solicitado: 3" in str(e), f"Mensaje inesperado: {e}"
+
+            assert repo.get_branch_product_stock(1, "Producto Escaso") == 5, "Stock Escaso cambio"
+            assert repo.get_branch_product_stock(1, "Producto Abundante") == 100, "Stock Abundante cambio"
+
+            # 2 + 3 del mismo producto si alcanza: ambos items quedan registrados
+            sale_id = repo.process_sale_atomic(
+                branch_id=1,
+                cash_register_id=1,
+                items=[
+                    {"product_name": "Producto Escaso", "quantity": 2, "price_at_sale": 100},
+                    {"product_name": "Producto Escaso", "quantity": 3, "price_at_sale": 90},
+                ],
+                total_amount=470,
+                timestamp="2026-03-05 00:00:01"
+            )
+            assert repo.get_branch_product_stock(1, "Producto Escaso") == 0, "Stock Escaso deberia ser 0"
+
+            with repo._connection() as conn:
+                rows = conn.execute(
+                    "SELECT quantity, price_at_sale FROM sale_item WHERE sale_id = ? ORDER BY id",
+                    (sale_id,)
+                ).fetchall()
+            assert rows == [(2, 100.0), (3, 90.0)], f"sale_items inesperados: {rows}"
+
+        finally:
+            cleanup_test_db(temp_dir)
+
+    test("Producto repetido: stock acumulado, mismo error y rollback", test_repeated_product)
+
+    # ========================================
+    # TEST 10: Group commit
+    # 9 cajas venden Producto Abundante y 1 pide 10 de Producto Escaso (stock 5).
+    # Todas caen en el mismo lote: la venta fallida no arrastra a sus vecinas.
+    # ========================================
+    print("\n--- Test 10: Group commit con una venta fallida en el lote ---")
+    print("    10 ventas en lote, 1 sin stock. Las otras 9 deben confirmarse.")
+
+    def test_group_commit():
+        temp_dir = setup_test_db()
+        try:
+            from database.group_commit import GroupCommitWriter
+
+            results = {}
+            errors = {}
+            lock = threading.Lock()
+            start = threading.Barrier(10)
+
+            with GroupCommitWriter(max_batch_size=20, max_wait=0.2) as writer:
+                def sell(thread_id):
+                    if thread_id == 0:
+                        items = [{"product_name": "Producto Escaso", "quantity": 10, "price_at_sale": 100}]
+                    else:
+                        items = [{"product_name": "Producto Abundante", "quantity": 2, "price_at_sale": 50}]
+                    start.wait()
+                    try:
+                        sale_id = writer.process_sale(
+                            branch_id=1,
+                            cash_register_id=1 + thread_id % 2,
+                            items=items,
+                            total_amount=100,
+                            timestamp=f"2026-03-05 00:00:{thread_id:02d}"
+                        )
+                        with lock:
+                            results[thread_id] = sale_id
+                    except ValueError as e:
+                        with lock:
+                            errors[thread_id] = str(e)
+
+                threads = [threading.Thread(target=sell, args=(i,)) for i in range(10)]
+                for t in threads:
+                    t.start()
+                for t in threads:
+                    t.join(timeout=15)
+                stats = writer.stats()
+
+            assert list(errors) == [0], f"Solo la caja 0 debia fallar. Errores: {errors}"
+            assert "Stock insuficiente" in errors[0], f"Error inesperado: {errors[0]}"
+            assert len(set(results.values())) == 9, f"Esperado 9 sale_id distintos: {results}"
+            assert stats["batches"] < 10, f"No hubo agrupamiento: {stats}"
+            assert stats["sales"] == 9 and stats["failed"] == 1, f"Stats: {stats}"
+
+            stock_abundante = repo.get_branch_product_stock(1, "Producto Abundante")
+            stock_escaso = repo.get_branch_product_stock(1, "Producto Escaso")
+            assert stock_abundante == 100 - 9 * 2, f"Stock Abundante: {stock_abundante}"
+            assert stock_escaso == 5, f"Stock Escaso cambio: {stock_escaso}"
+
+            balance = repo.get_cash_register_balance(1) + repo.get_cash_register_balance(2)
+            assert balance == 20000 + 9 * 100, f"Balance total: {balance}"
+
+        finally:
+            cleanup_test_db(temp_dir)
+
+    test("Group commit: cada caja recibe su resultado y el fallo no afecta al lote", test_group_commit)
+
+    # ========================================
+    # TEST 11: Reintentos con backoff cuando la BD está ocupada
+    # Otra conexión retiene el write lock un rato: la venta reintenta y se
+    # confirma si el lock se libera dentro del presupuesto, y falla con
+    # DatabaseBusyError (sin tocar nada) si no.
+    # ========================================
+    print("\n--- Test 11: Reintentos por BD ocupada ---")
+    print("    Lock retenido 0.3s con presupuesto 5s (confirma) y 1.5s con presupuesto 0.3s (falla).")
+
+    def hold_write_lock(seconds, lock_taken):
+        """Retiene el write lock `seconds` segundos desde una conexión propia"""
+        conn = sqlite3.connect(repo.DB_PATH, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            lock_taken.set()
+            time.sleep(seconds)
+            conn.execute("ROLLBACK")
+        finally:
+            conn.close()
+
+    def sell_during_lock(hold_seconds, timings):
+        """Vende mientras otra conexión retiene el lock; agrega a timings lo que tardó la venta"""
+        lock_taken = threading.Event()
+        holder = threading.Thread(target=hold_write_lock, args=(hold_seconds, lock_taken))
+        holder.start()
+        assert lock_taken.wait(timeout=5), "No se tomo el lock"
+        start = time.perf_counter()
+        try:
+            return repo.process_sale_atomic(
+                branch_id=1,
+                cash_register_id=1,
+                items=[{"product_name": "Producto Abundante", "quantity": 1, "price_at_sale": 50}],
+                total_amount=50,
+                timestamp="2026-03-05 00:00:00"
+            )
+        finally:
+            timings.append(time.perf_counter() - start)
+            holder.join(timeout=10)
+
+    def test_retry_succeeds():
+        from database import retry
+
+        temp_dir = setup_test_db()
+        original_policy = repo.RETRY_POLICY
+        try:
+            repo.RETRY_POLICY = retry.RetryPolicy(attempt_timeout=0.05, budget=5.0)
+            retry.reset_stats()
+
+            sale_id = sell_during_lock(0.3, [])
+            assert sale_id is not None
+            assert repo.get_branch_product_stock(1, "Producto Abundante") == 99
+
+            stats = retry.stats()["process_sale_atomic"]
+            assert stats["retries"] > 0, f"No hubo reintentos: {stats}"
+            assert stats["wait_seconds"] >= 0.2, f"Tiempo de espera no registrado: {stats}"
+            assert stats["exhausted"] == 0, f"Stats: {stats}"
+        finally:
+            repo.RETRY_POLICY = original_policy
+            cleanup_test_db(temp_dir)
+
+    def test_retry_budget_exhausted():
+        from database import retry
+
+        temp_dir = setup_test_db()
+        original_policy = repo.RETRY_POLICY
+        try:
+            repo.RETRY_POLICY = retry.RetryPolicy(attempt_timeout=0.05, budget=0.3)
+            retry.reset_stats()
+
+            timings = []
+            try:
+                sell_during_lock(1.5, timings)
+                raise AssertionError("Deberia fallar: el lock dura mas que el presupuesto")
+            except retry.DatabaseBusyError as e:
+                assert isinstance(e, sqlite3.OperationalError)
+                assert e.operation == "process_sale_atomic"
+                assert timings[0] < 1.0, f"Tardo {timings[0]:.2f}s en rendirse (presupuesto 0.3s)"
+
+            assert repo.get_branch_product_stock(1, "Producto Abundante") == 100, "Se modifico el stock"
+            stats = retry.stats()["process_sale_atomic"]
+            assert stats["exhausted"] == 1, f"Stats: {stats}"
+        finally:
+            repo.RETRY_POLICY = original_policy
+            cleanup_test_db(temp_dir)
+
+    test("La venta reintenta y se confirma cuando se libera el lock", test_retry_succeeds)
+    test("Presupuesto agotado: DatabaseBusyError rapido y sin cambios", test_retry_budget_exhausted)
+
+    def test_short_timeout_only_while_retrying():
+        """El busy_timeout corto de RETRY_POLICY vale dentro de la escritura; las lecturas usan el del perfil"""
+        from database import durability, retry
+
+        temp_dir = setup_test_db()
+        original_policy = repo.RETRY_POLICY
+        original_profile = repo.DURABILITY_PROFILE
+        seen = []
+
+        @repo._retry_on_busy
+        def escritura():
+            with repo._connection() as conn:
+                seen.append(conn.execute("PRAGMA busy_timeout").fetchone()[0])
+
+        def busy_timeout():
+            with repo._connection() as conn:
+                return conn.execute("PRAGMA busy_timeout").fetchone()[0]
+
+        try:
+            repo.RETRY_POLICY = retry.RetryPolicy(attempt_timeout=0.05, budget=5.0)
+            repo.DURABILITY_PROFILE = durability.DurabilityProfile(name="test", busy_timeout=2.0)
+            assert busy_timeout() == 2000, busy_timeout()
+            escritura()
+            # La misma conexión, tomada afuera de la escritura (como aio_repository)
+            with repo._connection():
+                escritura()
+                assert busy_timeout() == 2000, busy_timeout()
+            assert seen == [50, 50], seen
+            assert busy_timeout() == 2000, busy_timeout()
+
+            repo.DURABILITY_PROFILE = "safe"
+            assert busy_timeout() == int(repo.CONNECTION_TIMEOUT * 1000), busy_timeout()
+        finally:
+            repo.RETRY_POLICY = original_policy
+            repo.DURABILITY_PROFILE = original_profile
+            cleanup_test_db(temp_dir)
+
+    test("busy_timeout corto solo dentro de las escrituras que se reintentan",
+         test_short_timeout_only_while_retrying)
+
+    def test_group_commit_busy_retries_batch():
+        """'BD ocupada' dentro del SAVEPOINT de una venta reintenta el lote, no falla esa venta"""
+        from database import retry
+        from database.group_commit import GroupCommitWriter
+
+        temp_dir = setup_test_db()
+        original_policy = repo.RETRY_POLICY
+        original_apply = repo._apply_sale
+        calls = []
+
+        def apply_busy_once(cursor, *args, **kwargs):
+            calls.append(args[3])
+            if len(calls) == 2:
+                raise sqlite3.OperationalError("database is locked")
+            return original_apply(cursor, *args, **kwargs)
+
+        try:
+            repo.RETRY_POLICY = retry.RetryPolicy(attempt_timeout=0.05, budget=5.0)
+            retry.reset_stats()
+            repo._apply_sale = apply_busy_once
+            items = [{"product_name": "Producto Abundante", "quantity": 1, "price_at_sale": 50}]
+            with GroupCommitWriter(max_batch_size=3, max_wait=0.5) as writer:
+                futures = [
+                    writer.submit(1, 1, items, 50, f"2026-03-05 00:00:0{i}") for i in range(3)
+                ]
+                sale_ids = [f.result(timeout=10) for f in futures]
+                stats = writer.stats()
+
+            assert len(set(sale_ids)) == 3, f"sale_ids: {sale_ids}"
+            assert stats["sales"] == 3 and stats["failed"] == 0, f"Stats: {stats}"
+            assert retry.stats()["group_commit"]["retries"] >= 1, retry.stats()
+            # El primer intento se deshizo entero: cada venta descontó una sola vez
+            assert repo.get_branch_product_stock(1, "Producto Abundante") == 97
+            assert repo.get_cash_register_balance(1) == 10000 + 3 * 50
+        finally:
+            repo._apply_sale = original_apply
+            repo.RETRY_POLICY = original_policy
+            cleanup_test_db(temp_dir)
+
+    test("Group commit: BD ocupada en una venta reintenta el lote entero", test_group_commit_busy_retries_batch)
+
     # ========================================
     # RESUMEN
     # ========================================
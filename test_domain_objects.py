@@ -0,0 +1,172 @@
+"""
+Tests de los objetos de dominio compactos (__slots__) y del Producto internado.
+
+ARQUITECTURA DEL TEST:
+- Igual que test_concurrency.py: BD temporal, repo.DB_PATH parcheado
+- Verifica que Producto, ItemCarrito, ProductoProveedor y Proveedor no
+  tienen __dict__ (un atributo mal escrito falla en vez de crearse)
+- Verifica que InventarioSQLite devuelve un solo Producto por producto
+  mientras no cambien precio ni stock, y que un cambio de precio no
+  recalcula los carritos abiertos
+- Verifica que GestorProveedor comparte ese Producto entre proveedores y
+  que guardar() sigue persistiendo el stock de cada relación
+"""
+import os
+import sys
+
+# Agregar root al path para importar modulos del proyecto
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database import producto_repository as repo
+from carrito import Carrito, ItemCarrito
+from gestor_proveedor import GestorProveedor
+from inventario_sqlite import InventarioSQLite
+from producto import Producto
+from producto_proveedor import ProductoProveedor
+from proveedor import Proveedor
+from registro_ventas import RegistroVentas
+from sesion_venta import SesionVenta
+from test_concurrency import setup_test_db, cleanup_test_db
+
+
+ESCASO = "Producto Escaso"  # stock 5
+ABUNDANTE = "Producto Abundante"  # stock 100
+
+
+def main():
+    print("=" * 60)
+    print("  TESTS DE OBJETOS DE DOMINIO")
+    print("=" * 60)
+
+    passed = 0
+    failed = 0
+
+    def test(name, fn):
+        nonlocal passed, failed
+        temp_dir = setup_test_db()
+        try:
+            fn()
+            print(f"  [OK] {name}")
+            passed += 1
+        except Exception as e:
+            print(f"  [FAIL] {name}: {type(e).__name__} {e}")
+            failed += 1
+        finally:
+            cleanup_test_db(temp_dir)
+
+    # ========================================
+    # TEST 1: __slots__
+    # ========================================
+    print("\n--- Test 1: Sin __dict__ por instancia ---")
+
+    def test_slots():
+        producto = Producto("Pan", 10, 5)
+        proveedor = Proveedor("Molino", id=3)
+        objetos = [
+            producto,
+            ItemCarrito(producto, 2),
+            proveedor,
+            ProductoProveedor(producto, proveedor, 8, 100),
+        ]
+        for objeto in objetos:
+            assert not hasattr(objeto, "__dict__"), f"{type(objeto).__name__} tiene __dict__"
+            try:
+                objeto.stok = 1
+                raise AssertionError(f"{type(objeto).__name__} acepto un atributo nuevo")
+            except AttributeError:
+                pass
+        assert ProductoProveedor(producto, proveedor, 8, 100).id_relacion is None
+        assert Proveedor("Nuevo").id is None
+
+    test("Los objetos de dominio no aceptan atributos nuevos", test_slots)
+
+    # ========================================
+    # TEST 2: Producto internado
+    # ========================================
+    print("\n--- Test 2: Un Producto por producto de la sucursal ---")
+
+    def test_interning():
+        inventario = InventarioSQLite(branch_id=1)
+        producto = inventario.obtener_producto(ESCASO)
+        assert inventario.obtener_producto(ESCASO) is producto
+
+        # Otra caja vende y el gerente cambia el precio: un objeto nuevo; el
+        # anterior no se toca (puede estar en un carrito abierto)
+        repo.process_sale_atomic(
+            1, 2, [{"product_name": ESCASO, "quantity": 2, "price_at_sale": 100}],
+            200, "2026-03-05 10:00:00"
+        )
+        with repo._connection(1) as conn:
+            conn.execute("UPDATE branch_product SET price = 120 WHERE product_id = 1")
+            conn.commit()
+        nuevo = inventario.obtener_producto(ESCASO)
+        assert nuevo is not producto and (nuevo.precio, nuevo.stock) == (120, 3)
+        assert (producto.precio, producto.stock) == (100, 5), (producto.precio, producto.stock)
+        assert inventario.obtener_producto(ESCASO) is nuevo
+
+        # Otro inventario (otra sucursal o caja) tiene sus propios objetos
+        assert InventarioSQLite(branch_id=1).obtener_producto(ESCASO) is not producto
+
+    def test_cart_price():
+        inventario = InventarioSQLite(branch_id=1, usar_cache=True)
+        sesion = SesionVenta(inventario, RegistroVentas(branch_id=1, cash_register_id=1))
+        sesion.iniciar_venta(Carrito())
+        assert sesion.agregar_producto(ESCASO, 2).exito
+        assert sesion.carrito.calcular_subtotal() == 200
+
+        # Cambia el precio y otra búsqueda lo ve: el carrito no se recalcula
+        with repo._connection(1) as conn:
+            conn.execute("UPDATE branch_product SET price = 150 WHERE product_id = 1")
+            conn.commit()
+        assert inventario.obtener_producto(ESCASO).precio == 150
+        assert sesion.carrito.calcular_subtotal() == 200
+
+        sesion.confirmar_pago("efectivo")
+        with repo._connection(1) as conn:
+            precio = conn.execute(
+                "SELECT price_at_sale FROM sale_item ORDER BY id DESC LIMIT 1"
+            ).fetchone()[0]
+        assert precio == 100, precio
+
+    def test_suppliers():
+        inventario = InventarioSQLite(branch_id=1)
+        gestor = GestorProveedor(inventario)
+        gestor.agregar_relacion(ESCASO, "Distribuidora Norte", 70, stock_inicial=10)
+        gestor.agregar_relacion(ESCASO, "Distribuidora Sur", 65, stock_inicial=20)
+        gestor.agregar_relacion(ABUNDANTE, "Distribuidora Sur", 50, stock_inicial=30)
+
+        gestor = GestorProveedor(inventario)
+        norte, sur = sorted(
+            gestor.buscar_por_producto(inventario.obtener_producto(ESCASO)),
+            key=lambda r: r.proveedor.nombre
+        )
+        assert norte.producto is sur.producto is inventario.obtener_producto(ESCASO)
+        assert sur.proveedor is gestor._proveedores_cache["Distribuidora Sur"]
+
+        sur.descontar_stock(5)
+        gestor.guardar()
+        recargado = GestorProveedor(InventarioSQLite(branch_id=1))
+        stocks = sorted((r.proveedor.nombre, r.producto.nombre, r.stock_disponible)
+                        for r in recargado.relaciones)
+        assert stocks == [
+            ("Distribuidora Norte", ESCASO, 10),
+            ("Distribuidora Sur", ABUNDANTE, 30),
+            ("Distribuidora Sur", ESCASO, 15),
+        ], stocks
+
+    test("obtener_producto devuelve el mismo objeto mientras no cambie", test_interning)
+    test("Un cambio de precio no recalcula un carrito abierto", test_cart_price)
+    test("Las relaciones comparten el Producto y guardar() persiste", test_suppliers)
+
+    # ========================================
+    # RESUMEN
+    # ========================================
+    print(f"\n{'=' * 60}")
+    print(f"  RESULTADO: {passed} pasaron, {failed} fallaron")
+    print(f"{'=' * 60}")
+
+    return 0 if failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
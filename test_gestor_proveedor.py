@@ -0,0 +1,353 @@
+"""
+Tests de GestorProveedor (relaciones producto-proveedor en memoria).
+
+ARQUITECTURA DEL TEST:
+- Igual que test_concurrency.py: BD temporal, repo.DB_PATH parcheado, más
+  proveedores y relaciones sembrados acá
+- Verifica que la carga en bloque (iter_supplier_relations) arma las mismas
+  relaciones que la carga de antes (una query por proveedor y por producto)
+- Verifica que no entran proveedores inactivos ni productos inactivos o que
+  la sucursal no vende, y que la carga no hace queries por relación
+- Verifica que el índice por producto da el proveedor más barato con stock
+  (igual que filtrar todas las relaciones y tomar el mínimo), también
+  después de descontar_stock, y que ServicioCompra lo usa
+- Verifica que guardar() escribe solo las relaciones modificadas, en una
+  transacción, y no pisa las que cambió otro proceso
+- Con sharding, verifica que cada sucursal carga sus precios y stocks
+"""
+import os
+import sqlite3
+import sys
+
+# Agregar root al path para importar modulos del proyecto
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database import producto_repository as repo
+from database import metrics
+from caja import Caja
+from gestor_proveedor import GestorProveedor
+from inventario_sqlite import InventarioSQLite
+from servicio_compra import ServicioCompra
+import test_concurrency
+import test_sharding
+
+
+ESCASO = "Producto Escaso"  # de test_concurrency, sin proveedores
+PRODUCTOS = 25
+PROVEEDORES = 4
+
+
+def sembrar_relaciones():
+    """
+    PRODUCTOS productos activos en la sucursal 1 y PROVEEDORES proveedores
+    que venden cada uno una parte distinta (con precios y stocks distintos).
+    """
+    conn = sqlite3.connect(repo.DB_PATH)
+    try:
+        for i in range(PRODUCTOS):
+            product_id = conn.execute(
+                "INSERT INTO product (name, category) VALUES (?, 'Lote')", (f"Producto {i:02d}",)
+            ).lastrowid
+            conn.execute(
+                """INSERT INTO branch_product (branch_id, product_id, price, stock, active)
+                   VALUES (1, ?, ?, ?, 1)""",
+                (product_id, 100 + i, 10 * i)
+            )
+        for p in range(PROVEEDORES):
+            supplier_id = conn.execute(
+                "INSERT INTO supplier (name, active) VALUES (?, 1)", (f"Proveedor {p}",)
+            ).lastrowid
+            conn.execute(
+                """INSERT INTO product_supplier (product_id, supplier_id, purchase_price, available_stock)
+                   SELECT id, ?, 50 + id + ?, id * ? FROM product
+                   WHERE category = 'Lote' AND id % ? != 0""",
+                (supplier_id, p, p + 1, p + 2)
+            )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def cargar_antes(branch_id):
+    """La carga de antes: una query por proveedor y una por relación"""
+    relaciones = []
+    for proveedor_id, nombre_proveedor in repo.get_all_suppliers():
+        for relacion_id, _, nombre, precio_compra, stock in repo.get_relations_by_supplier(proveedor_id):
+            producto = repo.get_product_by_name(nombre, branch_id)
+            if producto:
+                _, name, price, stock_sucursal = producto
+                relaciones.append(
+                    (relacion_id, nombre_proveedor, name, price, stock_sucursal, precio_compra, stock)
+                )
+    return sorted(relaciones)
+
+
+def relaciones_de(gestor):
+    return sorted(
+        (r.id_relacion, r.proveedor.nombre, r.producto.nombre, r.producto.precio,
+         r.producto.stock, r.precio_compra, r.stock_disponible)
+        for r in gestor.relaciones
+    )
+
+
+def mas_barato_lineal(gestor, producto, cantidad):
+    """Lo de antes: filtrar todas las relaciones del gestor y tomar la más barata"""
+    con_stock = [r for r in gestor.relaciones if r.producto == producto and r.hay_stock(cantidad)]
+    return min(con_stock, key=lambda r: r.precio_compra) if con_stock else None
+
+
+def main():
+    print("=" * 60)
+    print("  TESTS DE GESTOR DE PROVEEDORES")
+    print("=" * 60)
+
+    passed = 0
+    failed = 0
+
+    def test(name, fn, modulo=test_concurrency):
+        nonlocal passed, failed
+        temp_dir = modulo.setup_test_db()
+        if isinstance(temp_dir, tuple):
+            temp_dir = temp_dir[0]
+        try:
+            fn()
+            print(f"  [OK] {name}")
+            passed += 1
+        except Exception as e:
+            print(f"  [FAIL] {name}: {type(e).__name__} {e}")
+            failed += 1
+        finally:
+            modulo.cleanup_test_db(temp_dir)
+
+    # ========================================
+    # TEST 1: Carga en bloque
+    # ========================================
+    print("\n--- Test 1: Carga en bloque ---")
+
+    def test_same_as_before():
+        sembrar_relaciones()
+        esperado = cargar_antes(1)
+        assert len(esperado) > PRODUCTOS, len(esperado)
+        gestor = GestorProveedor(InventarioSQLite(branch_id=1))
+        assert relaciones_de(gestor) == esperado
+
+        # Un Producto por producto y un Proveedor por proveedor
+        assert len({id(r.producto) for r in gestor.relaciones}) == len({r[2] for r in esperado})
+        for rel in gestor.relaciones:
+            assert rel.proveedor is gestor._proveedores_cache[rel.proveedor.nombre]
+
+    def test_pages():
+        sembrar_relaciones()
+        todas = list(repo.iter_supplier_relations(1))
+        for page_size in (1, 7, len(todas), len(todas) + 1):
+            assert list(repo.iter_supplier_relations(1, page_size=page_size)) == todas, page_size
+        ids = [fila[0] for fila in todas]
+        assert ids == sorted(ids) and len(set(ids)) == len(ids)
+        try:
+            repo.get_supplier_relations_page(1, page_size=0)
+            raise AssertionError("page_size=0 no dio ValueError")
+        except ValueError:
+            pass
+
+    def test_filters():
+        sembrar_relaciones()
+        with repo._connection(1) as conn:
+            # Proveedor 0 inactivo, Producto 01 inactivo y Producto 02 sin fila en la sucursal
+            conn.execute("UPDATE supplier SET active = 0 WHERE name = 'Proveedor 0'")
+            conn.execute(
+                """UPDATE branch_product SET active = 0
+                   WHERE product_id = (SELECT id FROM product WHERE name = 'Producto 01')"""
+            )
+            conn.execute(
+                """DELETE FROM branch_product
+                   WHERE product_id = (SELECT id FROM product WHERE name = 'Producto 02')"""
+            )
+            conn.commit()
+        gestor = GestorProveedor(InventarioSQLite(branch_id=1))
+        assert relaciones_de(gestor) == cargar_antes(1)
+        assert "Proveedor 0" not in {r.proveedor.nombre for r in gestor.relaciones}
+        assert not {"Producto 01", "Producto 02"} & {r.producto.nombre for r in gestor.relaciones}
+
+    def test_no_n_plus_one():
+        sembrar_relaciones()
+        inventario = InventarioSQLite(branch_id=1)
+        metrics.reset()
+        metrics.enable()
+        try:
+            gestor = GestorProveedor(inventario)
+            llamadas = {nombre: datos["calls"] for nombre, datos in metrics.snapshot().items()}
+        finally:
+            metrics.disable()
+            metrics.reset()
+        assert gestor.relaciones
+        assert llamadas == {"get_all_suppliers": 1, "get_supplier_relations_page": 1}, llamadas
+
+    test("Carga las mismas relaciones que una query por proveedor", test_same_as_before)
+    test("iter_supplier_relations no depende del tamaño de página", test_pages)
+    test("Excluye proveedores y productos inactivos", test_filters)
+    test("La carga hace una query por página, no por relación", test_no_n_plus_one)
+
+    # ========================================
+    # TEST 2: Índice por producto
+    # ========================================
+    print("\n--- Test 2: Proveedor más barato con stock ---")
+
+    def test_cheapest():
+        sembrar_relaciones()
+        inventario = InventarioSQLite(branch_id=1)
+        gestor = GestorProveedor(inventario)
+        productos = {r.producto.nombre: r.producto for r in gestor.relaciones}
+        cantidades = (1, 10, 40, 60, 1000)
+
+        def comparar():
+            for producto in productos.values():
+                relaciones = gestor.buscar_por_producto(producto)
+                precios = [r.precio_compra for r in relaciones]
+                assert precios == sorted(precios), (producto.nombre, precios)
+                assert {id(r) for r in relaciones} == {
+                    id(r) for r in gestor.relaciones if r.producto == producto}
+                for cantidad in cantidades:
+                    esperado = mas_barato_lineal(gestor, producto, cantidad)
+                    elegido = gestor.mas_barato_con_stock(producto, cantidad)
+                    assert elegido is esperado, (producto.nombre, cantidad)
+
+        comparar()
+        # Vaciar (casi) al más barato de cada producto: pasa a elegirse el siguiente
+        for producto in productos.values():
+            barato = gestor.buscar_por_producto(producto)[0]
+            barato.descontar_stock(barato.stock_disponible - 1)
+        comparar()
+
+        # Las relaciones nuevas entran al índice en su lugar por precio
+        gestor.agregar_relacion("Producto 03", "Proveedor Nuevo", 1, stock_inicial=500)
+        producto = inventario.obtener_producto("Producto 03")
+        assert gestor.mas_barato_con_stock(producto, 500).proveedor.nombre == "Proveedor Nuevo"
+        assert gestor.mas_barato_con_stock(producto, 501) is mas_barato_lineal(gestor, producto, 501)
+        assert gestor.mas_barato_con_stock(inventario.obtener_producto(ESCASO), 1) is None
+        assert gestor.buscar_por_producto(inventario.obtener_producto(ESCASO)) == []
+
+    def test_purchase_service():
+        gestor = GestorProveedor(InventarioSQLite(branch_id=1))
+        gestor.agregar_relacion(ESCASO, "Proveedor Caro", 80, stock_inicial=100)
+        gestor.agregar_relacion(ESCASO, "Proveedor Barato", 60, stock_inicial=10)
+        inventario = gestor.inventario
+        servicio = ServicioCompra(gestor, Caja(cash_register_id=1, branch_id=1), inventario)
+        producto = inventario.obtener_producto(ESCASO)
+
+        assert servicio.reponer_producto(producto, 8) == 8 * 60
+        # Al barato le quedan 2: 5 unidades salen del caro
+        assert servicio.reponer_producto(producto, 5) == 5 * 80
+        stocks = {r.proveedor.nombre: r.stock_disponible for r in gestor.buscar_por_producto(producto)}
+        assert stocks == {"Proveedor Barato": 2, "Proveedor Caro": 95}, stocks
+        try:
+            servicio.reponer_producto(producto, 96)
+            raise AssertionError("Repuso más de lo que tiene cualquier proveedor")
+        except ValueError as e:
+            assert "stock suficiente" in str(e), e
+
+    test("mas_barato_con_stock coincide con filtrar todo y tomar el mínimo", test_cheapest)
+    test("ServicioCompra repone del más barato con stock", test_purchase_service)
+
+    # ========================================
+    # TEST 3: Guardar solo lo modificado
+    # ========================================
+    print("\n--- Test 3: guardar() incremental ---")
+
+    def stocks_en_bd():
+        with repo._connection() as conn:
+            return dict(conn.execute("SELECT id, available_stock FROM product_supplier").fetchall())
+
+    def test_dirty_only():
+        sembrar_relaciones()
+        gestor = GestorProveedor(InventarioSQLite(branch_id=1))
+        assert not any(r.modificado for r in gestor.relaciones)
+        assert gestor.guardar()["escritas"] == 0
+
+        a, b, c, d = gestor.relaciones[:4]
+        a.descontar_stock(1)
+        b.agregar_stock(5)
+        c.stock_disponible = 0
+        d.stock_disponible = d.stock_disponible  # mismo valor: no cuenta como cambio
+        assert [r.modificado for r in (a, b, c, d)] == [True, True, True, False]
+        # guardar() toma las pendientes de este conjunto, sin recorrer gestor.relaciones
+        assert gestor._modificadas == {a, b, c}, gestor._modificadas
+
+        # Otro proceso cambia una relación que este gestor no tocó
+        with repo._connection() as conn:
+            conn.execute("UPDATE product_supplier SET available_stock = 777 WHERE id = ?", (d.id_relacion,))
+            conn.commit()
+
+        metrics.reset()
+        metrics.enable()
+        try:
+            resultado = gestor.guardar()
+            llamadas = {nombre: datos["calls"] for nombre, datos in metrics.snapshot().items()}
+        finally:
+            metrics.disable()
+            metrics.reset()
+        assert resultado["escritas"] == 3 and resultado["segundos"] >= 0, resultado
+        assert gestor.ultimo_guardado is resultado
+        assert llamadas == {"set_supplier_stocks": 1}, llamadas
+        assert not any(r.modificado for r in gestor.relaciones)
+        assert not gestor._modificadas
+
+        en_bd = stocks_en_bd()
+        esperado = {r.id_relacion: r.stock_disponible for r in gestor.relaciones}
+        esperado[d.id_relacion] = 777
+        assert en_bd == esperado
+        assert gestor.guardar()["escritas"] == 0
+
+    def test_failed_save():
+        sembrar_relaciones()
+        gestor = GestorProveedor(InventarioSQLite(branch_id=1))
+        rel = gestor.relaciones[0]
+        rel.descontar_stock(1)
+        original = repo.set_supplier_stocks
+
+        def falla(stocks):
+            raise sqlite3.OperationalError("disk I/O error")
+
+        repo.set_supplier_stocks = falla
+        try:
+            gestor.guardar()
+            raise AssertionError("guardar() no propagó el error")
+        except sqlite3.OperationalError:
+            pass
+        finally:
+            repo.set_supplier_stocks = original
+        assert rel.modificado
+        assert gestor.guardar()["escritas"] == 1
+        assert stocks_en_bd()[rel.id_relacion] == rel.stock_disponible
+
+    test("guardar() escribe solo las relaciones modificadas", test_dirty_only)
+    test("Si guardar() falla, las relaciones siguen pendientes", test_failed_save)
+
+    # ========================================
+    # TEST 4: Sharding
+    # ========================================
+    print("\n--- Test 4: Con un archivo por sucursal ---")
+
+    def test_branches():
+        gestor = GestorProveedor(InventarioSQLite(branch_id=1))
+        gestor.agregar_relacion("Coca Cola 500ml", "Distribuidora Norte", 90, stock_inicial=40)
+        gestor.agregar_relacion("Arroz 1kg", "Distribuidora Norte", 60, stock_inicial=15)
+        for branch_id in (1, 2):
+            gestor = GestorProveedor(InventarioSQLite(branch_id=branch_id))
+            assert relaciones_de(gestor) == cargar_antes(branch_id), branch_id
+        # Arroz 1kg no está activo en la sucursal 2
+        assert [r.producto.nombre for r in gestor.relaciones] == ["Coca Cola 500ml"]
+
+    test("Cada sucursal carga sus propios precios y stocks", test_branches, modulo=test_sharding)
+
+    # ========================================
+    # RESUMEN
+    # ========================================
+    print(f"\n{'=' * 60}")
+    print(f"  RESULTADO: {passed} pasaron, {failed} fallaron")
+    print(f"{'=' * 60}")
+
+    return 0 if failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+"""
+Tests de las métricas del repository (database/metrics.py).
+
+ARQUITECTURA DEL TEST:
+- Igual que test_concurrency.py: BD temporal, repo.DB_PATH parcheado
+- Verifica que desactivado no se registra nada, que activado se cuentan
+  llamadas, errores y percentiles, y que en las transacciones la espera del
+  write lock se separa del tiempo de ejecución
+- Verifica los formatos JSON y Prometheus y el flush periódico a archivo
+"""
+import os
+import sys
+import json
+import sqlite3
+import threading
+import inspect
+import tempfile
+import time
+
+# Agregar root al path para importar modulos del proyecto
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database import producto_repository as repo
+from database import metrics
+from test_concurrency import setup_test_db, cleanup_test_db
+
+
+ITEMS = [{"product_name": "Producto Abundante", "quantity": 1, "price_at_sale": 50}]
+
+
+def main():
+    print("=" * 60)
+    print("  TESTS DE METRICAS DEL REPOSITORY")
+    print("=" * 60)
+
+    passed = 0
+    failed = 0
+
+    def test(name, fn):
+        nonlocal passed, failed
+        temp_dir = setup_test_db()
+        metrics.reset()
+        try:
+            fn()
+            print(f"  [OK] {name}")
+            passed += 1
+        except Exception as e:
+            print(f"  [FAIL] {name}: {type(e).__name__} {e}")
+            failed += 1
+        finally:
+            metrics.disable()
+            metrics.reset()
+            cleanup_test_db(temp_dir)
+
+    # ========================================
+    # TEST 1: Cobertura y modo desactivado
+    # ========================================
+    print("\n--- Test 1: Instrumentacion ---")
+
+    def test_all_instrumented():
+        missing = [
+            name for name, obj in inspect.getmembers(repo, inspect.isfunction)
+            if obj.__module__ == repo.__name__ and not name.startswith("_")
+            and name not in ("get_pool", "close_pool")
+            # Los generadores se miden en la función que trae cada página
+            and not inspect.isgeneratorfunction(obj)
+            and not getattr(obj, "_instrumented", False)
+        ]
+        assert not missing, f"Funciones sin @metrics.instrument: {missing}"
+
+    def test_disabled_records_nothing():
+        repo.get_product_by_name("Producto Abundante", 1)
+        repo.process_sale_atomic(1, 1, ITEMS, 50, "2026-03-05 10:00:00")
+        assert metrics.snapshot() == {}, f"Se registro con metricas desactivadas: {metrics.snapshot()}"
+
+    test("Toda funcion publica del repository esta instrumentada", test_all_instrumented)
+    test("Desactivado no registra nada", test_disabled_records_nothing)
+
+    # ========================================
+    # TEST 2: Llamadas, errores y percentiles
+    # ========================================
+    print("\n--- Test 2: Snapshot ---")
+
+    def test_snapshot():
+        metrics.enable()
+        for _ in range(20):
+            repo.get_product_by_name("Producto Abundante", 1)
+        try:
+            repo.process_sale_atomic(
+                1, 1, [{"product_name": "Producto Escaso", "quantity": 99, "price_at_sale": 100}],
+                100, "2026-03-05 10:00:00"
+            )
+        except ValueError:
+            pass
+        repo.process_sale_atomic(1, 1, ITEMS, 50, "2026-03-05 10:00:01")
+
+        data = metrics.snapshot()
+        lookup = data["get_product_by_name"]
+        assert lookup["calls"] == 20 and lookup["errors"] == 0, f"get_product_by_name: {lookup}"
+        latency = lookup["latency"]
+        assert 0 < latency["p50"] <= latency["p95"] <= latency["p99"], f"Percentiles: {latency}"
+        assert "lock_wait" not in lookup, "Una lectura no deberia ser transaccional"
+
+        sale = data["process_sale_atomic"]
+        assert sale["calls"] == 2 and sale["errors"] == 1, f"process_sale_atomic: {sale}"
+        assert sale["transactions"] == 2, f"process_sale_atomic: {sale}"
+        assert abs(sale["lock_wait"]["sum"] + sale["execution"]["sum"] - sale["latency"]["sum"]) < 1e-6
+
+    test("Cuenta llamadas y errores y calcula p50/p95/p99", test_snapshot)
+
+    # ========================================
+    # TEST 3: Espera del lock separada de la ejecución
+    # Otra conexión retiene el write lock 0.3s mientras se vende
+    # ========================================
+    print("\n--- Test 3: Espera del write lock ---")
+    print("    Lock retenido 0.3s: la espera debe ir a lock_wait, no a execution.")
+
+    def test_lock_wait_split():
+        HOLD_SECONDS = 0.3
+        lock_taken = threading.Event()
+
+        def hold():
+            conn = sqlite3.connect(repo.DB_PATH, isolation_level=None)
+            conn.execute("BEGIN IMMEDIATE")
+            lock_taken.set()
+            time.sleep(HOLD_SECONDS)
+            conn.execute("ROLLBACK")
+            conn.close()
+
+        metrics.enable()
+        holder = threading.Thread(target=hold)
+        holder.start()
+        lock_taken.wait(timeout=5)
+        repo.process_sale_atomic(1, 1, ITEMS, 50, "2026-03-05 10:00:00")
+        holder.join(timeout=10)
+
+        sale = metrics.snapshot()["process_sale_atomic"]
+        lock_wait = sale["lock_wait"]["sum"]
+        execution = sale["execution"]["sum"]
+        assert lock_wait >= HOLD_SECONDS * 0.5, f"lock_wait {lock_wait:.3f}s, esperado ~{HOLD_SECONDS}s"
+        assert execution < HOLD_SECONDS * 0.5, f"execution {execution:.3f}s incluye la espera"
+
+    test("La espera del lock (y los reintentos) van a lock_wait", test_lock_wait_split)
+
+    # ========================================
+    # TEST 4: Formatos y flush a archivo
+    # ========================================
+    print("\n--- Test 4: JSON, Prometheus y flush periodico ---")
+
+    def test_formats():
+        metrics.enable()
+        repo.get_member_by_dni("00000000")
+        repo.process_sale_atomic(1, 1, ITEMS, 50, "2026-03-05 10:00:00")
+
+        text = metrics.to_prometheus()
+        assert 'repository_calls_total{function="get_member_by_dni"} 1' in text, text
+        assert 'repository_latency_seconds{function="process_sale_atomic",quantile="0.95"}' in text
+        assert 'repository_lock_wait_seconds_count{function="process_sale_atomic"} 1' in text
+        assert 'repository_lock_wait_seconds_count{function="get_member_by_dni"}' not in text
+
+        with tempfile.TemporaryDirectory() as out_dir:
+            path = os.path.join(out_dir, "metricas.json")
+            with metrics.MetricsFlusher(path, interval=0.05, fmt="json"):
+                time.sleep(0.2)
+                assert os.path.exists(path), "El flusher no escribio el archivo"
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            assert data["process_sale_atomic"]["calls"] == 1, data
+
+    test("Prometheus y JSON periodico con las mismas metricas", test_formats)
+
+    # ========================================
+    # RESUMEN
+    # ========================================
+    print(f"\n{'=' * 60}")
+    print(f"  RESULTADO: {passed} pasaron, {failed} fallaron")
+    print(f"{'=' * 60}")
+
+    return 0 if failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
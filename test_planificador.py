@@ -0,0 +1,265 @@
+"""
+Tests del planificador de reposición (planificador_reposicion.py).
+
+ARQUITECTURA DEL TEST:
+- Igual que test_concurrency.py: BD temporal, repo.DB_PATH parcheado, más
+  un lote de productos con stocks y proveedores distintos sembrados acá
+- Verifica que el plan toma solo los productos activos bajo el punto de
+  reposición, los lleva al stock objetivo y reparte entre proveedores
+  empezando por el más barato
+- Verifica que con poco saldo van primero los productos con menos stock
+  y que el presupuesto se cuenta al centavo (sin errores de redondeo)
+- Verifica que ejecutar() compra el plan en lotes y, si un lote falla
+  (stock, BD ocupada o error de SQLite), deja hechos los anteriores e
+  informa lo pendiente
+"""
+import os
+import sqlite3
+import sys
+
+# Agregar root al path para importar modulos del proyecto
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database import producto_repository as repo
+from database import retry
+from caja import Caja
+from gestor_proveedor import GestorProveedor
+from inventario_sqlite import InventarioSQLite
+from planificador_reposicion import PlanificadorReposicion
+import test_concurrency
+from test_restock import estado
+
+
+SALDO = 10000  # de cada caja de test_concurrency
+
+
+def sembrar():
+    """
+    Productos "Lote 0".."Lote 5" en la sucursal 1 con stock 0, 2, 4, 6, 8, 30
+    ("Lote 4" inactivo). Proveedores: Barato (10 c/u, 5 unidades de cada uno)
+    y Caro (20 c/u, 100 unidades de cada uno), salvo "Lote 3", que no tiene.
+    """
+    conn = sqlite3.connect(repo.DB_PATH)
+    try:
+        barato = conn.execute("INSERT INTO supplier (name, active) VALUES ('Barato', 1)").lastrowid
+        caro = conn.execute("INSERT INTO supplier (name, active) VALUES ('Caro', 1)").lastrowid
+        for i, stock in enumerate((0, 2, 4, 6, 8, 30)):
+            product_id = conn.execute(
+                "INSERT INTO product (name, category) VALUES (?, 'Lote')", (f"Lote {i}",)
+            ).lastrowid
+            conn.execute(
+                """INSERT INTO branch_product (branch_id, product_id, price, stock, active)
+                   VALUES (1, ?, 50, ?, ?)""",
+                (product_id, stock, 0 if i == 4 else 1)
+            )
+            if i != 3:
+                conn.executemany(
+                    """INSERT INTO product_supplier (product_id, supplier_id, purchase_price, available_stock)
+                       VALUES (?, ?, ?, ?)""",
+                    [(product_id, barato, 10, 5), (product_id, caro, 20, 100)]
+                )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def planificador():
+    inventario = InventarioSQLite(branch_id=1)
+    gestor = GestorProveedor(inventario)
+    return PlanificadorReposicion(gestor, Caja(1, 1), inventario), gestor
+
+
+def compras_de(plan):
+    return [(rel.producto.nombre, rel.proveedor.nombre, cantidad) for rel, cantidad in plan.compras]
+
+
+def main():
+    print("=" * 60)
+    print("  TESTS DEL PLANIFICADOR DE REPOSICIÓN")
+    print("=" * 60)
+
+    passed = 0
+    failed = 0
+
+    def test(name, fn):
+        nonlocal passed, failed
+        temp_dir = test_concurrency.setup_test_db()
+        try:
+            fn()
+            print(f"  [OK] {name}")
+            passed += 1
+        except Exception as e:
+            print(f"  [FAIL] {name}: {type(e).__name__} {e}")
+            failed += 1
+        finally:
+            test_concurrency.cleanup_test_db(temp_dir)
+
+    # ========================================
+    # TEST 1: Plan
+    # ========================================
+    print("\n--- Test 1: Armar el plan ---")
+
+    def test_plan():
+        sembrar()
+        planner, _ = planificador()
+        # Punto 7, objetivo 20: Lote 0, 1, 2, 3 y Producto Escaso (stock 5)
+        plan = planner.planificar(7, 20)
+        assert plan.productos == 5, plan.productos
+        assert compras_de(plan) == [
+            ("Lote 0", "Barato", 5), ("Lote 0", "Caro", 15),
+            ("Lote 1", "Barato", 5), ("Lote 1", "Caro", 13),
+            ("Lote 2", "Barato", 5), ("Lote 2", "Caro", 11),
+        ], compras_de(plan)
+        assert plan.costo_total == 15 * 10 + (15 + 13 + 11) * 20
+        # Lote 3 y Producto Escaso no tienen proveedores
+        assert plan.sin_cubrir == {"Lote 3": 14, "Producto Escaso": 15}, plan.sin_cubrir
+        # Planificar no toca la BD
+        assert estado()[0] == SALDO
+
+        # Objetivo por defecto: el doble del punto
+        assert compras_de(planner.planificar(2))[:2] == [("Lote 0", "Barato", 4)], \
+            compras_de(planner.planificar(2))
+        for punto, objetivo in ((0, None), (10, 5)):
+            try:
+                planner.planificar(punto, objetivo)
+                raise AssertionError(f"Aceptó punto={punto}, objetivo={objetivo}")
+            except ValueError:
+                pass
+
+    def test_budget():
+        sembrar()
+        planner, _ = planificador()
+        # 150: Lote 0 entero (5 * 10 + 5 * 20), nada más; Lote 1 (más stock) queda afuera
+        plan = planner.planificar(7, 10, presupuesto=150)
+        assert compras_de(plan) == [("Lote 0", "Barato", 5), ("Lote 0", "Caro", 5)], compras_de(plan)
+        assert plan.sin_cubrir["Lote 1"] == 8 and plan.sin_cubrir["Lote 2"] == 6, plan.sin_cubrir
+
+        # Lo que sobra alcanza para parte del siguiente
+        plan = planner.planificar(7, 10, presupuesto=165)
+        assert compras_de(plan)[2:] == [("Lote 1", "Barato", 1)], compras_de(plan)
+        assert plan.costo_total <= 165
+
+        # Sin presupuesto explícito: el saldo de la caja
+        Caja(1, 1).retirar(SALDO - 100)
+        assert planner.planificar(7, 10).costo_total <= 100
+
+    def test_cents():
+        sembrar()
+        conn = sqlite3.connect(repo.DB_PATH)
+        try:
+            centavos = conn.execute("INSERT INTO supplier (name, active) VALUES ('Centavos', 1)").lastrowid
+            conn.execute(
+                """INSERT INTO product_supplier (product_id, supplier_id, purchase_price, available_stock)
+                   SELECT id, ?, 0.1, 1 FROM product WHERE name IN ('Lote 0', 'Lote 1', 'Lote 2')""",
+                (centavos,)
+            )
+            conn.execute("UPDATE cash_register SET current_balance = 0.3 WHERE id = 1")
+            conn.commit()
+        finally:
+            conn.close()
+        planner, _ = planificador()
+        # Restando floats quedaba 0.3 - 0.1 - 0.1 = 0.0999... y Lote 2 no entraba
+        plan = planner.planificar(7, 10)
+        assert compras_de(plan) == [
+            ("Lote 0", "Centavos", 1), ("Lote 1", "Centavos", 1), ("Lote 2", "Centavos", 1),
+        ], compras_de(plan)
+        assert plan.costo_total == 0.3, plan.costo_total
+        # Y la caja no lo rechaza por 0.1 + 0.1 + 0.1 = 0.30000000000000004
+        resultado = planner.ejecutar(plan)
+        assert resultado["error"] is None, resultado["error"]
+        assert estado()[0] == 0, estado()[0]
+
+    test("Repone al objetivo, del proveedor más barato al más caro", test_plan)
+    test("Con poco saldo van primero los que tienen menos stock", test_budget)
+    test("El presupuesto se cuenta al centavo", test_cents)
+
+    # ========================================
+    # TEST 2: Ejecución
+    # ========================================
+    print("\n--- Test 2: Ejecutar el plan ---")
+
+    def test_execute():
+        sembrar()
+        planner, gestor = planificador()
+        plan = planner.planificar(7, 20)
+        resultado = planner.ejecutar(plan, tamanio_lote=4)
+        assert (resultado["compras"], resultado["lotes"], resultado["error"]) == (6, 2, None), resultado
+        assert resultado["costo"] == plan.costo_total
+
+        saldo, _, stocks, _ = estado()
+        assert saldo == SALDO - plan.costo_total
+        assert [stocks[f"Lote {i}"] for i in range(6)] == [20, 20, 20, 6, 8, 30]
+        # Memoria y BD coinciden, sin nada pendiente de guardar
+        en_bd = estado()[1]
+        assert all(en_bd[r.id_relacion] == r.stock_disponible for r in gestor.relaciones)
+        assert gestor.guardar()["escritas"] == 0
+        assert repo.get_stock_drift(1) == []
+
+        # Ya no queda nada por debajo del punto con proveedor
+        assert planner.planificar(7, 20).compras == []
+
+    def test_failed_batch():
+        sembrar()
+        planner, gestor = planificador()
+        plan = planner.planificar(7, 20)
+        # Otro proceso se lleva el stock del caro de Lote 2 (segundo lote)
+        rel = next(r for r, _ in plan.compras[4:] if r.producto.nombre == "Lote 2" and r.proveedor.nombre == "Caro")
+        repo.set_supplier_stock(rel.id_relacion, 0)
+
+        resultado = planner.ejecutar(plan, tamanio_lote=4)
+        assert (resultado["compras"], resultado["lotes"]) == (4, 1), resultado
+        assert resultado["pendientes"] == plan.compras[4:]
+        assert "Stock insuficiente" in resultado["error"], resultado["error"]
+        stocks = estado()[2]
+        assert [stocks[f"Lote {i}"] for i in range(3)] == [20, 20, 4]
+        assert estado()[0] == SALDO - resultado["costo"]
+
+    def lote_con_error_de_bd(error):
+        def test_fn():
+            sembrar()
+            planner, gestor = planificador()
+            plan = planner.planificar(7, 20)
+            original = repo.restock_from_suppliers
+            llamadas = []
+
+            # El primer lote se compra de verdad; el segundo falla en la BD
+            def falla_segundo(*args):
+                llamadas.append(args)
+                if len(llamadas) > 1:
+                    raise error
+                return original(*args)
+
+            repo.restock_from_suppliers = falla_segundo
+            try:
+                resultado = planner.ejecutar(plan, tamanio_lote=4)
+            finally:
+                repo.restock_from_suppliers = original
+            assert (resultado["compras"], resultado["lotes"]) == (4, 1), resultado
+            assert resultado["pendientes"] == plan.compras[4:]
+            assert resultado["error"] == str(error), resultado["error"]
+            assert estado()[0] == SALDO - resultado["costo"]
+            # El primer lote ya quedó descontado en memoria, sin nada pendiente de guardar
+            en_bd = estado()[1]
+            assert all(en_bd[r.id_relacion] == r.stock_disponible for r in gestor.relaciones)
+            assert gestor.guardar()["escritas"] == 0
+        return test_fn
+
+    test("ejecutar() compra el plan en lotes", test_execute)
+    test("Si un lote falla, los anteriores quedan hechos", test_failed_batch)
+    test("Si la BD sigue ocupada, devuelve lo hecho y lo pendiente",
+         lote_con_error_de_bd(retry.DatabaseBusyError("restock_from_suppliers", 3, 0.5)))
+    test("Si falla SQLite, devuelve lo hecho y lo pendiente",
+         lote_con_error_de_bd(sqlite3.OperationalError("disk I/O error")))
+
+    # ========================================
+    # RESUMEN
+    # ========================================
+    print(f"\n{'=' * 60}")
+    print(f"  RESULTADO: {passed} pasaron, {failed} fallaron")
+    print(f"{'=' * 60}")
+
+    return 0 if failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,278 @@
+"""
+Verifica con EXPLAIN QUERY PLAN que cada query del repository usa un índice.
+
+CÓMO FUNCIONA:
+- Crea una BD temporal con schema.sql + migraciones (no toca supermercado.db)
+- Ejecuta cada función pública de producto_repository con un trace callback
+  en la conexión del pool, así se capturan las sentencias REALES que corre
+  (con los parámetros ya expandidos)
+- Corre EXPLAIN QUERY PLAN sobre cada SELECT/UPDATE/DELETE y falla si
+  alguna tabla se recorre entera (SCAN) en vez de buscarse por índice (SEARCH)
+- Falla también si aparece una función nueva en el repository que este
+  test no ejecuta: toda query nueva tiene que pasar por acá
+"""
+import os
+import sys
+import inspect
+import sqlite3
+import tempfile
+import shutil
+
+# Agregar root al path para importar modulos del proyecto
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database import producto_repository as repo
+from database import migrations
+from database.init_db import _seed_data
+
+
+# Funciones del repository que no ejecutan queries de datos
+INFRASTRUCTURE = {"get_pool", "close_pool"}
+
+# Recorridos completos aceptados a propósito: {función: motivo}
+ALLOWED_SCANS = {
+    "get_all_suppliers": "lista TODOS los proveedores activos (la tabla entera es el resultado)",
+    "iter_active_products": "1ra página: recorre idx_product_name en orden y corta en el LIMIT",
+}
+
+
+def setup_test_db():
+    """Crea una BD temporal migrada y con datos semilla. Devuelve el directorio."""
+    temp_dir = tempfile.mkdtemp()
+    db_path = os.path.join(temp_dir, "test_query_plans.db")
+    schema_path = os.path.join(os.path.dirname(__file__), "database", "schema.sql")
+
+    repo.DB_PATH = db_path
+
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    with open(schema_path, "r", encoding="utf-8") as f:
+        cursor.executescript(f.read())
+    migrations.migrate(conn)
+    _seed_data(cursor)
+    conn.commit()
+    conn.close()
+    return temp_dir
+
+
+def cleanup_test_db(temp_dir):
+    """Limpia la BD temporal y restaura el path original"""
+    repo.close_pool()
+    repo.DB_PATH = os.path.join(os.path.dirname(__file__), "supermercado.db")
+    shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def repository_calls():
+    """
+    Una llamada representativa por cada función del repository.
+    Returns: lista de (nombre_funcion, callable)
+    """
+    sale_item = [{"product_name": "Coca Cola 500ml", "quantity": 1, "price_at_sale": 150}]
+    return [
+        ("process_sale_atomic", lambda: repo.process_sale_atomic(
+            1, 1, sale_item, 150, "2026-03-05 10:00:00")),
+        ("get_cash_registers_by_branch", lambda: repo.get_cash_registers_by_branch(1)),
+        ("create_product", lambda: repo.create_product("Producto Plan", "Test")),
+        ("create_product_with_branch", lambda: repo.create_product_with_branch(
+            "Producto Plan 2", "Test", 1, 100, 10)),
+        ("assign_product_to_branch", lambda: repo.assign_product_to_branch(
+            2, repo.get_product_id_by_name("Producto Plan"), 120, 5)),
+        ("set_product_active", lambda: repo.set_product_active(
+            2, repo.get_product_id_by_name("Producto Plan"), False)),
+        ("get_active_products", lambda: repo.get_active_products(1)),
+        ("get_active_products_page", lambda: repo.get_active_products_page(
+            1, ("Coca Cola 500ml", 1), 10)),
+        ("get_active_products_page (precio, categoría)", lambda: repo.get_active_products_page(
+            1, (150, 1), 10, category="Bebidas", order_by="price", descending=True)),
+        ("get_active_products_page (categoría)", lambda: repo.get_active_products_page(
+            1, ("Coca Cola 500ml", 1), 10, category="Bebidas")),
+        ("iter_active_products", lambda: list(repo.iter_active_products(1, page_size=10))),
+        ("get_product_by_name", lambda: repo.get_product_by_name("Coca Cola 500ml", 1)),
+        ("get_product_by_barcode", lambda: repo.get_product_by_barcode("7790000000012", 1)),
+        ("set_product_barcode", lambda: repo.set_product_barcode(
+            repo.get_product_id_by_name("Producto Plan"), "7790000009990")),
+        ("search_by_name", lambda: repo.search_by_name("Coca", 1)),
+        ("search_by_name (corto, LIKE)", lambda: repo.search_by_name("Co", 1)),
+        ("get_product_id_by_name", lambda: repo.get_product_id_by_name("Coca Cola 500ml")),
+        ("adjust_stock_bulk", lambda: repo.adjust_stock_bulk(
+            1, [("Coca Cola 500ml", 5), ("Arroz 1kg", -1)])),
+        ("update_branch_product_stock", lambda: repo.update_branch_product_stock(
+            1, "Coca Cola 500ml", 5)),
+        ("get_branch_product_stock", lambda: repo.get_branch_product_stock(1, "Coca Cola 500ml")),
+        ("snapshot_stock_ledger", lambda: repo.snapshot_stock_ledger(1)),
+        ("get_stock_at", lambda: repo.get_stock_at(1, "Coca Cola 500ml")),
+        ("get_stock_movements", lambda: repo.get_stock_movements(1, "Coca Cola 500ml")),
+        ("get_stock_drift", lambda: repo.get_stock_drift(1)),
+        ("reserve_stock", lambda: repo.reserve_stock(1, "plan", "Coca Cola 500ml", 2)),
+        ("reserve_stock (por id)", lambda: repo.reserve_stock(
+            1, "plan", "Coca Cola 500ml", 3, product_id=1)),
+        ("get_available_stock", lambda: repo.get_available_stock(1, "Coca Cola 500ml")),
+        ("process_sale_atomic (con reservas)", lambda: repo.process_sale_atomic(
+            1, 1, sale_item, 150, "2026-03-05 10:00:00", session_id="plan")),
+        ("release_reservation", lambda: repo.release_reservation(1, "plan", "Coca Cola 500ml")),
+        ("release_reservation (por id)", lambda: repo.release_reservation(1, "plan", product_id=1)),
+        ("release_reservation (todas)", lambda: repo.release_reservation(1, "plan")),
+        ("sweep_expired_reservations", lambda: repo.sweep_expired_reservations(1)),
+        ("create_member", lambda: repo.create_member("Socio Plan", "99999999", "hash")),
+        ("get_member_by_name", lambda: repo.get_member_by_name("Socio Plan")),
+        ("get_member_by_dni", lambda: repo.get_member_by_dni("99999999")),
+        ("create_sale", lambda: repo.create_sale(1, 1, 100, "2026-03-05 10:00:00")),
+        ("create_sale_item", lambda: repo.create_sale_item(1, 1, 1, 150)),
+        ("update_cash_register_balance", lambda: repo.update_cash_register_balance(1, 10)),
+        ("get_cash_register_balance", lambda: repo.get_cash_register_balance(1)),
+        ("create_supplier", lambda: repo.create_supplier("Proveedor Plan")),
+        ("get_supplier_by_name", lambda: repo.get_supplier_by_name("Proveedor Plan")),
+        ("get_all_suppliers", lambda: repo.get_all_suppliers()),
+        ("create_product_supplier_relation", lambda: repo.create_product_supplier_relation(
+            1, 1, 90, 50)),
+        ("get_relations_by_product", lambda: repo.get_relations_by_product(1)),
+        ("get_relations_by_supplier", lambda: repo.get_relations_by_supplier(1)),
+        ("get_supplier_relations_page", lambda: repo.get_supplier_relations_page(1)),
+        ("get_supplier_relations_page (keyset)", lambda: repo.get_supplier_relations_page(
+            1, after_id=1, page_size=10)),
+        ("iter_supplier_relations", lambda: list(repo.iter_supplier_relations(1, page_size=10))),
+        ("get_products_below_page", lambda: repo.get_products_below_page(1, 50)),
+        ("iter_products_below", lambda: list(repo.iter_products_below(1, 50, page_size=2))),
+        ("set_supplier_stock", lambda: repo.set_supplier_stock(1, 40)),
+        ("set_supplier_stocks", lambda: repo.set_supplier_stocks([(1, 40), (2, 30)])),
+        ("update_supplier_stock", lambda: repo.update_supplier_stock(1, -5)),
+        ("restock_from_supplier", lambda: repo.restock_from_supplier(1, 1, 1, 1)),
+        ("restock_from_suppliers", lambda: repo.restock_from_suppliers(1, 1, [(1, 1), (1, 2)])),
+        ("reconcile_supplier_restocks", lambda: repo.reconcile_supplier_restocks(1)),
+    ]
+
+
+def capture_statements(fn):
+    """
+    Ejecuta fn() registrando cada sentencia SQL que corre en la conexión del pool.
+    La conexión es reentrante por thread, así fn() usa la misma que trazamos.
+    """
+    statements = []
+    with repo._connection() as conn:
+        conn.set_trace_callback(statements.append)
+        try:
+            fn()
+        finally:
+            conn.set_trace_callback(None)
+    return statements
+
+
+def full_scans(conn, statement):
+    """
+    Devuelve los pasos del plan que recorren una tabla entera.
+    Las tablas virtuales (json_each con la lista de parámetros, FTS) resuelven
+    su propio acceso; su "SCAN ... VIRTUAL TABLE" no es un recorrido de tabla.
+    """
+    if "'product_fts_" in statement:
+        # Sentencias internas de FTS5 sobre sus tablas sombra (las dispara el
+        # trigger de product): las maneja el propio módulo, no el repository
+        return []
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {statement}").fetchall()
+    return [
+        detail for _, _, _, detail in plan
+        if detail.startswith("SCAN ") and "VIRTUAL TABLE" not in detail
+    ]
+
+
+def main():
+    print("=" * 60)
+    print("  EXPLAIN QUERY PLAN: TODA QUERY DEL REPOSITORY USA INDICE")
+    print("=" * 60)
+
+    passed = 0
+    failed = 0
+
+    def test(name, fn):
+        nonlocal passed, failed
+        try:
+            fn()
+            print(f"  [OK] {name}")
+            passed += 1
+        except Exception as e:
+            print(f"  [FAIL] {name}: {e}")
+            failed += 1
+
+    temp_dir = setup_test_db()
+    try:
+        calls = repository_calls()
+
+        # ========================================
+        # TEST 1: Cobertura — cada función del repository se ejecuta acá
+        # ========================================
+        print("\n--- Test 1: Cobertura de funciones del repository ---")
+
+        def test_coverage():
+            public = {
+                name for name, obj in inspect.getmembers(repo, inspect.isfunction)
+                if obj.__module__ == repo.__name__ and not name.startswith("_")
+            }
+            missing = public - INFRASTRUCTURE - {name for name, _ in calls}
+            assert not missing, f"Funciones sin chequeo de plan: {sorted(missing)}"
+
+        test("Todas las funciones publicas del repository estan cubiertas", test_coverage)
+
+        # ========================================
+        # TEST 2: Ningún SCAN de tabla completa
+        # ========================================
+        print("\n--- Test 2: Planes de ejecucion ---")
+
+        with repo._connection() as plan_conn:
+            for name, fn in calls:
+                def check_plan(name=name, fn=fn):
+                    statements = capture_statements(fn)
+                    queries = [
+                        s for s in statements
+                        if s.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "WITH"))
+                    ]
+                    # Funciones de solo INSERT: no buscan filas, no hay plan que revisar
+                    assert statements, "no se capturo ninguna sentencia"
+                    for statement in queries:
+                        scans = full_scans(plan_conn, statement)
+                        if scans and name not in ALLOWED_SCANS:
+                            compact = " ".join(statement.split())
+                            raise AssertionError(f"{scans} en: {compact}")
+
+                label = name
+                if name in ALLOWED_SCANS:
+                    label += f" (scan permitido: {ALLOWED_SCANS[name]})"
+                test(label, check_plan)
+
+        # ========================================
+        # TEST 3: Migraciones idempotentes y versionadas
+        # ========================================
+        print("\n--- Test 3: Migraciones ---")
+
+        def test_version():
+            with repo._connection() as conn:
+                version = migrations.current_version(conn)
+                assert version == migrations.latest_version(), (
+                    f"user_version {version}, esperado {migrations.latest_version()}"
+                )
+                applied = migrations.migrate(conn)
+                assert applied == [], f"Se re-aplicaron migraciones: {applied}"
+
+        def test_unique_name():
+            try:
+                repo.create_product("Coca Cola 500ml", "Bebidas")
+                raise AssertionError("Deberia fallar: nombre de producto duplicado")
+            except sqlite3.IntegrityError:
+                pass
+
+        test("user_version al dia y migrate() no repite migraciones", test_version)
+        test("UNIQUE en product.name rechaza duplicados", test_unique_name)
+
+    finally:
+        cleanup_test_db(temp_dir)
+
+    # ========================================
+    # RESUMEN
+    # ========================================
+    print(f"\n{'=' * 60}")
+    print(f"  RESULTADO: {passed} pasaron, {failed} fallaron")
+    print(f"{'=' * 60}")
+
+    return 0 if failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
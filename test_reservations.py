@@ -0,0 +1,296 @@
+"""
+Tests de las reservas de stock de carritos abiertos (stock_reservation, migración 5).
+
+ARQUITECTURA DEL TEST:
+- Igual que test_concurrency.py: BD temporal, repo.DB_PATH parcheado
+- Verifica que lo reservado por un carrito no se puede reservar ni vender
+  desde otro, y que la venta del carrito consume sus propias reservas
+- Verifica el vencimiento (sin barrer ya no cuentan) y el barrido por tandas
+- Verifica que Carrito.quitar/vaciar/modificar_cantidad liberan o ajustan,
+  que un escaneo rechazado no deja reservas y que una reserva rechazada no
+  toma el write lock
+- Simula varias cajas cargando el mismo producto escaso a la vez: sin
+  reservas fallan cobros; con reservas el rechazo llega al agregar
+"""
+import os
+import sys
+import sqlite3
+import threading
+import time
+
+# Agregar root al path para importar modulos del proyecto
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database import producto_repository as repo
+from carrito import Carrito
+from inventario_sqlite import InventarioSQLite
+from registro_ventas import RegistroVentas
+from sesion_venta import SesionVenta
+from test_concurrency import setup_test_db, cleanup_test_db
+
+
+ESCASO = "Producto Escaso"  # stock 5
+ABUNDANTE = "Producto Abundante"  # stock 100
+
+
+def item(name, quantity, price=100):
+    """Item en el formato de process_sale_atomic"""
+    return {"product_name": name, "quantity": quantity, "price_at_sale": price}
+
+
+def reservations():
+    """Filas de stock_reservation (vigentes o no)"""
+    with repo._connection(1) as conn:
+        return conn.execute("SELECT COUNT(*) FROM stock_reservation").fetchone()[0]
+
+
+def nueva_sesion(reservar_stock, cash_register_id=1, ttl_reserva=None):
+    """SesionVenta con un carrito nuevo sobre la sucursal 1"""
+    sesion = SesionVenta(
+        InventarioSQLite(branch_id=1),
+        RegistroVentas(branch_id=1, cash_register_id=cash_register_id),
+        reservar_stock=reservar_stock,
+        ttl_reserva=ttl_reserva,
+    )
+    sesion.iniciar_venta(Carrito())
+    return sesion
+
+
+def main():
+    print("=" * 60)
+    print("  TESTS DE RESERVAS DE STOCK")
+    print("=" * 60)
+
+    passed = 0
+    failed = 0
+
+    def test(name, fn):
+        nonlocal passed, failed
+        temp_dir = setup_test_db()
+        try:
+            fn()
+            print(f"  [OK] {name}")
+            passed += 1
+        except Exception as e:
+            print(f"  [FAIL] {name}: {type(e).__name__} {e}")
+            failed += 1
+        finally:
+            cleanup_test_db(temp_dir)
+
+    # ========================================
+    # TEST 1: Repository
+    # ========================================
+    print("\n--- Test 1: Reservar, vender y liberar ---")
+
+    def test_hold_and_sale():
+        assert repo.reserve_stock(1, "a", ESCASO, 3) == (True, 5)
+        assert repo.reserve_stock(1, "b", ESCASO, 3) == (False, 2), "Reservo lo de otro carrito"
+        assert repo.reserve_stock(1, "b", ESCASO, 2) == (True, 2)
+        assert repo.get_available_stock(1, ESCASO) == 0
+        assert repo.get_available_stock(1, ESCASO, session_id="a") == 3
+        # Cambiar el total del carrito (no suma): bajar de 3 a 1 libera 2
+        assert repo.reserve_stock(1, "a", ESCASO, 1) == (True, 3)
+        assert repo.get_available_stock(1, ESCASO) == 2
+
+        # Una venta sin reservas no puede llevarse lo reservado
+        try:
+            repo.process_sale_atomic(1, 1, [item(ESCASO, 3)], 300, "2026-03-05 10:00:00")
+            raise AssertionError("Vendio unidades reservadas por otro carrito")
+        except ValueError as e:
+            assert "Disponible: 2" in str(e), str(e)
+
+        # La venta de "b" usa lo suyo y borra sus reservas en la misma transacción
+        repo.process_sale_atomic(1, 1, [item(ESCASO, 2)], 200, "2026-03-05 10:00:01",
+                                 session_id="b")
+        assert repo.get_branch_product_stock(1, ESCASO) == 3
+        assert repo.get_available_stock(1, ESCASO) == 2 and reservations() == 1
+
+        assert repo.release_reservation(1, "a", ESCASO) == 1
+        assert repo.get_available_stock(1, ESCASO) == 3 and reservations() == 0
+        assert repo.reserve_stock(1, "a", "No Existe", 1) == (False, 0)
+
+    test("Lo reservado no lo toma otro carrito; la venta consume lo propio", test_hold_and_sale)
+
+    # ========================================
+    # TEST 2: Vencimiento
+    # ========================================
+    print("\n--- Test 2: Vencimiento y barrido ---")
+
+    def test_expiry():
+        assert repo.reserve_stock(1, "a", ESCASO, 5, ttl=0.05)[0]
+        assert repo.reserve_stock(1, "b", ESCASO, 1) == (False, 0)
+        time.sleep(0.1)
+        # Vencida: deja de contar en el acto, sin que nadie la borre
+        assert repo.get_available_stock(1, ESCASO) == 5 and reservations() == 1
+
+        # Cada reserva barre de paso hasta RESERVATION_SWEEP_BATCH vencidas
+        with repo._connection(1) as conn:
+            conn.executemany(
+                """INSERT INTO stock_reservation
+                       (branch_id, product_id, session_id, quantity, expires_at)
+                   VALUES (1, 2, ?, 1, ?)""",
+                [(f"vieja-{i}", time.time() - 60) for i in range(repo.RESERVATION_SWEEP_BATCH + 20)]
+            )
+            conn.commit()
+        assert repo.reserve_stock(1, "b", ESCASO, 1) == (True, 5)
+        # 121 vencidas ("a" + las insertadas): quedan "b" y 21
+        assert reservations() == 1 + 21, f"Quedaron {reservations()}"
+        assert repo.sweep_expired_reservations(1) == 21
+        assert reservations() == 1
+
+        # Reservar otra cosa renueva el vencimiento de TODO el carrito
+        assert repo.reserve_stock(1, "c", ABUNDANTE, 1, ttl=0.05)[0]
+        assert repo.reserve_stock(1, "c", ESCASO, 1, ttl=60)[0]
+        time.sleep(0.1)
+        assert repo.get_available_stock(1, ABUNDANTE) == 99, "Vencio con el carrito en uso"
+
+    test("Las vencidas no cuentan y se barren de a tandas", test_expiry)
+
+    # ========================================
+    # TEST 3: Carrito y SesionVenta
+    # ========================================
+    print("\n--- Test 3: Carrito con reservas ---")
+
+    def test_cart():
+        uno = nueva_sesion(reservar_stock=True)
+        otro = nueva_sesion(reservar_stock=True, cash_register_id=2)
+
+        assert uno.agregar_producto(ESCASO, 3).exito
+        assert uno.agregar_producto(ESCASO, 1).exito
+        resultado = otro.agregar_producto(ESCASO, 2)
+        assert not resultado.exito and "Disponible: 1" in resultado.mensaje, resultado.mensaje
+
+        assert uno.carrito.modificar_cantidad(ESCASO, 2)
+        assert otro.agregar_producto(ESCASO, 2).exito
+        assert not uno.carrito.modificar_cantidad(ESCASO, 4), "Subio por encima del disponible"
+        assert uno.carrito.cantidad_de(ESCASO) == 2
+
+        uno.carrito.quitar(ESCASO)
+        assert repo.get_available_stock(1, ESCASO) == 3
+        assert uno.agregar_producto(ABUNDANTE, 10).exito
+        uno.carrito.vaciar()
+        assert repo.get_available_stock(1, ABUNDANTE) == 100 and reservations() == 1
+
+        otro.confirmar_pago("efectivo")
+        assert repo.get_branch_product_stock(1, ESCASO) == 3 and reservations() == 0
+
+    test("quitar, vaciar, modificar_cantidad y cobrar mantienen las reservas", test_cart)
+
+    def test_rejected_scans():
+        sesion = nueva_sesion(reservar_stock=True)
+        assert sesion.agregar_producto(ESCASO, 2).exito
+
+        # Cantidad inválida o producto inexistente: no se reserva nada
+        for nombre, cantidad in ((ESCASO, 0), (ESCASO, -2), ("No Existe", 1)):
+            assert not sesion.agregar_producto(nombre, cantidad).exito
+            assert sesion.carrito.reservas.reservado == {ESCASO: 2}
+            assert repo.get_available_stock(1, ESCASO) == 3 and reservations() == 1
+
+        # Si falla agregar al carrito después de reservar, se devuelve lo apartado
+        def agregar_que_falla(producto, cantidad):
+            raise RuntimeError("falla")
+        sesion.carrito.agregar = agregar_que_falla
+        for nombre in (ESCASO, ABUNDANTE):
+            try:
+                sesion.agregar_producto(nombre, 1)
+                raise AssertionError("Deberia propagar el error")
+            except RuntimeError:
+                pass
+        assert sesion.carrito.reservas.reservado == {ESCASO: 2}
+        assert repo.get_available_stock(1, ESCASO) == 3
+        assert repo.get_available_stock(1, ABUNDANTE) == 100 and reservations() == 1
+
+    def test_rejected_without_lock():
+        from database import retry
+
+        original_policy = repo.RETRY_POLICY
+        # La conexión del pool ya abierta, como en una caja que viene vendiendo
+        # (abrirla configura la BD y eso sí espera el lock)
+        assert repo.get_available_stock(1, ESCASO) == 5
+        conn = sqlite3.connect(repo.DB_PATH, isolation_level=None)
+        try:
+            repo.RETRY_POLICY = retry.RetryPolicy(attempt_timeout=0.05, budget=0.3)
+            conn.execute("BEGIN IMMEDIATE")
+            # Otra conexión tiene el write lock: el rechazo no lo necesita
+            assert repo.reserve_stock(1, "a", ESCASO, 6) == (False, 5)
+            assert repo.reserve_stock(1, "a", "No Existe", 1) == (False, 0)
+            try:
+                repo.reserve_stock(1, "a", ESCASO, 1)
+                raise AssertionError("Reservo sin el write lock")
+            except retry.DatabaseBusyError:
+                pass
+        finally:
+            conn.execute("ROLLBACK")
+            conn.close()
+            repo.RETRY_POLICY = original_policy
+        assert repo.reserve_stock(1, "a", ESCASO, 1) == (True, 5)
+
+    test("Un escaneo rechazado no deja reservas", test_rejected_scans)
+    test("Una reserva rechazada no toma el write lock", test_rejected_without_lock)
+
+    # ========================================
+    # TEST 4: Cajas concurrentes
+    # ========================================
+    print("\n--- Test 4: Cobros fallidos con y sin reservas ---")
+
+    def run_registers(reservar_stock, registers=6, quantity=2):
+        """
+        Cada caja carga `quantity` unidades del producto escaso; recién cuando
+        todas cargaron, cobran a la vez (el cliente tarda en pagar).
+        Returns: dict con rechazos al agregar, cobros fallidos y cobros OK
+        """
+        counts = {"rejected": 0, "failed_checkouts": 0, "sold": 0}
+        lock = threading.Lock()
+        all_loaded = threading.Barrier(registers)
+
+        def register(i):
+            sesion = nueva_sesion(reservar_stock, cash_register_id=1 + i % 2)
+            added = sesion.agregar_producto(ESCASO, quantity).exito
+            all_loaded.wait()
+            if not added:
+                with lock:
+                    counts["rejected"] += 1
+                return
+            try:
+                sesion.confirmar_pago("efectivo")
+                outcome = "sold"
+            except ValueError:
+                outcome = "failed_checkouts"
+                sesion.carrito.vaciar()
+            with lock:
+                counts[outcome] += 1
+
+        threads = [threading.Thread(target=register, args=(i,)) for i in range(registers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return counts
+
+    def test_checkouts():
+        without = run_registers(reservar_stock=False)
+        stock_without = repo.get_branch_product_stock(1, ESCASO)
+        repo.update_branch_product_stock(1, ESCASO, 5 - stock_without)
+
+        with_holds = run_registers(reservar_stock=True)
+
+        # Stock 5, carritos de 2: se venden 2 carritos en los dos casos
+        assert without == {"rejected": 0, "failed_checkouts": 4, "sold": 2}, without
+        assert with_holds == {"rejected": 4, "failed_checkouts": 0, "sold": 2}, with_holds
+        assert stock_without == 1 and repo.get_branch_product_stock(1, ESCASO) == 1
+        assert reservations() == 0, "Quedaron reservas despues de cobrar"
+
+    test("Con reservas ningun cobro falla por stock (se rechaza al agregar)", test_checkouts)
+
+    # ========================================
+    # RESUMEN
+    # ========================================
+    print(f"\n{'=' * 60}")
+    print(f"  RESULTADO: {passed} pasaron, {failed} fallaron")
+    print(f"{'=' * 60}")
+
+    return 0 if failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
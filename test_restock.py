@@ -0,0 +1,400 @@
+"""
+Tests de la compra a proveedores atómica (restock_from_supplier(s) y ServicioCompra).
+
+ARQUITECTURA DEL TEST:
+- Igual que test_concurrency.py: BD temporal, repo.DB_PATH parcheado, con
+  dos proveedores para "Producto Escaso" y uno para "Producto Abundante"
+- Verifica que caja, proveedor y stock de la sucursal cambian juntos (con
+  su movimiento en el historial) y que, si algo falla, no cambia ninguno
+- Verifica que dos gerentes que compran el último stock de un proveedor
+  a la vez no lo compran dos veces
+- Verifica ServicioCompra.reponer_producto / reponer_productos y que, con
+  sharding, la compra de una sucursal usa su caja y su stock, y que una
+  compra cortada entre el archivo compartido y el de la sucursal se anula
+  (reconcile_supplier_restocks) sin dejar al proveedor descontado
+"""
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+# Agregar root al path para importar modulos del proyecto
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database import producto_repository as repo
+from caja import Caja
+from gestor_proveedor import GestorProveedor
+from inventario_sqlite import InventarioSQLite
+from servicio_compra import ServicioCompra
+import test_concurrency
+import test_sharding
+
+
+ESCASO = "Producto Escaso"  # stock 5
+ABUNDANTE = "Producto Abundante"  # stock 100
+SALDO = 10000  # de cada caja de test_concurrency
+
+
+def sembrar_proveedores():
+    """
+    Escaso: Barato (60 c/u, 10 unidades) y Caro (80 c/u, 100 unidades).
+    Abundante: Barato (30 c/u, 50 unidades).
+    Returns: {(proveedor, producto): relation_id}
+    """
+    barato = repo.create_supplier("Barato")
+    caro = repo.create_supplier("Caro")
+    escaso = repo.get_product_id_by_name(ESCASO)
+    abundante = repo.get_product_id_by_name(ABUNDANTE)
+    return {
+        ("Barato", ESCASO): repo.create_product_supplier_relation(escaso, barato, 60, 10),
+        ("Caro", ESCASO): repo.create_product_supplier_relation(escaso, caro, 80, 100),
+        ("Barato", ABUNDANTE): repo.create_product_supplier_relation(abundante, barato, 30, 50),
+    }
+
+
+def estado(branch_id=1, cash_register_id=1):
+    """(saldo de la caja, {relation_id: available_stock}, {producto: stock}, movimientos)"""
+    with repo._connection(branch_id) as conn:
+        saldo = conn.execute(
+            "SELECT current_balance FROM cash_register WHERE id = ?", (cash_register_id,)
+        ).fetchone()[0]
+        proveedores = dict(conn.execute("SELECT id, available_stock FROM product_supplier").fetchall())
+        stocks = dict(conn.execute(
+            """SELECT p.name, bp.stock FROM branch_product bp JOIN product p ON p.id = bp.product_id
+               WHERE bp.branch_id = ?""", (branch_id,)
+        ).fetchall())
+        movimientos = conn.execute("SELECT COUNT(*) FROM stock_movement").fetchone()[0]
+    return saldo, proveedores, stocks, movimientos
+
+
+def main():
+    print("=" * 60)
+    print("  TESTS DE COMPRA A PROVEEDORES ATÓMICA")
+    print("=" * 60)
+
+    passed = 0
+    failed = 0
+
+    def test(name, fn, modulo=test_concurrency):
+        nonlocal passed, failed
+        temp_dir = modulo.setup_test_db()
+        if isinstance(temp_dir, tuple):
+            temp_dir = temp_dir[0]
+        try:
+            fn()
+            print(f"  [OK] {name}")
+            passed += 1
+        except Exception as e:
+            print(f"  [FAIL] {name}: {type(e).__name__} {e}")
+            failed += 1
+        finally:
+            modulo.cleanup_test_db(temp_dir)
+
+    # ========================================
+    # TEST 1: Todo junto o nada
+    # ========================================
+    print("\n--- Test 1: Una transacción ---")
+
+    def test_restock():
+        rel = sembrar_proveedores()
+        saldo, proveedores, stocks, movimientos = estado()
+        costo = repo.restock_from_supplier(1, 1, rel[("Caro", ESCASO)], 7)
+        assert costo == 7 * 80
+        despues = estado()
+        assert despues[0] == saldo - costo
+        assert despues[1][rel[("Caro", ESCASO)]] == proveedores[rel[("Caro", ESCASO)]] - 7
+        assert despues[2][ESCASO] == stocks[ESCASO] + 7
+        assert despues[3] == movimientos + 1
+        ultimo = repo.get_stock_movements(1, ESCASO)[-1]
+        assert (ultimo[1], ultimo[2]) == (7, "purchase"), ultimo
+        assert repo.get_stock_drift(1) == []
+
+    def test_nothing_on_failure():
+        rel = sembrar_proveedores()
+        with repo._connection(1) as conn:
+            conn.execute("INSERT INTO product (name, category) VALUES ('Sin Sucursal', 'Test')")
+            sin_sucursal = conn.execute("SELECT id FROM product WHERE name = 'Sin Sucursal'").fetchone()[0]
+            conn.commit()
+        otra = repo.create_product_supplier_relation(sin_sucursal, 1, 10, 10)
+        # Compra previa que deja la caja con 1600 y al proveedor caro con 10
+        repo.restock_from_suppliers(1, 1, [(rel[("Caro", ESCASO)], 90), (rel[("Barato", ABUNDANTE)], 40)])
+        antes = estado()
+        casos = [
+            # 600 + 800 + 300 = 1700: cada compra tiene stock, el lote no tiene saldo
+            ("saldo", lambda: repo.restock_from_suppliers(1, 1, [
+                (rel[("Barato", ESCASO)], 10), (rel[("Caro", ESCASO)], 10),
+                (rel[("Barato", ABUNDANTE)], 10)])),
+            ("proveedor", lambda: repo.restock_from_supplier(1, 1, rel[("Barato", ESCASO)], 11)),
+            ("proveedor (la misma relación dos veces)", lambda: repo.restock_from_suppliers(1, 1, [
+                (rel[("Barato", ESCASO)], 6), (rel[("Barato", ESCASO)], 5)])),
+            ("sucursal", lambda: repo.restock_from_supplier(1, 1, otra, 1)),
+            ("relación", lambda: repo.restock_from_supplier(1, 1, 9999, 1)),
+            ("caja", lambda: repo.restock_from_supplier(1, 99, rel[("Caro", ESCASO)], 1)),
+            ("cantidad", lambda: repo.restock_from_supplier(1, 1, rel[("Caro", ESCASO)], 0)),
+        ]
+        for motivo, fn in casos:
+            try:
+                fn()
+                raise AssertionError(f"No falló: {motivo}")
+            except ValueError:
+                pass
+            assert estado() == antes, f"Quedó a medias: {motivo}"
+
+    def test_crash_midway():
+        rel = sembrar_proveedores()
+        antes = estado()
+        original = repo._record_movements
+
+        def corte(*args, **kwargs):
+            raise sqlite3.OperationalError("disk I/O error")
+
+        repo._record_movements = corte
+        try:
+            repo.restock_from_suppliers(1, 1, [(rel[("Caro", ESCASO)], 5), (rel[("Barato", ABUNDANTE)], 5)])
+            raise AssertionError("No falló")
+        except sqlite3.OperationalError:
+            pass
+        finally:
+            repo._record_movements = original
+        # Caja y proveedor ya se habían actualizado dentro de la transacción: ROLLBACK
+        assert estado() == antes
+
+    test("Caja, proveedor, stock e historial cambian juntos", test_restock)
+    test("Una compra inválida no cambia nada", test_nothing_on_failure)
+    test("Un error a mitad de la transacción no deja nada a medias", test_crash_midway)
+
+    # ========================================
+    # TEST 2: Concurrencia
+    # ========================================
+    print("\n--- Test 2: Dos gerentes compran el último stock ---")
+
+    def test_race():
+        rel = sembrar_proveedores()
+        barrera = threading.Barrier(2)
+        resultados = []
+
+        def comprar(cash_register_id):
+            barrera.wait()
+            try:
+                repo.restock_from_supplier(1, cash_register_id, rel[("Barato", ESCASO)], 8)
+                resultados.append("ok")
+            except ValueError:
+                resultados.append("sin stock")
+
+        hilos = [threading.Thread(target=comprar, args=(caja,)) for caja in (1, 2)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        assert sorted(resultados) == ["ok", "sin stock"], resultados
+        saldos = [estado(cash_register_id=caja)[0] for caja in (1, 2)]
+        assert sorted(saldos) == [SALDO - 8 * 60, SALDO], saldos
+        assert estado()[1][rel[("Barato", ESCASO)]] == 2
+        assert estado()[2][ESCASO] == 5 + 8
+
+    test("Solo una de dos compras simultáneas del mismo stock se hace", test_race)
+
+    # ========================================
+    # TEST 3: ServicioCompra
+    # ========================================
+    print("\n--- Test 3: ServicioCompra ---")
+
+    def servicio(branch_id=1, cash_register_id=1):
+        inventario = InventarioSQLite(branch_id=branch_id)
+        gestor = GestorProveedor(inventario)
+        return ServicioCompra(gestor, Caja(cash_register_id, branch_id), inventario), gestor, inventario
+
+    def test_service_batch():
+        rel = sembrar_proveedores()
+        compra, gestor, inventario = servicio()
+        escaso = inventario.obtener_producto(ESCASO)
+        abundante = inventario.obtener_producto(ABUNDANTE)
+
+        # 6 + 6 de Escaso: el segundo ya no entra en el barato (le quedan 4)
+        costo = compra.reponer_productos([(escaso, 6), (escaso, 6), (abundante, 10)])
+        assert costo == 6 * 60 + 6 * 80 + 10 * 30, costo
+        en_memoria = {r.id_relacion: r.stock_disponible for r in gestor.relaciones}
+        assert en_memoria == {k: v for k, v in estado()[1].items() if k in en_memoria}
+        assert en_memoria[rel[("Barato", ESCASO)]] == 4
+        assert not any(r.modificado for r in gestor.relaciones)
+        assert gestor.guardar()["escritas"] == 0
+        assert estado()[0] == SALDO - costo
+
+        # Si no alcanza el saldo para el lote, no se compra nada (300 + 800 > 860)
+        Caja(1, 1).retirar(8000)
+        antes = estado()
+        try:
+            compra.reponer_productos([(abundante, 10), (escaso, 10)])
+            raise AssertionError("Compró sin saldo")
+        except ValueError as e:
+            assert "Capital insuficiente" in str(e), e
+        assert estado() == antes
+
+    def test_service_stale_memory():
+        rel = sembrar_proveedores()
+        compra, gestor, inventario = servicio()
+        escaso = inventario.obtener_producto(ESCASO)
+        # Otro proceso se lleva el stock del barato después de cargar el gestor
+        repo.set_supplier_stock(rel[("Barato", ESCASO)], 0)
+        antes = estado()
+        try:
+            compra.reponer_producto(escaso, 5)
+            raise AssertionError("Compró stock que el proveedor ya no tenía")
+        except ValueError as e:
+            assert "Stock insuficiente" in str(e), e
+        assert estado() == antes
+
+    test("reponer_productos compra el lote en una transacción", test_service_batch)
+    test("Si el stock en memoria quedó viejo, la BD rechaza la compra", test_service_stale_memory)
+
+    # ========================================
+    # TEST 4: Sharding
+    # ========================================
+    print("\n--- Test 4: Con un archivo por sucursal ---")
+
+    def test_branch_files():
+        gestor = GestorProveedor(InventarioSQLite(branch_id=2))
+        gestor.agregar_relacion("Coca Cola 500ml", "Distribuidora Norte", 90, stock_inicial=40)
+        saldo = repo.get_cash_register_balance(3, branch_id=2)
+        stock = repo.get_product_by_name("Coca Cola 500ml", 2)[3]
+        stock_centro = repo.get_product_by_name("Coca Cola 500ml", 1)[3]
+        compra, _, inventario = servicio(branch_id=2, cash_register_id=3)
+        costo = compra.reponer_producto(inventario.obtener_producto("Coca Cola 500ml"), 10)
+        assert costo == 900
+        assert repo.get_cash_register_balance(3, branch_id=2) == saldo - 900
+        assert repo.get_product_by_name("Coca Cola 500ml", 2)[3] == stock + 10
+        assert repo.get_product_by_name("Coca Cola 500ml", 1)[3] == stock_centro
+        # La caja 1 es de la sucursal Centro: no paga compras de Norte
+        try:
+            repo.restock_from_supplier(2, 1, gestor.relaciones[0].id_relacion, 1)
+            raise AssertionError("Pagó con una caja de otra sucursal")
+        except ValueError:
+            pass
+
+    test("Cada sucursal paga con su caja y recibe en su stock", test_branch_files, modulo=test_sharding)
+
+    def relacion_norte(precio):
+        """Proveedor de Coca Cola 500ml para Norte (40 unidades). Returns: relation_id"""
+        gestor = GestorProveedor(InventarioSQLite(branch_id=2))
+        gestor.agregar_relacion("Coca Cola 500ml", "Distribuidora Norte", precio, stock_inicial=40)
+        return gestor.relaciones[0].id_relacion
+
+    def reservas(branch_id=2):
+        """(compras pendientes en el compartido, resultados en el archivo de la sucursal)"""
+        with repo._connection(branch_id) as conn:
+            pendientes = conn.execute("SELECT COUNT(*) FROM supplier_restock_pending").fetchone()[0]
+            resultados = conn.execute("SELECT COUNT(*) FROM supplier_restock_outcome").fetchone()[0]
+        return pendientes, resultados
+
+    def test_sharded_failure():
+        rel = relacion_norte(1000)
+        antes = estado(2, 3)
+        assert repo.restock_from_supplier(2, 3, rel, 10) == 10000
+        despues = estado(2, 3)
+        assert despues[0] == antes[0] - 10000 and despues[1][rel] == 30
+        assert despues[2]["Coca Cola 500ml"] == antes[2]["Coca Cola 500ml"] + 10
+        assert reservas() == (0, 1)
+
+        # 30 * 1000 > saldo: el proveedor ya estaba descontado, recupera las 30
+        try:
+            repo.restock_from_supplier(2, 3, rel, 30)
+            raise AssertionError("Compró sin saldo")
+        except ValueError as e:
+            assert "Saldo insuficiente" in str(e), e
+        assert estado(2, 3) == despues
+        assert reservas() == (0, 1)
+
+    def test_sharded_crash():
+        rel = relacion_norte(90)
+        antes = estado(2, 3)
+        originales = repo._charge_restock, repo._cancel_supplier_restock
+
+        def corte(*args, **kwargs):
+            raise sqlite3.OperationalError("disk I/O error")
+
+        # El proceso muere después de reservar en el compartido: ni cobra ni anula
+        repo._charge_restock = repo._cancel_supplier_restock = corte
+        try:
+            repo.restock_from_supplier(2, 3, rel, 10)
+            raise AssertionError("No falló")
+        except sqlite3.OperationalError:
+            pass
+        finally:
+            repo._charge_restock, repo._cancel_supplier_restock = originales
+        medio = estado(2, 3)
+        assert medio[1][rel] == 30 and (medio[0], medio[2], medio[3]) == (antes[0], antes[2], antes[3])
+        assert reservas() == (1, 0)
+
+        # Recién reservada puede ser una compra en curso de otra caja: no se toca
+        assert repo.reconcile_supplier_restocks(2) == 0
+        assert estado(2, 3) == medio and reservas() == (1, 0)
+
+        # Pasado RESTOCK_PENDING_MAX_AGE se anula: el proveedor recupera el stock
+        assert repo.reconcile_supplier_restocks(2, min_age=0) == 1
+        assert estado(2, 3) == antes
+        assert reservas() == (0, 0)
+
+        # Confirmada en la sucursal pero sin borrar la reserva: la compra queda hecha
+        repo.restock_from_supplier(2, 3, rel, 10)
+        hecha = estado(2, 3)
+        with repo._connection(2) as conn:
+            conn.execute(
+                """INSERT INTO supplier_restock_pending (id, branch_id, supplier_deltas, created_at)
+                   VALUES (100, 2, ?, 0)""", (json.dumps([[rel, 10]]),)
+            )
+            conn.execute("INSERT INTO supplier_restock_outcome (restock_id, committed) VALUES (100, 1)")
+            conn.commit()
+        assert repo.reconcile_supplier_restocks(2) == 0
+        assert estado(2, 3) == hecha
+        assert reservas() == (0, 0)
+
+    test("Si la sucursal rechaza la compra, el proveedor recupera el stock", test_sharded_failure,
+         modulo=test_sharding)
+    test("Una compra cortada entre los dos archivos se resuelve al arrancar", test_sharded_crash,
+         modulo=test_sharding)
+
+    def test_sharded_busy_not_retried():
+        from database import retry
+
+        rel = relacion_norte(90)
+        antes = estado(2, 3)
+        originales = repo._charge_restock, repo._cancel_supplier_restock, repo.RETRY_POLICY
+
+        def ocupada(*args, **kwargs):
+            raise sqlite3.OperationalError("database is locked")
+
+        # La sucursal está ocupada y el compartido también al querer anular
+        repo._charge_restock = repo._cancel_supplier_restock = ocupada
+        repo.RETRY_POLICY = retry.RetryPolicy(attempt_timeout=0.05, budget=0.5)
+        try:
+            repo.restock_from_supplier(2, 3, rel, 10)
+            raise AssertionError("No falló")
+        except sqlite3.OperationalError as e:
+            # No es "BD ocupada": _retry_on_busy no volvió a reservar
+            assert not retry.is_busy(e), e
+        finally:
+            repo._charge_restock, repo._cancel_supplier_restock, repo.RETRY_POLICY = originales
+        despues = estado(2, 3)
+        assert despues[1][rel] == 30, despues[1][rel]
+        assert (despues[0], despues[2]) == (antes[0], antes[2])
+        assert reservas() == (1, 0)
+
+        assert repo.reconcile_supplier_restocks(2, min_age=0) == 1
+        assert estado(2, 3) == antes
+
+    test("Si no se puede anular la reserva, la compra no se reintenta", test_sharded_busy_not_retried,
+         modulo=test_sharding)
+
+    # ========================================
+    # RESUMEN
+    # ========================================
+    print(f"\n{'=' * 60}")
+    print(f"  RESULTADO: {passed} pasaron, {failed} fallaron")
+    print(f"{'=' * 60}")
+
+    return 0 if failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""
+Tests de la búsqueda de productos por nombre (search_by_name con FTS5 trigram).
+
+ARQUITECTURA DEL TEST:
+- Igual que test_concurrency.py: BD temporal, repo.DB_PATH parcheado
+- Verifica que el índice product_fts sigue a product por los triggers
+  (alta, cambio de nombre, baja) sin reconstruirlo a mano
+- Verifica los filtros por sucursal/activo, el orden por relevancia, el
+  límite y el camino LIKE para textos de menos de 3 letras
+"""
+import os
+import sys
+import sqlite3
+
+# Agregar root al path para importar modulos del proyecto
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database import producto_repository as repo
+from test_concurrency import setup_test_db, cleanup_test_db
+
+
+def main():
+    print("=" * 60)
+    print("  TESTS DE BUSQUEDA POR NOMBRE (FTS5)")
+    print("=" * 60)
+
+    passed = 0
+    failed = 0
+
+    def test(name, fn):
+        nonlocal passed, failed
+        temp_dir = setup_test_db()
+        try:
+            fn()
+            print(f"  [OK] {name}")
+            passed += 1
+        except Exception as e:
+            print(f"  [FAIL] {name}: {type(e).__name__} {e}")
+            failed += 1
+        finally:
+            cleanup_test_db(temp_dir)
+
+    # ========================================
+    # TEST 1: El índice sigue a la tabla product
+    # ========================================
+    print("\n--- Test 1: Sincronizacion por triggers ---")
+
+    def test_triggers():
+        # Los productos que ya existían entraron con el 'rebuild' de la migración
+        assert sorted(repo.search_by_name("producto", 1)) == ["Producto Abundante", "Producto Escaso"]
+
+        repo.create_product_with_branch("Yerba Mate 1kg", "Almacen", 1, 300, 10)
+        assert repo.search_by_name("mate", 1) == ["Yerba Mate 1kg"]
+
+        conn = sqlite3.connect(repo.DB_PATH)
+        conn.execute("UPDATE product SET name = 'Yerba Suave 1kg' WHERE name = 'Yerba Mate 1kg'")
+        conn.commit()
+        assert repo.search_by_name("mate", 1) == [], "Sigue encontrando el nombre viejo"
+        assert repo.search_by_name("suave", 1) == ["Yerba Suave 1kg"]
+
+        conn.execute("DELETE FROM branch_product WHERE product_id = 3")
+        conn.execute("DELETE FROM product WHERE id = 3")
+        conn.commit()
+        conn.close()
+        assert repo.search_by_name("yerba", 1) == []
+
+    test("Alta, cambio de nombre y baja se reflejan en la busqueda", test_triggers)
+
+    # ========================================
+    # TEST 2: Filtros, orden y textos cortos
+    # ========================================
+    print("\n--- Test 2: Sucursal, activos, orden y LIKE ---")
+
+    def test_filters():
+        conn = sqlite3.connect(repo.DB_PATH)
+        conn.execute("INSERT INTO branch (name, address) VALUES ('Otra', 'Otra Addr')")
+        conn.execute("UPDATE branch_product SET active = 0 WHERE product_id = 1")
+        conn.commit()
+        conn.close()
+
+        assert repo.search_by_name("producto", 1) == ["Producto Abundante"], "Devolvio un inactivo"
+        assert repo.search_by_name("producto", 2) == [], "Devolvio productos de otra sucursal"
+
+    def test_ranking_and_limit():
+        for name in ("Leche Entera", "Dulce de Leche", "Leche Leche Descremada"):
+            repo.create_product_with_branch(name, "Lacteos", 1, 100, 10)
+
+        results = repo.search_by_name("leche", 1)
+        assert sorted(results) == ["Dulce de Leche", "Leche Entera", "Leche Leche Descremada"], results
+        # bm25: el nombre que repite el término es el más relevante
+        assert results[0] == "Leche Leche Descremada", results
+        assert repo.search_by_name("leche", 1, limit=2) == results[:2]
+
+    def test_short_and_literal():
+        # Menos de 3 letras: LIKE, mismo resultado que antes
+        assert sorted(repo.search_by_name("ab", 1)) == ["Producto Abundante"]
+        assert len(repo.search_by_name("o", 1)) == 2
+        # El texto se busca literal: comillas y operadores FTS no rompen la consulta
+        assert repo.search_by_name('"Escaso', 1) == []
+        assert repo.search_by_name("Escaso OR Abundante", 1) == []
+        assert repo.search_by_name("  escaso ", 1) == ["Producto Escaso"]
+
+    test("Solo productos activos de la sucursal pedida", test_filters)
+    test("Resultados ordenados por relevancia y limit", test_ranking_and_limit)
+    test("Textos de menos de 3 letras y textos con comillas", test_short_and_literal)
+
+    # ========================================
+    # RESUMEN
+    # ========================================
+    print(f"\n{'=' * 60}")
+    print(f"  RESULTADO: {passed} pasaron, {failed} fallaron")
+    print(f"{'=' * 60}")
+
+    return 0 if failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,267 @@
+"""
+Tests del sharding por sucursal (database/sharding.py).
+
+ARQUITECTURA DEL TEST:
+- Cada test crea una BD temporal con los datos semilla de init_db
+  (2 sucursales, cajas 1-2 en Centro y 3-4 en Norte) y la parte en un
+  archivo por sucursal con split_into_shards()
+- Activa repo.SHARDING y verifica que InventarioSQLite, RegistroVentas,
+  SesionVenta y Caja funcionan igual que con un solo archivo
+- Verifica que el write lock de una sucursal no frena a la otra
+"""
+import os
+import sys
+import sqlite3
+import threading
+import tempfile
+import shutil
+import time
+
+# Agregar root al path para importar modulos del proyecto
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database import producto_repository as repo
+from database import migrations
+from database import sharding
+from database.init_db import _seed_data
+
+
+def setup_test_db():
+    """
+    Crea una BD temporal con datos semilla, la reparte en shards y activa el sharding.
+    Devuelve (directorio temporal, productos activos por sucursal antes de partir).
+    """
+    temp_dir = tempfile.mkdtemp()
+    db_path = os.path.join(temp_dir, "test_sharding.db")
+    schema_path = os.path.join(os.path.dirname(__file__), "database", "schema.sql")
+
+    repo.DB_PATH = db_path
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA foreign_keys = ON")
+    cursor = conn.cursor()
+    with open(schema_path, "r", encoding="utf-8") as f:
+        cursor.executescript(f.read())
+    migrations.migrate(conn)
+    _seed_data(cursor)
+    conn.commit()
+    conn.close()
+
+    before = {branch_id: sorted(repo.get_active_products(branch_id)) for branch_id in (1, 2)}
+    repo.close_pool()
+
+    sharding.split_into_shards(db_path)
+    repo.SHARDING = True
+    return temp_dir, before
+
+
+def cleanup_test_db(temp_dir):
+    """Desactiva el sharding, limpia la BD temporal y restaura el path original"""
+    repo.close_pool()
+    repo.SHARDING = False
+    repo.DB_PATH = os.path.join(os.path.dirname(__file__), "supermercado.db")
+    shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def item(nombre, cantidad, precio):
+    """Item en el formato de process_sale_atomic"""
+    return {"product_name": nombre, "quantity": cantidad, "price_at_sale": precio}
+
+
+def main():
+    print("=" * 60)
+    print("  TESTS DE SHARDING: UN ARCHIVO POR SUCURSAL")
+    print("=" * 60)
+
+    passed = 0
+    failed = 0
+
+    def test(name, fn):
+        nonlocal passed, failed
+        temp_dir, before = setup_test_db()
+        try:
+            fn(before)
+            print(f"  [OK] {name}")
+            passed += 1
+        except Exception as e:
+            print(f"  [FAIL] {name}: {type(e).__name__} {e}")
+            failed += 1
+        finally:
+            cleanup_test_db(temp_dir)
+
+    # ========================================
+    # TEST 1: split_into_shards mueve las filas sin perder ninguna
+    # ========================================
+    print("\n--- Test 1: Reparto en archivos ---")
+
+    def test_split(before):
+        for branch_id in (1, 2):
+            path = sharding.shard_path(repo.DB_PATH, branch_id)
+            assert os.path.exists(path), f"Falta {path}"
+            after = sorted(repo.get_active_products(branch_id))
+            assert after == before[branch_id], f"Sucursal {branch_id}: productos distintos"
+
+        conn = sqlite3.connect(repo.DB_PATH)
+        try:
+            for table in sharding.SHARD_TABLES:
+                count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                assert count == 0, f"{table} quedo con {count} filas en el archivo compartido"
+        finally:
+            conn.close()
+
+        # Volver a partir no duplica ni pierde nada
+        repo.close_pool()
+        sharding.split_into_shards(repo.DB_PATH)
+        for branch_id in (1, 2):
+            assert sorted(repo.get_active_products(branch_id)) == before[branch_id]
+
+    test("Cada sucursal conserva sus productos y el compartido queda sin filas de sucursal",
+         test_split)
+
+    # ========================================
+    # TEST 2: Las clases de dominio enrutan solas
+    # ========================================
+    print("\n--- Test 2: InventarioSQLite, SesionVenta, RegistroVentas y Caja ---")
+
+    def test_domain_routing(before):
+        from inventario_sqlite import InventarioSQLite
+        from registro_ventas import RegistroVentas
+        from sesion_venta import SesionVenta
+        from carrito import Carrito
+        from caja import Caja
+
+        inventario = InventarioSQLite(branch_id=2)
+        producto = inventario.obtener_producto("Coca Cola 500ml")
+        assert producto is not None, "No encontro el producto en la sucursal 2"
+        stock_norte = producto.stock
+        stock_centro = repo.get_branch_product_stock(1, "Coca Cola 500ml")
+
+        caja = Caja(cash_register_id=3)  # sin branch_id: el repository la busca
+        saldo_inicial = caja.obtener_saldo()
+        assert saldo_inicial == 30000, f"Saldo caja 3: esperado 30000, obtenido {saldo_inicial}"
+
+        sesion = SesionVenta(inventario, RegistroVentas(branch_id=2, cash_register_id=3))
+        sesion.iniciar_venta(Carrito())
+        resultado = sesion.agregar_producto("Coca Cola 500ml", 2)
+        assert resultado.exito, resultado.mensaje
+        _, _, _, total = sesion.confirmar_pago("efectivo")
+
+        assert inventario.obtener_producto("Coca Cola 500ml").stock == stock_norte - 2
+        assert repo.get_branch_product_stock(1, "Coca Cola 500ml") == stock_centro, (
+            "La venta de Norte modifico el stock de Centro"
+        )
+        assert caja.obtener_saldo() == saldo_inicial + total, "La caja 3 no registro la venta"
+
+        caja.retirar(100)
+        assert Caja(cash_register_id=3, branch_id=2).obtener_saldo() == saldo_inicial + total - 100
+        assert Caja(cash_register_id=1).obtener_saldo() == 50000, "Se modifico la caja 1"
+
+    test("Venta en Norte: stock, venta y caja en el archivo de Norte", test_domain_routing)
+
+    # ========================================
+    # TEST 3: Sucursales con write locks independientes
+    # Una transacción larga en Centro no frena una venta en Norte
+    # ========================================
+    print("\n--- Test 3: Write lock por sucursal ---")
+    print("    Una transaccion de Centro retiene su write lock 1s; Norte vende mientras tanto.")
+
+    def test_independent_locks(before):
+        HOLD_SECONDS = 1.0
+        locked = threading.Event()
+        errors = []
+
+        def hold_centro():
+            # Misma forma de tomar el lock que process_sale_atomic, con el
+            # archivo compartido adjunto (el caso que podría trabar a Norte)
+            try:
+                with repo._connection(1) as conn:
+                    cursor = conn.cursor()
+                    repo._begin_immediate(cursor)
+                    cursor.execute(
+                        "UPDATE cash_register SET current_balance = current_balance + 1 WHERE id = 1"
+                    )
+                    locked.set()
+                    time.sleep(HOLD_SECONDS)
+                    conn.rollback()
+            except Exception as e:
+                errors.append(e)
+                locked.set()
+
+        holder = threading.Thread(target=hold_centro)
+        holder.start()
+        locked.wait(timeout=5)
+
+        start = time.perf_counter()
+        sale_id = repo.process_sale_atomic(
+            2, 3, [item("Coca Cola 500ml", 1, 150)], 150, "2026-03-05 10:00:00"
+        )
+        elapsed = time.perf_counter() - start
+
+        holder.join(timeout=10)
+        assert not errors, f"El hilo de Centro fallo: {errors}"
+        assert sale_id is not None
+        assert elapsed < HOLD_SECONDS / 2, f"Norte espero {elapsed:.2f}s el lock de Centro"
+
+    test("Una venta en Norte no espera el write lock de Centro", test_independent_locks)
+
+    # ========================================
+    # TEST 4: Group commit con ventas de dos sucursales en el mismo lote
+    # ========================================
+    print("\n--- Test 4: Group commit con varias sucursales ---")
+
+    def test_group_commit(before):
+        from database.group_commit import GroupCommitWriter
+
+        stock_1 = repo.get_branch_product_stock(1, "Pan Lactal")
+        stock_2 = repo.get_branch_product_stock(2, "Pan Lactal")
+
+        with GroupCommitWriter(max_batch_size=10, max_wait=0.2) as writer:
+            futures = [
+                writer.submit(1 + i % 2, 1 + 2 * (i % 2), [item("Pan Lactal", 1, 10)], 10,
+                              f"2026-03-05 10:00:{i:02d}")
+                for i in range(6)
+            ]
+            sale_ids = [future.result(timeout=10) for future in futures]
+
+        assert all(sale_ids), f"Ventas sin id: {sale_ids}"
+        assert repo.get_branch_product_stock(1, "Pan Lactal") == stock_1 - 3
+        assert repo.get_branch_product_stock(2, "Pan Lactal") == stock_2 - 3
+
+    test("Un lote mezclado confirma cada venta en el archivo de su sucursal", test_group_commit)
+
+    # ========================================
+    # TEST 5: Las funciones ambiguas piden la sucursal
+    # ========================================
+    print("\n--- Test 5: Validaciones ---")
+
+    def test_requires_branch(before):
+        try:
+            repo.create_sale_item(1, 1, 1, 100)
+            raise AssertionError("Deberia fallar: sale_id sin sucursal")
+        except ValueError:
+            pass
+
+        sale_id = repo.create_sale(2, 3, 100, "2026-03-05 10:00:00")
+        repo.create_sale_item(sale_id, 1, 1, 100, branch_id=2)
+
+        try:
+            repo.get_active_products(99)
+            raise AssertionError("Deberia fallar: sucursal sin archivo")
+        except ValueError:
+            pass
+
+    test("create_sale_item exige branch_id y una sucursal sin archivo da error claro",
+         test_requires_branch)
+
+    # ========================================
+    # RESUMEN
+    # ========================================
+    print(f"\n{'=' * 60}")
+    print(f"  RESULTADO: {passed} pasaron, {failed} fallaron")
+    print(f"{'=' * 60}")
+
+    return 0 if failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
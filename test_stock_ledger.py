@@ -0,0 +1,209 @@
+"""
+Tests del historial de stock (stock_movement / stock_snapshot, migración 6).
+
+ARQUITECTURA DEL TEST:
+- Igual que test_concurrency.py: BD temporal, repo.DB_PATH parcheado
+- Verifica que cada camino que cambia el stock (venta, reposición, ajuste,
+  lote, alta) deja su movimiento y que el historial coincide con el contador
+- Verifica el stock en un instante pasado y que, después de compactar, sale
+  del snapshot + la cola (aunque el historial viejo no estuviera)
+- Verifica que repartir en shards mueve el historial sin duplicar aperturas
+"""
+import os
+import sys
+import time
+
+# Agregar root al path para importar modulos del proyecto
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database import producto_repository as repo
+from inventario_sqlite import InventarioSQLite
+from test_concurrency import setup_test_db, cleanup_test_db
+import test_catalog_pages
+
+
+ESCASO = "Producto Escaso"  # stock 5
+ABUNDANTE = "Producto Abundante"  # stock 100
+
+
+def sell(name, quantity, branch_id=1, cash_register_id=1):
+    item = {"product_name": name, "quantity": quantity, "price_at_sale": 100}
+    return repo.process_sale_atomic(
+        branch_id, cash_register_id, [item], 100 * quantity, "2026-03-05 10:00:00"
+    )
+
+
+def reasons(name, branch_id=1):
+    """(delta, reason) de cada movimiento del producto, en orden"""
+    return [(delta, reason) for _, delta, reason, _, _ in repo.get_stock_movements(branch_id, name)]
+
+
+def assert_opening_clock(branch_id):
+    """
+    La apertura (trigger de branch_product) queda con milisegundos, como
+    time.time(): una venta enseguida nunca queda antes que la apertura.
+    """
+    before = time.time()
+    repo.create_product_with_branch(f"Reloj {branch_id}", "Almacen", branch_id, 300, 12)
+    after = time.time()
+    registers = repo.get_cash_registers_by_branch(branch_id)
+    sell(f"Reloj {branch_id}", 1, branch_id, registers[0][0])
+
+    (_, _, _, _, opened), (_, _, _, _, sold) = repo.get_stock_movements(branch_id, f"Reloj {branch_id}")
+    assert before - 0.002 <= opened <= after + 0.002, f"Apertura {opened} fuera de [{before}, {after}]"
+    assert opened <= sold
+    assert repo.get_stock_at(branch_id, f"Reloj {branch_id}", at=opened) == 12
+    assert repo.get_stock_at(branch_id, f"Reloj {branch_id}", at=sold) == 11
+
+
+def main():
+    print("=" * 60)
+    print("  TESTS DEL HISTORIAL DE STOCK")
+    print("=" * 60)
+
+    passed = 0
+    failed = 0
+
+    def test(name, fn, setup=setup_test_db, cleanup=cleanup_test_db):
+        nonlocal passed, failed
+        temp_dir = setup()
+        try:
+            fn()
+            print(f"  [OK] {name}")
+            passed += 1
+        except Exception as e:
+            print(f"  [FAIL] {name}: {type(e).__name__} {e}")
+            failed += 1
+        finally:
+            cleanup(temp_dir)
+
+    # ========================================
+    # TEST 1: Cada cambio de stock deja su movimiento
+    # ========================================
+    print("\n--- Test 1: Movimientos ---")
+
+    def test_movements():
+        inventario = InventarioSQLite(branch_id=1)
+        sale_id = sell(ESCASO, 2)
+        inventario.aumentar_stock(ESCASO, 10)
+        inventario.disminuir_stock(ESCASO, 1)
+        inventario.ajustar_stock_lote([(ESCASO, -3), (ABUNDANTE, 7)])
+        try:
+            sell(ESCASO, 100)
+        except ValueError:
+            pass  # venta fallida: ROLLBACK, sin movimiento
+        repo.create_product_with_branch("Yerba Mate 1kg", "Almacen", 1, 300, 12)
+
+        assert reasons(ESCASO) == [
+            (5, "opening"), (-2, "sale"), (10, "restock"), (-1, "adjust"), (-3, "adjust"),
+        ], reasons(ESCASO)
+        assert repo.get_stock_movements(1, ESCASO)[1][3] == sale_id, "La venta no quedo referenciada"
+        assert reasons("Yerba Mate 1kg") == [(12, "opening")]
+
+        # Paginado por id
+        first, second = repo.get_stock_movements(1, ESCASO, limit=2)
+        assert repo.get_stock_movements(1, ESCASO, after_id=second[0], limit=1)[0][2] == "restock"
+
+        assert repo.get_stock_drift(1) == [], repo.get_stock_drift(1)
+        assert repo.get_stock_at(1, ESCASO) == repo.get_branch_product_stock(1, ESCASO) == 9
+
+    def test_drift():
+        with repo._connection(1) as conn:
+            conn.execute("UPDATE branch_product SET stock = stock + 4 WHERE product_id = 2")
+            conn.commit()
+        assert repo.get_stock_drift(1) == [(ABUNDANTE, 104, 100)], repo.get_stock_drift(1)
+
+    def test_zero_delta():
+        inventario = InventarioSQLite(branch_id=1)
+        assert repo.update_branch_product_stock(1, ESCASO, 0) == 1
+        inventario.ajustar_stock_lote([(ESCASO, 0), (ABUNDANTE, 0), (ABUNDANTE, 2)])
+        assert reasons(ESCASO) == [(5, "opening")], reasons(ESCASO)
+        assert reasons(ABUNDANTE) == [(100, "opening"), (2, "adjust")], reasons(ABUNDANTE)
+        assert repo.get_stock_drift(1) == []
+
+    test("Venta, reposicion, ajuste, lote y alta quedan en el historial", test_movements)
+    test("Un delta 0 no deja movimiento", test_zero_delta)
+    test("Un cambio fuera del repository aparece como diferencia", test_drift)
+
+    # ========================================
+    # TEST 2: Stock en un instante y snapshots
+    # ========================================
+    print("\n--- Test 2: Instantes y compactacion ---")
+
+    def test_point_in_time():
+        sell(ABUNDANTE, 10)
+        time.sleep(0.01)
+        before = time.time()
+        time.sleep(0.01)
+        sell(ABUNDANTE, 5)
+
+        assert repo.snapshot_stock_ledger(1) == 2, "Esperaba un snapshot por producto"
+        assert repo.snapshot_stock_ledger(1) == 0, "Sin movimientos nuevos no hay snapshots"
+        sell(ABUNDANTE, 1)
+        assert repo.snapshot_stock_ledger(1) == 1
+        time.sleep(0.01)
+        sell(ABUNDANTE, 4)
+
+        assert repo.get_stock_at(1, ABUNDANTE, at=before) == 90
+        assert repo.get_stock_at(1, ABUNDANTE) == 80
+        assert repo.get_stock_at(1, ABUNDANTE, at=0) == 0, "Antes de la apertura no habia stock"
+
+        # Con snapshot, el historial anterior no hace falta: sin él da lo mismo
+        with repo._connection(1) as conn:
+            conn.execute(
+                "DELETE FROM stock_movement WHERE id <= (SELECT MAX(movement_id) FROM stock_snapshot)"
+            )
+            conn.commit()
+        assert repo.get_stock_at(1, ABUNDANTE) == 80 and repo.get_stock_at(1, ESCASO) == 5
+        assert repo.get_stock_drift(1) == []
+
+    def test_tail_plan():
+        statements = []
+        with repo._connection(1) as conn:
+            conn.set_trace_callback(statements.append)
+            try:
+                repo.get_stock_at(1, ABUNDANTE)
+            finally:
+                conn.set_trace_callback(None)
+            plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {statements[-1]}")]
+        assert any("idx_stock_movement_product (branch_id=? AND product_id=? AND id>?)" in step
+                   for step in plan), f"La cola no arranca en el snapshot: {plan}"
+
+    def test_opening_clock():
+        assert_opening_clock(1)
+
+    test("Stock en un instante pasado y desde el snapshot", test_point_in_time)
+    test("La apertura usa el mismo reloj que los movimientos", test_opening_clock)
+    test("La cola se lee desde el movimiento del snapshot", test_tail_plan)
+
+    # ========================================
+    # TEST 3: Sharding
+    # ========================================
+    print("\n--- Test 3: Un archivo por sucursal ---")
+
+    def test_sharded():
+        assert reasons("Coca Cola 500ml", branch_id=2) == [(50, "opening")]
+        registers = repo.get_cash_registers_by_branch(2)
+        sell("Coca Cola 500ml", 3, branch_id=2, cash_register_id=registers[0][0])
+        # Un snapshot por producto con stock (Arroz está inactivo y sin stock en Norte)
+        assert repo.snapshot_stock_ledger(2) == len(repo.get_active_products(2))
+        assert repo.get_stock_at(2, "Coca Cola 500ml") == 47
+        assert repo.get_stock_drift(1) == [] and repo.get_stock_drift(2) == []
+        assert_opening_clock(2)
+
+    test("El historial se reparte sin duplicar aperturas", test_sharded,
+         setup=lambda: test_catalog_pages.setup_test_db(sharded=True),
+         cleanup=test_catalog_pages.cleanup_test_db)
+
+    # ========================================
+    # RESUMEN
+    # ========================================
+    print(f"\n{'=' * 60}")
+    print(f"  RESULTADO: {passed} pasaron, {failed} fallaron")
+    print(f"{'=' * 60}")
+
+    return 0 if failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())